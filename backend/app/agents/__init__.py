@@ -1,48 +1,92 @@
 # AI员工模块
-from app.agents.base import BaseAgent, AgentRegistry
-from app.agents.coordinator import coordinator, coordinator_agent, CoordinatorAgent
-from app.agents.sales_agent import sales_agent, SalesAgent
-from app.agents.analyst import analyst_agent, AnalystAgent
-from app.agents.copywriter import copywriter_agent, CopywriterAgent
-from app.agents.video_creator import video_creator_agent, VideoCreatorAgent
-from app.agents.follow_agent import follow_agent, FollowAgent
-from app.agents.lead_hunter import lead_hunter_agent, LeadHunterAgent
-from app.agents.eu_customs_monitor import eu_customs_monitor_agent, EUCustomsMonitorAgent
-from app.agents.assistant_agent import clauwdbot_agent, assistant_agent, ClauwdbotAgent
-from app.agents.code_engineer import CodeEngineerAgent
+#
+# 员工模块按需加载：访问下面的导出名（如 app.agents.sales_agent）或 AgentRegistry.get 时才导入对应模块，
+# 模块导入时创建单例并注册。启动时不再加载全部员工及其依赖（视频、文档、采集等）
+import sys
+import types
+import importlib
 
-# 向后兼容
-AssistantAgent = ClauwdbotAgent
+from app.agents.base import BaseAgent, AgentRegistry
+from app.models.conversation import AgentType
 
-__all__ = [
-    # 基类
-    "BaseAgent",
-    "AgentRegistry",
+# 导出名 -> (模块, 属性)
+_EXPORTS = {
     # Agent类
-    "CoordinatorAgent",
-    "SalesAgent",
-    "AnalystAgent",
-    "CopywriterAgent",
-    "VideoCreatorAgent",
-    "FollowAgent",
-    "LeadHunterAgent",
-    "EUCustomsMonitorAgent",
-    "ClauwdbotAgent",
-    "AssistantAgent",  # 向后兼容
-    "CodeEngineerAgent",  # 小码 - 前端代码工程师
+    "CoordinatorAgent": ("app.agents.coordinator", "CoordinatorAgent"),
+    "SalesAgent": ("app.agents.sales_agent", "SalesAgent"),
+    "AnalystAgent": ("app.agents.analyst", "AnalystAgent"),
+    "CopywriterAgent": ("app.agents.copywriter", "CopywriterAgent"),
+    "VideoCreatorAgent": ("app.agents.video_creator", "VideoCreatorAgent"),
+    "FollowAgent": ("app.agents.follow_agent", "FollowAgent"),
+    "LeadHunterAgent": ("app.agents.lead_hunter", "LeadHunterAgent"),
+    "EUCustomsMonitorAgent": ("app.agents.eu_customs_monitor", "EUCustomsMonitorAgent"),
+    "ClauwdbotAgent": ("app.agents.assistant_agent", "ClauwdbotAgent"),
+    "AssistantAgent": ("app.agents.assistant_agent", "ClauwdbotAgent"),  # 向后兼容
+    "CodeEngineerAgent": ("app.agents.code_engineer", "CodeEngineerAgent"),  # 小码 - 前端代码工程师
     # 单例实例
-    "coordinator",
-    "coordinator_agent",  # 兼容旧代码
-    "sales_agent",
-    "analyst_agent",
-    "copywriter_agent",
-    "video_creator_agent",
-    "follow_agent",
-    "lead_hunter_agent",
-    "eu_customs_monitor_agent",
-    "clauwdbot_agent",
-    "assistant_agent",  # 向后兼容
-]
+    "coordinator": ("app.agents.coordinator", "coordinator"),
+    "coordinator_agent": ("app.agents.coordinator", "coordinator_agent"),  # 兼容旧代码
+    "sales_agent": ("app.agents.sales_agent", "sales_agent"),
+    "analyst_agent": ("app.agents.analyst", "analyst_agent"),
+    "copywriter_agent": ("app.agents.copywriter", "copywriter_agent"),
+    "video_creator_agent": ("app.agents.video_creator", "video_creator_agent"),
+    "follow_agent": ("app.agents.follow_agent", "follow_agent"),
+    "lead_hunter_agent": ("app.agents.lead_hunter", "lead_hunter_agent"),
+    "eu_customs_monitor_agent": ("app.agents.eu_customs_monitor", "eu_customs_monitor_agent"),
+    "clauwdbot_agent": ("app.agents.assistant_agent", "clauwdbot_agent"),
+    "assistant_agent": ("app.agents.assistant_agent", "assistant_agent"),  # 向后兼容
+}
+
+# 员工类型 -> 定义模块（模块导入时注册到 AgentRegistry）
+AGENT_MODULES = {
+    AgentType.COORDINATOR: "app.agents.coordinator",
+    AgentType.SALES: "app.agents.sales_agent",
+    AgentType.ANALYST: "app.agents.analyst",
+    AgentType.ANALYST2: "app.agents.analyst2",
+    AgentType.COPYWRITER: "app.agents.copywriter",
+    AgentType.VIDEO_CREATOR: "app.agents.video_creator",
+    AgentType.FOLLOW: "app.agents.follow_agent",
+    AgentType.LEAD_HUNTER: "app.agents.lead_hunter",
+    AgentType.EU_CUSTOMS_MONITOR: "app.agents.eu_customs_monitor",
+    AgentType.ASSISTANT: "app.agents.assistant_agent",
+    AgentType.CODE_ENGINEER: "app.agents.code_engineer",
+}
+
+for _agent_type, _module_path in AGENT_MODULES.items():
+    AgentRegistry.register_module(_agent_type, _module_path)
+
+__all__ = ["BaseAgent", "AgentRegistry", "AGENT_MODULES", "AI_TEAM", *_EXPORTS]
+
+
+def __getattr__(name: str):
+    """首次访问导出名时导入所在模块"""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_path, attr = _EXPORTS[name]
+    value = getattr(importlib.import_module(module_path), attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+class _AgentsPackage(types.ModuleType):
+    """
+    导入子模块时 import 系统会把子模块写到包属性上（app.agents.sales_agent = <module>），
+    与同名单例（sales_agent / follow_agent / coordinator）冲突；这里忽略该赋值，
+    保持包属性指向单例，与原先在包内直接导入单例的行为一致
+    """
+    
+    def __setattr__(self, name, value):
+        if name in _EXPORTS and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _AgentsPackage
+
 
 # AI员工团队介绍
 AI_TEAM = {
@@ -5,6 +5,7 @@
 """
 import json
 import re
+import asyncio
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from loguru import logger
@@ -12,7 +13,8 @@ from loguru import logger
 from app.agents.base import BaseAgent, AgentRegistry
 from app.models.conversation import AgentType
 from app.core.config import settings
-from app.core.prompts.analyst2 import SYSTEM_PROMPT as ANALYST2_SYSTEM_PROMPT
+from app.core.prompts.analyst2 import SYSTEM_PROMPT as ANALYST2_SYSTEM_PROMPT, CLASSIFY_BATCH_PROMPT
+from app.services.micro_batcher import MicroBatcher
 
 
 class Analyst2Agent(BaseAgent):
@@ -46,10 +48,21 @@ class Analyst2Agent(BaseAgent):
         "红包", "抢购", "限时", "促销", "打折"
     ]
     
+    def __init__(self):
+        super().__init__()
+        # 关键词命中的消息攒批后一次调用LLM分类（任务会话按批次记录，批次串行处理）
+        self._classifier = MicroBatcher(
+            self._ai_analyze_batch,
+            max_items=settings.ANALYST2_BATCH_SIZE,
+            max_wait=settings.ANALYST2_BATCH_WAIT,
+            max_concurrent_batches=1,
+            name="小析2批量分类"
+        )
+    
     def _build_system_prompt(self) -> str:
         return ANALYST2_SYSTEM_PROMPT
     
-    async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def process(self, input_data: Dict[str, Any], batch: bool = True) -> Dict[str, Any]:
         """
         处理微信群消息
         
@@ -61,6 +74,7 @@ class Analyst2Agent(BaseAgent):
                 "content": "消息内容",
                 "message_type": "text/image/file"
             }
+            batch: 是否攒批分析；有用户在等待结果的交互请求传 False，直接单条调用LLM，不等待攒批窗口
         """
         group_id = input_data.get("group_id", "")
         group_name = input_data.get("group_name", "")
@@ -95,39 +109,35 @@ class Analyst2Agent(BaseAgent):
                 "reason": "未匹配关键词"
             }
         
-        # 开始任务会话（实时直播）- 只对需要AI分析的消息启动
-        await self.start_task_session("wechat_analyze", f"分析群消息: {group_name}")
-        
-        try:
-            await self.log_live_step("analyze", "开始AI深度分析", f"来自: {sender_name}")
-            
-            # 使用AI进行深度分析
+        item = {
+            "content": content,
+            "group_name": group_name,
+            "sender_name": sender_name
+        }
+        if batch:
+            # 攒批后由AI深度分析（同一时间窗口内的消息合并为一次调用）
+            analysis = await self._classifier.submit(item)
+        else:
             analysis = await self._ai_analyze(content, group_name, sender_name)
-            
-            # 提取联系方式
-            contact_info = self._extract_contact_info(content)
-            if contact_info:
-                analysis["key_info"] = analysis.get("key_info", {})
-                analysis["key_info"]["contact_info"] = contact_info
-                await self.log_live_step("result", "提取到联系方式", str(contact_info))
-            
-            # 添加元数据
-            analysis["group_id"] = group_id
-            analysis["group_name"] = group_name
-            analysis["sender_name"] = sender_name
-            analysis["keyword_matches"] = keyword_result["keywords"]
-            analysis["analyzed_at"] = datetime.now().isoformat()
-            
-            # 记录日志
-            if analysis.get("is_valuable"):
-                self.log(f"发现有价值信息: [{group_name}] {analysis.get('category')} - {analysis.get('summary', '')[:50]}")
-                await self.log_live_step("result", "发现有价值信息", f"{analysis.get('category')}: {analysis.get('summary', '')[:50]}")
-            
-            await self.end_task_session(f"完成消息分析: {'有价值' if analysis.get('is_valuable') else '无价值'}")
-            return analysis
-        except Exception as e:
-            await self.end_task_session(error_message=str(e))
-            raise
+        
+        # 提取联系方式
+        contact_info = self._extract_contact_info(content)
+        if contact_info:
+            analysis["key_info"] = analysis.get("key_info", {})
+            analysis["key_info"]["contact_info"] = contact_info
+        
+        # 添加元数据
+        analysis["group_id"] = group_id
+        analysis["group_name"] = group_name
+        analysis["sender_name"] = sender_name
+        analysis["keyword_matches"] = keyword_result["keywords"]
+        analysis["analyzed_at"] = datetime.now().isoformat()
+        
+        # 记录日志
+        if analysis.get("is_valuable"):
+            self.log(f"发现有价值信息: [{group_name}] {analysis.get('category')} - {analysis.get('summary', '')[:50]}")
+        
+        return analysis
     
     def _quick_filter(self, content: str) -> bool:
         """快速过滤明显无关的内容"""
@@ -177,7 +187,7 @@ class Analyst2Agent(BaseAgent):
 消息内容：{content}
 
 请判断这条消息的价值，并以JSON格式返回分析结果。"""
-        
+
         response = await self.think([{"role": "user", "content": prompt}], temperature=0.3)
         
         # 解析JSON
@@ -197,6 +207,79 @@ class Analyst2Agent(BaseAgent):
             "reason": "AI分析失败"
         }
     
+    async def _ai_analyze_batch(self, items: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        批量分析一批消息（一次LLM调用），结果顺序与输入一致
+        
+        批量结果中缺失或无法解析的消息单独补充分析
+        """
+        await self.start_task_session("wechat_analyze", f"批量分析群消息: {len(items)}条")
+        
+        try:
+            await self.log_live_step("analyze", "开始AI批量分析", f"{len(items)}条消息")
+            
+            if len(items) == 1:
+                verdicts = {}
+            else:
+                verdicts = await self._classify_batch(items)
+            
+            missing = [i for i in range(len(items)) if i not in verdicts]
+            if missing and len(items) > 1:
+                logger.warning(f"[小析2] 批量结果缺失 {len(missing)}/{len(items)} 条，单独补充分析")
+            fallback = await asyncio.gather(*[
+                self._ai_analyze(items[i]["content"], items[i]["group_name"], items[i]["sender_name"])
+                for i in missing
+            ])
+            verdicts.update(zip(missing, fallback))
+            
+            results = [verdicts[i] for i in range(len(items))]
+            valuable = [r for r in results if r.get("is_valuable")]
+            for analysis in valuable:
+                await self.log_live_step("result", "发现有价值信息", f"{analysis.get('category')}: {analysis.get('summary', '')[:50]}")
+            
+            await self.end_task_session(f"完成{len(items)}条消息分析: {len(valuable)}条有价值")
+            return results
+        except Exception as e:
+            await self.end_task_session(error_message=str(e))
+            raise
+    
+    async def _classify_batch(self, items: List[Dict[str, str]]) -> Dict[int, Dict[str, Any]]:
+        """
+        一次调用分类多条消息
+        
+        Returns:
+            {消息下标: 分析结果}，只包含成功解析的消息
+        """
+        messages = "\n".join(
+            f"【{i + 1}】群：{item['group_name']} | 发送者：{item['sender_name']} | {item['content']}"
+            for i, item in enumerate(items)
+        )
+        prompt = CLASSIFY_BATCH_PROMPT.format(count=len(items), messages=messages)
+        
+        response = await self.think(
+            [{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=min(8000, 600 * len(items))
+        )
+        
+        verdicts = {}
+        try:
+            json_start = response.find("[")
+            json_end = response.rfind("]") + 1
+            if json_start != -1 and json_end > json_start:
+                for verdict in json.loads(response[json_start:json_end]):
+                    if not isinstance(verdict, dict):
+                        continue
+                    try:
+                        index = int(verdict.pop("id")) - 1
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    if 0 <= index < len(items):
+                        verdicts[index] = verdict
+        except json.JSONDecodeError as e:
+            logger.warning(f"[小析2] 批量结果解析失败: {e}")
+        return verdicts
+    
     def _extract_contact_info(self, content: str) -> Optional[Dict[str, str]]:
         """提取联系方式"""
         contact = {}
@@ -226,15 +309,12 @@ class Analyst2Agent(BaseAgent):
         return contact if contact else None
     
     async def process_batch(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """批量处理消息"""
-        results = []
-        for msg in messages:
-            result = await self.process(msg)
-            results.append({
-                "message": msg,
-                "analysis": result
-            })
-        return results
+        """批量处理消息（并发提交，关键词命中的消息会被合并为少量LLM调用）"""
+        analyses = await asyncio.gather(*[self.process(msg) for msg in messages])
+        return [
+            {"message": msg, "analysis": analysis}
+            for msg, analysis in zip(messages, analyses)
+        ]
     
     async def get_daily_summary(self) -> Dict[str, Any]:
         """生成每日汇总"""
@@ -13,6 +13,7 @@ from app.agents.base import BaseAgent
 from app.models.conversation import AgentType
 from app.models.database import AsyncSessionLocal
 from app.core.config import settings
+from app.services.asset_ingestion import asset_ingestion
 from sqlalchemy import text
 
 
@@ -35,7 +36,7 @@ class AssetCollectorAgent(BaseAgent):
 3. 确保素材版权合规
 4. 自动去重，避免重复采集
 """
-    
+
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """处理采集任务"""
         platforms = input_data.get("platforms", ["pexels", "pixabay"])
@@ -100,10 +101,10 @@ class AssetCollectorAgent(BaseAgent):
             else:
                 # 其他平台需要相应的API或爬虫
                 logger.warning(f"[小采] 平台 {platform} 暂未实现自动采集")
-                
+        
         except Exception as e:
             logger.error(f"[小采] 采集失败: {e}")
-            
+        
         return results
     
     async def _search_pexels(self, keyword: str, max_results: int) -> List[Dict[str, Any]]:
@@ -115,7 +116,7 @@ class AssetCollectorAgent(BaseAgent):
         if not api_key:
             logger.warning("[小采] 未配置Pexels API Key")
             return results
-            
+        
         async with httpx.AsyncClient() as client:
             try:
                 response = await client.get(
@@ -156,7 +157,7 @@ class AssetCollectorAgent(BaseAgent):
                             })
             except Exception as e:
                 logger.error(f"[小采] Pexels搜索失败: {e}")
-                
+        
         return results
     
     async def _search_pixabay(self, keyword: str, max_results: int) -> List[Dict[str, Any]]:
@@ -167,7 +168,7 @@ class AssetCollectorAgent(BaseAgent):
         if not api_key:
             logger.warning("[小采] 未配置Pixabay API Key")
             return results
-            
+        
         async with httpx.AsyncClient() as client:
             try:
                 # 搜索视频
@@ -212,50 +213,13 @@ class AssetCollectorAgent(BaseAgent):
                             })
             except Exception as e:
                 logger.error(f"[小采] Pixabay搜索失败: {e}")
-                
+        
         return results
     
     async def save_collected_assets(self, assets: List[Dict[str, Any]]) -> int:
-        """保存采集到的素材到数据库"""
-        saved_count = 0
-        
-        async with AsyncSessionLocal() as db:
-            for asset in assets:
-                try:
-                    # 检查是否已存在（通过source_url判断）
-                    result = await db.execute(
-                        text("SELECT id FROM assets WHERE file_url = :url"),
-                        {"url": asset.get("file_url")}
-                    )
-                    if result.fetchone():
-                        logger.debug(f"[小采] 素材已存在，跳过: {asset.get('name')}")
-                        continue
-                    
-                    # 插入新素材（包含文件大小）
-                    await db.execute(
-                        text("""
-                            INSERT INTO assets (name, type, category, file_url, thumbnail_url, duration, file_size)
-                            VALUES (:name, :type, :category, :file_url, :thumbnail_url, :duration, :file_size)
-                        """),
-                        {
-                            "name": asset.get("name"),
-                            "type": asset.get("type", "video"),
-                            "category": asset.get("platform"),
-                            "file_url": asset.get("file_url"),
-                            "thumbnail_url": asset.get("thumbnail_url"),
-                            "duration": asset.get("duration"),
-                            "file_size": asset.get("file_size", 0)
-                        }
-                    )
-                    saved_count += 1
-                    logger.info(f"[小采] 保存素材: {asset.get('name')}")
-                    
-                except Exception as e:
-                    logger.error(f"[小采] 保存素材失败: {e}")
-                    
-            await db.commit()
-            
-        return saved_count
+        """保存采集到的素材到数据库（批量入库，按URL和缩略图去重）"""
+        stats = await asset_ingestion.ingest(assets, collected_by="asset_collector")
+        return stats["saved"]
     
     async def run_collection_task(self, platforms: List[str] = None, keywords: List[str] = None):
         """执行采集任务"""
@@ -317,7 +281,7 @@ class AssetCollectorAgent(BaseAgent):
         else:
             logger.warning("[小采] 本次采集未发现新素材")
             await self.end_task_session("本次采集未发现新素材")
-            
+        
         return all_assets
     
     async def log_work(self, task_type: str, status: str, output_data: dict = None, error_message: str = None):
@@ -332,7 +296,7 @@ class AssetCollectorAgent(BaseAgent):
                 row = result.fetchone()
                 if not row:
                     return
-                    
+                
                 agent_id = row[0]
                 
                 # 插入工作日志
@@ -22,6 +22,9 @@ from app.models.conversation import AgentType
 from app.models.database import AsyncSessionLocal
 from sqlalchemy import text
 from app.core.prompts.clauwdbot import CLAUWDBOT_SYSTEM_PROMPT, AGENT_MANAGEMENT_PROMPT, AGENT_UPGRADE_PROMPT
+from app.core.prompt_composer import ComposedPrompt, compose_prompt
+from app.core.execution_context import execution_scope, request_local
+from app.core.tracing import tracer
 
 
 class ClauwdbotAgent(BaseAgent):
@@ -79,6 +82,13 @@ class ClauwdbotAgent(BaseAgent):
     CONVERSATION_HISTORY_LIMIT = 20  # 对话历史从10增加到20
     RAG_TOP_K = 5  # RAG检索从3增加到5
     
+    # 单条消息处理期间的状态（按请求隔离：单例并发处理多条消息时互不覆盖）
+    _recent_history: List[Dict] = request_local(default_factory=list)
+    _user_memory_context: str = request_local("")
+    _rag_context: str = request_local("")
+    _is_complex_task: bool = request_local(False)
+    _bot_display_name: Optional[str] = request_local(None)
+    
     # 复杂任务关键词（触发高级模型）
     COMPLEX_TASK_KEYWORDS = [
         "分析", "计划", "方案", "策略", "评估", "设计", "架构",
@@ -96,20 +106,24 @@ class ClauwdbotAgent(BaseAgent):
         return dt.astimezone(ClauwdbotAgent.CHINA_TZ)
     
     def _build_system_prompt(self) -> str:
+        return str(self._compose_react_prompt())
+    
+    def _compose_react_prompt(self) -> ComposedPrompt:
+        """
+        分层组装 ReAct 系统提示词（前缀缓存友好）：
+        角色设定（静态）→ 用户偏好记忆（慢变）→ RAG检索结果（本轮）
+        """
         bot_name = getattr(self, '_bot_display_name', None) or "Clauwdbot"
-        base_prompt = CLAUWDBOT_SYSTEM_PROMPT.format(bot_name=bot_name)
         
-        # 注入用户偏好记忆 + 行动准则（行动准则权重最高，必须遵守）
-        memory_ctx = getattr(self, '_user_memory_context', '')
-        if memory_ctx:
-            base_prompt += f"\n\n{memory_ctx}"
-        
-        # 注入RAG检索到的相关历史（Phase 2）
-        rag_ctx = getattr(self, '_rag_context', '')
-        if rag_ctx:
-            base_prompt += f"\n\n{rag_ctx}"
-        
-        return base_prompt
+        return compose_prompt(
+            CLAUWDBOT_SYSTEM_PROMPT.format(bot_name=bot_name),
+            # 用户偏好记忆 + 行动准则（行动准则权重最高，必须遵守）
+            context=getattr(self, '_user_memory_context', ''),
+            # RAG检索到的相关历史（Phase 2）
+            turn=getattr(self, '_rag_context', ''),
+            # ReAct 每轮都会重发整个系统提示词
+            cache_turn=True
+        )
     
     # ==================== 核心：ReAct 循环 ====================
     
@@ -117,6 +131,17 @@ class ClauwdbotAgent(BaseAgent):
         """
         处理用户消息 - Maria/Clauwdbot 大模型原生对话引擎
         
+        每条消息在独立的执行上下文中处理（历史、记忆、RAG、任务会话、用量归属按请求隔离）
+        """
+        with execution_scope(new_request=True, user_id=input_data.get("user_id") or None):
+            with tracer.span(
+                "maria.process", kind="agent", root=True,
+                message_type=input_data.get("message_type", "text"), user_id=input_data.get("user_id"),
+            ):
+                return await self._process(input_data)
+    
+    async def _process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
         架构：ReAct (Reasoning + Acting) 循环
         LLM 自主决定是直接回复还是调用工具干活，最多循环 MAX_REACT_TURNS 轮
         """
@@ -175,7 +200,7 @@ class ClauwdbotAgent(BaseAgent):
             from app.core.llm import chat_completion
             
             tool_executor = MariaToolExecutor(self)
-            system_prompt = self._build_system_prompt()
+            system_prompt = self._compose_react_prompt()
             
             final_text = ""
             collected_files = []
@@ -10,8 +10,12 @@ from uuid import UUID, uuid4
 from datetime import datetime
 from loguru import logger
 import json
+import importlib
 
 from app.core.llm import chat_completion
+from app.core.prompt_composer import ComposedPrompt, compose_prompt
+from app.core.execution_context import request_local, update_context
+from app.core.tracing import traced
 from app.models.conversation import AgentType
 from app.core.prompts.logistics_expert import LOGISTICS_EXPERT_BASE_PROMPT
 
@@ -34,11 +38,12 @@ class BaseAgent(ABC):
     # 是否启用实时工作直播
     enable_live_broadcast: bool = True
     
+    # 当前任务会话（按请求隔离：AI员工是单例，并发处理多条消息时各自独立）
+    _current_session_id: Optional[UUID] = request_local(None)
+    _session_start_time: Optional[datetime] = request_local(None)
+    
     def __init__(self):
         self.system_prompt = self._build_full_system_prompt()
-        # 当前任务会话ID
-        self._current_session_id: Optional[UUID] = None
-        self._session_start_time: Optional[datetime] = None
         logger.info(f"🤖 {self.name} 初始化完成 (物流专家模式: {'开启' if self.enable_logistics_expertise else '关闭'}, 实时直播: {'开启' if self.enable_live_broadcast else '关闭'})")
     
     def _build_full_system_prompt(self) -> str:
@@ -68,6 +73,24 @@ class BaseAgent(ABC):
         """构建系统提示词，子类必须实现"""
         pass
     
+    def compose_system_prompt(
+        self,
+        context: Optional[str] = None,
+        turn: Optional[str] = None,
+        cache_turn: bool = False
+    ) -> ComposedPrompt:
+        """
+        组装发送给LLM的系统提示词：静态前缀（self.system_prompt）→ 慢变上下文 → 本轮内容
+        
+        动态内容不要拼进 self.system_prompt，否则每次调用前缀都不同，无法命中前缀缓存
+        
+        Args:
+            context: 慢变上下文（公司资料、用户偏好记忆等）
+            turn: 本轮内容（RAG检索结果等）
+            cache_turn: 本轮内容在同一请求内会重复发送时设为True
+        """
+        return compose_prompt(self.system_prompt, context, turn, cache_turn)
+    
     @abstractmethod
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """处理任务，子类必须实现"""
@@ -87,6 +110,8 @@ class BaseAgent(ABC):
         """
         self._current_session_id = uuid4()
         self._session_start_time = datetime.now()
+        # 本请求后续的LLM调用用量归属到该AI员工和任务会话
+        update_context(agent_name=self.name, task_type=task_type, session_id=self._current_session_id)
         
         if self.enable_live_broadcast:
             try:
@@ -196,7 +221,9 @@ class BaseAgent(ABC):
         
         self._current_session_id = None
         self._session_start_time = None
+        update_context(session_id=None)
     
+    @traced("agent.live_step", kind="agent", attributes=("step_type", "title"))
     async def log_live_step(
         self, 
         step_type: str, 
@@ -330,7 +357,9 @@ class BaseAgent(ABC):
     async def think(
         self,
         messages: List[Dict[str, str]],
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        context: Optional[str] = None,
+        max_tokens: Optional[int] = None
     ) -> str:
         """
         调用LLM进行思考
@@ -338,6 +367,8 @@ class BaseAgent(ABC):
         Args:
             messages: 对话消息列表
             temperature: 创造性参数
+            context: 慢变上下文，放在静态系统提示词之后
+            max_tokens: 最大输出token数，默认由模型配置决定
         
         Returns:
             AI回复内容
@@ -345,8 +376,9 @@ class BaseAgent(ABC):
         try:
             response = await chat_completion(
                 messages=messages,
-                system_prompt=self.system_prompt,
-                temperature=temperature
+                system_prompt=self.compose_system_prompt(context),
+                temperature=temperature,
+                max_tokens=max_tokens
             )
             return response
         except Exception as e:
@@ -359,7 +391,8 @@ class BaseAgent(ABC):
         title: str = "正在生成内容",
         temperature: float = 0.7,
         chunk_size: int = 2,
-        delay: float = 0.015
+        delay: float = 0.015,
+        context: Optional[str] = None
     ) -> str:
         """
         调用LLM进行思考，并将结果以打字机效果流式传输到前端
@@ -370,6 +403,7 @@ class BaseAgent(ABC):
             temperature: 创造性参数
             chunk_size: 每次发送的字符数
             delay: 每次发送之间的延迟（秒）
+            context: 慢变上下文，放在静态系统提示词之后
         
         Returns:
             AI回复内容
@@ -378,7 +412,7 @@ class BaseAgent(ABC):
             # 1. 先调用LLM获取完整回复
             response = await chat_completion(
                 messages=messages,
-                system_prompt=self.system_prompt,
+                system_prompt=self.compose_system_prompt(context),
                 temperature=temperature
             )
             
@@ -427,9 +461,15 @@ class BaseAgent(ABC):
 
 
 class AgentRegistry:
-    """AI员工注册表"""
+    """
+    AI员工注册表
+    
+    员工模块导入时创建单例并调用 register；通过 register_module 登记的员工在首次 get 时才导入模块，
+    启动时不再加载全部员工及其依赖
+    """
     
     _agents: Dict[AgentType, BaseAgent] = {}
+    _modules: Dict[AgentType, str] = {}
     
     @classmethod
     def register(cls, agent: BaseAgent):
@@ -437,12 +477,28 @@ class AgentRegistry:
         cls._agents[agent.agent_type] = agent
         logger.info(f"✓ {agent.name} 已注册")
     
+    @classmethod
+    def register_module(cls, agent_type: AgentType, module_path: str):
+        """登记员工所在模块（延迟加载）"""
+        cls._modules[agent_type] = module_path
+    
     @classmethod
     def get(cls, agent_type: AgentType) -> Optional[BaseAgent]:
-        """获取AI员工"""
-        return cls._agents.get(agent_type)
+        """获取AI员工（未加载时导入其模块）"""
+        agent = cls._agents.get(agent_type)
+        if agent is None and agent_type in cls._modules:
+            importlib.import_module(cls._modules[agent_type])
+            agent = cls._agents.get(agent_type)
+        return agent
+    
+    @classmethod
+    def is_loaded(cls, agent_type: AgentType) -> bool:
+        """员工是否已创建"""
+        return agent_type in cls._agents
     
     @classmethod
     def get_all(cls) -> Dict[AgentType, BaseAgent]:
-        """获取所有AI员工"""
+        """获取所有AI员工（会加载全部已登记的员工）"""
+        for agent_type in list(cls._modules):
+            cls.get(agent_type)
         return cls._agents.copy()
@@ -3,14 +3,11 @@
 顶级文案大师，负责广告文案、视频脚本、营销内容、多语言创作
 """
 from typing import Dict, Any, List, Optional
-from loguru import logger
-from sqlalchemy import select
 import json
 
 from app.agents.base import BaseAgent, AgentRegistry
 from app.models.conversation import AgentType
-from app.models.database import AsyncSessionLocal
-from app.models.company_config import CompanyConfig
+from app.services.company_profile import company_profile
 from app.core.prompts.copywriter import (
     COPYWRITER_SYSTEM_PROMPT, 
     SCRIPT_WRITING_PROMPT,
@@ -59,57 +56,8 @@ class CopywriterAgent(BaseAgent):
         return COPYWRITER_SYSTEM_PROMPT
     
     async def _get_company_context(self) -> str:
-        """从数据库获取公司上下文信息"""
-        try:
-            async with AsyncSessionLocal() as db:
-                result = await db.execute(select(CompanyConfig).limit(1))
-                config = result.scalar_one_or_none()
-                
-                if not config:
-                    return ""
-                
-                lines = []
-                
-                if config.company_name:
-                    lines.append(f"公司名称：{config.company_name}")
-                
-                if config.company_intro:
-                    lines.append(f"公司简介：{config.company_intro}")
-                
-                if config.products:
-                    products_text = []
-                    for p in config.products:
-                        name = p.get('name', '')
-                        desc = p.get('description', '')
-                        features = p.get('features', [])
-                        if name:
-                            products_text.append(f"- {name}: {desc}")
-                    if products_text:
-                        lines.append("主营产品服务：")
-                        lines.extend(products_text)
-                
-                if config.service_routes:
-                    routes_text = []
-                    for r in config.service_routes:
-                        from_loc = r.get('from_location', '')
-                        to_loc = r.get('to_location', '')
-                        transport = r.get('transport', '')
-                        if from_loc and to_loc:
-                            routes_text.append(f"- {from_loc}→{to_loc} ({transport})")
-                    if routes_text:
-                        lines.append("服务航线：")
-                        lines.extend(routes_text[:5])
-                
-                if config.advantages:
-                    lines.append(f"公司优势：{', '.join(config.advantages)}")
-                
-                if config.contact_phone:
-                    lines.append(f"联系电话：{config.contact_phone}")
-                
-                return "\n".join(lines)
-        except Exception as e:
-            logger.error(f"获取公司配置失败: {e}")
-            return ""
+        """获取公司上下文信息（公司资料缓存，预渲染片段）"""
+        return await company_profile.prompt_context("copywriter")
     
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -6,6 +6,7 @@
 import json
 import hashlib
 import asyncio
+from contextlib import asynccontextmanager
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from loguru import logger
@@ -14,7 +15,22 @@ import httpx
 from app.agents.base import BaseAgent, AgentRegistry
 from app.models.conversation import AgentType
 from app.core.config import settings
-from app.core.prompts.eu_customs_monitor import SYSTEM_PROMPT as EU_CUSTOMS_MONITOR_SYSTEM_PROMPT
+from app.core.rate_limiter import RateLimiter
+from app.core.prompts.eu_customs_monitor import (
+    SYSTEM_PROMPT as EU_CUSTOMS_MONITOR_SYSTEM_PROMPT,
+    ANALYZE_BATCH_PROMPT,
+)
+from app.services.micro_batcher import MicroBatcher
+
+
+@asynccontextmanager
+async def _client_scope(client: Optional[httpx.AsyncClient]):
+    """复用传入的HTTP客户端，未传入时临时创建"""
+    if client is not None:
+        yield client
+    else:
+        async with httpx.AsyncClient(timeout=30.0) as new_client:
+            yield new_client
 
 
 class EUCustomsMonitorAgent(BaseAgent):
@@ -108,6 +124,17 @@ class EUCustomsMonitorAgent(BaseAgent):
         "urgent", "breaking", "new regulation", "immediate effect"
     ]
     
+    def __init__(self):
+        super().__init__()
+        # 送LLM的新闻按小批量合并评估，多个批次并发
+        self._news_scorer = MicroBatcher(
+            self._analyze_news_batch,
+            max_items=settings.EU_MONITOR_BATCH_SIZE,
+            max_wait=0.05,
+            max_concurrent_batches=settings.EU_MONITOR_LLM_CONCURRENCY,
+            name="小欧间谍批量评估"
+        )
+    
     def _build_system_prompt(self) -> str:
         return EU_CUSTOMS_MONITOR_SYSTEM_PROMPT
     
@@ -153,6 +180,10 @@ class EUCustomsMonitorAgent(BaseAgent):
     async def _full_monitor(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         完整的监控流程：搜索 -> 分析 -> 存储 -> 通知
+        
+        - 各来源 × 关键词的搜索并发进行（限流）
+        - 已入库URL用一次查询排除
+        - 规则评分预筛，明显不重要的新闻不送LLM；其余按小批量并发评估
         """
         self.log("🔍 开始欧洲海关新闻监控...")
         start_time = datetime.now()
@@ -174,6 +205,8 @@ class EUCustomsMonitorAgent(BaseAgent):
             "important_news": [],
             "total_news": 0,
             "important_count": 0,
+            "llm_analyzed": 0,
+            "deferred": 0,
             "notification_sent": False
         }
         
@@ -181,156 +214,116 @@ class EUCustomsMonitorAgent(BaseAgent):
             from app.models.database import async_session_maker
             from sqlalchemy import text
             
-            async with async_session_maker() as db:
-                all_news = []
-                
-                # 1. 从各个来源搜索新闻
-                for source_id, source_config in self.NEWS_SOURCES.items():
-                    source_name = source_config["name"]
-                    site_filter = source_config["site_filter"]
-                    keywords = source_config.get("keywords", self.MONITOR_KEYWORDS_CN[:5])
-                    
-                    await self.log_live_step("search", f"搜索{source_name}新闻", f"来源: {source_id}")
-                    
-                    for keyword in keywords[:3]:  # 每个来源使用前3个关键词
-                        try:
-                            query = f"{keyword} {site_filter}".strip()
-                            self.log(f"🔍 搜索: {query}")
-                            
-                            search_results = await self._search_with_serper(query)
-                            
-                            if search_results:
-                                results["sources_searched"].append(source_name)
-                                for item in search_results[:5]:  # 每个关键词取前5条
-                                    url = item.get("url", "")
-                                    if not url:
-                                        continue
-                                    
-                                    # 检查是否已存在
-                                    url_hash = hashlib.md5(url.encode()).hexdigest()
-                                    existing = await db.execute(
-                                        text("SELECT id FROM eu_customs_news WHERE url_hash = :hash"),
-                                        {"hash": url_hash}
-                                    )
-                                    if existing.fetchone():
-                                        continue
-                                    
-                                    item["source_id"] = source_id
-                                    item["source_name"] = source_name
-                                    item["keyword"] = keyword
-                                    item["url_hash"] = url_hash
-                                    all_news.append(item)
-                            
-                            # 控制请求频率
-                            await asyncio.sleep(0.3)
-                            
-                        except Exception as e:
-                            self.log(f"搜索失败 ({source_name}, {keyword}): {e}", "error")
+            # 1. 从各个来源并发搜索新闻
+            search_results = await self._search_all_sources(results)
+            
+            # 同一URL可能被多个关键词搜到，保留第一次出现的
+            candidates = {}
+            for item in search_results:
+                url = item.get("url", "")
+                if not url:
+                    continue
+                url_hash = hashlib.md5(url.encode()).hexdigest()
+                if url_hash not in candidates:
+                    item["url_hash"] = url_hash
+                    candidates[url_hash] = item
+            
+            # 检查是否已存在（一次查询）
+            if candidates:
+                async with async_session_maker() as db:
+                    existing = await db.execute(
+                        text("SELECT url_hash FROM eu_customs_news WHERE url_hash = ANY(:hashes)"),
+                        {"hashes": list(candidates)}
+                    )
+                    for row in existing.fetchall():
+                        candidates.pop(row[0], None)
+            all_news = list(candidates.values())
+            
+            self.log(f"📰 获取 {len(all_news)} 条新URL待分析")
+            await self.log_live_step("info", f"获取 {len(all_news)} 条新闻", "开始AI分析")
+            
+            # 2. 规则预筛 + 批量AI分析
+            max_analyze = input_data.get("max_results", 30)
+            analyses = await self._score_news(all_news, max_analyze)
+            results["llm_analyzed"] = sum(1 for a in analyses if a and a.get("analyzed_by") == "llm")
+            
+            rows = []
+            for item, analysis in zip(all_news, analyses):
+                if analysis is None:
+                    # 本轮未经AI分析（超出 max_analyze 或分析失败）：不入库，下次监控重新分析
+                    results["deferred"] += 1
+                    continue
+                title = item.get("title", "")
+                content = item.get("content", item.get("snippet", ""))
+                is_important = analysis.get("is_important", False)
+                importance_score = analysis.get("importance_score", 0)
                 
-                self.log(f"📰 获取 {len(all_news)} 条新URL待分析")
-                await self.log_live_step("info", f"获取 {len(all_news)} 条新闻", "开始AI分析")
+                # 构建新闻数据
+                news_data = {
+                    "title": title,
+                    "title_cn": analysis.get("title_cn", title),
+                    "content": content,
+                    "summary_cn": analysis.get("summary_cn", ""),
+                    "url": item.get("url", ""),
+                    "url_hash": item.get("url_hash", ""),
+                    "source_id": item.get("source_id", ""),
+                    "source_name": item.get("source_name", ""),
+                    "keyword": item.get("keyword", ""),
+                    "news_type": analysis.get("news_type", "行业动态"),
+                    "importance_score": importance_score,
+                    "is_important": is_important,
+                    "urgency": analysis.get("urgency", "一般"),
+                    "affected_countries": self._as_text_list(analysis.get("affected_countries")),
+                    "affected_products": self._as_text_list(analysis.get("affected_products")),
+                    "impact_analysis": self._as_text(analysis.get("impact_analysis", "")),
+                    "business_suggestion": self._as_text(analysis.get("business_suggestion", "")),
+                    "collected_at": datetime.now().isoformat()
+                }
                 
-                # 2. AI分析每条新闻
-                max_analyze = input_data.get("max_results", 30)
+                results["news_found"].append(news_data)
+                results["total_news"] += 1
                 
-                for item in all_news[:max_analyze]:
-                    try:
-                        title = item.get("title", "")
-                        content = item.get("content", item.get("snippet", ""))
-                        url = item.get("url", "")
-                        url_hash = item.get("url_hash", "")
-                        
-                        # 记录正在分析
-                        await self.log_fetch(url, title, {"source": item.get("source_name")})
-                        
-                        # AI分析新闻重要性
-                        await self.log_think("分析新闻重要性和影响", title[:50])
-                        analysis = await self._analyze_news_importance({
-                            "title": title,
-                            "content": content,
-                            "url": url,
-                            "source": item.get("source_name", "")
-                        })
-                        
-                        is_important = analysis.get("is_important", False)
-                        importance_score = analysis.get("importance_score", 0)
-                        
-                        # 构建新闻数据
-                        news_data = {
-                            "title": title,
-                            "title_cn": analysis.get("title_cn", title),
-                            "content": content,
-                            "summary_cn": analysis.get("summary_cn", ""),
-                            "url": url,
-                            "url_hash": url_hash,
-                            "source_id": item.get("source_id", ""),
-                            "source_name": item.get("source_name", ""),
-                            "keyword": item.get("keyword", ""),
-                            "news_type": analysis.get("news_type", "行业动态"),
-                            "importance_score": importance_score,
-                            "is_important": is_important,
-                            "urgency": analysis.get("urgency", "一般"),
-                            "affected_countries": analysis.get("affected_countries", []),
-                            "affected_products": analysis.get("affected_products", []),
-                            "impact_analysis": analysis.get("impact_analysis", ""),
-                            "business_suggestion": analysis.get("business_suggestion", ""),
-                            "collected_at": datetime.now().isoformat()
-                        }
-                        
-                        results["news_found"].append(news_data)
-                        results["total_news"] += 1
-                        
-                        if is_important:
-                            results["important_news"].append(news_data)
-                            results["important_count"] += 1
-                            await self.log_result(
-                                f"🚨 发现重要新闻!",
-                                f"{analysis.get('title_cn', title)[:50]}",
-                                {"importance_score": importance_score, "urgency": analysis.get("urgency")}
-                            )
-                        
-                        # 保存到数据库
-                        await db.execute(
-                            text("""
-                                INSERT INTO eu_customs_news 
-                                (title, title_cn, content, summary_cn, url, url_hash,
-                                 source_id, source_name, keyword, news_type,
-                                 importance_score, is_important, urgency,
-                                 affected_countries, affected_products,
-                                 impact_analysis, business_suggestion, created_at)
-                                VALUES 
-                                (:title, :title_cn, :content, :summary_cn, :url, :url_hash,
-                                 :source_id, :source_name, :keyword, :news_type,
-                                 :importance_score, :is_important, :urgency,
-                                 :affected_countries, :affected_products,
-                                 :impact_analysis, :business_suggestion, NOW())
-                                ON CONFLICT (url_hash) DO NOTHING
-                            """),
-                            {
-                                "title": news_data["title"],
-                                "title_cn": news_data["title_cn"],
-                                "content": news_data["content"][:2000],  # 限制长度
-                                "summary_cn": news_data["summary_cn"],
-                                "url": news_data["url"],
-                                "url_hash": news_data["url_hash"],
-                                "source_id": news_data["source_id"],
-                                "source_name": news_data["source_name"],
-                                "keyword": news_data["keyword"],
-                                "news_type": news_data["news_type"],
-                                "importance_score": news_data["importance_score"],
-                                "is_important": news_data["is_important"],
-                                "urgency": news_data["urgency"],
-                                "affected_countries": news_data["affected_countries"],
-                                "affected_products": news_data["affected_products"],
-                                "impact_analysis": news_data["impact_analysis"],
-                                "business_suggestion": news_data["business_suggestion"]
-                            }
-                        )
-                        
-                    except Exception as e:
-                        self.log(f"分析新闻失败: {e}", "error")
+                if is_important:
+                    results["important_news"].append(news_data)
+                    results["important_count"] += 1
+                    await self.log_result(
+                        f"🚨 发现重要新闻!",
+                        f"{analysis.get('title_cn', title)[:50]}",
+                        {"importance_score": importance_score, "urgency": analysis.get("urgency")}
+                    )
                 
-                await db.commit()
+                rows.append({
+                    **{k: news_data[k] for k in (
+                        "title", "title_cn", "summary_cn", "url", "url_hash",
+                        "source_id", "source_name", "keyword", "news_type",
+                        "importance_score", "is_important", "urgency",
+                        "affected_countries", "affected_products",
+                        "impact_analysis", "business_suggestion"
+                    )},
+                    "content": news_data["content"][:2000]  # 限制长度
+                })
+            
+            async with async_session_maker() as db:
+                # 保存到数据库（一次批量执行）
+                if rows:
+                    await db.execute(
+                        text("""
+                            INSERT INTO eu_customs_news 
+                            (title, title_cn, content, summary_cn, url, url_hash,
+                             source_id, source_name, keyword, news_type,
+                             importance_score, is_important, urgency,
+                             affected_countries, affected_products,
+                             impact_analysis, business_suggestion, created_at)
+                            VALUES 
+                            (:title, :title_cn, :content, :summary_cn, :url, :url_hash,
+                             :source_id, :source_name, :keyword, :news_type,
+                             :importance_score, :is_important, :urgency,
+                             :affected_countries, :affected_products,
+                             :impact_analysis, :business_suggestion, NOW())
+                            ON CONFLICT (url_hash) DO NOTHING
+                        """),
+                        rows
+                    )
                 
                 # 3. 更新AI员工任务统计
                 await db.execute(
@@ -343,12 +336,12 @@ class EUCustomsMonitorAgent(BaseAgent):
                     """)
                 )
                 await db.commit()
-                
-                # 4. 发送企业微信通知（如果有重要新闻）
-                if results["important_news"]:
-                    notification_result = await self._send_wechat_notification(results["important_news"])
-                    results["notification_sent"] = notification_result.get("success", False)
-                
+            
+            # 4. 发送企业微信通知（如果有重要新闻）
+            if results["important_news"]:
+                notification_result = await self._send_wechat_notification(results["important_news"])
+                results["notification_sent"] = notification_result.get("success", False)
+        
         except Exception as e:
             self.log(f"监控任务出错: {e}", "error")
             results["error"] = str(e)
@@ -361,18 +354,202 @@ class EUCustomsMonitorAgent(BaseAgent):
         results["duration_seconds"] = round(duration, 2)
         
         self.log(f"✅ 监控完成！耗时{duration:.1f}秒，发现 {results['total_news']} 条新闻，"
-                 f"重要新闻 {results['important_count']} 条")
+                 f"重要新闻 {results['important_count']} 条（AI分析 {results['llm_analyzed']} 条，"
+                 f"留待下次 {results['deferred']} 条）")
+        
+        return results
+    
+    async def _search_all_sources(self, results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """各来源 × 前3个关键词并发搜索（限流），结果按来源、关键词顺序返回"""
+        limiter = RateLimiter(
+            concurrency=settings.EU_MONITOR_SEARCH_CONCURRENCY,
+            min_interval=settings.EU_MONITOR_SEARCH_INTERVAL
+        )
+        
+        jobs = []
+        for source_id, source_config in self.NEWS_SOURCES.items():
+            keywords = source_config.get("keywords", self.MONITOR_KEYWORDS_CN[:5])
+            await self.log_live_step("search", f"搜索{source_config['name']}新闻", f"来源: {source_id}")
+            for keyword in keywords[:3]:  # 每个来源使用前3个关键词
+                jobs.append((source_id, source_config, keyword))
+        
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            async def search(source_config: Dict[str, Any], keyword: str) -> List[Dict[str, Any]]:
+                query = f"{keyword} {source_config['site_filter']}".strip()
+                async with limiter.slot():
+                    self.log(f"🔍 搜索: {query}")
+                    return await self._search_with_serper(query, client=client)
+            
+            outcomes = await asyncio.gather(
+                *(search(source_config, keyword) for _, source_config, keyword in jobs),
+                return_exceptions=True
+            )
+        
+        all_news = []
+        for (source_id, source_config, keyword), outcome in zip(jobs, outcomes):
+            if isinstance(outcome, Exception):
+                self.log(f"搜索失败 ({source_config['name']}, {keyword}): {outcome}", "error")
+                continue
+            if outcome:
+                results["sources_searched"].append(source_config["name"])
+            for item in outcome[:5]:  # 每个关键词取前5条
+                item["source_id"] = source_id
+                item["source_name"] = source_config["name"]
+                item["keyword"] = keyword
+                all_news.append(item)
+        return all_news
+    
+    async def _score_news(self, news: List[Dict[str, Any]], max_analyze: int) -> List[Dict[str, Any]]:
+        """
+        评估新闻重要性，结果顺序与输入一致
+        
+        规则评分低于 EU_MONITOR_PREFILTER_SCORE 的直接使用规则结果（不标记为重要）；
+        其余按规则评分从高到低取前 max_analyze 条，小批量并发送LLM。
+        超出 max_analyze 或AI分析失败的返回 None：这些新闻没有翻译和分析，调用方不入库也不通知，
+        下次监控时仍是新URL，会重新送AI分析
+        """
+        analyses: List[Optional[Dict[str, Any]]] = []
+        shortlisted = []
+        for i, item in enumerate(news):
+            title = item.get("title", "")
+            content = item.get("content", item.get("snippet", ""))
+            rule_result = self._rule_based_importance(title, content, self._has_importance_keyword(title, content))
+            if title and rule_result["importance_score"] >= settings.EU_MONITOR_PREFILTER_SCORE:
+                shortlisted.append(i)
+            else:
+                rule_result["is_important"] = False
+            analyses.append(rule_result)
+        
+        shortlisted.sort(key=lambda i: analyses[i]["importance_score"], reverse=True)
+        for i in shortlisted[max_analyze:]:
+            analyses[i] = None
+        shortlisted = shortlisted[:max_analyze]
+        if not shortlisted:
+            return analyses
+        
+        self.log(f"🧮 规则预筛：{len(shortlisted)}/{len(news)} 条送AI分析")
+        llm_results = await asyncio.gather(
+            *(self._news_scorer.submit(news[i]) for i in shortlisted),
+            return_exceptions=True
+        )
+        for i, result in zip(shortlisted, llm_results):
+            if isinstance(result, Exception):
+                self.log(f"分析新闻失败: {result}", "error")
+                analyses[i] = None
+            elif result.get("analyzed_by") != "llm":
+                # AI分析失败后退回的规则结果
+                analyses[i] = None
+            else:
+                analyses[i] = result
+        deferred = sum(1 for analysis in analyses if analysis is None)
+        if deferred:
+            self.log(f"⏭️ {deferred} 条新闻本轮未完成AI分析，下次监控重新分析")
+        return analyses
+    
+    async def _analyze_news_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        一次LLM调用评估一批新闻，结果顺序与输入一致
+        
+        批量结果中缺失或无法解析的新闻单独补充分析
+        """
+        await self.log_think(f"批量分析 {len(items)} 条新闻的重要性和影响", items[0].get("title", "")[:50])
         
+        verdicts: Dict[int, Dict[str, Any]] = {}
+        if len(items) > 1:
+            news_text = "\n".join(
+                f"【{i + 1}】来源：{item.get('source_name', '')} | 标题：{item.get('title', '')} | "
+                f"内容：{item.get('content', item.get('snippet', ''))[:500]} | URL：{item.get('url', '')}"
+                for i, item in enumerate(items)
+            )
+            prompt = ANALYZE_BATCH_PROMPT.format(count=len(items), news=news_text)
+            try:
+                response = await self.think([{"role": "user", "content": prompt}], temperature=0.3)
+                json_start = response.find("[")
+                json_end = response.rfind("]") + 1
+                if json_start != -1 and json_end > json_start:
+                    for verdict in json.loads(response[json_start:json_end]):
+                        if not isinstance(verdict, dict):
+                            continue
+                        try:
+                            index = int(verdict.pop("id")) - 1
+                        except (KeyError, TypeError, ValueError):
+                            continue
+                        if 0 <= index < len(items):
+                            verdicts[index] = verdict
+            except json.JSONDecodeError:
+                self.log("AI批量分析结果解析失败", "warning")
+            except Exception as e:
+                self.log(f"AI批量分析异常: {e}", "error")
+        
+        missing = [i for i in range(len(items)) if i not in verdicts]
+        if missing and len(items) > 1:
+            self.log(f"批量结果缺失 {len(missing)}/{len(items)} 条，单独补充分析", "warning")
+        fallback = await asyncio.gather(*[
+            self._analyze_news_importance({
+                "title": items[i].get("title", ""),
+                "content": items[i].get("content", items[i].get("snippet", "")),
+                "url": items[i].get("url", ""),
+                "source": items[i].get("source_name", "")
+            })
+            for i in missing
+        ])
+        verdicts.update(zip(missing, fallback))
+        
+        results = []
+        for i, item in enumerate(items):
+            result = verdicts[i]
+            if i not in missing:
+                title = item.get("title", "")
+                content = item.get("content", item.get("snippet", ""))
+                result = self._apply_keyword_boost(result, self._has_importance_keyword(title, content))
+                result["analyzed_by"] = "llm"
+            results.append(result)
         return results
     
-    async def _search_with_serper(self, query: str) -> List[Dict[str, Any]]:
-        """使用Serper API搜索新闻"""
+    def _has_importance_keyword(self, title: str, content: str) -> bool:
+        combined_text = f"{title} {content}".lower()
+        return any(kw.lower() in combined_text for kw in self.IMPORTANCE_KEYWORDS)
+    
+    def _apply_keyword_boost(self, result: Dict[str, Any], has_importance_keyword: bool) -> Dict[str, Any]:
+        """如果有重要性关键词，提升分数"""
+        if has_importance_keyword and result.get("importance_score", 0) < 70:
+            result["importance_score"] = min(result.get("importance_score", 50) + 20, 100)
+            if not result.get("is_important"):
+                result["is_important"] = result.get("importance_score", 0) >= 60
+        return result
+    
+    @staticmethod
+    def _as_text(value: Any) -> str:
+        """LLM 偶尔返回对象/数组，入库前统一为文本"""
+        if value is None:
+            return ""
+        if isinstance(value, str):
+            return value
+        return json.dumps(value, ensure_ascii=False)
+    
+    @staticmethod
+    def _as_text_list(value: Any) -> List[str]:
+        if not value:
+            return []
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, list):
+            return [str(v) for v in value if v]
+        return []
+    
+    async def _search_with_serper(self, query: str, client: Optional[httpx.AsyncClient] = None) -> List[Dict[str, Any]]:
+        """
+        使用Serper API搜索新闻
+        
+        Args:
+            client: 复用的HTTP客户端（批量搜索时共用连接），不传则临时创建
+        """
         api_key = getattr(settings, 'SERPER_API_KEY', None)
         if not api_key:
             return []
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with _client_scope(client) as client:
                 # 使用新闻搜索API
                 response = await client.post(
                     "https://google.serper.dev/news",
@@ -405,7 +582,7 @@ class EUCustomsMonitorAgent(BaseAgent):
                     return results
                 else:
                     self.log(f"Serper API返回错误: {response.status_code}", "error")
-                    
+        
         except Exception as e:
             self.log(f"Serper搜索异常: {e}", "error")
         
@@ -422,8 +599,7 @@ class EUCustomsMonitorAgent(BaseAgent):
             return {"is_important": False, "reason": "标题为空"}
         
         # 快速判断：检查是否包含重要性关键词
-        combined_text = f"{title} {content}".lower()
-        has_importance_keyword = any(kw.lower() in combined_text for kw in self.IMPORTANCE_KEYWORDS)
+        has_importance_keyword = self._has_importance_keyword(title, content)
         
         # 使用AI深度分析
         prompt = f"""请分析以下欧洲海关相关新闻的重要性：
@@ -439,7 +615,7 @@ URL：{url}
 3. 需要立即关注吗？
 
 请以JSON格式返回分析结果，所有内容必须使用中文。"""
-        
+
         try:
             response = await self.think([{"role": "user", "content": prompt}], temperature=0.3)
             
@@ -450,12 +626,8 @@ URL：{url}
                 result = json.loads(response[json_start:json_end])
                 
                 # 如果有重要性关键词，提升分数
-                if has_importance_keyword and result.get("importance_score", 0) < 70:
-                    result["importance_score"] = min(result.get("importance_score", 50) + 20, 100)
-                    if not result.get("is_important"):
-                        result["is_important"] = result.get("importance_score", 0) >= 60
-                
-                return result
+                result["analyzed_by"] = "llm"
+                return self._apply_keyword_boost(result, has_importance_keyword)
         except json.JSONDecodeError:
             self.log("AI分析结果解析失败", "warning")
         except Exception as e:
@@ -465,20 +637,28 @@ URL：{url}
         return self._rule_based_importance(title, content, has_importance_keyword)
     
     def _rule_based_importance(self, title: str, content: str, has_importance_keyword: bool) -> Dict[str, Any]:
-        """基于规则的重要性判断（AI失败时的备选）"""
+        """基于规则的重要性判断（送LLM前的预筛，以及AI失败时的备选）"""
         importance_score = 30  # 基础分
         
-        # 检查标题中的关键词
-        title_keywords = ["反倾销", "关税", "新规", "政策", "禁止", "处罚", "调查"]
-        title_matches = sum(1 for kw in title_keywords if kw in title)
+        # 检查标题中的关键词（英文不区分大小写）
+        title_keywords = [
+            "反倾销", "关税", "新规", "政策", "禁止", "处罚", "调查",
+            "anti-dumping", "tariff", "duties", "regulation", "ban", "penalt", "investigation", "quota"
+        ]
+        title_lower = title.lower()
+        title_matches = sum(1 for kw in title_keywords if kw in title_lower)
         importance_score += title_matches * 15
         
         if has_importance_keyword:
             importance_score += 20
         
         # 检查内容中的关键词
-        content_keywords = ["生效", "实施", "通知", "公告", "决定"]
-        content_matches = sum(1 for kw in content_keywords if kw in content)
+        content_keywords = [
+            "生效", "实施", "通知", "公告", "决定",
+            "enter into force", "effective", "implement", "notice", "decision"
+        ]
+        content_lower = (content or "").lower()
+        content_matches = sum(1 for kw in content_keywords if kw in content_lower)
         importance_score += content_matches * 10
         
         importance_score = min(importance_score, 100)
@@ -493,7 +673,8 @@ URL：{url}
             "affected_products": [],
             "impact_analysis": "需要进一步分析",
             "business_suggestion": "建议关注后续发展",
-            "urgency": "重要" if importance_score >= 70 else "一般"
+            "urgency": "重要" if importance_score >= 70 else "一般",
+            "analyzed_by": "rule"
         }
     
     async def _send_wechat_notification(self, important_news: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -511,7 +692,7 @@ URL：{url}
 📊 今日发现 **{len(important_news)}** 条重要新闻：
 
 """
-            
+
             for i, news in enumerate(important_news[:5], 1):  # 最多显示5条
                 urgency_emoji = "🚨" if news.get("urgency") == "紧急" else "⚠️" if news.get("urgency") == "重要" else "📌"
                 content += f"""{urgency_emoji} **{i}. {news.get('title_cn', news.get('title', ''))[:50]}**
@@ -520,14 +701,14 @@ URL：{url}
 > 建议：{news.get('business_suggestion', '暂无')[:50]}
 
 """
-            
+
             if len(important_news) > 5:
                 content += f"\n... 还有 **{len(important_news) - 5}** 条重要新闻，请登录系统查看\n"
             
             content += """
 ---
 *由小欧间谍自动监控 | 物流获客AI*"""
-            
+
             # 使用小欧间谍专用应用发送
             result = await self._send_with_eu_monitor_app(content)
             
@@ -537,7 +718,7 @@ URL：{url}
                 self.log(f"⚠️ 企业微信通知发送失败: {result.get('error')}", "warning")
             
             return result
-            
+        
         except Exception as e:
             self.log(f"发送企业微信通知失败: {e}", "error")
             return {"success": False, "error": str(e)}
@@ -594,7 +775,7 @@ URL：{url}
                     return {"success": True, "app": "eu_monitor"}
                 else:
                     return {"success": False, "error": f"发送失败: {send_data}"}
-                    
+        
         except Exception as e:
             return {"success": False, "error": str(e)}
     
@@ -712,7 +893,7 @@ URL：{url}
                     "by_type": by_type,
                     "recent_important": recent_important
                 }
-                
+        
         except Exception as e:
             self.log(f"获取统计失败: {e}", "error")
             return {"error": str(e)}
@@ -8,6 +8,8 @@ import json
 from typing import Dict, Any, List, Callable, Awaitable
 from loguru import logger
 
+from app.core.tracing import traced
+
 
 # ============================================================
 # 1. OpenAI 格式的工具 Schema 定义
@@ -1165,6 +1167,7 @@ class MariaToolExecutor:
                 masked[key] = "******"
         return masked
 
+    @traced("tool.{tool_name}", kind="tool")
     async def execute(self, tool_name: str, arguments: Dict[str, Any], user_id: str) -> Dict[str, Any]:
         """
         执行一个工具调用 - 路由到对应的Skill模块
@@ -6,16 +6,16 @@
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timezone
 from loguru import logger
-from sqlalchemy import select, text
+from sqlalchemy import text
 import re
 
 from app.agents.base import BaseAgent, AgentRegistry
 from app.models.conversation import AgentType
 from app.models.database import AsyncSessionLocal
 from app.core.prompt_utils import sanitize_user_input
-from app.models.company_config import CompanyConfig
 from app.core.prompts.sales import SALES_SYSTEM_PROMPT, CHAT_RESPONSE_PROMPT
 from app.services.erp_query_helper import erp_query_helper
+from app.services.company_profile import company_profile
 
 
 class SalesAgent(BaseAgent):
@@ -29,66 +29,8 @@ class SalesAgent(BaseAgent):
         return SALES_SYSTEM_PROMPT
     
     async def _get_company_context(self) -> str:
-        """从数据库获取公司上下文信息"""
-        try:
-            async with AsyncSessionLocal() as db:
-                result = await db.execute(select(CompanyConfig).limit(1))
-                config = result.scalar_one_or_none()
-                
-                if not config:
-                    return ""
-                
-                lines = []
-                
-                if config.company_name:
-                    lines.append(f"公司名称：{config.company_name}")
-                
-                if config.company_intro:
-                    lines.append(f"公司简介：{config.company_intro}")
-                
-                if config.products:
-                    products_text = []
-                    for p in config.products:
-                        name = p.get('name', '')
-                        desc = p.get('description', '')
-                        features = p.get('features', [])
-                        products_text.append(f"- {name}: {desc} (特点: {', '.join(features)})")
-                    if products_text:
-                        lines.append("我们提供的产品服务：")
-                        lines.extend(products_text)
-                
-                if config.service_routes:
-                    routes_text = []
-                    for r in config.service_routes:
-                        from_loc = r.get('from_location', '')
-                        to_loc = r.get('to_location', '')
-                        transport = r.get('transport', '')
-                        time = r.get('time', '')
-                        price_ref = r.get('price_ref', '')
-                        route_info = f"- {from_loc}→{to_loc} ({transport}): {time}"
-                        if price_ref:
-                            route_info += f", 参考价格: {price_ref}"
-                        routes_text.append(route_info)
-                    if routes_text:
-                        lines.append("服务航线：")
-                        lines.extend(routes_text)
-                
-                if config.advantages:
-                    lines.append(f"公司优势：{', '.join(config.advantages)}")
-                
-                if config.price_policy:
-                    lines.append(f"价格政策：{config.price_policy}")
-                
-                if config.contact_phone:
-                    lines.append(f"联系电话：{config.contact_phone}")
-                
-                if config.contact_wechat:
-                    lines.append(f"客服微信：{config.contact_wechat}")
-                
-                return "\n".join(lines)
-        except Exception as e:
-            logger.error(f"获取公司配置失败: {e}")
-            return ""
+        """获取公司上下文信息（公司资料缓存，预渲染片段）"""
+        return await company_profile.prompt_context("sales")
     
     async def _get_erp_context(self, message: str, customer_id: str = None) -> str:
         """
@@ -311,9 +253,6 @@ class SalesAgent(BaseAgent):
             
             chat_prompt = f"""你是公司的AI助手"小销"，现在正在和公司内部的同事聊天。
 
-## 你所在公司的信息
-{company_context if company_context else "暂未配置公司信息"}
-
 {work_summary}
 
 ## 同事的消息
@@ -337,9 +276,6 @@ class SalesAgent(BaseAgent):
             safe_message = sanitize_user_input(message, max_length=2000)
             
             chat_prompt = f"""你正在与一位潜在客户对话。
-
-## 你所在公司的信息
-{company_context if company_context else "暂未配置公司信息"}
 {erp_context}
 
 ## 客户信息
@@ -358,8 +294,11 @@ class SalesAgent(BaseAgent):
 - 回复要专业但亲切，展现服务态度
 """
         
-        # 生成回复
-        reply = await self.think([{"role": "user", "content": chat_prompt}])
+        # 生成回复（公司信息属于慢变上下文，放在系统提示词静态前缀之后）
+        reply = await self.think(
+            [{"role": "user", "content": chat_prompt}],
+            context=f"## 你所在公司的信息\n{company_context if company_context else '暂未配置公司信息'}"
+        )
         
         # 分析意向信号和收集的信息（仅对外部客户）
         intent_signals = []
@@ -332,52 +332,34 @@ class VideoCreatorAgent(BaseAgent):
     async def _generate_video_segments_batch(
         self, 
         segment_prompts: List[Dict[str, Any]],
-        max_concurrent: int = 3
+        max_concurrent: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """批量生成视频片段，控制并发数量"""
+        """
+        批量生成视频片段
+        
+        交给共享的任务跟踪器：在并发上限内提交，集中轮询在途任务，
+        任一片段完成立即补位提交下一个；同内容批次重跑时复用已生成片段
+        """
         if not self.access_key or not self.secret_key:
             self.log("API未配置，使用占位符", "warning")
             return [{"status": "api_not_configured", **p} for p in segment_prompts]
         
-        results = []
+        from app.services.video_job_tracker import VideoJobTracker, video_job_tracker
         
-        # 分批处理
-        for i in range(0, len(segment_prompts), max_concurrent):
-            batch = segment_prompts[i:i+max_concurrent]
-            self.log(f"生成批次 {i//max_concurrent + 1}/{(len(segment_prompts)-1)//max_concurrent + 1}")
-            
-            # 并行生成这批片段
-            tasks = [self._generate_single_segment(p) for p in batch]
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for j, result in enumerate(batch_results):
-                if isinstance(result, Exception):
-                    results.append({
-                        **batch[j],
-                        "status": "failed",
-                        "error": str(result)
-                    })
-                else:
-                    results.append(result)
-            
-            # 批次间短暂延迟，避免API限流
-            if i + max_concurrent < len(segment_prompts):
-                await asyncio.sleep(2)
+        tracker = video_job_tracker
+        if max_concurrent and max_concurrent != tracker.max_concurrent:
+            tracker = VideoJobTracker(provider=tracker.provider, max_concurrent=max_concurrent)
         
-        return results
-    
-    async def _generate_single_segment(
-        self, 
-        prompt_data: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """生成单个视频片段"""
-        token = self._generate_jwt_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        payloads = [self._build_segment_payload(p) for p in segment_prompts]
         
-        payload = {
+        async def on_progress(done: int, total: int):
+            self.log(f"片段生成进度 {done}/{total}")
+        
+        return await tracker.run_batch(segment_prompts, payloads, on_progress=on_progress)
+    
+    def _build_segment_payload(self, prompt_data: Dict[str, Any]) -> Dict[str, Any]:
+        """构建单个片段的可灵AI提交参数"""
+        return {
             "model": "kling-v1-5",
             "prompt": prompt_data["main_prompt"],
             "negative_prompt": "text, title, subtitle, watermark, logo, blurry, low quality, amateur",
@@ -386,41 +368,6 @@ class VideoCreatorAgent(BaseAgent):
             "aspect_ratio": "16:9",
             "duration": "5"
         }
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.keling_api_url}/v1/videos/text2video",
-                    headers=headers,
-                    json=payload,
-                    timeout=60.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    task_id = result.get("data", {}).get("task_id")
-                    
-                    if task_id:
-                        video_url = await self._poll_video_status(task_id, headers)
-                        return {
-                            **prompt_data,
-                            "status": "success" if video_url else "processing",
-                            "task_id": task_id,
-                            "video_url": video_url
-                        }
-                
-                return {
-                    **prompt_data,
-                    "status": "failed",
-                    "error": f"API返回: {response.status_code}"
-                }
-                
-        except Exception as e:
-            return {
-                **prompt_data,
-                "status": "failed",
-                "error": str(e)
-            }
     
     async def _poll_video_status(
         self, 
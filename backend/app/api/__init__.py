@@ -1,59 +1,73 @@
 # API 路由模块
-from fastapi import APIRouter
+#
+# 路由模块在 include_routers 时才导入，并直接挂到应用上：
+# - 不经过中间的聚合 APIRouter（FastAPI 每 include 一层都会重建全部路由的参数模型，启动时多一轮开销）
+# - API_DISABLED_ROUTERS 中的模块不导入（不需要社交媒体采集、微信群监控等功能的实例不加载其依赖）
+import importlib
+from typing import List, Optional, Tuple
 
-from app.api import (
-    customers, videos, chat, dashboard, agents, 
-    wechat, company, leads, follow,
-    reports, knowledge, webchat,
-    standards, monitoring, marketing,
-    assets, settings, notifications, wechat_groups,
-    social_auth, erp, wechat_analyst2, content, email,
-    topics,  # 热门话题（小猎话题发现模式）
-    products,  # 产品趋势（小猎产品发现模式）
-    websocket,  # WebSocket实时工作直播
-    wechat_eu_monitor,  # 小欧间谍企业微信回调
-    wechat_coordinator,  # 小调企业微信回调
-    wechat_assistant,  # 小助企业微信回调
-    email_accounts,  # 多邮箱账户管理
-    assistant_work,  # 小助工作台
-    ai_usage,  # AI用量监控
-    website,  # WordPress网站对接
-)
+from fastapi import FastAPI
+from loguru import logger
 
-router = APIRouter()
+from app.core.config import settings
 
-# 注册子路由
-router.include_router(dashboard.router, prefix="/dashboard", tags=["数据面板"])
-router.include_router(customers.router, prefix="/customers", tags=["客户管理"])
-router.include_router(leads.router, prefix="/leads", tags=["线索管理"])
-router.include_router(follow.router, prefix="/follow", tags=["跟进管理"])
-router.include_router(chat.router, prefix="/chat", tags=["对话"])
-router.include_router(videos.router, prefix="/videos", tags=["视频"])
-router.include_router(agents.router, prefix="/agents", tags=["AI员工"])
-router.include_router(wechat.router, tags=["企业微信"])
-router.include_router(company.router, tags=["公司配置"])
-router.include_router(reports.router)
-router.include_router(knowledge.router)
-router.include_router(webchat.router)
-router.include_router(standards.router, tags=["工作标准"])
-router.include_router(monitoring.router, tags=["系统监控"])
-router.include_router(marketing.router, prefix="/marketing", tags=["营销序列"])
-router.include_router(assets.router, tags=["素材库"])
-router.include_router(settings.router, tags=["系统设置"])
-router.include_router(notifications.router, tags=["通知中心"])
-router.include_router(wechat_groups.router, tags=["微信群监控"])
-router.include_router(social_auth.router, tags=["社交媒体登录"])
-router.include_router(erp.router, prefix="/erp", tags=["ERP对接"])
-router.include_router(wechat_analyst2.router, tags=["企业微信-小析2"])
-router.include_router(content.router, prefix="/content", tags=["内容营销"])
-router.include_router(email.router, tags=["邮件营销"])
-router.include_router(topics.router, prefix="/topics", tags=["热门话题"])
-router.include_router(products.router, prefix="/products", tags=["产品趋势"])
-router.include_router(websocket.router, tags=["实时工作直播"])
-router.include_router(wechat_eu_monitor.router, prefix="/wechat/eu-monitor", tags=["企业微信-小欧间谍"])
-router.include_router(wechat_coordinator.router, tags=["企业微信-小调"])
-router.include_router(wechat_assistant.router, tags=["企业微信-小助"])
-router.include_router(email_accounts.router, tags=["多邮箱管理"])
-router.include_router(assistant_work.router, prefix="/assistant", tags=["小助工作台"])
-router.include_router(ai_usage.router, tags=["AI用量监控"])
-router.include_router(website.router, tags=["WordPress网站对接"])
\ No newline at end of file
+# (模块, 前缀, 标签)，按原注册顺序（路由匹配按顺序进行）
+ROUTER_MODULES: List[Tuple[str, str, Optional[List[str]]]] = [
+    ("dashboard", "/dashboard", ["数据面板"]),
+    ("customers", "/customers", ["客户管理"]),
+    ("leads", "/leads", ["线索管理"]),
+    ("follow", "/follow", ["跟进管理"]),
+    ("chat", "/chat", ["对话"]),
+    ("videos", "/videos", ["视频"]),
+    ("agents", "/agents", ["AI员工"]),
+    ("wechat", "", ["企业微信"]),
+    ("company", "", ["公司配置"]),
+    ("reports", "", None),
+    ("knowledge", "", None),
+    ("webchat", "", None),
+    ("standards", "", ["工作标准"]),
+    ("monitoring", "", ["系统监控"]),
+    ("marketing", "/marketing", ["营销序列"]),
+    ("assets", "", ["素材库"]),
+    ("settings", "", ["系统设置"]),
+    ("notifications", "", ["通知中心"]),
+    ("wechat_groups", "", ["微信群监控"]),
+    ("social_auth", "", ["社交媒体登录"]),
+    ("erp", "/erp", ["ERP对接"]),
+    ("wechat_analyst2", "", ["企业微信-小析2"]),
+    ("content", "/content", ["内容营销"]),
+    ("email", "", ["邮件营销"]),
+    ("topics", "/topics", ["热门话题"]),  # 热门话题（小猎话题发现模式）
+    ("products", "/products", ["产品趋势"]),  # 产品趋势（小猎产品发现模式）
+    ("websocket", "", ["实时工作直播"]),  # WebSocket实时工作直播
+    ("wechat_eu_monitor", "/wechat/eu-monitor", ["企业微信-小欧间谍"]),  # 小欧间谍企业微信回调
+    ("wechat_coordinator", "", ["企业微信-小调"]),  # 小调企业微信回调
+    ("wechat_assistant", "", ["企业微信-小助"]),  # 小助企业微信回调
+    ("email_accounts", "", ["多邮箱管理"]),  # 多邮箱账户管理
+    ("assistant_work", "/assistant", ["小助工作台"]),  # 小助工作台
+    ("ai_usage", "", ["AI用量监控"]),  # AI用量监控
+    ("website", "", ["WordPress网站对接"]),  # WordPress网站对接
+]
+
+
+def include_routers(app: FastAPI, prefix: str = "/api") -> List[str]:
+    """
+    导入路由模块并注册到应用
+    
+    Returns:
+        已注册的模块名
+    """
+    disabled = set(settings.API_DISABLED_ROUTERS)
+    unknown = disabled - {name for name, _, _ in ROUTER_MODULES}
+    if unknown:
+        logger.warning(f"API_DISABLED_ROUTERS 中有未知模块: {sorted(unknown)}")
+    
+    included = []
+    for name, router_prefix, tags in ROUTER_MODULES:
+        if name in disabled:
+            logger.info(f"路由模块 {name} 已禁用，跳过加载")
+            continue
+        module = importlib.import_module(f"app.api.{name}")
+        app.include_router(module.router, prefix=prefix + router_prefix, tags=tags)
+        included.append(name)
+    return included
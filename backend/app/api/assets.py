@@ -6,7 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, text
 from typing import Optional, List
 from pydantic import BaseModel
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime
 import os
 import aiofiles
@@ -142,10 +142,10 @@ async def upload_asset(
         # 创建上传目录
         os.makedirs(UPLOAD_DIR, exist_ok=True)
         
-        # 生成文件名
+        # 生成文件名（加随机后缀：同一秒内的多次上传不会互相覆盖，也不会违反 file_url 唯一索引）
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         ext = os.path.splitext(file.filename)[1] if file.filename else ""
-        filename = f"{asset_type}_{timestamp}{ext}"
+        filename = f"{asset_type}_{timestamp}_{uuid4().hex[:8]}{ext}"
         filepath = os.path.join(UPLOAD_DIR, filename)
         
         # 保存文件
@@ -2,7 +2,8 @@
 小助工作台API
 提供日程、待办事项、会议记录等数据的CRUD接口
 """
-from fastapi import APIRouter, Query, HTTPException
+import hmac
+from fastapi import APIRouter, Query, HTTPException, Request
 from typing import Optional, List
 from datetime import datetime, date, timedelta
 from pydantic import BaseModel
@@ -10,6 +11,7 @@ from sqlalchemy import text
 from loguru import logger
 
 from app.models.database import AsyncSessionLocal
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -588,6 +590,39 @@ async def get_meeting(meeting_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/meetings/asr-callback")
+async def asr_callback(request: Request, token: str = Query("")):
+    """
+    腾讯云录音文件识别回调
+    
+    腾讯云以表单方式回调：code（0为成功）、message、requestId（任务ID）、text（识别结果）等
+    回调地址需带上 ?token=TENCENT_ASR_CALLBACK_TOKEN；未配置 token 时拒绝所有回调（转写结果由轮询获取）
+    """
+    expected = settings.TENCENT_ASR_CALLBACK_TOKEN
+    if not expected or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="invalid token")
+    
+    form = await request.form()
+    tencent_task_id = str(form.get("requestId", ""))
+    if not tencent_task_id:
+        return {"code": 1, "message": "缺少requestId"}
+    
+    try:
+        code = int(form.get("code", -1))
+    except (TypeError, ValueError):
+        code = -1
+    
+    from app.services.transcription_tracker import transcription_tracker
+    await transcription_tracker.handle_callback(
+        tencent_task_id,
+        code,
+        result=form.get("text", "") or "",
+        message=form.get("message", "") or ""
+    )
+    # 腾讯云要求返回 code=0，否则会重试回调
+    return {"code": 0, "message": "成功"}
+
+
 # ========================
 # 统计数据API
 # ========================
@@ -16,6 +16,7 @@ from app.agents.sales_agent import sales_agent
 from app.agents.follow_agent import follow_agent
 from app.agents.analyst import analyst_agent
 from app.services.notification import notification_service
+from app.services.dashboard_metrics import dashboard_metrics
 
 router = APIRouter()
 
@@ -251,6 +252,7 @@ async def send_message(
     
     # 8. 更新客户信息
     old_level = customer.intent_level.value
+    old_score = customer.intent_score
     customer.intent_score = new_intent_score
     customer.update_intent_level()
     customer.last_contact_at = datetime.utcnow()
@@ -258,6 +260,10 @@ async def send_message(
     
     await db.commit()
     
+    await dashboard_metrics.record_conversation(agent_type, content)
+    await dashboard_metrics.record_conversation(agent_type, ai_reply)
+    await dashboard_metrics.record_intent_changed(old_score, old_level, new_intent_score, customer.intent_level)
+    
     # 9. 如果变为高意向客户，触发通知
     if should_notify or (customer.intent_level.value in ['S', 'A'] and old_level not in ['S', 'A']):
         try:
@@ -312,6 +318,7 @@ async def simulate_customer_message(
         db.add(customer)
         await db.commit()
         await db.refresh(customer)
+        await dashboard_metrics.record_customer_created(customer.intent_score, customer.intent_level)
         logger.info(f"创建测试客户: {customer_name}")
     
     # 发送消息
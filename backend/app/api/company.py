@@ -10,6 +10,7 @@ import logging
 
 from ..models.database import get_db
 from ..models.company_config import CompanyConfig
+from ..services.company_profile import company_profile
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/company", tags=["company"])
@@ -111,6 +112,7 @@ async def get_company_config(db: AsyncSession = Depends(get_db)):
             db.add(config)
             await db.commit()
             await db.refresh(config)
+            await company_profile.invalidate()
         
         # 获取新字段（使用getattr防止字段不存在时报错）
         return {
@@ -170,6 +172,7 @@ async def update_company_config(
         
         await db.commit()
         await db.refresh(config)
+        await company_profile.invalidate()
         
         logger.info(f"公司配置已更新")
         
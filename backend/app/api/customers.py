@@ -3,13 +3,15 @@
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
+from sqlalchemy import select
 from typing import Optional, List
 from uuid import UUID
 from datetime import datetime
 
 from app.models import get_db, Customer, IntentLevel, CustomerSource
 from app.schemas.customer import CustomerCreate, CustomerUpdate, CustomerResponse, CustomerListResponse
+from app.core.pagination import COUNT_MODES, count_total, decode_cursor, encode_cursor, keyset_before, search_expression
+from app.services.dashboard_metrics import dashboard_metrics
 
 router = APIRouter()
 
@@ -20,9 +22,18 @@ async def list_customers(
     page_size: int = Query(20, ge=1, le=100),
     intent_level: Optional[IntentLevel] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入后忽略 page"),
+    count: Optional[str] = Query(None, description="总数：exact / estimated / none，默认翻页时 exact、游标时 none"),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取客户列表"""
+    """获取客户列表
+    
+    分页：page/page_size 按偏移翻页；深翻页用 cursor（按 intent_score, created_at, id 定位，不随页数变慢）
+    """
+    count = count or ("none" if cursor else "exact")
+    if count not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"count 只能是 {', '.join(COUNT_MODES)}")
+    
     query = select(Customer).where(Customer.is_active == True)
     
     # 筛选条件
@@ -30,32 +41,41 @@ async def list_customers(
         query = query.where(Customer.intent_level == intent_level)
     
     if search:
+        # 名称/电话/公司拼接后模糊匹配（trigram 表达式索引）
         query = query.where(
-            or_(
-                Customer.name.ilike(f"%{search}%"),
-                Customer.phone.ilike(f"%{search}%"),
-                Customer.company.ilike(f"%{search}%")
-            )
+            search_expression(Customer.name, Customer.phone, Customer.company).ilike(f"%{search}%")
         )
     
     # 统计总数
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
+    total = await count_total(db, query, count)
     
     # 分页
-    query = query.order_by(Customer.intent_score.desc(), Customer.created_at.desc())
-    query = query.offset((page - 1) * page_size).limit(page_size)
+    query = query.order_by(Customer.intent_score.desc(), Customer.created_at.desc(), Customer.id.desc())
+    if cursor:
+        try:
+            after = decode_cursor(cursor, (int, datetime.fromisoformat, UUID))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(keyset_before((Customer.intent_score, Customer.created_at, Customer.id), after))
+    else:
+        query = query.offset((page - 1) * page_size)
     
-    result = await db.execute(query)
+    # 多取一条判断是否还有下一页
+    result = await db.execute(query.limit(page_size + 1))
     customers = result.scalars().all()
+    next_cursor = None
+    if len(customers) > page_size:
+        customers = customers[:page_size]
+        last = customers[-1]
+        next_cursor = encode_cursor((last.intent_score, last.created_at, last.id))
     
     return {
         "items": customers,
         "total": total,
         "page": page,
         "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
+        "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+        "next_cursor": next_cursor
     }
 
 
@@ -119,6 +139,7 @@ async def create_customer(
     db.add(customer)
     await db.commit()
     await db.refresh(customer)
+    await dashboard_metrics.record_customer_created(customer.intent_score, customer.intent_level)
     return customer
 
 
@@ -137,12 +158,14 @@ async def update_customer(
     if not customer:
         raise HTTPException(status_code=404, detail="客户不存在")
     
+    old_score, old_level = customer.intent_score, customer.intent_level
     update_data = customer_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(customer, field, value)
     
     await db.commit()
     await db.refresh(customer)
+    await dashboard_metrics.record_intent_changed(old_score, old_level, customer.intent_score, customer.intent_level)
     return customer
 
 
@@ -169,6 +192,7 @@ async def update_customer_intent(
     customer.update_intent_level()
     
     await db.commit()
+    await dashboard_metrics.record_intent_changed(old_score, old_level, customer.intent_score, customer.intent_level)
     
     return {
         "customer_id": str(customer_id),
@@ -196,6 +220,7 @@ async def mark_high_intent(
         raise HTTPException(status_code=404, detail="客户不存在")
     
     old_level = customer.intent_level
+    old_score = customer.intent_score
     
     # 直接设置为S级客户，分数提升到80+
     customer.intent_level = IntentLevel.S
@@ -203,6 +228,7 @@ async def mark_high_intent(
         customer.intent_score = 80
     
     await db.commit()
+    await dashboard_metrics.record_intent_changed(old_score, old_level, customer.intent_score, customer.intent_level)
     
     return {
         "message": "已标记为高意向客户",
@@ -12,6 +12,8 @@ from loguru import logger
 
 from app.models import get_db
 from app.models.lead import Lead, LeadSource, LeadStatus, LeadIntentLevel
+from app.core.pagination import COUNT_MODES, count_total, decode_cursor, encode_cursor, keyset_before, search_expression
+from app.services.dashboard_metrics import dashboard_metrics
 
 router = APIRouter()
 
@@ -51,6 +53,8 @@ async def list_leads(
     include_converted: bool = Query(False, description="是否包含已转化的线索"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入后忽略 page"),
+    count: Optional[str] = Query(None, description="总数：exact / estimated / none，默认翻页时 exact、游标时 none"),
     db: AsyncSession = Depends(get_db)
 ):
     """获取线索列表
@@ -58,7 +62,13 @@ async def list_leads(
     默认不显示已转化(converted)的线索，如需查看历史转化记录：
     - 设置 include_converted=true 或
     - 设置 status=converted
+    
+    分页：page/page_size 按偏移翻页；深翻页用 cursor（按 created_at, id 定位，不随页数变慢）
     """
+    count = count or ("none" if cursor else "exact")
+    if count not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"count 只能是 {', '.join(COUNT_MODES)}")
+    
     query = select(Lead)
     
     # 过滤条件
@@ -74,25 +84,32 @@ async def list_leads(
     if source:
         query = query.where(Lead.source == source)
     if search:
-        search_filter = f"%{search}%"
+        # 名称/公司/电话/邮箱拼接后模糊匹配（trigram 表达式索引）
         query = query.where(
-            (Lead.name.ilike(search_filter)) |
-            (Lead.company.ilike(search_filter)) |
-            (Lead.phone.ilike(search_filter)) |
-            (Lead.email.ilike(search_filter))
+            search_expression(Lead.name, Lead.company, Lead.phone, Lead.email).ilike(f"%{search}%")
         )
     
     # 统计总数
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
+    total = await count_total(db, query, count)
     
     # 分页
-    query = query.order_by(Lead.created_at.desc())
-    query = query.offset((page - 1) * page_size).limit(page_size)
-    
-    result = await db.execute(query)
+    query = query.order_by(Lead.created_at.desc(), Lead.id.desc())
+    if cursor:
+        try:
+            after = decode_cursor(cursor, (datetime.fromisoformat, UUID))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(keyset_before((Lead.created_at, Lead.id), after))
+    else:
+        query = query.offset((page - 1) * page_size)
+    
+    # 多取一条判断是否还有下一页
+    result = await db.execute(query.limit(page_size + 1))
     leads = result.scalars().all()
+    next_cursor = None
+    if len(leads) > page_size:
+        leads = leads[:page_size]
+        next_cursor = encode_cursor((leads[-1].created_at, leads[-1].id))
     
     return {
         "items": [
@@ -118,7 +135,8 @@ async def list_leads(
         ],
         "total": total,
         "page": page,
-        "page_size": page_size
+        "page_size": page_size,
+        "next_cursor": next_cursor
     }
 
 
@@ -383,6 +401,7 @@ async def convert_lead_to_customer(
     
     await db.commit()
     await db.refresh(customer)
+    await dashboard_metrics.record_customer_created(customer.intent_score, customer.intent_level)
     
     logger.info(f"线索 {lead.name} 转化为客户 {customer.id}")
     
@@ -1,7 +1,7 @@
 """
 系统监控API
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from datetime import datetime, timedelta
@@ -9,8 +9,9 @@ import httpx
 import ssl
 import socket
 
-from app.models.database import AsyncSessionLocal
+from app.models.database import AsyncSessionLocal, pool_stats
 from app.core.config import settings
+from app.core.tracing import tracer, trace_summary, trace_detail
 
 router = APIRouter(prefix="/monitoring", tags=["monitoring"])
 
@@ -360,3 +361,43 @@ async def generate_team_report(period: str = "daily"):
             return report
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ==================== 请求追踪 ====================
+
+@router.get("/traces")
+async def get_traces(
+    limit: int = Query(20, ge=1, le=200),
+    name: Optional[str] = Query(None, description="只看该入口的追踪，如 'maria.process'、'HTTP GET /api/leads'"),
+    kind: Optional[str] = Query(None, description="只统计该类型的span：llm/db/client/tool/agent/server/job"),
+):
+    """最慢的追踪（缓冲区内）和各 span 的耗时分位数"""
+    return {
+        "enabled": tracer.enabled,
+        "sample_rate": settings.TRACING_SAMPLE_RATE,
+        "buffered": tracer.buffered,
+        "slowest": [trace_summary(trace) for trace in tracer.slowest_traces(limit, name)],
+        "spans": tracer.span_stats(kind),
+    }
+
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """单条追踪的全部 span（按开始时间排序，offset_ms 为相对请求开始的偏移）"""
+    trace = tracer.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="追踪不存在或已移出缓冲区")
+    return trace_detail(trace)
+
+
+# ==================== 数据库连接池 ====================
+
+@router.get("/db-pools")
+async def get_db_pools():
+    """
+    各数据库连接池的使用情况（当前 worker 进程）
+    
+    checked_out 为已借出连接数，overflow 为超出 size 的临时连接数，
+    wait_ms 为最近1000次获取连接的等待时间，timeouts 为获取连接超时次数
+    """
+    return {"pools": pool_stats()}
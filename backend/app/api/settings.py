@@ -10,6 +10,7 @@ import json
 import os
 
 from app.models.database import AsyncSessionLocal
+from app.services.company_profile import company_profile
 from sqlalchemy import text
 
 router = APIRouter(prefix="/settings", tags=["系统设置"])
@@ -148,6 +149,7 @@ async def update_company_settings(config: CompanyConfig):
         current = await get_setting("company")
         merged = {**current, **data}
         await save_setting("company", merged)
+        await company_profile.invalidate()
         
         logger.info("公司设置已更新")
         return {"message": "公司信息已保存", "data": merged}
@@ -200,6 +202,7 @@ async def save_all_settings(
             data = company.model_dump(exclude_none=True)
             current = await get_setting("company")
             await save_setting("company", {**current, **data})
+            await company_profile.invalidate()
         
         if notification:
             data = notification.model_dump(exclude_none=True)
@@ -285,6 +288,8 @@ async def update_smtp_settings(config: SMTPConfig):
                     data["smtp_password"] = env_password
         
         await save_setting("smtp", data)
+        # 邮件Logo属于邮件签名使用的公司资料
+        await company_profile.invalidate()
         
         # 更新email_service的配置
         try:
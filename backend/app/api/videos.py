@@ -11,6 +11,7 @@ from pydantic import BaseModel
 from loguru import logger
 
 from app.models import get_db, Video, VideoStatus
+from app.services.dashboard_metrics import dashboard_metrics
 
 router = APIRouter()
 
@@ -144,6 +145,7 @@ async def generate_video(
     db.add(video)
     await db.commit()
     await db.refresh(video)
+    await dashboard_metrics.record_video_created()
     
     try:
         # 第一步：小文生成脚本
@@ -6,12 +6,12 @@
 3. 群聊消息 - 小析2分析并存入知识库
 """
 import asyncio
-from collections import OrderedDict
 from fastapi import APIRouter, Request, Query, HTTPException, BackgroundTasks
 from fastapi.responses import PlainTextResponse
 from loguru import logger
 
 from app.services.wechat import wechat_service
+from app.services.message_dedup import message_dedup
 from app.services.conversation_service import conversation_service
 from app.agents.sales_agent import SalesAgent
 from app.agents.analyst2 import analyst2_agent
@@ -19,26 +19,6 @@ from app.services.knowledge_service import knowledge_service
 
 router = APIRouter(prefix="/wechat", tags=["企业微信"])
 
-# 消息去重缓存 - 存储已处理的消息ID，最多保留1000条
-_processed_messages = OrderedDict()
-_MAX_CACHE_SIZE = 1000
-
-
-def is_message_processed(msg_id: str) -> bool:
-    """检查消息是否已处理过"""
-    if msg_id in _processed_messages:
-        return True
-    return False
-
-
-def mark_message_processed(msg_id: str):
-    """标记消息为已处理"""
-    _processed_messages[msg_id] = True
-    # 超过最大缓存数量时，删除最早的记录
-    while len(_processed_messages) > _MAX_CACHE_SIZE:
-        _processed_messages.popitem(last=False)
-
-
 @router.get("/config-status")
 async def get_wechat_config_status():
     """
@@ -401,14 +381,10 @@ async def receive_message(
             chat_id = message.get("ChatId")  # 群聊ID（如果是群消息）
             
             # 消息去重检查
-            if msg_id and is_message_processed(msg_id):
+            if msg_id and not await message_dedup.claim("wechat", msg_id):
                 logger.info(f"⏭️ 跳过重复消息: MsgId={msg_id}, 用户={user_id}")
                 return PlainTextResponse(content="success")
             
-            # 标记消息为已处理
-            if msg_id:
-                mark_message_processed(msg_id)
-            
             # 判断消息类型：群消息 vs 私聊消息
             if chat_id:
                 # 群消息 - 交给小析2分析（不回复）
@@ -3,35 +3,18 @@
 专门处理群消息监控和情报分析
 """
 import asyncio
-from collections import OrderedDict
 from fastapi import APIRouter, Request, Query, HTTPException, BackgroundTasks
 from fastapi.responses import PlainTextResponse
 from loguru import logger
 
 from app.core.config import settings
+from app.services.message_dedup import message_dedup
 from app.agents.analyst2 import analyst2_agent
 from app.services.knowledge_service import knowledge_service
 from app.services.conversation_service import conversation_service
 
 router = APIRouter(prefix="/wechat/analyst2", tags=["企业微信-小析2"])
 
-# 消息去重缓存
-_processed_messages = OrderedDict()
-_MAX_CACHE_SIZE = 1000
-
-
-def is_message_processed(msg_id: str) -> bool:
-    """检查消息是否已处理过"""
-    return msg_id in _processed_messages
-
-
-def mark_message_processed(msg_id: str):
-    """标记消息为已处理"""
-    _processed_messages[msg_id] = True
-    while len(_processed_messages) > _MAX_CACHE_SIZE:
-        _processed_messages.popitem(last=False)
-
-
 class Analyst2WeChatCrypto:
     """小析2专用的企业微信消息加解密"""
     
@@ -184,13 +167,10 @@ async def receive_message(
             chat_id = message.get("ChatId")
             
             # 消息去重
-            if msg_id and is_message_processed(msg_id):
+            if msg_id and not await message_dedup.claim("analyst2", msg_id):
                 logger.info(f"[小析2] ⏭️ 跳过重复消息: MsgId={msg_id}")
                 return PlainTextResponse(content="success")
             
-            if msg_id:
-                mark_message_processed(msg_id)
-            
             # 判断是群消息还是私聊
             if chat_id:
                 logger.info(f"[小析2] 📢 收到群消息: ChatId={chat_id}, 内容={content[:30]}...")
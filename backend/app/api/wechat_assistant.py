@@ -5,12 +5,13 @@ Clauwdbot 企业微信回调API（由小助升级）
 AI中心超级助理 - 最高权限执行官
 """
 import os
+import json
+import asyncio
 import xml.etree.ElementTree as ET
 import hashlib
 import base64
 import struct
 import time
-from collections import OrderedDict
 from typing import Optional
 from Crypto.Cipher import AES
 
@@ -20,6 +21,8 @@ from loguru import logger
 import httpx
 
 from app.core.config import settings
+from app.services.message_dedup import message_dedup
+from app.services.wechat_token_manager import wechat_token_manager, TOKEN_INVALID_ERRCODES
 
 router = APIRouter(prefix="/wechat_assistant", tags=["Clauwdbot企业微信"])
 
@@ -98,59 +101,21 @@ def get_crypto() -> Optional[WeChatCrypto]:
     return None
 
 
-# ==================== 消息去重 ====================
-
-_processed_messages = OrderedDict()
-_MAX_CACHE_SIZE = 1000
-
-
-def is_message_processed(msg_id: str) -> bool:
-    """检查消息是否已处理"""
-    return msg_id in _processed_messages
-
-
-def mark_message_processed(msg_id: str):
-    """标记消息为已处理"""
-    _processed_messages[msg_id] = time.time()
-    # 清理过旧的缓存
-    while len(_processed_messages) > _MAX_CACHE_SIZE:
-        _processed_messages.popitem(last=False)
-
-
 # ==================== Access Token ====================
 
-_access_token_cache = {"token": None, "expires_at": 0}
-
-
 async def get_access_token() -> str:
-    """获取企业微信access_token"""
-    global _access_token_cache
-    
-    # 检查缓存
-    if _access_token_cache["token"] and time.time() < _access_token_cache["expires_at"]:
-        return _access_token_cache["token"]
-    
+    """获取企业微信access_token（统一由token管理器缓存和刷新）"""
     config = get_config()
-    if not config["corp_id"] or not config["secret"]:
-        raise ValueError("企业微信配置不完整")
-    
-    url = "https://qyapi.weixin.qq.com/cgi-bin/gettoken"
-    params = {
-        "corpid": config["corp_id"],
-        "corpsecret": config["secret"]
-    }
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, params=params)
-        data = response.json()
-    
-    if data.get("errcode") != 0:
-        raise ValueError(f"获取access_token失败: {data.get('errmsg')}")
-    
-    _access_token_cache["token"] = data["access_token"]
-    _access_token_cache["expires_at"] = time.time() + data["expires_in"] - 300  # 提前5分钟刷新
-    
-    return _access_token_cache["token"]
+    return await wechat_token_manager.get_token(
+        config["corp_id"], config["secret"], app_name="Clauwdbot"
+    )
+
+
+async def invalidate_access_token(result: dict, access_token: str):
+    """接口返回token失效错误码时作废缓存"""
+    if result.get("errcode") in TOKEN_INVALID_ERRCODES:
+        config = get_config()
+        await wechat_token_manager.invalidate(config["corp_id"], config["secret"], access_token)
 
 
 # ==================== 发送消息 ====================
@@ -182,6 +147,7 @@ async def send_text_message(user_id: str, content: str):
         
         if result.get("errcode") != 0:
             logger.error(f"[Clauwdbot] 发送消息失败: {result}")
+            await invalidate_access_token(result, access_token)
         else:
             logger.info(f"[Clauwdbot] 消息已发送给 {user_id}")
                 
@@ -570,7 +536,6 @@ async def process_file_message(user_id: str, media_id: str, file_name: str):
     from app.agents.assistant_agent import clauwdbot_agent
     from app.services.speech_recognition_service import speech_recognition_service
     from app.services.cos_storage_service import cos_storage_service
-    from app.services.document_service import document_service
     
     logger.info(f"[Clauwdbot] 收到文件: user={user_id}, file={file_name}")
     
@@ -595,7 +560,10 @@ async def process_file_message(user_id: str, media_id: str, file_name: str):
         # --- 情况A：音频文件 (会议录音) ---
         audio_extensions = [".mp3", ".m4a", ".wav", ".amr", ".ogg", ".aac"]
         if ext in audio_extensions:
-            await _handle_audio_file(user_id, file_name, file_data, cos_storage_service, speech_recognition_service)
+            await _handle_audio_file(
+                user_id, file_name, file_data, cos_storage_service, speech_recognition_service,
+                file_path=temp_path
+            )
             return
 
         # --- 情况B：文档文件 (Word, PDF, TXT) ---
@@ -604,48 +572,46 @@ async def process_file_message(user_id: str, media_id: str, file_name: str):
             # 立即反馈，让用户知道开始处理
             await send_text_message(user_id, f"📄 收到「{file_name}」\n⏳ 正在读取文档内容...")
             
-            # 解析文档
-            doc_result = await document_service.read_document(temp_path, file_name)
-            
-            if not doc_result["success"]:
-                await send_text_message(user_id, f"❌ 文档读取失败: {doc_result['error']}")
-                return
-            
-            content = doc_result["content"]
             file_name_lower = file_name.lower()
-            
-            # 发送进度更新
             doc_type = _detect_document_type(file_name_lower)
-            await send_text_message(user_id, f"✅ 文档读取完成（{len(content)}字）\n🔍 正在进行{doc_type}分析...")
             
-            # 智能识别文档类型，构建专业提示词
-            prompt = _build_document_analysis_prompt(file_name_lower, content)
+            # 长文档分块并发分析，按进度推送（至少间隔20秒，避免刷屏）
+            last_push = {"time": time.time(), "completed": 0}
+            
+            async def on_progress(completed: int, total: int, reading_done: bool):
+                if completed == 0 or time.time() - last_push["time"] < 20:
+                    return
+                if completed == last_push["completed"]:
+                    return
+                last_push.update(time=time.time(), completed=completed)
+                total_text = f"{total}" if reading_done else f"{total}+"
+                await send_text_message(user_id, f"📖 长文档分段分析中：已完成 {completed}/{total_text} 部分...")
+            
+            await send_text_message(user_id, f"🔍 正在进行{doc_type}分析...")
             
-            # 使用快速直接调用 LLM，跳过复杂的 ReAct 循环
             try:
-                from app.core.llm import chat_completion
-                import asyncio
+                from app.services.document_analyzer import document_analyzer
                 
-                # 设置超时，避免无限等待
-                response = await asyncio.wait_for(
-                    chat_completion(
-                        messages=[{"role": "user", "content": prompt}],
-                        system_prompt="你是Maria，老板的AI助理，具备法律、财务、物流等专业知识。请直接分析文档内容，给出专业建议。",
-                        use_advanced=True,
-                        agent_name="Maria",
-                        task_type="document_analysis",
-                        max_tokens=4000,  # 允许更长的回复
-                    ),
-                    timeout=120  # 2分钟超时
+                result = await document_analyzer.analyze(
+                    temp_path,
+                    file_name,
+                    build_prompt=lambda name, content: _build_document_analysis_prompt(name.lower(), content),
+                    system_prompt="你是Maria，老板的AI助理，具备法律、财务、物流等专业知识。请直接分析文档内容，给出专业建议。",
+                    on_progress=on_progress,
+                    max_tokens=4000,  # 允许更长的回复
+                    final_timeout=120  # 2分钟超时
                 )
                 
-                if response:
-                    await send_text_message(user_id, response)
+                if not result["success"]:
+                    if result.get("error") == "timeout":
+                        await send_text_message(user_id, "⏰ 分析时间较长，我会继续处理。如有结果会立即通知您。")
+                    else:
+                        await send_text_message(user_id, f"❌ 文档读取失败: {result['error']}")
+                elif result["content"]:
+                    await send_text_message(user_id, result["content"])
                 else:
                     await send_text_message(user_id, "⚠️ 分析完成但未生成回复，请重试或换个方式提问。")
                     
-            except asyncio.TimeoutError:
-                await send_text_message(user_id, "⏰ 分析时间较长，我会继续处理。如有结果会立即通知您。")
             except Exception as e:
                 logger.error(f"[Maria] 文档分析失败: {e}")
                 await send_text_message(user_id, f"⚠️ 分析出现问题: {str(e)[:100]}\n请稍后重试。")
@@ -668,8 +634,8 @@ async def process_file_message(user_id: str, media_id: str, file_name: str):
                 pass
 
 
-async def _handle_audio_file(user_id, file_name, audio_data, cos_service, asr_service):
-    """处理音频文件的具体逻辑"""
+async def _handle_audio_file(user_id, file_name, audio_data, cos_service, asr_service, file_path=None):
+    """处理音频文件的具体逻辑（长录音按静音切分后分段并发转写）"""
     # 检查配置
     if not cos_service.is_configured:
         await send_text_message(user_id, f"📼 收到录音: {file_name}\n\n⚠️ 云存储未配置，请联系管理员配置腾讯云COS。")
@@ -679,6 +645,20 @@ async def _handle_audio_file(user_id, file_name, audio_data, cos_service, asr_se
         await send_text_message(user_id, f"📼 收到录音: {file_name}\n\n⚠️ 语音识别未配置，请联系管理员配置腾讯云ASR。")
         return
     
+    # 长录音：分段并发转写，逐段推送纪要
+    plan = None
+    if file_path:
+        from app.services.meeting_audio_pipeline import meeting_audio_pipeline
+        try:
+            loop = asyncio.get_event_loop()
+            plan = await loop.run_in_executor(None, meeting_audio_pipeline.plan, file_path)
+        except Exception as e:
+            logger.warning(f"[Clauwdbot] 录音切分规划失败，整段转写: {e}")
+    
+    if plan:
+        await _handle_segmented_audio(user_id, file_name, file_path, plan, cos_service, asr_service)
+        return
+    
     # 通知用户
     await send_text_message(user_id, f"📼 收到会议录音: {file_name}\n\n正在处理中，转写完成后会自动发送会议纪要。\n⏱ 预计需要2-5分钟")
     
@@ -726,12 +706,118 @@ async def _handle_audio_file(user_id, file_name, audio_data, cos_service, asr_se
         return
     
     # 启动后台等待
-    import asyncio
     asyncio.create_task(
         _wait_and_send_meeting_summary(user_id, meeting_id, transcribe_result.get('task_id'))
     )
 
 
+async def _handle_segmented_audio(user_id, file_name, file_path, plan, cos_service, asr_service):
+    """长录音分段转写：每段完成后按顺序推送分段纪要，最后发送整场纪要"""
+    from app.models.database import AsyncSessionLocal
+    from app.services.meeting_audio_pipeline import meeting_audio_pipeline, format_clock
+    from sqlalchemy import text
+    
+    segments = plan["segments"]
+    await send_text_message(
+        user_id,
+        f"📼 收到会议录音: {file_name}\n\n"
+        f"录音约{plan['duration'] / 60:.0f}分钟，已按停顿切成{len(segments)}段并行转写，"
+        f"每段完成后先发送该段纪要。"
+    )
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            text("""
+                INSERT INTO meeting_records (transcription_status, created_by)
+                VALUES ('processing', :user_id)
+                RETURNING id
+            """),
+            {"user_id": user_id}
+        )
+        meeting_id = str(result.fetchone()[0])
+        await db.commit()
+    
+    async def on_section(index, total, start, end, summary):
+        await send_text_message(
+            user_id,
+            f"📋 会议纪要（第{index + 1}/{total}段 {format_clock(start)}-{format_clock(end)}）\n{summary}"
+        )
+    
+    # 临时文件在 process_file_message 返回后删除，流水线在后台运行前先复制一份
+    import shutil
+    import tempfile
+    fd, audio_copy = tempfile.mkstemp(suffix=os.path.splitext(file_name)[1].lower())
+    os.close(fd)
+    shutil.copyfile(file_path, audio_copy)
+    
+    async def run():
+        try:
+            result = await meeting_audio_pipeline.run(
+                audio_copy, meeting_id, plan, cos_service, asr_service, on_section=on_section
+            )
+            if result["success"]:
+                await _send_meeting_summary(user_id, meeting_id)
+            elif not result.get("skipped"):
+                await send_text_message(user_id, "❌ 会议录音转写失败，请检查录音质量后重试。")
+        except Exception as e:
+            logger.error(f"[Clauwdbot] 分段转写失败: {e}")
+            await send_text_message(user_id, f"❌ 会议录音处理失败: {str(e)[:100]}")
+        finally:
+            if os.path.exists(audio_copy):
+                os.remove(audio_copy)
+    
+    asyncio.create_task(run())
+
+
+def _format_meeting_summary(summary, transcription, action_items) -> str:
+    """格式化会议纪要消息"""
+    lines = ["📋 会议纪要", "━" * 18]
+    lines.append(f"\n📝 摘要: {summary or '无摘要'}")
+    
+    # 解析待办事项
+    try:
+        if isinstance(action_items, str):
+            action_items = json.loads(action_items)
+        if action_items:
+            lines.append("\n✅ 待办事项:")
+            for item in action_items[:5]:  # 最多显示5条
+                assignee = item.get('assignee', '待定')
+                task = item.get('task', '')
+                lines.append(f"  • {assignee}: {task}")
+    except:
+        pass
+    
+    # 添加部分转写内容
+    if transcription:
+        preview = transcription[:300] + "..." if len(transcription) > 300 else transcription
+        lines.append(f"\n📄 转写预览:\n{preview}")
+    
+    lines.append("\n━" * 18)
+    lines.append("完整内容可在系统中查看")
+    return "\n".join(lines)
+
+
+async def _send_meeting_summary(user_id: str, meeting_id: str):
+    """发送已生成的整场会议纪要"""
+    from app.models.database import AsyncSessionLocal
+    from sqlalchemy import text
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            text("""
+                SELECT summary, raw_transcription, action_items
+                FROM meeting_records
+                WHERE id = :meeting_id
+            """),
+            {"meeting_id": meeting_id}
+        )
+        row = result.fetchone()
+    
+    if row:
+        await send_text_message(user_id, _format_meeting_summary(row[0], row[1], row[2]))
+        logger.info(f"[Clauwdbot] 会议纪要已发送: {meeting_id}")
+
+
 async def _wait_and_send_meeting_summary(user_id: str, meeting_id: str, task_id: str):
     """等待转写完成后发送会议纪要给用户"""
     import asyncio
@@ -766,35 +852,7 @@ async def _wait_and_send_meeting_summary(user_id: str, meeting_id: str, task_id:
                 
                 if status == 'completed':
                     # 转写完成，发送会议纪要
-                    summary = row[1] or "无摘要"
-                    transcription = row[2] or ""
-                    
-                    # 格式化会议纪要
-                    lines = ["📋 会议纪要", "━" * 18]
-                    lines.append(f"\n📝 摘要: {summary}")
-                    
-                    # 解析待办事项
-                    try:
-                        import json
-                        action_items = json.loads(row[4]) if row[4] else []
-                        if action_items:
-                            lines.append("\n✅ 待办事项:")
-                            for item in action_items[:5]:  # 最多显示5条
-                                assignee = item.get('assignee', '待定')
-                                task = item.get('task', '')
-                                lines.append(f"  • {assignee}: {task}")
-                    except:
-                        pass
-                    
-                    # 添加部分转写内容
-                    if transcription:
-                        preview = transcription[:300] + "..." if len(transcription) > 300 else transcription
-                        lines.append(f"\n📄 转写预览:\n{preview}")
-                    
-                    lines.append("\n━" * 18)
-                    lines.append("完整内容可在系统中查看")
-                    
-                    await send_text_message(user_id, "\n".join(lines))
+                    await send_text_message(user_id, _format_meeting_summary(row[1], row[2], row[4]))
                     logger.info(f"[Clauwdbot] 会议纪要已发送: {meeting_id}")
                     return
                 
@@ -889,13 +947,10 @@ async def receive_message(
         
         # 消息去重
         msg_id = message.get("MsgId")
-        if msg_id and is_message_processed(msg_id):
+        if msg_id and not await message_dedup.claim("assistant", msg_id):
             logger.info(f"[Clauwdbot] 跳过重复消息: {msg_id}")
             return PlainTextResponse(content="success")
         
-        if msg_id:
-            mark_message_processed(msg_id)
-        
         user_id = message.get("FromUserName")
         msg_type = message.get("MsgType")
         
@@ -6,7 +6,6 @@
 3. 汇报工作进展和日报
 """
 import asyncio
-from collections import OrderedDict
 from fastapi import APIRouter, Request, Query, HTTPException, BackgroundTasks
 from fastapi.responses import PlainTextResponse
 from loguru import logger
@@ -21,6 +20,8 @@ import json
 from datetime import datetime
 
 from app.core.config import settings
+from app.services.message_dedup import message_dedup
+from app.services.wechat_token_manager import wechat_token_manager, TOKEN_INVALID_ERRCODES
 from app.agents.coordinator import coordinator
 from app.models.database import AsyncSessionLocal
 
@@ -118,21 +119,6 @@ class CoordinatorWeChatCrypto:
         return self._decrypt(encrypted_msg)
 
 
-# 消息去重缓存
-_processed_messages = OrderedDict()
-_MAX_CACHE_SIZE = 500
-
-
-def is_message_processed(msg_id: str) -> bool:
-    return msg_id in _processed_messages
-
-
-def mark_message_processed(msg_id: str):
-    _processed_messages[msg_id] = True
-    while len(_processed_messages) > _MAX_CACHE_SIZE:
-        _processed_messages.popitem(last=False)
-
-
 def get_crypto() -> Optional[CoordinatorWeChatCrypto]:
     """获取小调专用的加解密实例"""
     crypto = CoordinatorWeChatCrypto()
@@ -142,25 +128,26 @@ def get_crypto() -> Optional[CoordinatorWeChatCrypto]:
 
 
 async def get_access_token() -> Optional[str]:
-    """获取小调应用的access_token"""
+    """获取小调应用的access_token（统一由token管理器缓存和刷新）"""
     corp_id = settings.WECHAT_CORP_ID
     secret = settings.WECHAT_COORDINATOR_SECRET
     
     if not corp_id or not secret:
         return None
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://qyapi.weixin.qq.com/cgi-bin/gettoken",
-            params={"corpid": corp_id, "corpsecret": secret}
+    try:
+        return await wechat_token_manager.get_token(corp_id, secret, app_name="小调")
+    except Exception as e:
+        logger.error(f"[小调] 获取access_token失败: {e}")
+        return None
+
+
+async def invalidate_access_token(data: Dict[str, Any], access_token: str):
+    """接口返回token失效错误码时作废缓存"""
+    if data.get("errcode") in TOKEN_INVALID_ERRCODES:
+        await wechat_token_manager.invalidate(
+            settings.WECHAT_CORP_ID, settings.WECHAT_COORDINATOR_SECRET, access_token
         )
-        data = response.json()
-        
-        if data.get("errcode") == 0:
-            return data.get("access_token")
-        else:
-            logger.error(f"[小调] 获取access_token失败: {data}")
-            return None
 
 
 async def send_text_message(user_ids: list, content: str) -> Dict[str, Any]:
@@ -189,6 +176,7 @@ async def send_text_message(user_ids: list, content: str) -> Dict[str, Any]:
         if data.get("errcode") == 0:
             return {"success": True}
         else:
+            await invalidate_access_token(data, access_token)
             return {"success": False, "error": data}
 
 
@@ -218,6 +206,7 @@ async def send_markdown_message(user_ids: list, content: str) -> Dict[str, Any]:
         if data.get("errcode") == 0:
             return {"success": True}
         else:
+            await invalidate_access_token(data, access_token)
             return {"success": False, "error": data}
 
 
@@ -306,13 +295,10 @@ async def receive_message(
             content = message.get("Content", "").strip()
             
             # 消息去重
-            if msg_id and is_message_processed(msg_id):
+            if msg_id and not await message_dedup.claim("coordinator", msg_id):
                 logger.info(f"[小调] 跳过重复消息: {msg_id}")
                 return PlainTextResponse(content="success")
             
-            if msg_id:
-                mark_message_processed(msg_id)
-            
             # 检查权限
             if not is_admin_user(user_id):
                 logger.warning(f"[小调] 非管理员用户尝试发送消息: {user_id}")
@@ -0,0 +1,127 @@
+"""
+请求级执行上下文
+AI员工是模块级单例，同一事件循环里会并发处理多条消息；
+凡是"这一次请求"的状态（任务会话、用户、LLM用量归属、记忆/RAG上下文）都放在 contextvars 中，
+每个 asyncio Task 各自一份，互不覆盖
+
+- ExecutionContext：用户、AI员工、任务类型等归属信息（chat_completion/_record_usage 读取）
+- execution_scope()：在一段代码内覆盖部分字段，退出时恢复
+- request_local：描述符，把单例上的实例属性变为按请求隔离
+"""
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ExecutionContext:
+    """当前请求的归属信息（不可变，修改时整体替换）"""
+    trace_id: Optional[str] = None  # 一次请求（如一条企业微信消息）的追踪ID
+    user_id: Optional[str] = None
+    agent_name: Optional[str] = None
+    agent_id: Optional[int] = None
+    task_type: Optional[str] = None
+    session_id: Optional[Any] = None
+
+
+_current: ContextVar[ExecutionContext] = ContextVar("execution_context", default=ExecutionContext())
+
+# request_local 属性存储：(对象id, 属性名) -> 值；写时复制，子任务修改不影响父任务
+_request_state: ContextVar[Dict[Tuple[int, str], Any]] = ContextVar("request_state", default={})
+
+
+def current_context() -> ExecutionContext:
+    """获取当前执行上下文"""
+    return _current.get()
+
+
+def update_context(**changes) -> ExecutionContext:
+    """
+    修改当前执行上下文（传入的字段原样写入，包括 None）
+    作用到当前Task结束，或外层 execution_scope 退出
+    """
+    ctx = replace(_current.get(), **changes)
+    _current.set(ctx)
+    return ctx
+
+
+def push_context(**changes) -> Token:
+    """
+    覆盖执行上下文字段，返回用于恢复的 token（配合 reset_context 在 finally 中使用）
+    值为 None 的字段沿用外层
+    """
+    changes = {k: v for k, v in changes.items() if v is not None}
+    return _current.set(replace(_current.get(), **changes))
+
+
+def reset_context(token: Token):
+    """恢复 push_context 之前的执行上下文"""
+    _current.reset(token)
+
+
+@contextmanager
+def execution_scope(new_request: bool = False, **changes) -> Iterator[ExecutionContext]:
+    """
+    在代码块内覆盖执行上下文字段，退出时恢复原值（值为 None 的字段沿用外层）
+    
+    Args:
+        new_request: 开始一个新请求：生成新 trace_id，并清空 request_local 状态
+            （同一个Task先后处理多条消息时，上一条的记忆/RAG等状态不会带入下一条）
+    """
+    if new_request:
+        changes.setdefault("trace_id", uuid.uuid4().hex[:12])
+    
+    token = push_context(**changes)
+    state_token = _request_state.set({}) if new_request else None
+    try:
+        yield _current.get()
+    finally:
+        reset_context(token)
+        if state_token is not None:
+            _request_state.reset(state_token)
+
+
+class request_local:
+    """
+    按请求隔离的实例属性（描述符）
+    
+    用法：
+        class ClauwdbotAgent(BaseAgent):
+            _rag_context = request_local("")
+    
+    单例上读写 self._rag_context 时，实际存取的是当前 contextvars 上下文中的值；
+    并发的两个请求各自看到自己写入的值，未写入时返回默认值
+    """
+    
+    def __init__(self, default: Any = None, default_factory: Optional[Callable[[], Any]] = None):
+        self.default = default
+        self.default_factory = default_factory
+        self.name = ""
+    
+    def __set_name__(self, owner, name):
+        self.name = name
+    
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        key = (id(obj), self.name)
+        state = _request_state.get()
+        if key in state:
+            return state[key]
+        if self.default_factory is not None:
+            value = self.default_factory()
+            self.__set__(obj, value)
+            return value
+        return self.default
+    
+    def __set__(self, obj, value):
+        state = dict(_request_state.get())
+        state[(id(obj), self.name)] = value
+        _request_state.set(state)
+    
+    def __delete__(self, obj):
+        state = dict(_request_state.get())
+        state.pop((id(obj), self.name), None)
+        _request_state.set(state)
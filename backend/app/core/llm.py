@@ -2,7 +2,7 @@
 LLM（大语言模型）调用封装
 支持 Claude 和 GPT-4，包含重试机制和用量记录
 """
-from typing import Optional, List, Dict, Any, Callable, TypeVar
+from typing import Optional, List, Dict, Any, Callable, Tuple, TypeVar, Union
 from abc import ABC, abstractmethod
 import httpx
 import asyncio
@@ -12,6 +12,14 @@ import uuid
 from loguru import logger
 
 from app.core.config import settings
+from app.core.prompt_composer import ComposedPrompt
+from app.core.execution_context import (
+    current_context, update_context, push_context, reset_context
+)
+from app.core.tracing import traced
+
+# 系统提示词：普通字符串，或分层组装的 ComposedPrompt（支持前缀缓存）
+SystemPrompt = Union[str, ComposedPrompt]
 
 
 # 重试配置
@@ -71,29 +79,27 @@ RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
 
 T = TypeVar('T')
 
-# 当前调用上下文（用于传递agent_name等信息）
-_current_context: Dict[str, Any] = {}
-
-
 def set_llm_context(agent_name: str = None, task_type: str = None, agent_id: int = None):
-    """设置LLM调用上下文"""
-    global _current_context
-    _current_context = {
-        "agent_name": agent_name,
-        "task_type": task_type,
-        "agent_id": agent_id
-    }
+    """设置LLM调用上下文（写入当前请求的执行上下文，不影响其他并发请求）"""
+    update_context(agent_name=agent_name, task_type=task_type, agent_id=agent_id)
 
 
 def clear_llm_context():
     """清除LLM调用上下文"""
-    global _current_context
-    _current_context = {}
+    update_context(agent_name=None, task_type=None, agent_id=None)
 
 
 def get_llm_context() -> Dict[str, Any]:
     """获取当前LLM调用上下文"""
-    return _current_context.copy()
+    ctx = current_context()
+    return {
+        "agent_name": ctx.agent_name,
+        "task_type": ctx.task_type,
+        "agent_id": ctx.agent_id,
+        "user_id": ctx.user_id,
+        "session_id": ctx.session_id,
+        "trace_id": ctx.trace_id
+    }
 
 
 async def retry_with_exponential_backoff(
@@ -185,6 +191,61 @@ def estimate_tokens(text: str) -> int:
     return max(1, estimated)
 
 
+def _system_text(system_prompt: Optional[SystemPrompt]) -> str:
+    """系统提示词的纯文本形式"""
+    return str(system_prompt) if system_prompt else ""
+
+
+def _cache_blocks(system_prompt: Optional[SystemPrompt]) -> Optional[List[Dict[str, Any]]]:
+    """
+    分层提示词转换为带缓存断点的文本块
+    
+    Returns:
+        未启用显式缓存、或不是分层提示词时返回 None（按普通字符串发送）
+    """
+    if not isinstance(system_prompt, ComposedPrompt) or not settings.PROMPT_CACHE_ENABLED:
+        return None
+    blocks = system_prompt.cache_blocks(settings.PROMPT_CACHE_MIN_TOKENS, estimate_tokens)
+    if not any("cache_control" in block for block in blocks):
+        return None
+    return blocks
+
+
+def _estimate_input_tokens(system_prompt: Optional[SystemPrompt], messages: List[Dict[str, Any]]) -> int:
+    """估算输入tokens（系统提示词 + 消息）"""
+    input_text = _system_text(system_prompt)
+    for msg in messages:
+        content = msg.get("content") or ""
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        input_text += content
+    return estimate_tokens(input_text)
+
+
+def _parse_cached_tokens(usage: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    从各家 usage 中解析缓存命中情况
+    
+    Returns:
+        (命中缓存的输入tokens, 写入缓存的输入tokens)
+    """
+    # Anthropic
+    if "cache_read_input_tokens" in usage or "cache_creation_input_tokens" in usage:
+        return (
+            usage.get("cache_read_input_tokens") or 0,
+            usage.get("cache_creation_input_tokens") or 0
+        )
+    # DeepSeek
+    if "prompt_cache_hit_tokens" in usage:
+        return usage.get("prompt_cache_hit_tokens") or 0, 0
+    # OpenAI / 通义千问 / OpenRouter
+    details = usage.get("prompt_tokens_details") or {}
+    return (
+        details.get("cached_tokens") or 0,
+        details.get("cache_creation_input_tokens") or 0
+    )
+
+
 class BaseLLM(ABC):
     """LLM基类"""
     
@@ -196,7 +257,7 @@ class BaseLLM(ABC):
         messages: List[Dict[str, str]], 
         temperature: float = 0.7,
         max_tokens: int = 2000,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[SystemPrompt] = None
     ) -> str:
         """发送聊天消息"""
         pass
@@ -209,14 +270,25 @@ class BaseLLM(ABC):
         response_time_ms: int,
         is_success: bool = True,
         error_message: str = None,
-        request_id: str = None
+        request_id: str = None,
+        cached_tokens: int = 0,
+        cache_write_tokens: int = 0
     ):
-        """记录API调用用量"""
+        """记录API调用用量（input_tokens 含命中缓存的部分）"""
         try:
             from app.services.ai_usage_service import record_ai_usage
             
             context = get_llm_context()
             
+            # 请求级归属（用户、任务会话），便于按请求追溯
+            extra_data = {
+                key: str(context[key])
+                for key in ("user_id", "session_id", "trace_id")
+                if context.get(key)
+            }
+            if cache_write_tokens:
+                extra_data["cache_write_tokens"] = cache_write_tokens
+            
             await record_ai_usage(
                 provider=self.provider,
                 model_name=model_name,
@@ -228,7 +300,10 @@ class BaseLLM(ABC):
                 request_id=request_id or str(uuid.uuid4())[:8],
                 response_time_ms=response_time_ms,
                 is_success=is_success,
-                error_message=error_message
+                error_message=error_message,
+                cached_tokens=cached_tokens,
+                cache_write_tokens=cache_write_tokens,
+                extra_data=extra_data or None
             )
         except Exception as e:
             # 用量记录失败不应影响主流程
@@ -250,7 +325,7 @@ class ClaudeLLM(BaseLLM):
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = 2000,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[SystemPrompt] = None
     ) -> str:
         """发送聊天消息到Claude（带重试机制和用量记录）"""
         headers = {
@@ -267,13 +342,11 @@ class ClaudeLLM(BaseLLM):
         }
         
         if system_prompt:
-            payload["system"] = system_prompt
+            # 分层提示词按块发送，静态前缀/慢变上下文末尾设置 cache_control
+            payload["system"] = _cache_blocks(system_prompt) or _system_text(system_prompt)
         
         # 估算输入tokens
-        input_text = system_prompt or ""
-        for msg in messages:
-            input_text += msg.get("content", "")
-        estimated_input_tokens = estimate_tokens(input_text)
+        estimated_input_tokens = _estimate_input_tokens(system_prompt, messages)
         
         start_time = time.time()
         request_id = str(uuid.uuid4())[:8]
@@ -302,9 +375,10 @@ class ClaudeLLM(BaseLLM):
             # 计算响应时间
             response_time_ms = int((time.time() - start_time) * 1000)
             
-            # 获取实际token使用量（Claude API返回的）
+            # 获取实际token使用量（Claude API返回的，input_tokens 不含缓存读写部分）
             usage = data.get("usage", {})
-            input_tokens = usage.get("input_tokens", estimated_input_tokens)
+            cached_tokens, cache_write_tokens = _parse_cached_tokens(usage)
+            input_tokens = usage.get("input_tokens", estimated_input_tokens) + cached_tokens + cache_write_tokens
             output_tokens = usage.get("output_tokens", estimate_tokens(response_text))
             
             # 记录用量
@@ -314,7 +388,9 @@ class ClaudeLLM(BaseLLM):
                 output_tokens=output_tokens,
                 response_time_ms=response_time_ms,
                 is_success=True,
-                request_id=request_id
+                request_id=request_id,
+                cached_tokens=cached_tokens,
+                cache_write_tokens=cache_write_tokens
             )
             
             return response_text
@@ -353,12 +429,25 @@ class OpenAILLM(BaseLLM):
         else:
             self.provider = "openai"
     
+    def _system_message(self, system_prompt: SystemPrompt) -> Dict[str, Any]:
+        """
+        构建系统消息
+        OpenRouter转发的Claude、开启显式缓存的通义千问使用带 cache_control 的 content 数组；
+        DeepSeek/OpenAI 为自动前缀缓存，按普通字符串发送
+        """
+        explicit = (
+            self.provider == "openrouter/claude"
+            or (self.provider == "dashscope" and settings.DASHSCOPE_EXPLICIT_CACHE)
+        )
+        blocks = _cache_blocks(system_prompt) if explicit else None
+        return {"role": "system", "content": blocks or _system_text(system_prompt)}
+    
     async def chat(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = 2000,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[SystemPrompt] = None
     ) -> str:
         """发送聊天消息到GPT（带重试机制和用量记录）"""
         headers = {
@@ -369,7 +458,7 @@ class OpenAILLM(BaseLLM):
         # 如果有系统提示，添加到消息列表开头
         full_messages = messages.copy()
         if system_prompt:
-            full_messages.insert(0, {"role": "system", "content": system_prompt})
+            full_messages.insert(0, self._system_message(system_prompt))
         
         payload = {
             "model": self.model,
@@ -379,10 +468,7 @@ class OpenAILLM(BaseLLM):
         }
         
         # 估算输入tokens
-        input_text = ""
-        for msg in full_messages:
-            input_text += msg.get("content", "")
-        estimated_input_tokens = estimate_tokens(input_text)
+        estimated_input_tokens = _estimate_input_tokens(system_prompt, messages)
         
         start_time = time.time()
         request_id = str(uuid.uuid4())[:8]
@@ -415,6 +501,7 @@ class OpenAILLM(BaseLLM):
             usage = data.get("usage", {})
             input_tokens = usage.get("prompt_tokens", estimated_input_tokens)
             output_tokens = usage.get("completion_tokens", estimate_tokens(response_text))
+            cached_tokens, cache_write_tokens = _parse_cached_tokens(usage)
             
             # 记录用量
             await self._record_usage(
@@ -423,7 +510,9 @@ class OpenAILLM(BaseLLM):
                 output_tokens=output_tokens,
                 response_time_ms=response_time_ms,
                 is_success=True,
-                request_id=request_id
+                request_id=request_id,
+                cached_tokens=cached_tokens,
+                cache_write_tokens=cache_write_tokens
             )
             
             return response_text
@@ -452,7 +541,7 @@ class OpenAILLM(BaseLLM):
         tools: List[Dict[str, Any]],
         temperature: float = 0.7,
         max_tokens: int = 2000,
-        system_prompt: Optional[str] = None,
+        system_prompt: Optional[SystemPrompt] = None,
         tool_choice: str = "auto"
     ) -> Dict[str, Any]:
         """
@@ -476,7 +565,7 @@ class OpenAILLM(BaseLLM):
         
         full_messages = messages.copy()
         if system_prompt:
-            full_messages.insert(0, {"role": "system", "content": system_prompt})
+            full_messages.insert(0, self._system_message(system_prompt))
         
         payload = {
             "model": self.model,
@@ -488,10 +577,7 @@ class OpenAILLM(BaseLLM):
         }
         
         # 估算输入tokens
-        input_text = ""
-        for msg in full_messages:
-            input_text += msg.get("content", "") or ""
-        estimated_input_tokens = estimate_tokens(input_text)
+        estimated_input_tokens = _estimate_input_tokens(system_prompt, messages)
         
         start_time = time.time()
         request_id = str(uuid.uuid4())[:8]
@@ -522,6 +608,7 @@ class OpenAILLM(BaseLLM):
             usage = data.get("usage", {})
             input_tokens = usage.get("prompt_tokens", estimated_input_tokens)
             output_tokens = usage.get("completion_tokens", 0)
+            cached_tokens, cache_write_tokens = _parse_cached_tokens(usage)
             
             await self._record_usage(
                 model_name=self.model,
@@ -529,7 +616,9 @@ class OpenAILLM(BaseLLM):
                 output_tokens=output_tokens,
                 response_time_ms=response_time_ms,
                 is_success=True,
-                request_id=request_id
+                request_id=request_id,
+                cached_tokens=cached_tokens,
+                cache_write_tokens=cache_write_tokens
             )
             
             # 返回标准化格式
@@ -573,7 +662,7 @@ class HunyuanLLM(BaseLLM):
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = 2000,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[SystemPrompt] = None
     ) -> str:
         """调用腾讯混元 API"""
         import hashlib
@@ -583,7 +672,7 @@ class HunyuanLLM(BaseLLM):
         # 构建消息
         full_messages = messages.copy()
         if system_prompt:
-            full_messages.insert(0, {"role": "system", "content": system_prompt})
+            full_messages.insert(0, {"role": "system", "content": _system_text(system_prompt)})
         
         # 腾讯云 API 签名（简化版，实际应使用 SDK）
         # 这里使用 HTTP API 兼容模式
@@ -857,9 +946,10 @@ class LLMFactory:
         raise ValueError("未配置任何AI API密钥")
 
 
+@traced("llm.chat_completion", kind="llm", attributes=("agent_name", "task_type", "model_preference"))
 async def chat_completion(
     messages: List[Dict[str, str]],
-    system_prompt: Optional[str] = None,
+    system_prompt: Optional[SystemPrompt] = None,
     temperature: float = None,
     max_tokens: int = None,
     use_fallback: bool = False,
@@ -877,7 +967,7 @@ async def chat_completion(
     
     Args:
         messages: 消息列表 [{"role": "user", "content": "..."}]
-        system_prompt: 系统提示词
+        system_prompt: 系统提示词（字符串，或 compose_prompt 分层组装以命中前缀缓存）
         temperature: 温度参数
         max_tokens: 最大token数
         use_fallback: 是否使用备用模型
@@ -900,9 +990,8 @@ async def chat_completion(
         - 无 tools 时：str（AI回复文本）
         - 有 tools 时：dict（{"content": "...", "tool_calls": [...]}）
     """
-    # 设置调用上下文
-    if agent_name or task_type or agent_id:
-        set_llm_context(agent_name=agent_name, task_type=task_type, agent_id=agent_id)
+    # 调用归属写入执行上下文（contextvars）：并发请求互不覆盖，未传入的字段沿用外层（如AI员工任务会话）
+    context_token = push_context(agent_name=agent_name, task_type=task_type, agent_id=agent_id)
     
     kwargs = {
         "messages": messages,
@@ -991,5 +1080,5 @@ async def chat_completion(
                 logger.error("所有备用模型都调用失败")
             raise
     finally:
-        # 清除调用上下文
-        clear_llm_context()
+        # 恢复外层执行上下文
+        reset_context(context_token)
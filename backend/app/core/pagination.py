@@ -0,0 +1,101 @@
+"""
+列表分页工具（线索、客户列表）
+- 游标（keyset）分页：按排序键 + id 定位下一页，无论翻到多深都只读取 page_size 行
+- 总数：exact 精确计数；estimated 取查询计划的估算行数（估算较小时仍精确计数）；none 不计数
+- 多列模糊搜索：拼接列的表达式与迁移 049 中的 trigram 表达式索引保持一致，ILIKE 可走索引
+"""
+import json
+import base64
+from typing import Any, Callable, List, Optional, Sequence
+from loguru import logger
+from sqlalchemy import func, literal_column, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+COUNT_MODES = ("exact", "estimated", "none")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """把最后一行的排序键编码为游标（datetime / UUID 转字符串）"""
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else str(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[Callable[[str], Any]]) -> List[Any]:
+    """
+    解析游标
+    
+    Args:
+        cursor: encode_cursor 生成的字符串
+        types: 每个排序键的转换函数（如 int、datetime.fromisoformat、UUID）
+    
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("字段数不匹配")
+        return [convert(value) for convert, value in zip(types, values)]
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {e}")
+
+
+def keyset_before(columns: Sequence[Any], values: Sequence[Any]):
+    """
+    降序排列时"排在游标之后"的条件：(a, b, id) < (:a, :b, :id)
+    
+    行比较可直接使用同列序的复合索引
+    """
+    return tuple_(*columns) < tuple_(*values)
+
+
+def search_expression(*columns) -> Any:
+    """
+    多列拼接的搜索表达式：coalesce(t.a, '') || ' ' || coalesce(t.b, '') ...
+    
+    用字面SQL而不是绑定参数拼接，保证与表达式索引的定义完全一致，规划器才能匹配
+    """
+    parts = [f"coalesce({column.table.name}.{column.name}, '')" for column in columns]
+    return literal_column("(" + " || ' ' || ".join(parts) + ")")
+
+
+async def count_total(db: AsyncSession, query, mode: str = "exact") -> Optional[int]:
+    """
+    统计列表总数
+    
+    Args:
+        query: 带筛选条件、不含排序和分页的查询
+        mode: exact / estimated / none
+    
+    Returns:
+        总数；mode=none 时返回 None
+    """
+    if mode == "none":
+        return None
+    
+    if mode == "estimated":
+        estimate = await _planner_estimate(db, query)
+        if estimate is not None and estimate >= settings.LIST_EXACT_COUNT_THRESHOLD:
+            return estimate
+    
+    result = await db.execute(select(func.count()).select_from(query.subquery()))
+    return result.scalar()
+
+
+async def _planner_estimate(db: AsyncSession, query) -> Optional[int]:
+    """查询计划的估算行数（依赖表统计信息，不执行查询）"""
+    try:
+        conn = await db.connection()
+        sql = query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        # 参数已内联，绕过 text() 的 :name 解析（搜索词里可能有冒号）
+        result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.debug(f"[分页] 获取估算行数失败，改为精确计数: {e}")
+        return None
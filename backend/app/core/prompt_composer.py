@@ -0,0 +1,134 @@
+"""
+提示词组装
+系统提示词按 静态前缀 → 慢变上下文 → 本轮内容 的顺序拼装，
+保证同一AI员工多次调用时前缀逐字节一致，命中模型的前缀缓存：
+- Anthropic（直连或OpenRouter转发）：在段落末尾设置 cache_control 断点
+- 通义千问：隐式前缀缓存，可选显式 cache_control
+- DeepSeek / OpenAI：自动前缀缓存，只需保证前缀稳定
+
+动态内容（记忆、RAG、公司资料等）只能放在后两段，不要拼进静态前缀
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# 段落层级（越靠前越稳定）
+STATIC = "static"
+CONTEXT = "context"
+TURN = "turn"
+
+TIER_ORDER = (STATIC, CONTEXT, TURN)
+
+
+@dataclass
+class PromptSegment:
+    """提示词片段"""
+    tier: str
+    text: str
+    cache: bool = False  # 是否在该层末尾设置显式缓存断点
+
+
+class ComposedPrompt:
+    """分层组装的系统提示词
+    
+    str(prompt) 得到拼接后的完整文本（与各段依次拼接的字符串一致），
+    不支持分段缓存的模型按普通字符串使用
+    """
+    
+    def __init__(self, separator: str = "\n\n"):
+        self.separator = separator
+        self._segments: List[PromptSegment] = []
+    
+    def static(self, text: Optional[str], cache: bool = True) -> "ComposedPrompt":
+        """静态前缀：角色设定、规则、专业知识（进程内不变）"""
+        return self._add(STATIC, text, cache)
+    
+    def context(self, text: Optional[str], cache: bool = True) -> "ComposedPrompt":
+        """慢变上下文：用户偏好记忆、公司资料等（多轮对话间基本不变）"""
+        return self._add(CONTEXT, text, cache)
+    
+    def turn(self, text: Optional[str], cache: bool = False) -> "ComposedPrompt":
+        """本轮内容：RAG检索结果、本次任务附加信息
+        
+        cache=True 适合同一请求内多次调用（如ReAct循环）
+        """
+        return self._add(TURN, text, cache)
+    
+    def _add(self, tier: str, text: Optional[str], cache: bool) -> "ComposedPrompt":
+        if text and text.strip():
+            self._segments.append(PromptSegment(tier=tier, text=text, cache=cache))
+        return self
+    
+    def blocks(self) -> List[PromptSegment]:
+        """按层级排序并合并同层片段，每层一个块"""
+        blocks = []
+        for tier in TIER_ORDER:
+            segments = [s for s in self._segments if s.tier == tier]
+            if segments:
+                blocks.append(PromptSegment(
+                    tier=tier,
+                    text=self.separator.join(s.text for s in segments),
+                    cache=any(s.cache for s in segments)
+                ))
+        
+        # 块之间的分隔符并入后一个块，保证各块拼接结果与 str() 完全一致
+        for i in range(1, len(blocks)):
+            blocks[i].text = self.separator + blocks[i].text
+        return blocks
+    
+    @property
+    def text(self) -> str:
+        return "".join(block.text for block in self.blocks())
+    
+    def __str__(self) -> str:
+        return self.text
+    
+    def __bool__(self) -> bool:
+        return bool(self._segments)
+    
+    def cache_blocks(
+        self,
+        min_tokens: int,
+        count_tokens: Callable[[str], int]
+    ) -> List[Dict[str, Any]]:
+        """
+        生成带缓存断点的文本块列表（Anthropic system / OpenAI兼容 content 数组格式）
+        
+        Args:
+            min_tokens: 前缀累计长度达到该值的块才设置断点
+            count_tokens: token估算函数
+        
+        Returns:
+            [{"type": "text", "text": "...", "cache_control": {"type": "ephemeral"}}, ...]
+        """
+        result = []
+        prefix_tokens = 0
+        for block in self.blocks():
+            prefix_tokens += count_tokens(block.text)
+            item: Dict[str, Any] = {"type": "text", "text": block.text}
+            if block.cache and prefix_tokens >= min_tokens:
+                item["cache_control"] = {"type": "ephemeral"}
+            result.append(item)
+        
+        # Anthropic 单次请求最多4个断点
+        marked = [item for item in result if "cache_control" in item]
+        for item in marked[:-4]:
+            item.pop("cache_control")
+        return result
+
+
+def compose_prompt(
+    static: Optional[str],
+    context: Optional[str] = None,
+    turn: Optional[str] = None,
+    cache_turn: bool = False
+) -> ComposedPrompt:
+    """
+    便捷函数：按三层组装系统提示词
+    
+    Args:
+        static: 静态前缀
+        context: 慢变上下文
+        turn: 本轮内容
+        cache_turn: 本轮内容是否也设置断点（同一请求内会重复调用时使用）
+    """
+    return ComposedPrompt().static(static).context(context).turn(turn, cache=cache_turn)
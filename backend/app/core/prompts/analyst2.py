@@ -212,6 +212,16 @@ QUICK_FILTER_PROMPT = """快速判断以下群消息是否值得深入分析：
 ```
 """
 
+# 批量分类模板（关键词命中的消息攒批后一次分析，用 str.format 填充）
+CLASSIFY_BATCH_PROMPT = """请逐条分析以下{count}条微信群消息（每条以【编号】开头）：
+
+{messages}
+
+请按「输出格式」逐条判断，返回一个JSON数组，数组中每个对象对应一条消息并带上其编号 "id"：
+- 无价值消息只返回：{{"id": 编号, "is_valuable": false, "category": "irrelevant", "confidence": 0-100, "reason": "简短原因"}}
+- 有价值消息返回完整分析对象（额外带上 "id"），与类别无关的 lead_info / intel_info / knowledge_info 可省略
+每条消息都必须有对应结果，只返回JSON数组，不要其他内容。"""
+
 # 批量分析模板（用于每日汇总）
 BATCH_ANALYSIS_PROMPT = """请分析以下时间段内的群消息汇总：
 
@@ -159,6 +159,19 @@ DEEP_ANALYSIS_PROMPT = """作为资深欧洲关务专家，请深度分析以下
 4. 需要通知的具体对象
 """
 
+# 批量评估模板（一次调用评估多条新闻的重要性）
+ANALYZE_BATCH_PROMPT = """请逐条分析以下{count}条欧洲海关相关新闻（每条以【编号】开头）：
+
+{news}
+
+每条新闻请判断：属于什么类型（政策变化/反倾销/关税调整/执法行动/行业动态）、对物流行业有什么影响、是否需要立即关注。
+返回一个JSON数组，每个对象对应一条新闻并带上其编号 "id"，所有内容使用中文：
+{{"id": 编号, "is_important": true/false, "importance_score": 0-100, "urgency": "紧急|重要|一般|仅供参考",
+ "news_type": "新闻类型", "title_cn": "中文标题", "summary_cn": "100字以内的中文摘要",
+ "affected_countries": ["涉及国家"], "affected_products": ["涉及商品"],
+ "impact_analysis": "影响分析（一段话）", "business_suggestion": "业务建议（一段话）"}}
+每条新闻都必须有对应结果，只返回JSON数组，不要其他内容。"""
+
 # 欧盟主要海关新闻源
 EU_CUSTOMS_SOURCES = {
     "official": [
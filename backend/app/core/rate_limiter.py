@@ -0,0 +1,39 @@
+"""
+请求限流
+对同一个外部服务（搜索API、被采集的网站）并发发起请求时，限制同时在途数和相邻请求间隔
+"""
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+
+class RateLimiter:
+    """并发上限 + 相邻两次请求的最短间隔
+    
+    用法：
+        limiter = RateLimiter(concurrency=4, min_interval=0.3)
+        async with limiter.slot():
+            await client.get(...)
+    """
+    
+    def __init__(self, concurrency: int = 1, min_interval: float = 0):
+        self.concurrency = max(1, concurrency)
+        self.min_interval = min_interval
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._interval_lock: Optional[asyncio.Lock] = None
+        self._last_start = 0.0
+    
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._interval_lock = asyncio.Lock()
+        
+        async with self._semaphore:
+            async with self._interval_lock:
+                wait = self._last_start + self.min_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._last_start = time.monotonic()
+            yield
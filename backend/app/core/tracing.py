@@ -0,0 +1,492 @@
+"""
+进程内请求追踪
+一次请求（HTTP 请求、企业微信消息、Maria 一轮对话、定时任务）是一条追踪，其中的 LLM 调用、数据库语句、
+外部 HTTP 请求、工具执行、实时步骤各是一个 span；当前 span 放在 contextvars 中，随 asyncio Task 传递
+
+- 采样：在追踪的根 span 决定（TRACING_SAMPLE_RATE），未采样的请求内所有 span 都是空操作
+- 导出：完成的追踪进入内存环形缓冲区（监控接口读取），可选追加写入 OTLP/JSON 文件
+- 统计：每个 span 名称保留最近 TRACING_STATS_WINDOW 次耗时，用于计算分位数
+
+用法：
+    with tracer.span("maria.process", kind="agent", root=True):
+        ...
+    
+    @traced("tool.{tool_name}", kind="tool")
+    async def execute(self, tool_name, arguments, user_id): ...
+"""
+import os
+import json
+import time
+import uuid
+import random
+import inspect
+import functools
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence
+from loguru import logger
+
+from app.core.config import settings
+from app.core.execution_context import current_context
+
+# OTLP span kind：INTERNAL=1, SERVER=2, CLIENT=3
+_OTLP_KINDS = {"server": 2, "client": 3, "db": 3, "llm": 3}
+
+# 字符串属性的最大长度
+_MAX_ATTRIBUTE_CHARS = 300
+
+
+@dataclass
+class Trace:
+    """一条追踪（根 span 结束时完成）"""
+    trace_id: str
+    root: Optional["Span"] = None
+    spans: List["Span"] = field(default_factory=list)
+    dropped: int = 0  # 超过 TRACING_MAX_SPANS 未记录的 span 数
+    finished: bool = False
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    trace: Trace
+    span_id: str
+    parent_id: Optional[str]
+    start: float  # 墙钟时间（秒）
+    started: float  # perf_counter，用于计算耗时
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    duration_ms: float = 0.0
+    error: Optional[str] = None
+    
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = _clip(value)
+    
+    def rename(self, name: str):
+        """结束前修改名称（如 HTTP 请求匹配到路由后改用路由模板）"""
+        self.name = name
+
+
+class _NoopSpan:
+    """未启用或未采样时返回的 span，写属性不产生任何记录"""
+    name = ""
+    kind = ""
+    error = None
+    
+    @property
+    def attributes(self) -> Dict[str, Any]:
+        return {}
+    
+    def set_attribute(self, key: str, value: Any):
+        pass
+    
+    def rename(self, name: str):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+_current_span: ContextVar[Any] = ContextVar("current_span", default=None)
+
+
+def _clip(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > _MAX_ATTRIBUTE_CHARS:
+        return value[:_MAX_ATTRIBUTE_CHARS] + "..."
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return _clip(str(value))
+
+
+class _SpanStats:
+    """单个 span 名称的耗时统计（最近 window 次）"""
+    
+    def __init__(self, kind: str, window: int):
+        self.kind = kind
+        self.count = 0
+        self.errors = 0
+        self.durations: Deque[float] = deque(maxlen=window)
+    
+    def add(self, duration_ms: float, error: bool):
+        self.count += 1
+        self.errors += int(error)
+        self.durations.append(duration_ms)
+    
+    def summary(self) -> Dict[str, Any]:
+        values = sorted(self.durations)
+        
+        def percentile(p: float) -> float:
+            return round(values[min(len(values) - 1, int(len(values) * p))], 2) if values else 0.0
+        
+        return {
+            "kind": self.kind,
+            "count": self.count,
+            "errors": self.errors,
+            "window": len(values),
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(values[-1], 2) if values else 0.0,
+        }
+
+
+class Tracer:
+    """追踪器"""
+    
+    def __init__(self):
+        self._traces: Deque[Trace] = deque(maxlen=settings.TRACING_BUFFER_SIZE)
+        self._stats: Dict[str, _SpanStats] = {}
+        self._export_file = None
+    
+    @property
+    def enabled(self) -> bool:
+        return settings.TRACING_ENABLED
+    
+    def active(self) -> bool:
+        """当前上下文是否处于已采样的追踪中"""
+        span = _current_span.get()
+        return span is not None and span is not _NOOP
+    
+    def current_span(self):
+        span = _current_span.get()
+        return span if span is not None else _NOOP
+    
+    def annotate(self, **attributes):
+        """给当前 span 添加属性"""
+        span = self.current_span()
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+    
+    # ==================== 记录 ====================
+    
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", root: bool = False, **attributes) -> Iterator[Any]:
+        """
+        记录一个 span
+        
+        Args:
+            name: span 名称（统计分位数的维度，不要包含ID等高基数内容，放到属性里）
+            kind: server / client / db / llm / tool / agent / job / internal
+            root: 当前没有进行中的追踪时是否开始一条新追踪（请求入口使用）；
+                为 False 时只在已有追踪内记录
+        """
+        parent = _current_span.get()
+        if not self.enabled or parent is _NOOP:
+            yield _NOOP
+            return
+        
+        if parent is not None and not parent.trace.finished:
+            trace = parent.trace
+            parent_id = parent.span_id
+        elif root:
+            # 新追踪（父追踪已结束的后台任务也开始新追踪）
+            if random.random() >= settings.TRACING_SAMPLE_RATE:
+                token = _current_span.set(_NOOP)
+                try:
+                    yield _NOOP
+                finally:
+                    _current_span.reset(token)
+                return
+            trace = Trace(trace_id=current_context().trace_id or uuid.uuid4().hex[:12])
+            parent_id = None
+        else:
+            yield _NOOP
+            return
+        
+        span = Span(
+            name=name, kind=kind, trace=trace, span_id=os.urandom(8).hex(), parent_id=parent_id,
+            start=time.time(), started=time.perf_counter(),
+            attributes={key: _clip(value) for key, value in attributes.items() if value is not None},
+        )
+        if parent_id is None:
+            trace.root = span
+        
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = _clip(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.duration_ms = (time.perf_counter() - span.started) * 1000
+            self._finish(span)
+    
+    def record(self, name: str, kind: str, started: float, error: Optional[str] = None, **attributes):
+        """
+        记录一个已经结束的操作（用于无法包裹成 with 的回调，如 SQLAlchemy 事件）
+        
+        Args:
+            started: 操作开始时的 perf_counter
+        """
+        parent = _current_span.get()
+        if parent is None or parent is _NOOP or parent.trace.finished:
+            return
+        duration = time.perf_counter() - started
+        span = Span(
+            name=name, kind=kind, trace=parent.trace, span_id=os.urandom(8).hex(), parent_id=parent.span_id,
+            start=time.time() - duration, started=started,
+            attributes={key: _clip(value) for key, value in attributes.items() if value is not None},
+            duration_ms=duration * 1000, error=_clip(error),
+        )
+        self._finish(span)
+    
+    def _finish(self, span: Span):
+        stats = self._stats.get(span.name)
+        if stats is None:
+            stats = self._stats[span.name] = _SpanStats(span.kind, settings.TRACING_STATS_WINDOW)
+        stats.add(span.duration_ms, span.error is not None)
+        
+        trace = span.trace
+        if len(trace.spans) < settings.TRACING_MAX_SPANS:
+            trace.spans.append(span)
+        else:
+            trace.dropped += 1
+        
+        if span is trace.root:
+            trace.finished = True
+            self._traces.append(trace)
+            if settings.TRACING_EXPORT_FILE:
+                self._export(trace)
+    
+    # ==================== 导出 ====================
+    
+    def _export(self, trace: Trace):
+        """追加一行 OTLP/JSON（与 OpenTelemetry Collector 文件导出格式一致）"""
+        try:
+            if self._export_file is None:
+                self._export_file = open(settings.TRACING_EXPORT_FILE, "a", encoding="utf-8")
+            self._export_file.write(json.dumps(to_otlp(trace), ensure_ascii=False) + "\n")
+            self._export_file.flush()
+        except Exception as e:
+            logger.warning(f"[追踪] 导出到文件失败: {e}")
+    
+    # ==================== 查询 ====================
+    
+    def get_trace(self, trace_id: str) -> Optional[Trace]:
+        for trace in reversed(self._traces):
+            if trace.trace_id == trace_id:
+                return trace
+        return None
+    
+    def slowest_traces(self, limit: int = 20, name: Optional[str] = None) -> List[Trace]:
+        traces = [t for t in self._traces if name is None or t.root.name == name]
+        return sorted(traces, key=lambda t: t.root.duration_ms, reverse=True)[:limit]
+    
+    def span_stats(self, kind: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: stats.summary()
+            for name, stats in sorted(self._stats.items())
+            if kind is None or stats.kind == kind
+        }
+    
+    @property
+    def buffered(self) -> int:
+        return len(self._traces)
+    
+    def reset(self):
+        """清空缓冲区和统计"""
+        self._traces.clear()
+        self._stats.clear()
+
+
+# 全局实例
+tracer = Tracer()
+
+
+def traced(name: str, kind: str = "internal", root: bool = False, attributes: Sequence[str] = ()):
+    """
+    异步函数装饰器：调用包裹在 span 中
+    
+    Args:
+        name: span 名称，可用 {参数名} 引用调用参数（如 "tool.{tool_name}"）
+        attributes: 记录为 span 属性的参数名
+    """
+    def decorator(func: Callable):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled or (not root and not tracer.active()):
+                return await func(*args, **kwargs)
+            
+            bound = signature.bind_partial(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            span_name = name.format(**arguments) if "{" in name else name
+            with tracer.span(span_name, kind=kind, root=root, **{key: arguments.get(key) for key in attributes}):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ==================== 序列化 ====================
+
+def _kind_breakdown(trace: Trace) -> Dict[str, float]:
+    """
+    按 kind 汇总耗时（ms）；同 kind 嵌套的 span 只算最外层（如 LLM 调用内的重试不重复计算）
+    """
+    by_id = {span.span_id: span for span in trace.spans}
+    breakdown: Dict[str, float] = {}
+    for span in trace.spans:
+        if span is trace.root:
+            continue
+        parent = by_id.get(span.parent_id)
+        nested = False
+        while parent is not None and parent is not trace.root:
+            if parent.kind == span.kind:
+                nested = True
+                break
+            parent = by_id.get(parent.parent_id)
+        if not nested:
+            breakdown[span.kind] = round(breakdown.get(span.kind, 0.0) + span.duration_ms, 2)
+    return breakdown
+
+
+def trace_summary(trace: Trace) -> Dict[str, Any]:
+    root = trace.root
+    return {
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "kind": root.kind,
+        "started_at": datetime.fromtimestamp(root.start).isoformat(),
+        "duration_ms": round(root.duration_ms, 2),
+        "span_count": len(trace.spans) + trace.dropped,
+        "error": root.error or next((s.error for s in trace.spans if s.error), None),
+        "breakdown_ms": _kind_breakdown(trace),
+        "attributes": root.attributes,
+    }
+
+
+def trace_detail(trace: Trace) -> Dict[str, Any]:
+    root_start = trace.root.started
+    spans = sorted(trace.spans, key=lambda s: s.started)
+    return {
+        **trace_summary(trace),
+        "dropped_spans": trace.dropped,
+        "spans": [
+            {
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "kind": span.kind,
+                "offset_ms": round((span.started - root_start) * 1000, 2),
+                "duration_ms": round(span.duration_ms, 2),
+                "attributes": span.attributes,
+                "error": span.error,
+            }
+            for span in spans
+        ],
+    }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> Dict[str, Any]:
+    """转换为 OTLP/JSON（ExportTraceServiceRequest）"""
+    trace_id = trace.trace_id.rjust(32, "0")[-32:]
+    spans = []
+    for span in trace.spans:
+        start_ns = int(span.start * 1e9)
+        item = {
+            "traceId": trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": _OTLP_KINDS.get(span.kind, 1),
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(span.duration_ms * 1e6)),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in {"span.kind": span.kind, **span.attributes}.items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        spans.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.APP_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+# ==================== 自动埋点 ====================
+
+def instrument_sqlalchemy(engine):
+    """给引擎注册语句执行事件，已采样的请求中每条 SQL 记录为 db span"""
+    if not settings.TRACING_ENABLED:
+        return
+    from sqlalchemy import event
+    
+    sync_engine = getattr(engine, "sync_engine", engine)
+    
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        # 异步引擎的事件在 greenlet 中执行，SQLAlchemy 会沿用调用方的 contextvars 上下文
+        if tracer.active():
+            conn.info.setdefault("trace_started", []).append(time.perf_counter())
+    
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("trace_started")
+        if started:
+            _record_statement(statement, started.pop(), None, cursor.rowcount, executemany)
+    
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        started = conn.info.get("trace_started") if conn is not None else None
+        if started:
+            error = exception_context.original_exception
+            _record_statement(
+                exception_context.statement or "", started.pop(), f"{type(error).__name__}: {error}", -1, False
+            )
+
+
+def _record_statement(statement: str, started: float, error: Optional[str], rowcount: int, executemany: bool):
+    text = " ".join(statement.split())
+    verb = text.split(" ", 1)[0].upper() if text else "SQL"
+    tracer.record(
+        f"db.{verb}", "db", started, error=error,
+        statement=text, rowcount=rowcount if rowcount is not None and rowcount >= 0 else None,
+        executemany=executemany or None,
+    )
+
+
+def instrument_httpx():
+    """包裹 httpx.AsyncClient.send：已采样的请求中每次外部 HTTP 调用记录为 client span（不记录查询参数）"""
+    if not settings.TRACING_ENABLED:
+        return
+    import httpx
+    
+    original = httpx.AsyncClient.send
+    if getattr(original, "_traced", False):
+        return
+    
+    @functools.wraps(original)
+    async def send(self, request, *args, **kwargs):
+        if not tracer.active():
+            return await original(self, request, *args, **kwargs)
+        url = request.url
+        with tracer.span(
+            f"http.client {request.method} {url.host}", kind="client",
+            url=f"{url.scheme}://{url.host}{url.path}",
+        ) as span:
+            response = await original(self, request, *args, **kwargs)
+            span.set_attribute("status_code", response.status_code)
+            return response
+    
+    send._traced = True
+    httpx.AsyncClient.send = send
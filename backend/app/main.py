@@ -2,12 +2,14 @@
 物流获客AI - FastAPI 主应用
 """
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
 from app.core.config import settings
-from app.api import router as api_router
+from app.core.tracing import tracer, instrument_httpx
+from app.api import include_routers
+from app.models.database import db_pool, dispose_engines
 
 
 def check_critical_config():
@@ -108,9 +110,14 @@ async def lifespan(app: FastAPI):
     yield
     
     # 关闭时执行
+    from app.services.wechat_monitor import wechat_monitor
+    await wechat_monitor.close()
     await task_queue.close()
     await cache_service.close()
     await shutdown_scheduler()
+    from app.services.asset_ingestion import shutdown_process_pool
+    shutdown_process_pool()
+    await dispose_engines()
     logger.info("👋 系统关闭中...")
 
 
@@ -141,8 +148,46 @@ app.add_middleware(
     ],
 )
 
+# 请求追踪：HTTP 请求作为追踪入口，外部 HTTP 调用自动记录
+instrument_httpx()
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """每个 HTTP 请求一条追踪（按 TRACING_SAMPLE_RATE 采样，追踪查询接口自身不记录）"""
+    if not tracer.enabled or request.url.path.startswith("/api/monitoring/traces"):
+        return await call_next(request)
+    
+    with tracer.span(f"HTTP {request.method}", kind="server", root=True, path=request.url.path) as span:
+        response = await call_next(request)
+        # 用路由模板命名，同一接口的请求归入同一组统计
+        route = request.scope.get("route")
+        span.rename(f"HTTP {request.method} {route.path if route else '(unmatched)'}")
+        span.set_attribute("status_code", response.status_code)
+        return response
+
+
+@app.middleware("http")
+async def route_db_pool(request: Request, call_next):
+    """仪表板、报表、列表等 GET 请求的数据库会话走 analytics 连接池（可配置只读副本）"""
+    if request.method == "GET" and _is_analytics_path(request.url.path):
+        with db_pool("analytics"):
+            return await call_next(request)
+    return await call_next(request)
+
+
+def _is_analytics_path(path: str) -> bool:
+    for route in settings.DB_ANALYTICS_ROUTES:
+        if route.endswith("*"):
+            if path.startswith(route[:-1]):
+                return True
+        elif path == route:
+            return True
+    return False
+
+
 # 注册路由
-app.include_router(api_router, prefix="/api")
+include_routers(app, prefix="/api")
 
 
 @app.get("/")
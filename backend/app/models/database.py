@@ -1,9 +1,30 @@
 """
 数据库连接和会话管理
+
+连接池按用途分开（每个 worker 进程内各自独立，互不占用）：
+- api：HTTP 请求（默认）
+- background：定时任务和任务队列，长时间运行的AI员工任务占满自己的池也不影响 API 请求
+- analytics：仪表板、报表、AI用量统计、列表等重读路径；配置 DATABASE_REPLICA_URL 时连接只读副本
+
+会话在创建时按当前上下文（db_pool）选择连接池，AsyncSessionLocal / async_session_maker / get_db 的调用方无需修改
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+import re
+import time
+import functools
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict
+
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
 from app.core.config import settings
+from app.core.tracing import instrument_sqlalchemy
 
 
 class Base(DeclarativeBase):
@@ -11,21 +32,143 @@ class Base(DeclarativeBase):
     pass
 
 
-# 创建异步引擎
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_size=5,
-    max_overflow=10,
-    pool_pre_ping=True,
-    pool_recycle=1800,  # 30分钟回收连接，防止长时间空闲断开
-    pool_timeout=30,    # 获取连接超时30秒
-)
+class MeteredPool(AsyncAdaptedQueuePool):
+    """记录获取连接的等待时间和超时次数"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = deque(maxlen=1000)  # 最近的等待时间（秒）
+        self.checkouts = 0
+        self.timeouts = 0
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa_exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        self.waits.append(time.perf_counter() - started)
+        self.checkouts += 1
+        return connection
+
+
+def _create_engine(url: str, pool_size: int, max_overflow: int) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        echo=settings.DEBUG,
+        poolclass=MeteredPool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=True,
+        pool_recycle=1800,  # 30分钟回收连接，防止长时间空闲断开
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    # 已采样的请求中记录每条SQL的耗时
+    instrument_sqlalchemy(engine)
+    return engine
+
+
+# 创建异步引擎（每个连接池一个）
+engines: Dict[str, AsyncEngine] = {
+    "api": _create_engine(
+        settings.DATABASE_URL, settings.DB_POOL_API_SIZE, settings.DB_POOL_API_OVERFLOW
+    ),
+    "background": _create_engine(
+        settings.DATABASE_URL, settings.DB_POOL_BACKGROUND_SIZE, settings.DB_POOL_BACKGROUND_OVERFLOW
+    ),
+    "analytics": _create_engine(
+        settings.DATABASE_REPLICA_URL or settings.DATABASE_URL,
+        settings.DB_POOL_ANALYTICS_SIZE, settings.DB_POOL_ANALYTICS_OVERFLOW,
+    ),
+}
+
+# 主引擎（建表、迁移等直接使用引擎的场景）
+engine = engines["api"]
+
+_current_pool: ContextVar[str] = ContextVar("db_pool", default="api")
+
+
+def current_pool() -> str:
+    """当前上下文中新建会话使用的连接池"""
+    return _current_pool.get()
+
+
+@contextmanager
+def db_pool(name: str):
+    """在此上下文中（包括其中创建的子任务）新建的会话使用指定连接池"""
+    if name not in engines:
+        raise ValueError(f"未知的连接池: {name}")
+    token = _current_pool.set(name)
+    try:
+        yield
+    finally:
+        _current_pool.reset(token)
+
+
+def with_db_pool(name: str):
+    """异步函数装饰器：函数内新建的会话使用指定连接池"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with db_pool(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_LOCKING_READ = re.compile(r"\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b", re.IGNORECASE)
+_MODIFYING_CTE = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+def _is_write(clause: Any) -> bool:
+    """
+    是否需要走主库：INSERT/UPDATE/DELETE、SELECT ... FOR UPDATE/SHARE，
+    以及不以 SELECT/WITH 开头、或 WITH 中含修改语句的文本SQL
+    """
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, Select):
+        return clause._for_update_arg is not None
+    if isinstance(clause, TextClause):
+        words = clause.text.split(None, 1)
+        if not words:
+            return False
+        first = words[0].upper()
+        if first not in ("SELECT", "WITH", "SHOW", "EXPLAIN"):
+            return True
+        if _LOCKING_READ.search(clause.text):
+            return True
+        return first == "WITH" and bool(_MODIFYING_CTE.search(clause.text))
+    return False
+
+
+class RoutingSession(Session):
+    """
+    按会话创建时的 db_pool 选择引擎
+    
+    analytics 池连接只读副本时，会话中的写操作（flush、INSERT/UPDATE/DELETE、加锁读）仍走主库；
+    第一次写之后会话固定走主库，后续读取能看到自己刚写入的数据（副本有复制延迟）
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_name = _current_pool.get()
+        self.pinned_to_primary = False
+    
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.pool_name == "analytics" and settings.DATABASE_REPLICA_URL:
+            if not self.pinned_to_primary and (self._flushing or _is_write(clause)):
+                self.pinned_to_primary = True
+            if self.pinned_to_primary:
+                return engines["api"].sync_engine
+        return engines[self.pool_name].sync_engine
+
 
 # 创建异步会话工厂
 AsyncSessionLocal = async_sessionmaker(
-    engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False,
@@ -48,3 +191,33 @@ async def init_db():
     """初始化数据库（创建表）"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """各连接池的使用情况（当前 worker 进程）"""
+    stats = {}
+    for name, pool_engine in engines.items():
+        pool = pool_engine.pool
+        waits = sorted(pool.waits)
+        stats[name] = {
+            "replica": name == "analytics" and bool(settings.DATABASE_REPLICA_URL),
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "checkouts": pool.checkouts,
+            "timeouts": pool.timeouts,
+            "wait_ms": {
+                "avg": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+                "p95": round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            },
+        }
+    return stats
+
+
+async def dispose_engines():
+    """关闭所有连接池"""
+    for pool_engine in engines.values():
+        await pool_engine.dispose()
@@ -8,12 +8,15 @@
 """
 import os
 import fcntl
+import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from loguru import logger
 
 from app.core.config import settings
+from app.core.tracing import traced
+from app.models.database import with_db_pool
 
 
 # 全局调度器实例
@@ -169,6 +172,15 @@ async def init_scheduler():
         logger.warning(f"TaskWorker导入失败: {e}")
         process_pending_tasks = check_stale_tasks = None
     
+    # 仪表板指标快照
+    try:
+        from app.services.dashboard_metrics import dashboard_metrics
+        refresh_dashboard_team = dashboard_metrics.refresh_team_status
+        reconcile_dashboard_metrics = dashboard_metrics.reconcile
+    except ImportError as e:
+        logger.warning(f"仪表板指标任务导入失败: {e}")
+        refresh_dashboard_team = reconcile_dashboard_metrics = None
+    
     # Notion 知识库同步任务
     async def sync_notion_knowledge_task():
         """定时同步 Notion 知识库到向量数据库"""
@@ -185,6 +197,11 @@ async def init_scheduler():
         if func is None:
             logger.warning(f"⚠️ 跳过任务注册: {name} (函数未导入)")
             return
+        if asyncio.iscoroutinefunction(func):
+            # 每次执行是一条追踪（按 TRACING_SAMPLE_RATE 采样）
+            func = traced(f"job.{job_id}", kind="job", root=True)(func)
+            # 定时任务使用独立的 background 连接池，不占用 API 请求的连接
+            func = with_db_pool("background")(func)
         scheduler.add_job(func, trigger, id=job_id, name=name, replace_existing=True, **kwargs)
         logger.info(f"📅 注册任务: {name}")
     
@@ -268,6 +285,36 @@ async def init_scheduler():
     _safe_add_job(auto_video_generation, CronTrigger(hour=10, minute=0),
                   "auto_video_generation", "[小视] 自动视频生成 - 10:00")
     
+    # 视频生成任务恢复（重启后继续跟踪在途的可灵AI任务）
+    try:
+        from app.services.video_job_tracker import resume_video_generation_jobs
+    except ImportError as e:
+        logger.warning(f"视频任务恢复导入失败: {e}")
+        resume_video_generation_jobs = None
+    
+    _safe_add_job(resume_video_generation_jobs, IntervalTrigger(minutes=2),
+                  "resume_video_generation_jobs", "[小视] 视频生成任务恢复 - 每2分钟")
+    
+    # 语音转写任务恢复（重启后继续跟踪在途的腾讯云ASR任务）
+    try:
+        from app.services.transcription_tracker import resume_transcription_tasks
+    except ImportError as e:
+        logger.warning(f"语音转写任务恢复导入失败: {e}")
+        resume_transcription_tasks = None
+    
+    _safe_add_job(resume_transcription_tasks, IntervalTrigger(minutes=2),
+                  "resume_transcription_tasks", "[小助] 语音转写任务恢复 - 每2分钟")
+    
+    # 长会议录音分段转写恢复（重启后拼接已完成的分段并生成会议纪要）
+    try:
+        from app.services.meeting_audio_pipeline import resume_meeting_segments
+    except ImportError as e:
+        logger.warning(f"分段转写恢复导入失败: {e}")
+        resume_meeting_segments = None
+    
+    _safe_add_job(resume_meeting_segments, IntervalTrigger(minutes=5),
+                  "resume_meeting_segments", "[小助] 分段转写恢复 - 每5分钟")
+    
     # ==================== 小文任务 ====================
     
     _safe_add_job(auto_content_publish, CronTrigger(day_of_week='mon,wed,fri', hour=15, minute=0),
@@ -374,6 +421,14 @@ async def init_scheduler():
     _safe_add_job(check_stale_tasks, IntervalTrigger(minutes=5),
                   "task_stale_check", "[TaskWorker] 任务停滞预警 - 每5分钟")
     
+    # ==================== 仪表板指标 ====================
+    
+    _safe_add_job(refresh_dashboard_team, IntervalTrigger(seconds=settings.DASHBOARD_REFRESH_INTERVAL),
+                  "dashboard_team_refresh", f"[系统] 仪表板团队状态刷新 - 每{settings.DASHBOARD_REFRESH_INTERVAL}秒")
+    
+    _safe_add_job(reconcile_dashboard_metrics, IntervalTrigger(seconds=settings.DASHBOARD_RECONCILE_INTERVAL),
+                  "dashboard_reconcile", f"[系统] 仪表板计数器对账 - 每{settings.DASHBOARD_RECONCILE_INTERVAL}秒")
+    
     # ==================== 启动调度器 ====================
     
     scheduler.start()
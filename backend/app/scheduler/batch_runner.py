@@ -0,0 +1,92 @@
+"""
+定时任务批量执行器
+负责：对一批条目（客户、线索等）并发执行同一个异步处理函数，
+限制并发数和单条超时，按进度输出日志，结束后汇总成功/失败/超时
+
+单条失败或超时不影响其他条目；适用于每条都要调用LLM、发消息等耗时操作的定时任务
+"""
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple
+from loguru import logger
+
+
+@dataclass
+class BatchResult:
+    """批量执行结果"""
+    name: str
+    total: int
+    results: List[Any] = field(default_factory=list)  # 与输入顺序一致，失败/超时的为 None
+    failed: List[Tuple[str, str]] = field(default_factory=list)  # (条目名称, 错误信息)
+    timed_out: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+    
+    @property
+    def succeeded(self) -> int:
+        return self.total - len(self.failed) - len(self.timed_out)
+    
+    def summary(self) -> str:
+        text = f"[{self.name}] 完成 {self.succeeded}/{self.total}，耗时 {self.elapsed:.1f}s"
+        if self.failed:
+            text += f"，失败 {len(self.failed)}（{', '.join(label for label, _ in self.failed[:5])}"
+            text += "等）" if len(self.failed) > 5 else "）"
+        if self.timed_out:
+            text += f"，超时 {len(self.timed_out)}"
+        return text
+
+
+async def run_batch(
+    items: Sequence[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    name: str = "batch",
+    concurrency: int = 4,
+    item_timeout: Optional[float] = None,
+    label: Callable[[Any], str] = str,
+) -> BatchResult:
+    """
+    并发处理一批条目
+    
+    Args:
+        items: 待处理条目
+        worker: 单条处理函数，抛出异常视为该条失败
+        name: 任务名称（日志用）
+        concurrency: 最大并发数
+        item_timeout: 单条超时（秒），None 表示不限
+        label: 条目在日志和失败汇总中的名称
+    
+    Returns:
+        BatchResult
+    """
+    batch = BatchResult(name=name, total=len(items), results=[None] * len(items))
+    if not items:
+        return batch
+    
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    started = time.monotonic()
+    done = 0
+    # 每完成约10%输出一次进度
+    report_every = max(1, len(items) // 10)
+    
+    async def run_one(index: int, item: Any):
+        nonlocal done
+        async with semaphore:
+            try:
+                batch.results[index] = await asyncio.wait_for(worker(item), timeout=item_timeout)
+            except asyncio.TimeoutError:
+                batch.timed_out.append(label(item))
+                logger.warning(f"[{name}] 处理超时（{item_timeout}s）: {label(item)}")
+            except Exception as e:
+                batch.failed.append((label(item), str(e)))
+                logger.error(f"[{name}] 处理失败 [{label(item)}]: {e}")
+        
+        done += 1
+        if done % report_every == 0 and done < len(items):
+            logger.info(f"[{name}] 进度 {done}/{len(items)}，已用 {time.monotonic() - started:.1f}s")
+    
+    logger.info(f"[{name}] 开始处理 {len(items)} 条，并发 {concurrency}")
+    await asyncio.gather(*(run_one(i, item) for i, item in enumerate(items)))
+    
+    batch.elapsed = time.monotonic() - started
+    logger.info(batch.summary())
+    return batch
@@ -12,6 +12,7 @@ from app.services.conversation_service import conversation_service
 from app.services.notification import notification_service
 from app.agents.follow_agent import follow_agent
 from app.core.config import settings
+from app.scheduler.batch_runner import run_batch
 
 
 async def daily_follow_check():
@@ -23,7 +24,7 @@ async def daily_follow_check():
     
     try:
         # 获取需要跟进的客户
-        customers = await conversation_service.get_customers_need_follow(limit=100)
+        customers = await conversation_service.get_customers_need_follow(limit=settings.FOLLOW_CHECK_LIMIT)
         
         if not customers:
             logger.info("📅 没有需要跟进的客户")
@@ -42,23 +43,32 @@ async def daily_follow_check():
         # 发送跟进提醒通知
         await notification_service.notify_follow_reminder(customers)
         
-        # 为高优先级客户自动生成跟进内容
+        # 为高优先级客户自动生成跟进内容（并发调用小跟）
         high_priority = [c for c in customers if c.get("intent_level") in ["S", "A"]]
         
-        for customer in high_priority[:10]:  # 最多处理10个
-            try:
-                await _generate_follow_content(customer)
-            except Exception as e:
-                logger.error(f"生成跟进内容失败 [{customer.get('name')}]: {e}")
+        batch = await run_batch(
+            high_priority[:settings.FOLLOW_CONTENT_MAX_CUSTOMERS],
+            _generate_follow_content,
+            name="每日跟进内容生成",
+            concurrency=settings.FOLLOW_CONTENT_CONCURRENCY,
+            item_timeout=settings.FOLLOW_CONTENT_TIMEOUT,
+            label=lambda c: c.get("name") or str(c.get("id")),
+        )
+        generated = sum(1 for saved in batch.results if saved)
         
-        logger.info("📅 每日跟进检查完成")
+        logger.info(f"📅 每日跟进检查完成，生成跟进内容 {generated} 条")
         
     except Exception as e:
         logger.error(f"每日跟进检查失败: {e}")
 
 
-async def _generate_follow_content(customer: Dict[str, Any]):
-    """为客户生成跟进内容"""
+async def _generate_follow_content(customer: Dict[str, Any]) -> bool:
+    """
+    为客户生成跟进内容
+    
+    Returns:
+        是否生成并保存了跟进记录；调用小跟或写库出错时抛出异常，由调用方汇总
+    """
     customer_id = customer.get("id")
     customer_name = customer.get("name", "未知")
     
@@ -69,43 +79,41 @@ async def _generate_follow_content(customer: Dict[str, Any]):
     ]) if chat_history else "无历史对话"
     
     # 调用小跟生成跟进内容
-    try:
-        result = await follow_agent.process({
-            "customer_info": {
-                "name": customer_name,
-                "company": customer.get("company")
-            },
-            "intent_level": customer.get("intent_level", "B"),
-            "last_contact": customer.get("last_contact_at", "未知"),
-            "last_conversation": last_conversation,
-            "purpose": "日常跟进"
-        })
-        
-        follow_message = result.get("follow_message", "")
-        
-        if follow_message:
-            # 保存跟进记录
-            async with async_session_maker() as db:
-                await db.execute(
-                    text("""
-                        INSERT INTO follow_records 
-                        (customer_id, follow_type, channel, executor_type, executor_name, 
-                         content, intent_before, intent_after, created_at)
-                        VALUES (:customer_id, 'daily_follow', 'system', 'follow', '小跟',
-                                :content, :intent_score, :intent_score, NOW())
-                    """),
-                    {
-                        "customer_id": customer_id,
-                        "content": follow_message,
-                        "intent_score": customer.get("intent_score", 0)
-                    }
-                )
-                await db.commit()
-            
-            logger.info(f"📅 已为 {customer_name} 生成跟进内容")
-            
-    except Exception as e:
-        logger.error(f"生成跟进内容失败: {e}")
+    result = await follow_agent.process({
+        "customer_info": {
+            "name": customer_name,
+            "company": customer.get("company")
+        },
+        "intent_level": customer.get("intent_level", "B"),
+        "last_contact": customer.get("last_contact_at", "未知"),
+        "last_conversation": last_conversation,
+        "purpose": "日常跟进"
+    })
+    
+    follow_message = result.get("follow_message", "")
+    if not follow_message:
+        return False
+    
+    # 保存跟进记录
+    async with async_session_maker() as db:
+        await db.execute(
+            text("""
+                INSERT INTO follow_records 
+                (customer_id, follow_type, channel, executor_type, executor_name, 
+                 content, intent_before, intent_after, created_at)
+                VALUES (:customer_id, 'daily_follow', 'system', 'follow', '小跟',
+                        :content, :intent_score, :intent_score, NOW())
+            """),
+            {
+                "customer_id": customer_id,
+                "content": follow_message,
+                "intent_score": customer.get("intent_score", 0)
+            }
+        )
+        await db.commit()
+    
+    logger.info(f"📅 已为 {customer_name} 生成跟进内容")
+    return True
 
 
 async def check_no_reply_customers():
@@ -151,19 +159,17 @@ async def check_no_reply_customers():
             if no_reply_count > 0:
                 logger.info(f"📅 发现 {no_reply_count} 位客户未回复")
                 
-                # 更新跟进记录的结果
-                for row in rows:
-                    customer_id = row[0]
-                    await db.execute(
-                        text("""
-                            UPDATE follow_records
-                            SET result = 'no_reply'
-                            WHERE customer_id = :customer_id
-                            AND result IS NULL
-                            AND created_at > NOW() - INTERVAL '24 hours'
-                        """),
-                        {"customer_id": customer_id}
-                    )
+                # 更新跟进记录的结果（一条语句覆盖所有客户）
+                await db.execute(
+                    text("""
+                        UPDATE follow_records
+                        SET result = 'no_reply'
+                        WHERE customer_id = ANY(:customer_ids)
+                        AND result IS NULL
+                        AND created_at > NOW() - INTERVAL '24 hours'
+                    """),
+                    {"customer_ids": [row[0] for row in rows]}
+                )
                 
                 await db.commit()
             else:
@@ -526,6 +526,7 @@ async def check_maria_inbox_attachments():
         from app.services.multi_email_service import multi_email_service
         from app.api.wechat_assistant import send_text_message
         from app.services.document_service import document_service
+        from app.services.parsed_document_cache import parsed_document_cache
         from app.core.llm import chat_completion
         
         logger.info("[Maria邮箱] 检查收件箱附件...")
@@ -601,8 +602,12 @@ async def check_maria_inbox_attachments():
                         )
                         continue
                     
-                    # 读取文档内容
+                    # 读取文档内容，并记录来源以便后续"再分析"直接命中缓存
                     doc_result = await document_service.read_document(filepath, filename)
+                    if doc_result.get("content_hash"):
+                        await parsed_document_cache.link_source(
+                            "email", email_id, filename, doc_result["content_hash"]
+                        )
                     
                     if not doc_result.get("success"):
                         await send_text_message(
@@ -752,7 +757,8 @@ async def check_maria_inbox_attachments():
                             attachment_name=filename,
                             attachment_content=content,
                             analysis_result=analysis,
-                            doc_type=saved_doc_type
+                            doc_type=saved_doc_type,
+                            content_hash=doc_result.get("content_hash")
                         )
                         logger.info(f"[Maria邮箱] 已保存邮件上下文: {filename} (type={saved_doc_type})")
                         
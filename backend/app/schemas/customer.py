@@ -63,7 +63,8 @@ class CustomerResponse(CustomerBase):
 class CustomerListResponse(BaseModel):
     """客户列表响应"""
     items: List[CustomerResponse]
-    total: int
+    total: Optional[int]  # count=none 时为空
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int]
+    next_cursor: Optional[str] = None  # 下一页游标，没有下一页时为空
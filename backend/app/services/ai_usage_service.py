@@ -35,6 +35,15 @@ class AIUsageService:
         ('deepseek', 'deepseek-chat'): {'input': 0.001, 'output': 0.002},
     }
     
+    # 命中提示词缓存的输入tokens计价比例（相对正常输入价格）
+    CACHED_INPUT_RATIO = {
+        'anthropic': 0.1,
+        'openrouter/claude': 0.1,
+        'deepseek': 0.1,
+        'dashscope': 0.4,
+        'openai': 0.5,
+    }
+    
     # 价格缓存
     _pricing_cache: Dict[tuple, Dict] = {}
     _cache_loaded: bool = False
@@ -96,7 +105,9 @@ class AIUsageService:
         provider: str,
         model_name: str,
         input_tokens: int,
-        output_tokens: int
+        output_tokens: int,
+        cached_tokens: int = 0,
+        cache_write_tokens: int = 0
     ) -> float:
         """
         计算API调用费用
@@ -104,15 +115,21 @@ class AIUsageService:
         Args:
             provider: 提供商
             model_name: 模型名称
-            input_tokens: 输入token数
+            input_tokens: 输入token数（含命中缓存、写入缓存的部分）
             output_tokens: 输出token数
+            cached_tokens: 命中提示词缓存的输入token数
+            cache_write_tokens: 写入提示词缓存的输入token数，按正常输入价格计费
         
         Returns:
             估算费用（元）
         """
         pricing = cls._get_pricing(provider, model_name)
         
-        input_cost = (input_tokens / 1000) * pricing['input']
+        # 部分接口返回的输入token数不含缓存写入部分，保证写入的token至少按输入价格计入
+        input_tokens = max(input_tokens, cached_tokens + cache_write_tokens)
+        cached_ratio = cls.CACHED_INPUT_RATIO.get(provider, 1.0)
+        billable_input = (input_tokens - cached_tokens) + cached_tokens * cached_ratio
+        input_cost = (billable_input / 1000) * pricing['input']
         output_cost = (output_tokens / 1000) * pricing['output']
         
         return round(input_cost + output_cost, 6)
@@ -131,7 +148,9 @@ class AIUsageService:
         response_time_ms: Optional[int] = None,
         is_success: bool = True,
         error_message: Optional[str] = None,
-        extra_data: Optional[Dict] = None
+        extra_data: Optional[Dict] = None,
+        cached_tokens: int = 0,
+        cache_write_tokens: int = 0
     ) -> Optional[int]:
         """
         记录AI用量
@@ -149,6 +168,8 @@ class AIUsageService:
             is_success: 是否成功
             error_message: 错误信息
             extra_data: 额外数据
+            cached_tokens: 命中提示词缓存的输入token数（已包含在 input_tokens 中）
+            cache_write_tokens: 写入提示词缓存的输入token数（已包含在 input_tokens 中）
         
         Returns:
             日志ID
@@ -158,19 +179,21 @@ class AIUsageService:
             await cls._load_pricing_cache()
             
             total_tokens = input_tokens + output_tokens
-            cost_estimate = cls.calculate_cost(provider, model_name, input_tokens, output_tokens)
+            cost_estimate = cls.calculate_cost(
+                provider, model_name, input_tokens, output_tokens, cached_tokens, cache_write_tokens
+            )
             
             async with AsyncSessionLocal() as db:
                 result = await db.execute(
                     text("""
                         INSERT INTO ai_usage_logs (
                             agent_name, agent_id, model_name, provider,
-                            input_tokens, output_tokens, total_tokens,
+                            input_tokens, output_tokens, total_tokens, cached_tokens,
                             cost_estimate, task_type, request_id,
                             response_time_ms, is_success, error_message, extra_data
                         ) VALUES (
                             :agent_name, :agent_id, :model_name, :provider,
-                            :input_tokens, :output_tokens, :total_tokens,
+                            :input_tokens, :output_tokens, :total_tokens, :cached_tokens,
                             :cost_estimate, :task_type, :request_id,
                             :response_time_ms, :is_success, :error_message, :extra_data
                         )
@@ -184,6 +207,7 @@ class AIUsageService:
                         "input_tokens": input_tokens,
                         "output_tokens": output_tokens,
                         "total_tokens": total_tokens,
+                        "cached_tokens": cached_tokens,
                         "cost_estimate": cost_estimate,
                         "task_type": task_type,
                         "request_id": request_id,
@@ -200,7 +224,7 @@ class AIUsageService:
                 
                 logger.debug(
                     f"记录AI用量: {provider}/{model_name}, "
-                    f"tokens: {input_tokens}+{output_tokens}={total_tokens}, "
+                    f"tokens: {input_tokens}+{output_tokens}={total_tokens} (缓存命中{cached_tokens}), "
                     f"费用: ¥{cost_estimate:.4f}"
                 )
                 
@@ -208,7 +232,7 @@ class AIUsageService:
                 asyncio.create_task(cls._check_alerts())
                 
                 return log_id
-                
+        
         except Exception as e:
             logger.error(f"记录AI用量失败: {e}")
             return None
@@ -270,7 +294,8 @@ class AIUsageService:
                             SUM(total_tokens) as total_tokens,
                             SUM(cost_estimate) as total_cost,
                             AVG(response_time_ms) as avg_response_time,
-                            MAX(response_time_ms) as max_response_time
+                            MAX(response_time_ms) as max_response_time,
+                            SUM(cached_tokens) as total_cached_tokens
                         FROM ai_usage_logs
                         WHERE {where_clause}
                     """),
@@ -380,14 +405,16 @@ class AIUsageService:
                         "total_tokens": int(row[4] or 0),
                         "total_cost": float(row[5] or 0),
                         "avg_response_time_ms": int(row[6] or 0),
-                        "max_response_time_ms": int(row[7] or 0)
+                        "max_response_time_ms": int(row[7] or 0),
+                        "total_cached_tokens": int(row[8] or 0),
+                        "cache_hit_rate": round((row[8] or 0) / (row[2] or 1) * 100, 2)
                     },
                     "by_provider": provider_stats,
                     "by_model": model_stats,
                     "by_agent": agent_stats,
                     "daily_trend": daily_stats
                 }
-                
+        
         except Exception as e:
             logger.error(f"获取用量统计失败: {e}")
             return {
@@ -475,7 +502,7 @@ class AIUsageService:
                             id, agent_name, model_name, provider,
                             input_tokens, output_tokens, total_tokens,
                             cost_estimate, task_type, response_time_ms,
-                            is_success, error_message, created_at
+                            is_success, error_message, created_at, cached_tokens
                         FROM ai_usage_logs
                         WHERE {where_clause}
                         ORDER BY created_at DESC
@@ -498,7 +525,8 @@ class AIUsageService:
                         "response_time_ms": r[9],
                         "is_success": r[10],
                         "error_message": r[11],
-                        "created_at": r[12].isoformat() if r[12] else None
+                        "created_at": r[12].isoformat() if r[12] else None,
+                        "cached_tokens": r[13] or 0
                     }
                     for r in result.fetchall()
                 ]
@@ -510,7 +538,7 @@ class AIUsageService:
                     "page_size": page_size,
                     "total_pages": (total + page_size - 1) // page_size
                 }
-                
+        
         except Exception as e:
             logger.error(f"获取用量日志失败: {e}")
             return {"logs": [], "total": 0, "page": 1, "page_size": page_size, "total_pages": 0}
@@ -595,7 +623,7 @@ class AIUsageService:
                 
                 row = result.fetchone()
                 return row[0] if row else None
-                
+        
         except Exception as e:
             logger.error(f"创建告警配置失败: {e}")
             return None
@@ -634,7 +662,7 @@ class AIUsageService:
                 )
                 await db.commit()
                 return True
-                
+        
         except Exception as e:
             logger.error(f"更新告警配置失败: {e}")
             return False
@@ -713,7 +741,7 @@ class AIUsageService:
                             float(threshold), float(current_cost),
                             notify_wechat, notify_email, notify_users
                         )
-                        
+        
         except Exception as e:
             logger.error(f"检查告警失败: {e}")
     
@@ -762,7 +790,7 @@ class AIUsageService:
 📈 超出比例: {((current_cost - threshold) / threshold * 100):.1f}%
 
 请及时关注AI用量情况，避免费用超支。"""
-            
+
             logger.warning(f"触发告警 [{alert_name}]: 当前费用 ¥{current_cost:.2f} 超过阈值 ¥{threshold:.2f}")
             
             # 发送企业微信通知
@@ -789,7 +817,7 @@ class AIUsageService:
                     )
                 except Exception as e:
                     logger.error(f"发送邮件告警失败: {e}")
-                    
+        
         except Exception as e:
             logger.error(f"触发告警失败: {e}")
     
@@ -876,7 +904,7 @@ class AIUsageService:
                 cls._pricing_cache.clear()
                 
                 return True
-                
+        
         except Exception as e:
             logger.error(f"更新模型价格配置失败: {e}")
             return False
@@ -0,0 +1,375 @@
+"""
+素材入库服务
+AssetCollectorAgent（Pexels/Pixabay）与 SocialMediaCollector（小红书/抖音/B站）共用：
+- 按规范化的 URL（补全协议、统一大小写、去掉跟踪参数）去重，规范化结果只作为去重键（assets.url_key），
+  file_url 按采集到的原样保存（CDN 的查询串可能是签名或图片处理参数，不能重新编码）
+- 下载缩略图，在进程池中计算感知哈希（dHash），批次内近似重复的只保留第一个
+- 哈希按8位一段分成8段（phash_bands，GIN索引），一条查询取出与本批有相同分段的库中素材，
+  在内存中比较汉明距离，排除与库中已有素材近似的条目
+- 整批一条 INSERT ... ON CONFLICT DO NOTHING RETURNING（file_url、url_key 唯一）
+
+无论一批多少素材，数据库往返不超过两次
+"""
+import io
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+from loguru import logger
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.models.database import AsyncSessionLocal
+
+# 去掉的跟踪参数（其余参数可能是CDN签名，原样保留）
+TRACKING_PARAMS = {"spm", "fbclid", "gclid", "share_source", "share_medium", "vd_source"}
+
+THUMBNAIL_MAX_BYTES = 5 * 1024 * 1024
+
+# 64位哈希分成8段，每段8位：汉明距离不超过7的两个哈希至少有一段完全相同（抽屉原理）
+PHASH_BANDS = 8
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _absolute_url(url: Optional[str]) -> Optional[str]:
+    """去掉首尾空白，//host/path 补全为 https://host/path"""
+    if not url or not isinstance(url, str):
+        return None
+    url = url.strip()
+    return "https:" + url if url.startswith("//") else url
+
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    """
+    规范化素材URL，只用作去重键
+    
+    //host/path → https://host/path；协议和域名转小写，去掉默认端口、锚点和跟踪参数，
+    其余查询参数按原字节保留（不解码、不重新编码）
+    """
+    url = _absolute_url(url)
+    if not url:
+        return None
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    
+    netloc = parts.netloc.lower()
+    if (parts.scheme, netloc.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = "&".join(
+        pair for pair in parts.query.split("&")
+        if pair and not _is_tracking_param(pair.split("=", 1)[0])
+    )
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path or "/", query, ""))
+
+
+def _is_tracking_param(name: str) -> bool:
+    return name in TRACKING_PARAMS or name.startswith("utm_")
+
+
+def dhash(data: bytes, size: int = 8) -> Optional[int]:
+    """
+    计算图片的 64 位差值哈希（在进程池中执行）
+    
+    Returns:
+        有符号 64 位整数（可直接存入 BIGINT），无法解码时返回 None
+    """
+    try:
+        from PIL import Image
+        
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("L", (size * 4, size * 4))  # JPEG 解码时直接缩小，减少计算量
+            pixels = list(image.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+    
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+def phash_bands(value: int) -> List[int]:
+    """
+    哈希的分段桶：第 i 段为 i * 256 + 该段的8位值
+    
+    与迁移 048 回填 phash_bands 的 SQL 表达式一致（有符号 BIGINT 算术右移后取低8位）
+    """
+    return [i * 256 + ((value >> (i * 8)) & 0xFF) for i in range(PHASH_BANDS)]
+
+
+class _BandIndex:
+    """按分段桶索引的哈希集合，只与有相同分段的哈希比较汉明距离"""
+    
+    def __init__(self, max_distance: int, values: Iterable[int] = ()):
+        self.max_distance = max_distance
+        self.buckets: Dict[int, List[int]] = {}
+        for value in values:
+            self.add(value)
+    
+    def add(self, value: int):
+        for band in phash_bands(value):
+            self.buckets.setdefault(band, []).append(value)
+    
+    def has_similar(self, value: int) -> bool:
+        return any(
+            hamming(value, other) <= self.max_distance
+            for band in phash_bands(value)
+            for other in self.buckets.get(band, ())
+        )
+
+
+def _duration_seconds(value: Any) -> Optional[int]:
+    """时长统一为秒：数字原样取整，'m:ss' / 'h:mm:ss' 字符串换算"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and value:
+        try:
+            seconds = 0
+            for part in value.split(":"):
+                seconds = seconds * 60 + int(part)
+            return seconds
+        except ValueError:
+            return None
+    return None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        workers = settings.ASSET_PHASH_WORKERS or os.cpu_count() or 2
+        # spawn：不 fork 带着事件循环和连接池的主进程
+        _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """关闭计算感知哈希的进程池（应用关闭时调用）"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+class AssetIngestionService:
+    """素材批量入库（URL去重 + 感知哈希去重）"""
+    
+    def __init__(self):
+        self.phash_enabled = settings.ASSET_PHASH_ENABLED
+        # 分段桶只能保证找到距离不超过 PHASH_BANDS - 1 的近似哈希
+        self.max_distance = min(settings.ASSET_PHASH_DISTANCE, PHASH_BANDS - 1)
+    
+    async def ingest(self, items: List[Dict[str, Any]], collected_by: str = "manual") -> Dict[str, int]:
+        """
+        批量保存采集到的素材
+        
+        Args:
+            items: 采集结果，字段 name/type/platform/file_url/thumbnail_url/source_url/
+                description/duration/file_size
+            collected_by: 采集来源标识（写入 assets.collected_by）
+        
+        Returns:
+            {"saved": 新写入数, "existing": 库中已有（URL相同或缩略图相近）,
+             "duplicate": 批次内URL重复数, "similar": 批次内缩略图近似数, "invalid": 无有效URL数}
+        """
+        stats = {"saved": 0, "existing": 0, "duplicate": 0, "similar": 0, "invalid": 0}
+        
+        rows = []
+        seen = set()
+        for item in items:
+            url_key = normalize_url(item.get("file_url"))
+            if not url_key:
+                stats["invalid"] += 1
+                continue
+            if url_key in seen:
+                stats["duplicate"] += 1
+                continue
+            seen.add(url_key)
+            # 保存采集到的原始URL
+            file_url = item["file_url"].strip()
+            thumbnail_url = item.get("thumbnail_url").strip() if isinstance(item.get("thumbnail_url"), str) else None
+            rows.append({
+                "name": (item.get("name") or "未命名")[:255],
+                "type": item.get("type") or "video",
+                "category": item.get("platform") or "unknown",
+                "file_url": file_url,
+                "url_key": url_key,
+                "thumbnail_url": thumbnail_url or file_url,
+                "source_platform": item.get("platform"),
+                "source_url": item.get("source_url"),
+                "description": (item.get("description") or "")[:500],
+                "duration": _duration_seconds(item.get("duration")),
+                "file_size": int(item.get("file_size") or 0),
+                "phash": None,
+                # 计算哈希用的图片：没有缩略图的视频不下载原文件
+                "hash_url": _absolute_url(thumbnail_url) or (
+                    _absolute_url(file_url) if item.get("type") == "image" else None
+                ),
+            })
+        
+        if rows and self.phash_enabled:
+            rows = await self._drop_similar(rows, stats)
+            rows = await self._drop_existing_similar(rows, stats)
+        
+        if not rows:
+            return stats
+        
+        try:
+            inserted = await self._insert(rows, collected_by)
+        except Exception as e:
+            logger.error(f"[素材入库] 批量写入失败 ({len(rows)} 个): {e}")
+            return stats
+        
+        stats["saved"] = len(inserted)
+        # 未写入的：URL 已存在（或并发写入时与库中素材缩略图相近）
+        stats["existing"] += len(rows) - len(inserted)
+        logger.info(
+            f"[素材入库] {collected_by}: 新增 {stats['saved']}，库中已有 {stats['existing']}，"
+            f"批次内重复 {stats['duplicate']}，批次内近似 {stats['similar']}，无效 {stats['invalid']}"
+        )
+        return stats
+    
+    # ========== 内部方法 ==========
+    
+    async def _drop_similar(self, rows: List[Dict[str, Any]], stats: Dict[str, int]) -> List[Dict[str, Any]]:
+        """计算缩略图哈希，批次内近似重复的只保留第一个"""
+        hashes = await self._compute_hashes([r["hash_url"] for r in rows])
+        
+        kept = []
+        kept_hashes = _BandIndex(self.max_distance)
+        for row, value in zip(rows, hashes):
+            if value is not None:
+                if kept_hashes.has_similar(value):
+                    stats["similar"] += 1
+                    continue
+                kept_hashes.add(value)
+            row["phash"] = value
+            kept.append(row)
+        return kept
+    
+    async def _drop_existing_similar(self, rows: List[Dict[str, Any]], stats: Dict[str, int]) -> List[Dict[str, Any]]:
+        """
+        排除与库中已有素材缩略图相近的条目
+        
+        一条查询按分段桶（phash_bands && ...，走 GIN 索引）取出候选，汉明距离在内存中比较，
+        不对全表逐行计算距离
+        """
+        bands = sorted({band for row in rows if row["phash"] is not None for band in phash_bands(row["phash"])})
+        if not bands:
+            return rows
+        
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    text("SELECT phash FROM assets WHERE phash_bands && CAST(:bands AS integer[])"),
+                    {"bands": bands}
+                )
+                existing = _BandIndex(self.max_distance, (row[0] for row in result.fetchall()))
+        except Exception as e:
+            logger.warning(f"[素材入库] 查询近似素材失败，只按URL去重: {e}")
+            return rows
+        
+        kept = []
+        for row in rows:
+            if row["phash"] is not None and existing.has_similar(row["phash"]):
+                stats["existing"] += 1
+                continue
+            kept.append(row)
+        return kept
+    
+    async def _compute_hashes(self, urls: List[Optional[str]]) -> List[Optional[int]]:
+        import httpx
+        
+        semaphore = asyncio.Semaphore(settings.ASSET_THUMBNAIL_CONCURRENCY)
+        loop = asyncio.get_running_loop()
+        pool = _get_process_pool()
+        
+        async def one(client: httpx.AsyncClient, url: Optional[str]) -> Optional[int]:
+            if not url:
+                return None
+            try:
+                data = bytearray()
+                async with semaphore:
+                    async with client.stream("GET", url) as response:
+                        if response.status_code != 200:
+                            return None
+                        async for chunk in response.aiter_bytes():
+                            data += chunk
+                            if len(data) > THUMBNAIL_MAX_BYTES:
+                                return None
+                return await loop.run_in_executor(pool, dhash, bytes(data))
+            except Exception as e:
+                logger.debug(f"[素材入库] 缩略图哈希失败 {url}: {e}")
+                return None
+        
+        async with httpx.AsyncClient(timeout=15, follow_redirects=True) as client:
+            return await asyncio.gather(*(one(client, url) for url in urls))
+    
+    async def _insert(self, rows: List[Dict[str, Any]], collected_by: str) -> set:
+        """
+        一条语句写入整批：file_url 或 url_key 已存在的由唯一索引跳过
+        
+        Returns:
+            实际写入的 url_key 集合
+        """
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                text("""
+                    INSERT INTO assets (
+                        name, type, category, file_url, url_key, thumbnail_url, source_platform, source_url,
+                        description, duration, file_size, phash, phash_bands, collected_by, collected_at
+                    )
+                    SELECT c.name, c.type, c.category, c.file_url, c.url_key, c.thumbnail_url, c.source_platform,
+                           c.source_url, c.description, c.duration, c.file_size, c.phash,
+                           CASE WHEN c.phash IS NOT NULL THEN ARRAY(
+                               SELECT i * 256 + CAST((c.phash >> (i * 8)) & 255 AS integer)
+                               FROM generate_series(0, 7) AS i
+                           ) END,
+                           :collected_by, NOW()
+                    FROM unnest(
+                        CAST(:names AS varchar[]), CAST(:types AS varchar[]), CAST(:categories AS varchar[]),
+                        CAST(:file_urls AS text[]), CAST(:url_keys AS text[]), CAST(:thumbnail_urls AS text[]),
+                        CAST(:source_platforms AS varchar[]), CAST(:source_urls AS text[]),
+                        CAST(:descriptions AS text[]), CAST(:durations AS integer[]),
+                        CAST(:file_sizes AS bigint[]), CAST(:phashes AS bigint[])
+                    ) AS c(name, type, category, file_url, url_key, thumbnail_url, source_platform, source_url,
+                           description, duration, file_size, phash)
+                    ON CONFLICT DO NOTHING
+                    RETURNING url_key
+                """),
+                {
+                    "names": [r["name"] for r in rows],
+                    "types": [r["type"] for r in rows],
+                    "categories": [r["category"] for r in rows],
+                    "file_urls": [r["file_url"] for r in rows],
+                    "url_keys": [r["url_key"] for r in rows],
+                    "thumbnail_urls": [r["thumbnail_url"] for r in rows],
+                    "source_platforms": [r["source_platform"] for r in rows],
+                    "source_urls": [r["source_url"] for r in rows],
+                    "descriptions": [r["description"] for r in rows],
+                    "durations": [r["duration"] for r in rows],
+                    "file_sizes": [r["file_size"] for r in rows],
+                    "phashes": [r["phash"] for r in rows],
+                    "collected_by": collected_by,
+                }
+            )
+            inserted = {row[0] for row in result.fetchall()}
+            await db.commit()
+            return inserted
+
+
+# 全局实例
+asset_ingestion = AssetIngestionService()
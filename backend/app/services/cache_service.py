@@ -14,6 +14,9 @@ from app.core.config import settings
 class CacheService:
     """智能缓存服务"""
     
+    # 所有缓存键的统一前缀（DB1）
+    KEY_PREFIX = "maria:cache:"
+    
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
         self._connected = False
@@ -39,6 +42,16 @@ class CacheService:
             self.redis_client = None
             self._connected = False
     
+    def key(self, name: str) -> str:
+        """带统一前缀的完整Redis键（直接使用 client() 读写时用）"""
+        return f"{self.KEY_PREFIX}{name}"
+    
+    async def client(self) -> Optional[redis.Redis]:
+        """获取Redis客户端（自动连接），不可用时返回None"""
+        if not self._connected:
+            await self.connect()
+        return self.redis_client if self._connected else None
+    
     async def get(self, key: str) -> Optional[Any]:
         """获取缓存"""
         if not self._connected:
@@ -48,7 +61,7 @@ class CacheService:
             return None
         
         try:
-            value = await self.redis_client.get(f"maria:cache:{key}")
+            value = await self.redis_client.get(self.key(key))
             if value:
                 logger.debug(f"[缓存命中] {key}")
                 return json.loads(value)
@@ -72,7 +85,7 @@ class CacheService:
             return False
         
         try:
-            cache_key = f"maria:cache:{key}"
+            cache_key = self.key(key)
             json_value = json.dumps(value, ensure_ascii=False, default=str)
             
             if ttl is None:
@@ -94,7 +107,7 @@ class CacheService:
             return False
         
         try:
-            await self.redis_client.delete(f"maria:cache:{key}")
+            await self.redis_client.delete(self.key(key))
             logger.debug(f"[缓存删除] {key}")
             return True
         except Exception as e:
@@ -108,7 +121,7 @@ class CacheService:
         
         try:
             keys = []
-            async for key in self.redis_client.scan_iter(f"maria:cache:{pattern}*"):
+            async for key in self.redis_client.scan_iter(self.key(f"{pattern}*")):
                 keys.append(key)
             
             if keys:
@@ -0,0 +1,290 @@
+"""
+公司资料读穿缓存
+负责：一次加载 company_config（及邮件Logo），按 AI员工 预渲染提示词片段，
+配置写入后失效，并通过 Redis 发布/订阅通知其他 worker 同步失效
+
+每条消息构建提示词时只读内存快照，不访问数据库；
+失效通知丢失时靠 TTL 兜底（默认10分钟后重新加载）
+"""
+import json
+import time
+import asyncio
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+from sqlalchemy import select, text
+
+from app.models.database import AsyncSessionLocal
+from app.models.company_config import CompanyConfig
+
+INVALIDATE_CHANNEL = "maria:company_profile:invalidate"
+
+# 提示词片段标签
+LABELS = {
+    "name": "公司名称",
+    "intro": "公司简介",
+    "products": "我们提供的产品服务：",
+    "main_products": "主营产品服务：",
+    "features": "特点",
+    "routes": "服务航线：",
+    "price_ref": "参考价格",
+    "advantages": "公司优势",
+    "price_policy": "价格政策",
+    "phone": "联系电话",
+    "wechat": "客服微信",
+    "sep": "：",
+}
+
+
+def _render_sales(profile: Dict[str, Any], labels: Dict[str, str]) -> str:
+    """小销：完整产品、航线（含时效和参考价）、价格政策和联系方式"""
+    sep = labels["sep"]
+    lines = []
+    
+    if profile.get("company_name"):
+        lines.append(f"{labels['name']}{sep}{profile['company_name']}")
+    
+    if profile.get("company_intro"):
+        lines.append(f"{labels['intro']}{sep}{profile['company_intro']}")
+    
+    products_text = []
+    for p in profile.get("products") or []:
+        name = p.get('name', '')
+        desc = p.get('description', '')
+        features = p.get('features', [])
+        products_text.append(f"- {name}: {desc} ({labels['features']}: {', '.join(features)})")
+    if products_text:
+        lines.append(labels["products"])
+        lines.extend(products_text)
+    
+    routes_text = []
+    for r in profile.get("service_routes") or []:
+        route_info = f"- {r.get('from_location', '')}→{r.get('to_location', '')} ({r.get('transport', '')}): {r.get('time', '')}"
+        if r.get('price_ref'):
+            route_info += f", {labels['price_ref']}: {r['price_ref']}"
+        routes_text.append(route_info)
+    if routes_text:
+        lines.append(labels["routes"])
+        lines.extend(routes_text)
+    
+    if profile.get("advantages"):
+        lines.append(f"{labels['advantages']}{sep}{', '.join(profile['advantages'])}")
+    
+    if profile.get("price_policy"):
+        lines.append(f"{labels['price_policy']}{sep}{profile['price_policy']}")
+    
+    if profile.get("contact_phone"):
+        lines.append(f"{labels['phone']}{sep}{profile['contact_phone']}")
+    
+    if profile.get("contact_wechat"):
+        lines.append(f"{labels['wechat']}{sep}{profile['contact_wechat']}")
+    
+    return "\n".join(lines)
+
+
+def _render_copywriter(profile: Dict[str, Any], labels: Dict[str, str]) -> str:
+    """小文：产品名称与简介、前5条航线、优势和电话"""
+    sep = labels["sep"]
+    lines = []
+    
+    if profile.get("company_name"):
+        lines.append(f"{labels['name']}{sep}{profile['company_name']}")
+    
+    if profile.get("company_intro"):
+        lines.append(f"{labels['intro']}{sep}{profile['company_intro']}")
+    
+    products_text = [
+        f"- {p.get('name')}: {p.get('description', '')}"
+        for p in profile.get("products") or [] if p.get('name')
+    ]
+    if products_text:
+        lines.append(labels["main_products"])
+        lines.extend(products_text)
+    
+    routes_text = [
+        f"- {r.get('from_location')}→{r.get('to_location')} ({r.get('transport', '')})"
+        for r in profile.get("service_routes") or []
+        if r.get('from_location') and r.get('to_location')
+    ]
+    if routes_text:
+        lines.append(labels["routes"])
+        lines.extend(routes_text[:5])
+    
+    if profile.get("advantages"):
+        lines.append(f"{labels['advantages']}{sep}{', '.join(profile['advantages'])}")
+    
+    if profile.get("contact_phone"):
+        lines.append(f"{labels['phone']}{sep}{profile['contact_phone']}")
+    
+    return "\n".join(lines)
+
+
+RENDERERS: Dict[str, Callable[[Dict[str, Any], Dict[str, str]], str]] = {
+    "sales": _render_sales,
+    "copywriter": _render_copywriter,
+}
+
+
+class CompanyProfile:
+    """公司资料缓存（进程内快照 + 跨 worker 失效）"""
+    
+    def __init__(self, ttl: int = 600):
+        """
+        Args:
+            ttl: 快照最长有效期（秒），失效通知丢失时的兜底
+        """
+        self.ttl = ttl
+        self._profile: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+        # 每次失效递增，防止失效前开始的加载把旧数据写回快照
+        self._generation = 0
+        self._fragments: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+        self._listener: Optional[asyncio.Task] = None
+    
+    async def get(self) -> Dict[str, Any]:
+        """
+        获取公司资料快照（company_config 字段 + email_logo）
+        
+        Returns:
+            配置不存在时返回空字典
+        """
+        self._ensure_listener()
+        if self._profile is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return self._profile
+        
+        async with self._lock:
+            if self._profile is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._profile
+            generation = self._generation
+            profile = await self._load()
+            if profile is None:
+                # 加载失败不缓存，沿用旧快照（如有）
+                return self._profile or {}
+            if generation != self._generation:
+                return profile
+            self._profile = profile
+            self._fragments = {}
+            self._loaded_at = time.monotonic()
+            return profile
+    
+    async def prompt_context(self, agent: str = "sales") -> str:
+        """
+        获取预渲染的公司上下文提示词片段
+        
+        Args:
+            agent: 片段类型（sales / copywriter）
+        """
+        profile = await self.get()
+        if not profile:
+            return ""
+        
+        fragment = self._fragments.get(agent)
+        if fragment is None:
+            fragment = RENDERERS.get(agent, _render_sales)(profile, LABELS)
+            self._fragments[agent] = fragment
+        return fragment
+    
+    async def company_name(self, default: str = "") -> str:
+        profile = await self.get()
+        return profile.get("company_name") or default
+    
+    def _clear(self):
+        self._profile = None
+        self._fragments = {}
+        self._generation += 1
+    
+    async def invalidate(self, broadcast: bool = True):
+        """
+        配置写入后调用：清空本进程快照，并通知其他 worker
+        
+        Args:
+            broadcast: 是否通过 Redis 广播
+        """
+        self._clear()
+        
+        if not broadcast:
+            return
+        from app.services.cache_service import cache_service
+        
+        try:
+            client = await cache_service.client()
+            if client:
+                await client.publish(INVALIDATE_CHANNEL, str(time.time()))
+        except Exception as e:
+            logger.warning(f"[公司资料] 广播失效通知失败: {e}")
+    
+    # ========== 内部方法 ==========
+    
+    async def _load(self) -> Optional[Dict[str, Any]]:
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(select(CompanyConfig).limit(1))
+                config = result.scalar_one_or_none()
+                
+                profile: Dict[str, Any] = {}
+                if config:
+                    profile = {
+                        column.key: getattr(config, column.key)
+                        for column in CompanyConfig.__table__.columns
+                        if column.key not in ("id", "created_at", "updated_at")
+                    }
+                
+                # 邮件Logo存放在SMTP设置中（邮件签名使用）
+                try:
+                    result = await db.execute(
+                        text("SELECT value FROM system_settings WHERE key = 'smtp'")
+                    )
+                    row = result.fetchone()
+                    if row and row[0]:
+                        smtp_config = row[0] if isinstance(row[0], dict) else json.loads(row[0])
+                        profile["email_logo"] = smtp_config.get("email_logo", "")
+                except Exception:
+                    pass
+                
+                logger.debug("[公司资料] 已重新加载")
+                return profile
+        except Exception as e:
+            logger.error(f"获取公司配置失败: {e}")
+            return None
+    
+    def _ensure_listener(self):
+        """首次使用时启动失效通知订阅（每个 worker 一个）"""
+        if self._listener is not None and not self._listener.done():
+            return
+        try:
+            self._listener = asyncio.get_event_loop().create_task(self._listen())
+        except RuntimeError:
+            # 不在事件循环中（如同步脚本），只依赖 TTL
+            self._listener = None
+    
+    async def _listen(self):
+        from app.services.cache_service import cache_service
+        
+        while True:
+            try:
+                client = await cache_service.client()
+                if not client:
+                    await asyncio.sleep(60)
+                    continue
+                
+                pubsub = client.pubsub()
+                await pubsub.subscribe(INVALIDATE_CHANNEL)
+                try:
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self._clear()
+                            logger.debug("[公司资料] 收到失效通知")
+                finally:
+                    await pubsub.unsubscribe(INVALIDATE_CHANNEL)
+                    await pubsub.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[公司资料] 失效订阅中断，稍后重连: {e}")
+                # 断线期间可能错过通知，重连前清空快照
+                self._clear()
+                await asyncio.sleep(5)
+
+
+# 全局实例
+company_profile = CompanyProfile()
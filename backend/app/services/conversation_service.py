@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
 from app.models.database import async_session_maker
+from app.services.dashboard_metrics import dashboard_metrics
 
 
 class ConversationService:
@@ -94,6 +95,7 @@ class ConversationService:
                 )
                 customer_id = result.fetchone()[0]
                 await db.commit()
+                await dashboard_metrics.record_customer_created(0, "C")
                 
                 logger.info(f"✅ 创建新客户: {customer_name} (ID: {customer_id})")
                 
@@ -163,6 +165,7 @@ class ConversationService:
                     }
                 )
                 await db.commit()
+                await dashboard_metrics.record_conversation(agent_type, content)
                 
                 logger.info(f"✅ 保存消息: [{agent_type}] {message_type} - {content[:30]}...")
                 return True
@@ -221,6 +224,7 @@ class ConversationService:
                     {"customer_id": customer_id, "score": final_score, "level": new_level}
                 )
                 await db.commit()
+                await dashboard_metrics.record_intent_changed(old_score, old_level, final_score, new_level)
                 
                 level_changed = old_level != new_level
                 upgraded_to_high = new_level in ['S', 'A'] and old_level not in ['S', 'A']
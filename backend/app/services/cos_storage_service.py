@@ -4,15 +4,16 @@
 """
 import os
 import time
+import asyncio
 import uuid
-from typing import Optional, Tuple
+from typing import Optional, Tuple, TYPE_CHECKING
 from loguru import logger
 
-from qcloud_cos import CosConfig
-from qcloud_cos import CosS3Client
-
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    from qcloud_cos import CosS3Client
+
 
 class COSStorageService:
     """腾讯云COS对象存储服务"""
@@ -23,7 +24,7 @@ class COSStorageService:
         self.secret_key = settings.COS_SECRET_KEY or getattr(settings, 'TENCENT_SECRET_KEY', None)
         self.bucket = settings.COS_BUCKET
         self.region = settings.COS_REGION or "ap-guangzhou"
-        self._client: Optional[CosS3Client] = None
+        self._client: Optional["CosS3Client"] = None
     
     @property
     def is_configured(self) -> bool:
@@ -31,12 +32,14 @@ class COSStorageService:
         return bool(self.secret_id and self.secret_key and self.bucket)
     
     @property
-    def client(self) -> Optional[CosS3Client]:
+    def client(self) -> Optional["CosS3Client"]:
         """获取COS客户端"""
         if not self.is_configured:
             return None
         
         if self._client is None:
+            # SDK 在首次使用时导入
+            from qcloud_cos import CosConfig, CosS3Client
             config = CosConfig(
                 Region=self.region,
                 SecretId=self.secret_id,
@@ -143,13 +146,14 @@ class COSStorageService:
             filename = os.path.basename(file_path)
             key = self._generate_key(filename, folder)
             
-            # 上传文件
-            response = self.client.upload_file(
+            # 上传文件（SDK为同步调用，放入线程池，多个分段可并发上传）
+            loop = asyncio.get_event_loop()
+            response = await loop.run_in_executor(None, lambda: self.client.upload_file(
                 Bucket=self.bucket,
                 Key=key,
                 LocalFilePath=file_path,
                 EnableMD5=False
-            )
+            ))
             
             # 生成公网访问URL
             url = f"https://{self.bucket}.cos.{self.region}.myqcloud.com/{key}"
@@ -0,0 +1,465 @@
+"""
+仪表板指标快照
+负责：今日计数（新客户/对话/视频）、客户意向分布和最近活动以 Redis 计数器/列表维护，
+由写入路径增量更新；AI团队状态由定时任务刷新。仪表板接口只读一份快照，不访问数据库
+
+- 写入路径（保存消息、创建/更新客户、创建视频）提交后调用 record_* 方法，一次 Redis 往返
+- reconcile() 定时用数据库精确计数覆盖计数器，修正漏记（Redis 短暂不可用、未接入的写入路径）；
+  对账查询与其间的增量可能相差几条，下次对账再修正
+- 快照在进程内缓存 DASHBOARD_SNAPSHOT_TTL 秒，前端高频轮询时每个 worker 每秒最多访问一次 Redis
+
+Redis 不可用时退化为数据库查询，结果在进程内缓存 DASHBOARD_REFRESH_INTERVAL 秒
+"""
+import json
+import time
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from loguru import logger
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.models.database import async_session_maker
+from app.services.cache_service import cache_service
+
+KEY_PREFIX = cache_service.key("dashboard")
+INTENT_LEVELS = ("S", "A", "B", "C")
+
+# 所有AI员工（仪表板指挥中心展示顺序）
+AGENTS_INFO = {
+    "coordinator": {"name": "小调", "role": "调度主管"},
+    "sales": {"name": "小销", "role": "销售客服"},
+    "analyst": {"name": "小析", "role": "客户分析"},
+    "copywriter": {"name": "小文", "role": "文案策划"},
+    "video_creator": {"name": "小影", "role": "视频创作"},
+    "follow": {"name": "小跟", "role": "跟进专员"},
+    "lead_hunter": {"name": "小猎", "role": "线索猎手"},
+    "analyst2": {"name": "小析2", "role": "群情报员"},
+    "eu_customs_monitor": {"name": "小欧", "role": "海关监控"},
+    "code_engineer": {"name": "小码", "role": "代码工程师"},
+    "knowledge_curator": {"name": "小知", "role": "知识管理"},
+}
+
+
+def _value(value: Any) -> Any:
+    """枚举取值（IntentLevel / AgentType / MessageType）"""
+    return getattr(value, "value", value)
+
+
+def _today_start() -> datetime:
+    return datetime.combine(datetime.utcnow().date(), datetime.min.time())
+
+
+def _day_key() -> str:
+    return f"{KEY_PREFIX}:day:{datetime.utcnow().date().isoformat()}"
+
+
+def _activity(agent_type: Any, content: Optional[str], created_at: Optional[datetime] = None) -> Dict[str, Any]:
+    content = content or ""
+    return {
+        "type": "conversation",
+        "agent": _value(agent_type) or "system",
+        "content_preview": content[:50] + "..." if len(content) > 50 else content,
+        "timestamp": (created_at or datetime.utcnow()).isoformat()
+    }
+
+
+def _default_team(error: Optional[str] = None) -> Dict[str, Any]:
+    team = {
+        "agents": [
+            {
+                "name": info["name"],
+                "type": agent_type,
+                "role": info["role"],
+                "status": "online",
+                "current_task": None,
+                "tasks_today": 0,
+                "last_active": None,
+            }
+            for agent_type, info in AGENTS_INFO.items()
+        ],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if error:
+        team["error"] = error
+    return team
+
+
+class DashboardMetrics:
+    """仪表板指标（Redis 增量计数 + 定时对账 + 进程内快照）"""
+    
+    def __init__(self):
+        self.snapshot_ttl = settings.DASHBOARD_SNAPSHOT_TTL
+        self.refresh_interval = settings.DASHBOARD_REFRESH_INTERVAL
+        self.activity_limit = settings.DASHBOARD_ACTIVITY_LIMIT
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        # 对账失败后在此之前不再由读取方触发对账（如数据库故障时避免每次快照未命中都重跑）
+        self._reconcile_retry_at = 0.0
+    
+    # ========== 写入路径 ==========
+    
+    async def record_customer_created(self, intent_score: int = 0, intent_level: Any = "C"):
+        """新客户写入后调用"""
+        level = _value(intent_level) or "C"
+        
+        def ops(pipe):
+            pipe.hincrby(_day_key(), "new_customers", 1)
+            pipe.expire(_day_key(), 3 * 86400)
+            pipe.hincrby(f"{KEY_PREFIX}:totals", f"intent_{level}", 1)
+            if (intent_score or 0) >= settings.HIGH_INTENT_THRESHOLD:
+                pipe.hincrby(f"{KEY_PREFIX}:totals", "high_intent_customers", 1)
+        
+        await self._record(ops)
+    
+    async def record_intent_changed(self, old_score: int, old_level: Any, new_score: int, new_level: Any):
+        """客户意向分数/等级更新后调用"""
+        old_level, new_level = _value(old_level), _value(new_level)
+        old_high = (old_score or 0) >= settings.HIGH_INTENT_THRESHOLD
+        new_high = (new_score or 0) >= settings.HIGH_INTENT_THRESHOLD
+        if old_level == new_level and old_high == new_high:
+            return
+        
+        def ops(pipe):
+            if old_level != new_level:
+                pipe.hincrby(f"{KEY_PREFIX}:totals", f"intent_{old_level}", -1)
+                pipe.hincrby(f"{KEY_PREFIX}:totals", f"intent_{new_level}", 1)
+            if old_high != new_high:
+                pipe.hincrby(f"{KEY_PREFIX}:totals", "high_intent_customers", 1 if new_high else -1)
+        
+        await self._record(ops)
+    
+    async def record_conversation(self, agent_type: Any, content: Optional[str]):
+        """对话消息写入后调用（计数 + 最近活动）"""
+        entry = json.dumps(_activity(agent_type, content), ensure_ascii=False)
+        
+        def ops(pipe):
+            pipe.hincrby(_day_key(), "conversations", 1)
+            pipe.expire(_day_key(), 3 * 86400)
+            pipe.lpush(f"{KEY_PREFIX}:activities", entry)
+            pipe.ltrim(f"{KEY_PREFIX}:activities", 0, self.activity_limit - 1)
+        
+        await self._record(ops)
+    
+    async def record_video_created(self):
+        """视频记录写入后调用"""
+        def ops(pipe):
+            pipe.hincrby(_day_key(), "videos_generated", 1)
+            pipe.expire(_day_key(), 3 * 86400)
+        
+        await self._record(ops)
+    
+    # ========== 读取 ==========
+    
+    async def snapshot(self) -> Dict[str, Any]:
+        """
+        获取仪表板快照
+        
+        Returns:
+            {"stats": 今日统计, "team": AI团队状态, "intent_distribution": 意向分布, "activities": 最近活动}
+        """
+        if self._fresh():
+            return self._snapshot
+        
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._fresh():
+                return self._snapshot
+            
+            # Redis 不可用时直接查数据库
+            snapshot = await self._read_redis() or await self._load_from_db()
+            self._snapshot = snapshot
+            self._snapshot_at = time.monotonic()
+            return snapshot
+    
+    async def recent_activities(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """最近活动：快照中保留的条数不够时查数据库"""
+        if limit <= self.activity_limit:
+            return (await self.snapshot())["activities"][:limit]
+        async with async_session_maker() as db:
+            return await self._query_activities(db, limit)
+    
+    # ========== 定时任务 ==========
+    
+    async def reconcile(self) -> bool:
+        """
+        用数据库精确计数覆盖 Redis 计数器和最近活动（定时任务调用）
+        
+        Returns:
+            是否对账成功
+        """
+        client = await self._client()
+        if client is None:
+            return False
+        
+        try:
+            async with async_session_maker() as db:
+                counts = await self._query_counts(db)
+                distribution = await self._query_distribution(db)
+                activities = await self._query_activities(db, self.activity_limit)
+            
+            pipe = client.pipeline(transaction=True)
+            pipe.hset(_day_key(), mapping={
+                "new_customers": counts["new_customers"],
+                "conversations": counts["conversations"],
+                "videos_generated": counts["videos_generated"],
+            })
+            pipe.expire(_day_key(), 3 * 86400)
+            pipe.hset(f"{KEY_PREFIX}:totals", mapping={
+                "high_intent_customers": counts["high_intent_customers"],
+                **{f"intent_{level}": distribution.get(level, 0) for level in INTENT_LEVELS},
+                "reconciled_at": datetime.utcnow().isoformat(),
+            })
+            pipe.delete(f"{KEY_PREFIX}:activities")
+            if activities:
+                pipe.rpush(f"{KEY_PREFIX}:activities", *(json.dumps(a, ensure_ascii=False) for a in activities))
+            await pipe.execute()
+            self._snapshot = None
+            self._reconcile_retry_at = 0.0
+            logger.debug(f"[仪表板] 计数器已对账: {counts}")
+            return True
+        except Exception as e:
+            self._reconcile_retry_at = time.monotonic() + self.refresh_interval
+            logger.warning(f"[仪表板] 计数器对账失败: {e}")
+            return False
+    
+    async def refresh_team_status(self) -> Dict[str, Any]:
+        """查询AI团队状态并写入 Redis（定时任务调用，快照缺失时读取方也会调用）"""
+        async with async_session_maker() as db:
+            team = await self._query_team_status(db)
+        
+        client = await self._client()
+        if client is not None and "error" not in team:
+            try:
+                # 定时任务停止后让快照自然过期，由读取方重新查询
+                await client.set(f"{KEY_PREFIX}:team", json.dumps(team, ensure_ascii=False), ex=self.refresh_interval * 4)
+            except Exception as e:
+                logger.warning(f"[仪表板] 团队状态写入失败: {e}")
+        return team
+    
+    # ========== 内部方法 ==========
+    
+    def _fresh(self) -> bool:
+        if self._snapshot is None:
+            return False
+        # 数据库查询得到的快照保留一个刷新周期，避免 Redis 故障期间轮询压到数据库
+        ttl = self.refresh_interval if self._snapshot["source"] == "database" else self.snapshot_ttl
+        return time.monotonic() - self._snapshot_at < ttl
+    
+    async def _client(self):
+        return await cache_service.client()
+    
+    async def _record(self, ops):
+        """执行一组 Redis 增量操作（失败只记日志，由对账修正）"""
+        client = await self._client()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            ops(pipe)
+            await pipe.execute()
+            # 本进程的写入立即可见
+            self._snapshot = None
+        except Exception as e:
+            logger.warning(f"[仪表板] 计数器更新失败: {e}")
+    
+    async def _read_redis(self) -> Optional[Dict[str, Any]]:
+        """一次往返读取计数器、最近活动和团队状态；Redis 不可用时返回 None"""
+        client = await self._client()
+        if client is None:
+            return None
+        
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.hgetall(_day_key())
+            pipe.hgetall(f"{KEY_PREFIX}:totals")
+            pipe.lrange(f"{KEY_PREFIX}:activities", 0, self.activity_limit - 1)
+            pipe.get(f"{KEY_PREFIX}:team")
+            day, totals, activities, team = await pipe.execute()
+            
+            if not totals:
+                # 首次启动或 Redis 被清空：先用数据库对账；对账失败后的退避期内改查数据库
+                if time.monotonic() < self._reconcile_retry_at or not await self.reconcile():
+                    return None
+                pipe = client.pipeline(transaction=False)
+                pipe.hgetall(_day_key())
+                pipe.hgetall(f"{KEY_PREFIX}:totals")
+                pipe.lrange(f"{KEY_PREFIX}:activities", 0, self.activity_limit - 1)
+                day, totals, activities = await pipe.execute()
+            
+            team = json.loads(team) if team else await self.refresh_team_status()
+        except Exception as e:
+            logger.warning(f"[仪表板] 读取Redis快照失败，改查数据库: {e}")
+            return None
+        
+        def count(values: Dict[str, Any], field: str) -> int:
+            return max(0, int(values.get(field) or 0))
+        
+        now = datetime.utcnow().isoformat()
+        return {
+            "stats": {
+                "today": {
+                    "new_customers": count(day, "new_customers"),
+                    "high_intent_customers": count(totals, "high_intent_customers"),
+                    "conversations": count(day, "conversations"),
+                    "videos_generated": count(day, "videos_generated"),
+                    "processing_tasks": 0
+                },
+                "timestamp": now
+            },
+            "team": team,
+            "intent_distribution": {
+                "distribution": {level: count(totals, f"intent_{level}") for level in INTENT_LEVELS}
+            },
+            "activities": [json.loads(a) for a in activities],
+            "source": "redis",
+        }
+    
+    async def _load_from_db(self) -> Dict[str, Any]:
+        """Redis 不可用时直接查数据库生成快照"""
+        now = datetime.utcnow().isoformat()
+        try:
+            async with async_session_maker() as db:
+                counts = await self._query_counts(db)
+                distribution = await self._query_distribution(db)
+                activities = await self._query_activities(db, self.activity_limit)
+                team = await self._query_team_status(db)
+            stats = {"today": {**counts, "processing_tasks": 0}, "timestamp": now}
+        except Exception as e:
+            logger.error(f"[仪表板] 查询统计数据失败: {e}")
+            distribution, activities, team = {}, [], _default_team(str(e))
+            stats = {
+                "today": {
+                    "new_customers": 0,
+                    "high_intent_customers": 0,
+                    "conversations": 0,
+                    "videos_generated": 0,
+                    "processing_tasks": 0
+                },
+                "timestamp": now,
+                "error": str(e)
+            }
+        
+        return {
+            "stats": stats,
+            "team": team,
+            "intent_distribution": {
+                "distribution": {level: distribution.get(level, 0) for level in INTENT_LEVELS}
+            },
+            "activities": activities,
+            "source": "database",
+        }
+    
+    async def _query_counts(self, db) -> Dict[str, int]:
+        result = await db.execute(
+            text("""
+                SELECT
+                    (SELECT COUNT(*) FROM customers WHERE created_at >= :today),
+                    (SELECT COUNT(*) FROM customers WHERE intent_score >= :high_intent),
+                    (SELECT COUNT(*) FROM conversations WHERE created_at >= :today),
+                    (SELECT COUNT(*) FROM videos WHERE created_at >= :today)
+            """),
+            {"today": _today_start(), "high_intent": settings.HIGH_INTENT_THRESHOLD}
+        )
+        row = result.fetchone()
+        return {
+            "new_customers": row[0] or 0,
+            "high_intent_customers": row[1] or 0,
+            "conversations": row[2] or 0,
+            "videos_generated": row[3] or 0,
+        }
+    
+    async def _query_distribution(self, db) -> Dict[str, int]:
+        result = await db.execute(
+            text("SELECT intent_level, COUNT(*) FROM customers GROUP BY intent_level")
+        )
+        return {str(_value(row[0])): row[1] for row in result.fetchall() if row[0]}
+    
+    async def _query_activities(self, db, limit: int) -> List[Dict[str, Any]]:
+        result = await db.execute(
+            text("SELECT agent_type, message_type, content, created_at FROM conversations ORDER BY created_at DESC LIMIT :limit"),
+            {"limit": limit}
+        )
+        return [_activity(row[0], row[2], row[3]) for row in result.fetchall()]
+    
+    async def _query_team_status(self, db) -> Dict[str, Any]:
+        """AI团队状态：每个员工的当前任务、今日完成数、最后活跃时间"""
+        try:
+            # 1. 每个员工的当前任务（processing 或最新 pending）
+            current_tasks = {}
+            task_result = await db.execute(
+                text("""
+                    SELECT DISTINCT ON (agent_type)
+                        agent_type,
+                        status,
+                        input_data,
+                        created_at,
+                        started_at
+                    FROM ai_tasks
+                    WHERE status IN ('processing', 'pending')
+                    ORDER BY agent_type,
+                             CASE WHEN status = 'processing' THEN 0 ELSE 1 END,
+                             created_at DESC
+                """)
+            )
+            for agent_type, task_status, input_data, created_at, started_at in task_result.fetchall():
+                input_data = input_data or {}
+                task_desc = ""
+                if isinstance(input_data, dict):
+                    task_desc = input_data.get("description", "") or input_data.get("task_description", "") or input_data.get("title", "")
+                
+                current_tasks[agent_type] = {
+                    "task": task_desc[:80] + "..." if len(task_desc) > 80 else task_desc,
+                    "status": task_status,
+                }
+            
+            # 2. 今日完成任务数 + 3. 最后活跃时间（一次扫描）
+            tasks_today = {}
+            last_active = {}
+            stats_result = await db.execute(
+                text("""
+                    SELECT agent_type,
+                           COUNT(*) FILTER (WHERE status = 'completed' AND completed_at >= :today),
+                           MAX(COALESCE(completed_at, started_at, created_at))
+                    FROM ai_tasks
+                    GROUP BY agent_type
+                """),
+                {"today": _today_start()}
+            )
+            for agent_type, completed, last_time in stats_result.fetchall():
+                tasks_today[agent_type] = completed
+                if last_time:
+                    last_active[agent_type] = last_time.isoformat()
+        except Exception as e:
+            logger.warning(f"[仪表板] 查询团队状态失败: {e}")
+            return _default_team(str(e))
+        
+        agents = []
+        for agent_type, info in AGENTS_INFO.items():
+            current_task_info = current_tasks.get(agent_type)
+            
+            # 有 processing 任务则 busy，否则 online
+            if current_task_info:
+                status = "busy" if current_task_info["status"] == "processing" else "online"
+                current_task = current_task_info["task"]
+            else:
+                status = "online"
+                current_task = None
+            
+            agents.append({
+                "name": info["name"],
+                "type": agent_type,
+                "role": info["role"],
+                "status": status,
+                "current_task": current_task,
+                "tasks_today": tasks_today.get(agent_type, 0),
+                "last_active": last_active.get(agent_type),
+            })
+        
+        return {"agents": agents, "timestamp": datetime.utcnow().isoformat()}
+
+
+# 全局实例
+dashboard_metrics = DashboardMetrics()
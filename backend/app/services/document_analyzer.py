@@ -0,0 +1,237 @@
+"""
+长文档分块分析服务（map-reduce）
+负责：边流式读取边并发分析分块、汇总各分块要点、生成最终分析报告
+
+流程：
+1. DocumentService.stream_chunks 在线程池中按页/段落解析并按token预算切分
+2. map：每个分块并发提取要点（有界并发，单块超时不影响其他分块）
+3. reduce：要点过长时分组再压缩，最后套用专家提示词生成完整分析
+文档只有一个分块时直接整篇分析，与原有行为一致
+"""
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+
+from app.core.config import settings
+from app.services.document_service import document_service, estimate_tokens
+
+# 进度回调：(已完成分块数, 已读取分块数, 是否读取完毕)
+ProgressCallback = Callable[[int, int, bool], Awaitable[None]]
+
+MAP_SYSTEM_PROMPT = "你是专业的文档分析助理，负责从长文档的片段中提取关键信息，只输出要点，不做寒暄。"
+
+MAP_PROMPT = """以下是文档「{file_name}」的第{index}部分{pages}：
+
+{content}
+
+---
+请提取本部分的关键信息（不超过{limit}字）：
+1. 涉及的当事方、金额、日期、数量、编号等关键数据（原样保留）
+2. 重要条款、约定或结论
+3. 可能存在的风险、异常或前后矛盾之处
+本部分没有实质内容时只回复"无要点"。"""
+
+REDUCE_PROMPT = """以下是文档「{file_name}」若干部分的要点摘录：
+
+{content}
+
+---
+请合并以上要点（不超过{limit}字）：去除重复，保留所有关键数据、条款和风险提示，按原文顺序组织。"""
+
+
+class DocumentAnalyzer:
+    """长文档 map-reduce 分析器"""
+    
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        chunk_tokens: Optional[int] = None,
+        chunk_timeout: Optional[int] = None,
+        finding_chars: int = 800
+    ):
+        self.concurrency = concurrency or settings.DOCUMENT_ANALYSIS_CONCURRENCY
+        self.chunk_tokens = chunk_tokens or settings.DOCUMENT_CHUNK_TOKENS
+        self.chunk_timeout = chunk_timeout or settings.DOCUMENT_CHUNK_TIMEOUT
+        self.finding_chars = finding_chars
+        # 进度回调任务的强引用，避免完成前被回收
+        self._report_tasks: set = set()
+    
+    @staticmethod
+    def _page_label(chunk: Dict[str, Any]) -> str:
+        if not chunk.get("page_start"):
+            return ""
+        if chunk["page_start"] == chunk["page_end"]:
+            return f"（第{chunk['page_start']}页）"
+        return f"（第{chunk['page_start']}-{chunk['page_end']}页）"
+    
+    async def _llm(self, prompt: str, system_prompt: str, task_type: str, max_tokens: int,
+                   use_advanced: bool = False) -> str:
+        from app.core.llm import chat_completion
+        
+        response = await chat_completion(
+            messages=[{"role": "user", "content": prompt}],
+            system_prompt=system_prompt,
+            use_advanced=use_advanced,
+            agent_name="Maria",
+            task_type=task_type,
+            max_tokens=max_tokens,
+        )
+        return response or ""
+    
+    async def _map_chunk(self, file_name: str, chunk: Dict[str, Any], semaphore: asyncio.Semaphore) -> str:
+        """提取单个分块要点；失败时返回占位说明，不中断整体分析"""
+        async with semaphore:
+            prompt = MAP_PROMPT.format(
+                file_name=file_name,
+                index=chunk["index"] + 1,
+                pages=self._page_label(chunk),
+                content=chunk["text"],
+                limit=self.finding_chars
+            )
+            try:
+                return await asyncio.wait_for(
+                    self._llm(prompt, MAP_SYSTEM_PROMPT, "document_analysis_map", 1500),
+                    timeout=self.chunk_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"[文档分析] {file_name} 第{chunk['index'] + 1}部分分析超时")
+                return "（本部分分析超时，未提取要点）"
+            except Exception as e:
+                logger.warning(f"[文档分析] {file_name} 第{chunk['index'] + 1}部分分析失败: {e}")
+                return "（本部分分析失败，未提取要点）"
+    
+    async def _reduce(self, file_name: str, findings: List[str], semaphore: asyncio.Semaphore) -> str:
+        """要点总长超出预算时分组合并，直到能放进一次最终分析"""
+        merged = "\n\n".join(findings)
+        while estimate_tokens(merged) > self.chunk_tokens and len(findings) > 1:
+            groups: List[List[str]] = [[]]
+            group_tokens = 0
+            for finding in findings:
+                tokens = estimate_tokens(finding)
+                if groups[-1] and group_tokens + tokens > self.chunk_tokens:
+                    groups.append([])
+                    group_tokens = 0
+                groups[-1].append(finding)
+                group_tokens += tokens
+            if len(groups) == len(findings):
+                # 每组只有一条，无法继续合并
+                break
+            
+            async def reduce_group(group: List[str]) -> str:
+                if len(group) == 1:
+                    return group[0]
+                async with semaphore:
+                    prompt = REDUCE_PROMPT.format(
+                        file_name=file_name,
+                        content="\n\n".join(group),
+                        limit=self.finding_chars * 2
+                    )
+                    return await self._llm(prompt, MAP_SYSTEM_PROMPT, "document_analysis_reduce", 3000)
+            
+            findings = list(await asyncio.gather(*[reduce_group(g) for g in groups]))
+            merged = "\n\n".join(findings)
+        return merged
+    
+    async def analyze(
+        self,
+        filepath: str,
+        file_name: str,
+        build_prompt: Callable[[str, str], str],
+        system_prompt: str,
+        on_progress: Optional[ProgressCallback] = None,
+        max_tokens: int = 4000,
+        final_timeout: int = 120
+    ) -> Dict[str, Any]:
+        """
+        分析文档
+        
+        Args:
+            filepath: 文件本地路径
+            file_name: 原始文件名
+            build_prompt: 专家提示词构建函数 (file_name, content) -> prompt
+            system_prompt: 最终分析的系统提示词
+            on_progress: 分块分析进度回调
+            max_tokens: 最终分析的最大输出token
+            final_timeout: 最终分析超时（秒）
+        
+        Returns:
+            {"success": bool, "content": 分析结果, "chunks": 分块数, "chars": 文档字符数, "error": str}
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: List[asyncio.Task] = []
+        labels: List[str] = []
+        first_chunk: Optional[Dict[str, Any]] = None
+        completed = 0
+        reading_done = False
+        total_chars = 0
+        start = time.perf_counter()
+        
+        async def report():
+            if on_progress:
+                try:
+                    await on_progress(completed, len(tasks), reading_done)
+                except Exception as e:
+                    logger.warning(f"[文档分析] 进度回调失败: {e}")
+        
+        def on_done(_):
+            nonlocal completed
+            completed += 1
+            task = asyncio.ensure_future(report())
+            self._report_tasks.add(task)
+            task.add_done_callback(self._report_tasks.discard)
+        
+        try:
+            async for chunk in document_service.stream_chunks(filepath, file_name, self.chunk_tokens):
+                total_chars += len(chunk["text"])
+                if chunk["index"] == 0:
+                    # 先缓存第一块：整篇只有一块时不走 map-reduce
+                    first_chunk = chunk
+                    continue
+                pending = [first_chunk, chunk] if not tasks else [chunk]
+                for item in pending:
+                    task = asyncio.create_task(self._map_chunk(file_name, item, semaphore))
+                    task.add_done_callback(on_done)
+                    tasks.append(task)
+                    labels.append(f"【第{item['index'] + 1}部分{self._page_label(item)}】")
+        except Exception as e:
+            for task in tasks:
+                task.cancel()
+            logger.error(f"[文档分析] 文档解析失败: {file_name} - {e}")
+            return {"success": False, "error": f"解析失败: {str(e)}"}
+        
+        reading_done = True
+        if first_chunk is None:
+            return {"success": False, "error": "文档内容为空"}
+        
+        if not tasks:
+            content = first_chunk["text"]
+            chunk_count = 1
+        else:
+            chunk_count = len(tasks)
+            await report()
+            findings = await asyncio.gather(*tasks)
+            labelled = [f"{label}\n{finding}" for label, finding in zip(labels, findings)]
+            merged = await self._reduce(file_name, labelled, semaphore)
+            content = (
+                f"（原文约{total_chars}字，共{chunk_count}部分，以下为逐部分提取的要点）\n\n{merged}"
+            )
+            logger.info(
+                f"[文档分析] {file_name} 分块分析完成: {chunk_count} 块, "
+                f"{total_chars} 字, 耗时 {time.perf_counter() - start:.1f}s"
+            )
+        
+        prompt = build_prompt(file_name, content)
+        try:
+            response = await asyncio.wait_for(
+                self._llm(prompt, system_prompt, "document_analysis", max_tokens, use_advanced=True),
+                timeout=final_timeout
+            )
+        except asyncio.TimeoutError:
+            return {"success": False, "error": "timeout", "chunks": chunk_count, "chars": total_chars}
+        
+        return {"success": True, "content": response, "chunks": chunk_count, "chars": total_chars}
+
+
+# 全局实例
+document_analyzer = DocumentAnalyzer()
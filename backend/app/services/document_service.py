@@ -1,17 +1,42 @@
 """
 文档处理服务
 负责解析 Word, PDF, TXT 等文档内容，赋予 Maria "阅读" 能力
+
+大文档采用流式读取：按页/段落逐块产出文本，在线程池中解析，按token预算切分成分块，
+供 DocumentAnalyzer 边读边分析，不再整篇载入后截断
+
+解析结果按文件内容 sha256 缓存（ParsedDocumentCache），同一文件再次读取时跳过解析
 """
 import os
 import io
-from typing import Optional, Dict, Any
+import asyncio
+import threading
+from typing import Optional, Dict, Any, Iterator, Tuple, AsyncIterator
 from loguru import logger
 
+from app.core.config import settings
+from app.services.parsed_document_cache import parsed_document_cache
+
+TEXT_EXTENSIONS = [".txt", ".md", ".csv", ".json", ".log", ".py", ".js", ".html"]
+
+# 单次整篇读取的字符上限（read_document 使用）
+MAX_DOCUMENT_CHARS = 50000
+
+
+def estimate_tokens(text: str) -> int:
+    """估算token数（与 app.core.llm.estimate_tokens 口径一致）"""
+    if not text:
+        return 0
+    chinese_chars = sum(1 for c in text if '\u4e00' <= c <= '\u9fff')
+    other_chars = len(text) - chinese_chars
+    return max(1, int(chinese_chars / 1.5 + other_chars / 4))
+
+
 class DocumentService:
-    
+
     def __init__(self):
         pass
-
+    
     async def read_document(self, filepath: str, filename: str) -> Dict[str, Any]:
         """
         读取文档内容
@@ -19,7 +44,7 @@ class DocumentService:
         Args:
             filepath: 文件本地路径
             filename: 原始文件名
-            
+        
         Returns:
             {
                 "success": bool,
@@ -32,52 +57,284 @@ class DocumentService:
             return {"success": False, "error": "文件不存在"}
         
         ext = os.path.splitext(filename)[1].lower()
+        if ext not in [".docx", ".doc", ".pdf"] + TEXT_EXTENSIONS:
+            return {"success": False, "error": f"不支持的文件格式: {ext}"}
+        
+        # 读到上限就停止解析，超长文档不必整篇解析完
+        result = await self.parse_document(filepath, filename, max_chars=MAX_DOCUMENT_CHARS)
+        if not result["success"]:
+            return result
+        return self._truncated(result)
+    
+    async def read_cached(self, content_hash: str, filename: str) -> Dict[str, Any]:
+        """
+        按内容哈希读取已缓存的文档（无需原文件），返回格式同 read_document
+        """
+        record = await parsed_document_cache.get(content_hash)
+        if not record:
+            return {"success": False, "error": "缓存不存在"}
+        return self._truncated({
+            "success": True,
+            "content": record["text"],
+            "type": os.path.splitext(filename)[1].lower(),
+            "content_hash": content_hash,
+            "cached": True
+        })
+    
+    @staticmethod
+    def _truncated(result: Dict[str, Any]) -> Dict[str, Any]:
+        """限制整篇读取的长度，避免 Token 溢出；完整分析请使用 stream_chunks"""
+        content = result["content"]
+        if len(content) > MAX_DOCUMENT_CHARS:
+            content = content[:MAX_DOCUMENT_CHARS] + "\n\n...(文档过长，已截断)..."
+        return {**result, "content": content, "length": len(content)}
+    
+    async def parse_document(
+        self,
+        filepath: str,
+        filename: str,
+        max_chars: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        解析文档（优先命中内容哈希缓存）
+        
+        Args:
+            max_chars: 读到该字符数后停止解析（未读完的文档不写入缓存）；默认读完整篇
         
+        Returns:
+            {"success": bool, "content": 全文, "type": 扩展名, "content_hash": str, "cached": bool, "error": str}
+        """
+        ext = os.path.splitext(filename)[1].lower()
         try:
-            content = ""
+            # 解析是CPU密集的同步操作，放到线程池避免阻塞事件循环
+            loop = asyncio.get_event_loop()
+            info: Dict[str, Any] = {}
             
-            if ext in [".docx", ".doc"]:
-                content = self._read_docx(filepath)
-            elif ext == ".pdf":
-                content = self._read_pdf(filepath)
-            elif ext in [".txt", ".md", ".csv", ".json", ".log", ".py", ".js", ".html"]:
-                content = self._read_text(filepath)
-            else:
-                return {"success": False, "error": f"不支持的文件格式: {ext}"}
+            def collect():
+                parts = []
+                total = 0
+                units = self._iter_units_cached(filepath, filename, info)
+                try:
+                    for _, text in units:
+                        parts.append(text)
+                        total += len(text) + 1
+                        if max_chars and total > max_chars:
+                            break
+                finally:
+                    # 提前停止时立即关闭生成器，释放已打开的文件
+                    units.close()
+                return parts
             
-            # 限制内容长度，避免 Token 溢出 (例如限制前 50000 字符)
-            # 如果需要处理超长文档，可能需要 RAG 分块，这里先做简单截断
-            if len(content) > 50000:
-                content = content[:50000] + "\n\n...(文档过长，已截断)..."
-                
+            parts = await loop.run_in_executor(None, collect)
+            await self._register_parsed(info, filename, filepath)
             return {
                 "success": True,
-                "content": content,
+                "content": "\n".join(parts),
                 "type": ext,
-                "length": len(content)
+                "content_hash": info.get("content_hash"),
+                "cached": info.get("cached", False)
             }
-            
+        
         except Exception as e:
             logger.error(f"文档解析失败: {filename} - {e}")
             return {"success": False, "error": f"解析失败: {str(e)}"}
-
+    
+    async def _register_parsed(self, info: Dict[str, Any], filename: str, filepath: str):
+        """新解析的文档登记数据库索引；命中缓存的更新访问统计"""
+        if info.get("saved"):
+            await parsed_document_cache.register(
+                info["content_hash"], filename, info["chars"], info["pages"],
+                file_size=os.path.getsize(filepath) if os.path.exists(filepath) else 0
+            )
+        elif info.get("cached"):
+            await parsed_document_cache.touch(info["content_hash"])
+    
+    def _iter_units_cached(
+        self,
+        filepath: str,
+        filename: str,
+        info: Dict[str, Any]
+    ) -> Iterator[Tuple[int, str]]:
+        """
+        带缓存的 iter_units：命中时从缓存回放；未命中时边解析边记录，完整读完后写入缓存
+        
+        info 回填 content_hash / cached / saved / chars / pages，供调用方登记索引
+        """
+        content_hash = parsed_document_cache.hash_file(filepath)
+        info["content_hash"] = content_hash
+        
+        record = parsed_document_cache.load(content_hash)
+        if record:
+            info["cached"] = True
+            cached_text = record["text"]
+            pages = record["pages"]
+            for i, (page_no, start) in enumerate(pages):
+                end = pages[i + 1][1] - 1 if i + 1 < len(pages) else len(cached_text)
+                segment = cached_text[start:end]
+                if page_no:
+                    yield page_no, segment
+                else:
+                    for line in segment.split("\n"):
+                        yield 0, line
+            return
+        
+        parts = []
+        pages = []
+        offset = 0
+        for page_no, unit in self.iter_units(filepath, filename):
+            if not pages or pages[-1][0] != page_no or page_no:
+                pages.append([page_no, offset])
+            parts.append(unit)
+            offset += len(unit) + 1
+            yield page_no, unit
+        
+        # 只有完整读完才写入缓存，避免缓存半篇文档
+        full_text = "\n".join(parts)
+        try:
+            parsed_document_cache.save(content_hash, filename, full_text, pages)
+            info.update(saved=True, chars=len(full_text), pages=len(pages))
+        except OSError as e:
+            logger.warning(f"[文档缓存] 写入失败: {e}")
+    
+    def iter_units(self, filepath: str, filename: str) -> Iterator[Tuple[int, str]]:
+        """
+        按页/段落逐块产出文档文本
+        
+        Yields:
+            (页码, 文本)；页码仅对 PDF 有意义，其他格式为 0
+        """
+        ext = os.path.splitext(filename)[1].lower()
+        if ext in [".docx", ".doc"]:
+            yield from self._iter_docx(filepath)
+        elif ext == ".pdf":
+            yield from self._iter_pdf(filepath)
+        elif ext in TEXT_EXTENSIONS:
+            for line in self._read_text(filepath).splitlines():
+                yield 0, line
+        else:
+            raise ValueError(f"不支持的文件格式: {ext}")
+    
+    def iter_chunks(
+        self,
+        filepath: str,
+        filename: str,
+        max_tokens: Optional[int] = None,
+        info: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        按token预算切分文档（尽量在段落/页边界切分）
+        
+        Yields:
+            {"index": 分块序号, "text": 文本, "page_start": 起始页, "page_end": 结束页, "tokens": 估算token数}
+        """
+        max_tokens = max_tokens or settings.DOCUMENT_CHUNK_TOKENS
+        buffer = []
+        buffer_tokens = 0
+        page_start = page_end = 0
+        index = 0
+        
+        def make_chunk():
+            return {
+                "index": index,
+                "text": "\n".join(buffer),
+                "page_start": page_start,
+                "page_end": page_end,
+                "tokens": buffer_tokens
+            }
+        
+        for page, text in self._iter_units_cached(filepath, filename, info if info is not None else {}):
+            if not text.strip():
+                continue
+            tokens = estimate_tokens(text)
+            
+            # 单个段落超出预算时按字符硬切
+            pieces = [text]
+            if tokens > max_tokens:
+                step = max(1, int(len(text) * max_tokens / tokens))
+                pieces = [text[i:i + step] for i in range(0, len(text), step)]
+            
+            for piece in pieces:
+                piece_tokens = estimate_tokens(piece)
+                if buffer and buffer_tokens + piece_tokens > max_tokens:
+                    yield make_chunk()
+                    index += 1
+                    buffer = []
+                    buffer_tokens = 0
+                if not buffer:
+                    page_start = page
+                buffer.append(piece)
+                buffer_tokens += piece_tokens
+                page_end = page
+        
+        if buffer:
+            yield make_chunk()
+    
+    async def stream_chunks(
+        self,
+        filepath: str,
+        filename: str,
+        max_tokens: Optional[int] = None,
+        prefetch: int = 4
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        异步流式产出分块：后台线程解析，队列满时阻塞解析线程（背压），
+        调用方可以在后续页面仍在解析时开始处理已产出的分块
+        """
+        loop = asyncio.get_event_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+        done = object()
+        cancelled = threading.Event()
+        info: Dict[str, Any] = {}
+        
+        def produce():
+            try:
+                for chunk in self.iter_chunks(filepath, filename, max_tokens, info):
+                    if cancelled.is_set():
+                        return
+                    asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+                asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+            except Exception as e:
+                if not cancelled.is_set():
+                    asyncio.run_coroutine_threadsafe(queue.put(e), loop).result()
+        
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            # 释放可能阻塞在 put 上的解析线程
+            while not queue.empty():
+                queue.get_nowait()
+            await producer
+            await self._register_parsed(info, filename, filepath)
+    
     def _read_docx(self, filepath: str) -> str:
         """解析 Word 文档"""
+        return '\n'.join(text for _, text in self._iter_docx(filepath))
+    
+    def _iter_docx(self, filepath: str) -> Iterator[Tuple[int, str]]:
+        """逐段落产出 Word 文档文本"""
         # 先尝试用 python-docx 读取 (适用于 .docx)
         try:
             import docx
             doc = docx.Document(filepath)
-            full_text = []
-            for para in doc.paragraphs:
-                full_text.append(para.text)
-            return '\n'.join(full_text)
         except ImportError:
             raise ImportError("请安装 python-docx 库")
         except Exception as e:
             # 如果失败且是 .doc 文件，尝试用 antiword
             if filepath.endswith(".doc") or "Package not found" in str(e) or "not a valid" in str(e).lower():
-                return self._read_doc_with_antiword(filepath)
+                for line in self._read_doc_with_antiword(filepath).splitlines():
+                    yield 0, line
+                return
             raise e
+        for para in doc.paragraphs:
+            yield 0, para.text
     
     def _read_doc_with_antiword(self, filepath: str) -> str:
         """使用 antiword 解析旧版 .doc 文件"""
@@ -109,26 +366,28 @@ class DocumentService:
             
             # 都失败了，提示用户
             raise ValueError("无法读取 .doc 文件内容，请另存为 .docx 格式后重试")
-            
+        
         except FileNotFoundError:
             raise ValueError("服务器缺少 antiword/catdoc 工具，无法处理旧版 .doc 文件")
         except subprocess.TimeoutExpired:
             raise ValueError("处理 .doc 文件超时")
         except Exception as e:
             raise ValueError(f"解析 .doc 文件失败: {e}")
-
+    
     def _read_pdf(self, filepath: str) -> str:
         """解析 PDF 文档"""
+        return "".join(text + "\n" for _, text in self._iter_pdf(filepath))
+    
+    def _iter_pdf(self, filepath: str) -> Iterator[Tuple[int, str]]:
+        """逐页产出 PDF 文本（页面按需解析，不整篇加载）"""
         try:
             from pypdf import PdfReader
-            reader = PdfReader(filepath)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
         except ImportError:
             raise ImportError("请安装 pypdf 库")
-
+        reader = PdfReader(filepath)
+        for page_no, page in enumerate(reader.pages, start=1):
+            yield page_no, page.extract_text() or ""
+    
     def _read_text(self, filepath: str) -> str:
         """解析纯文本文件"""
         try:
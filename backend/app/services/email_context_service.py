@@ -45,7 +45,8 @@ class EmailContextService:
         attachment_name: str,
         attachment_content: str,
         analysis_result: str,
-        doc_type: str = "general"
+        doc_type: str = "general",
+        content_hash: Optional[str] = None
     ) -> bool:
         """
         保存邮件上下文
@@ -60,6 +61,7 @@ class EmailContextService:
             attachment_content: 附件内容（截取前部分）
             analysis_result: AI分析结果
             doc_type: 文档类型 (contract/invoice/logistics/general)
+            content_hash: 附件内容哈希（关联已解析文档缓存，再次分析时免下载解析）
         
         Returns:
             是否成功
@@ -83,18 +85,22 @@ class EmailContextService:
                         UNIQUE(user_id, email_id, attachment_name)
                     )
                 """))
+                await db.execute(text("""
+                    ALTER TABLE email_context ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)
+                """))
                 
                 # 插入或更新
                 await db.execute(
                     text("""
                         INSERT INTO email_context 
                         (user_id, email_id, subject, from_address, from_name, 
-                         attachment_name, attachment_content, analysis_result, doc_type, created_at)
+                         attachment_name, attachment_content, analysis_result, doc_type, content_hash, created_at)
                         VALUES (:user_id, :email_id, :subject, :from_address, :from_name,
-                                :attachment_name, :attachment_content, :analysis_result, :doc_type, NOW())
+                                :attachment_name, :attachment_content, :analysis_result, :doc_type, :content_hash, NOW())
                         ON CONFLICT (user_id, email_id, attachment_name) 
                         DO UPDATE SET 
                             analysis_result = :analysis_result,
+                            content_hash = COALESCE(:content_hash, email_context.content_hash),
                             created_at = NOW()
                     """),
                     {
@@ -106,7 +112,8 @@ class EmailContextService:
                         "attachment_name": attachment_name,
                         "attachment_content": attachment_content[:10000],  # 限制长度
                         "analysis_result": analysis_result[:20000],  # 限制长度
-                        "doc_type": doc_type
+                        "doc_type": doc_type,
+                        "content_hash": content_hash
                     }
                 )
                 await db.commit()
@@ -142,7 +149,7 @@ class EmailContextService:
                         text("""
                             SELECT email_id, subject, from_address, from_name, 
                                    attachment_name, attachment_content, analysis_result, 
-                                   doc_type, created_at
+                                   doc_type, created_at, content_hash
                             FROM email_context
                             WHERE user_id = :user_id 
                               AND doc_type = :doc_type
@@ -157,7 +164,7 @@ class EmailContextService:
                         text("""
                             SELECT email_id, subject, from_address, from_name, 
                                    attachment_name, attachment_content, analysis_result, 
-                                   doc_type, created_at
+                                   doc_type, created_at, content_hash
                             FROM email_context
                             WHERE user_id = :user_id 
                               AND created_at > NOW() - INTERVAL ':hours hours'
@@ -179,7 +186,8 @@ class EmailContextService:
                         "attachment_content": row[5],
                         "analysis_result": row[6],
                         "doc_type": row[7],
-                        "created_at": row[8].isoformat() if row[8] else None
+                        "created_at": row[8].isoformat() if row[8] else None,
+                        "content_hash": row[9]
                     })
                 
                 return contexts
@@ -285,12 +293,21 @@ class EmailContextService:
         if not context:
             return None
         
+        # 附件已解析缓存时取缓存全文（数据库里只存了前1万字）
+        attachment_content = context['attachment_content'] or ""
+        if context.get('content_hash'):
+            from app.services.parsed_document_cache import parsed_document_cache
+            record = await parsed_document_cache.get(context['content_hash'])
+            if record:
+                attachment_content = record["text"]
+        
         # 构建上下文提示
         prompt = f"""
 📧 **相关邮件上下文（自动注入）**
 
-用户正在引用之前处理过的邮件附件：
+用户正在引用之前处理过的邮件附件（如需重新分析，调用附件分析工具时传入邮件ID，可直接复用已解析内容）：
 
+- **邮件ID**: {context['email_id']}
 - **邮件主题**: {context['subject']}
 - **发件人**: {context['from_name']} <{context['from_address']}>
 - **附件名称**: {context['attachment_name']}
@@ -298,7 +315,7 @@ class EmailContextService:
 - **处理时间**: {context['created_at']}
 
 **附件内容摘要**:
-{context['attachment_content'][:5000]}
+{attachment_content[:5000]}
 
 **之前的分析结果**:
 {context['analysis_result'][:5000]}
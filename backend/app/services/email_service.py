@@ -89,7 +89,7 @@ class EmailService:
         Args:
             language: 语言 'zh' 中文, 'en' 英文
         """
-        from app.models.database import async_session_maker
+        from app.services.company_profile import company_profile
         import json
         
         # 标签文字（中英文）
@@ -125,107 +125,88 @@ class EmailService:
         default_text = f"\n\n---\n{self.sender_name}\n{lang_labels['email']}：{self.smtp_user}\n"
         
         try:
-            # 获取SMTP配置中的邮件Logo
-            email_logo = ""
-            try:
-                result = await async_session_maker().execute(
-                    text("SELECT value FROM system_settings WHERE key = 'smtp'")
-                )
-                smtp_row = result.fetchone()
-                if smtp_row and smtp_row[0]:
-                    smtp_config = smtp_row[0] if isinstance(smtp_row[0], dict) else json.loads(smtp_row[0])
-                    email_logo = smtp_config.get("email_logo", "")
-            except:
-                pass
+            profile = await company_profile.get()
             
-            async with async_session_maker() as db:
-                # 获取公司配置
-                result = await db.execute(
-                    text("""SELECT company_name, contact_phone, contact_email, contact_wechat, 
-                                   address, company_website, brand_slogan, brand_assets
-                            FROM company_config LIMIT 1""")
-                )
-                row = result.fetchone()
+            if "company_name" in profile:
+                email_logo = profile.get("email_logo") or ""
+                company_name = profile.get("company_name") or ""
+                contact_phone = profile.get("contact_phone") or ""
+                contact_email = profile.get("contact_email") or self.smtp_user
+                contact_wechat = profile.get("contact_wechat") or ""
+                address = profile.get("address") or ""
+                company_website = profile.get("company_website") or ""
+                brand_slogan = profile.get("brand_slogan") or ""
+                # 从 brand_assets 获取微信二维码
+                brand_assets = profile.get("brand_assets") or {}
+                if isinstance(brand_assets, str):
+                    brand_assets = json.loads(brand_assets)
+                wechat_qrcode = brand_assets.get("qrcode", {}).get("wechat", "")
                 
-                if row:
-                    company_name = row[0] or ""
-                    contact_phone = row[1] or ""
-                    contact_email = row[2] or self.smtp_user
-                    contact_wechat = row[3] or ""
-                    address = row[4] or ""
-                    company_website = row[5] or ""
-                    brand_slogan = row[6] or ""
-                    # 从 brand_assets 获取微信二维码
-                    brand_assets = row[7] if row[7] else {}
-                    if isinstance(brand_assets, str):
-                        brand_assets = json.loads(brand_assets)
-                    wechat_qrcode = brand_assets.get("qrcode", {}).get("wechat", "")
-                    
-                    # 构建 HTML 签名
-                    html_parts = [
-                        '<div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #e0e0e0; font-size: 13px; color: #666; font-family: Arial, sans-serif;">'
-                    ]
-                    
-                    # Logo显示在最上方
-                    if email_logo:
-                        html_parts.append(f'<p style="margin: 0 0 15px 0;"><img src="{email_logo}" alt="Logo" style="max-height: 80px; width: auto;" /></p>')
-                    
-                    if brand_slogan:
-                        html_parts.append(f'<p style="margin: 0 0 10px 0; color: #333; font-style: italic;">"{brand_slogan}"</p>')
-                    
-                    html_parts.append(f'<p style="margin: 5px 0; font-size: 14px;"><strong style="color: #333;">{self.sender_name}</strong></p>')
-                    
-                    if company_name:
-                        html_parts.append(f'<p style="margin: 5px 0;">{company_name}</p>')
-                    
-                    # 地址
-                    if address:
-                        html_parts.append(f'<p style="margin: 5px 0;">{lang_labels["address"]}：{address}</p>')
-                    
-                    # 电话
-                    if contact_phone:
-                        html_parts.append(f'<p style="margin: 5px 0;">{lang_labels["phone"]}：{contact_phone}</p>')
-                    
-                    # 邮箱
-                    if contact_email:
-                        html_parts.append(f'<p style="margin: 5px 0;">{lang_labels["email"]}：{contact_email}</p>')
-                    
-                    # 官网
-                    if company_website:
-                        html_parts.append(f'<p style="margin: 5px 0;">{lang_labels["website"]}：<a href="{company_website}" style="color: #0066cc;">{company_website}</a></p>')
-                    
-                    # 微信号
-                    if contact_wechat:
-                        html_parts.append(f'<p style="margin: 5px 0;">{lang_labels["wechat"]}：{contact_wechat}</p>')
-                    
-                    # 二维码放最下面
-                    if wechat_qrcode:
-                        html_parts.append(f'<p style="margin: 10px 0;"><img src="{wechat_qrcode}" alt="WeChat QR Code" style="max-width: 120px; height: auto;" /></p>')
-                    
-                    html_parts.append('</div>')
-                    
-                    # 构建纯文本签名
-                    text_parts = ["\n\n---"]
-                    if brand_slogan:
-                        text_parts.append(f'"{brand_slogan}"')
-                    text_parts.append(f"{self.sender_name}")
-                    if company_name:
-                        text_parts.append(company_name)
-                    if address:
-                        text_parts.append(f"{lang_labels['address']}：{address}")
-                    if contact_phone:
-                        text_parts.append(f"{lang_labels['phone']}：{contact_phone}")
-                    if contact_email:
-                        text_parts.append(f"{lang_labels['email']}：{contact_email}")
-                    if company_website:
-                        text_parts.append(f"{lang_labels['website']}：{company_website}")
-                    if contact_wechat:
-                        text_parts.append(f"{lang_labels['wechat']}：{contact_wechat}")
+                # 构建 HTML 签名
+                html_parts = [
+                    '<div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #e0e0e0; font-size: 13px; color: #666; font-family: Arial, sans-serif;">'
+                ]
                     
-                    return {
-                        "html": "\n".join(html_parts),
-                        "text": "\n".join(text_parts)
-                    }
+                # Logo显示在最上方
+                if email_logo:
+                    html_parts.append(f'<p style="margin: 0 0 15px 0;"><img src="{email_logo}" alt="Logo" style="max-height: 80px; width: auto;" /></p>')
+                
+                if brand_slogan:
+                    html_parts.append(f'<p style="margin: 0 0 10px 0; color: #333; font-style: italic;">"{brand_slogan}"</p>')
+                
+                html_parts.append(f'<p style="margin: 5px 0; font-size: 14px;"><strong style="color: #333;">{self.sender_name}</strong></p>')
+                
+                if company_name:
+                    html_parts.append(f'<p style="margin: 5px 0;">{company_name}</p>')
+                
+                # 地址
+                if address:
+                    html_parts.append(f'<p style="margin: 5px 0;">{lang_labels["address"]}：{address}</p>')
+                
+                # 电话
+                if contact_phone:
+                    html_parts.append(f'<p style="margin: 5px 0;">{lang_labels["phone"]}：{contact_phone}</p>')
+                
+                # 邮箱
+                if contact_email:
+                    html_parts.append(f'<p style="margin: 5px 0;">{lang_labels["email"]}：{contact_email}</p>')
+                
+                # 官网
+                if company_website:
+                    html_parts.append(f'<p style="margin: 5px 0;">{lang_labels["website"]}：<a href="{company_website}" style="color: #0066cc;">{company_website}</a></p>')
+                
+                # 微信号
+                if contact_wechat:
+                    html_parts.append(f'<p style="margin: 5px 0;">{lang_labels["wechat"]}：{contact_wechat}</p>')
+                
+                # 二维码放最下面
+                if wechat_qrcode:
+                    html_parts.append(f'<p style="margin: 10px 0;"><img src="{wechat_qrcode}" alt="WeChat QR Code" style="max-width: 120px; height: auto;" /></p>')
+                
+                html_parts.append('</div>')
+                
+                # 构建纯文本签名
+                text_parts = ["\n\n---"]
+                if brand_slogan:
+                    text_parts.append(f'"{brand_slogan}"')
+                text_parts.append(f"{self.sender_name}")
+                if company_name:
+                    text_parts.append(company_name)
+                if address:
+                    text_parts.append(f"{lang_labels['address']}：{address}")
+                if contact_phone:
+                    text_parts.append(f"{lang_labels['phone']}：{contact_phone}")
+                if contact_email:
+                    text_parts.append(f"{lang_labels['email']}：{contact_email}")
+                if company_website:
+                    text_parts.append(f"{lang_labels['website']}：{company_website}")
+                if contact_wechat:
+                    text_parts.append(f"{lang_labels['wechat']}：{contact_wechat}")
+                
+                return {
+                    "html": "\n".join(html_parts),
+                    "text": "\n".join(text_parts)
+                }
         except Exception as e:
             logger.warning(f"获取邮件签名失败: {e}")
         
@@ -490,21 +471,10 @@ class EmailService:
             return None
     
     async def _get_company_name(self) -> str:
-        """获取公司名称（从配置中）"""
-        from app.models.database import async_session_maker
-        
-        try:
-            async with async_session_maker() as db:
-                result = await db.execute(
-                    text("SELECT company_name FROM company_config LIMIT 1")
-                )
-                row = result.fetchone()
-                if row and row[0]:
-                    return row[0]
-        except Exception as e:
-            logger.warning(f"获取公司名称失败: {e}")
+        """获取公司名称（从公司资料缓存中）"""
+        from app.services.company_profile import company_profile
         
-        return self.default_company_name
+        return await company_profile.company_name(self.default_company_name)
     
     async def send_customer_email(
         self,
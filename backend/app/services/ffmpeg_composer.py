@@ -0,0 +1,751 @@
+"""
+ffmpeg 原生视频合成引擎
+负责：用单个 ffmpeg filtergraph 完成片段拼接（xfade转场）、字幕烧录（ASS）、配音+背景音乐混音
+
+相比 moviepy 逐帧解码/合成，整条流水线在 ffmpeg 内部完成，
+不支持的效果（未知转场、缺少 libass 等）由调用方回退到 moviepy。
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+from loguru import logger
+
+from app.core.config import settings
+from app.services.video_segment_cache import SegmentCache, segment_cache
+
+
+# 业务转场名称 → ffmpeg xfade 转场
+XFADE_TRANSITIONS = {
+    "cross_dissolve": "dissolve",
+    "dissolve": "dissolve",
+    "fade": "fade",
+    "fade_in": "fade",
+    "fade_out": "fade",
+    "wipe": "wipeleft",
+    "wipe_left": "wipeleft",
+    "wipe_right": "wiperight",
+    "slide": "slideleft",
+    "slide_left": "slideleft",
+    "slide_right": "slideright",
+    "circle": "circleopen",
+}
+
+# 可选的 x264 编码预设
+ENCODE_PRESETS = (
+    "ultrafast", "superfast", "veryfast", "faster", "fast",
+    "medium", "slow", "slower", "veryslow",
+)
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_VIDEO_SIZE_RE = re.compile(r"Stream #.*?Video:.*?(\d{2,5})x(\d{2,5})")
+
+
+class UnsupportedEffect(Exception):
+    """当前 ffmpeg 引擎无法实现的效果，调用方应回退到 moviepy"""
+    pass
+
+
+@lru_cache()
+def get_ffmpeg_binary() -> Optional[str]:
+    """查找 ffmpeg 可执行文件（系统安装优先，其次 imageio-ffmpeg 自带）"""
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+@lru_cache()
+def get_available_filters() -> frozenset:
+    """获取当前 ffmpeg 构建支持的滤镜列表"""
+    binary = get_ffmpeg_binary()
+    if not binary:
+        return frozenset()
+    try:
+        result = subprocess.run(
+            [binary, "-hide_banner", "-filters"],
+            capture_output=True,
+            text=True,
+            timeout=15
+        )
+        names = set()
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            # 格式: " TSC xfade  VV->V  Cross fade ..."
+            if len(parts) >= 3 and "->" in parts[2]:
+                names.add(parts[1])
+        return frozenset(names)
+    except Exception as e:
+        logger.warning(f"[ffmpeg] 获取滤镜列表失败: {e}")
+        return frozenset()
+
+
+class FFmpegComposer:
+    """ffmpeg filtergraph 视频合成器（同步执行，由调用方放入线程池）"""
+    
+    def __init__(
+        self,
+        preset: Optional[str] = None,
+        threads: Optional[int] = None,
+        fps: int = 24,
+        crf: int = 23
+    ):
+        preset = preset or settings.VIDEO_ENCODE_PRESET
+        self.preset = preset if preset in ENCODE_PRESETS else "veryfast"
+        # 0 表示由 ffmpeg 根据CPU核数自动决定，不绑定具体硬件
+        self.threads = settings.VIDEO_ENCODE_THREADS if threads is None else threads
+        self.fps = fps
+        self.crf = crf
+    
+    @property
+    def available(self) -> bool:
+        """ffmpeg 是否可用"""
+        return get_ffmpeg_binary() is not None
+    
+    # ========== 媒体探测 ==========
+    
+    def probe(self, path: str) -> Dict[str, Any]:
+        """
+        探测媒体时长与画面尺寸
+        
+        解析 `ffmpeg -i` 的输出，避免依赖单独的 ffprobe
+        """
+        result = subprocess.run(
+            [get_ffmpeg_binary(), "-hide_banner", "-i", path],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+        info = result.stderr
+        
+        duration = 0.0
+        match = _DURATION_RE.search(info)
+        if match:
+            hours, minutes, seconds = match.groups()
+            duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+        
+        width, height = 0, 0
+        match = _VIDEO_SIZE_RE.search(info)
+        if match:
+            width, height = int(match.group(1)), int(match.group(2))
+        
+        return {
+            "duration": duration,
+            "width": width,
+            "height": height,
+            "has_audio": "Audio:" in info,
+        }
+    
+    # ========== 字幕 ==========
+    
+    @staticmethod
+    def _ass_time(seconds: float) -> str:
+        """秒 → ASS 时间格式 H:MM:SS.cc"""
+        centis = int(round(max(seconds, 0) * 100))
+        hours, centis = divmod(centis, 360000)
+        minutes, centis = divmod(centis, 6000)
+        secs, centis = divmod(centis, 100)
+        return f"{hours}:{minutes:02d}:{secs:02d}.{centis:02d}"
+    
+    def write_ass_subtitles(
+        self,
+        subtitles: List[str],
+        duration: float,
+        width: int,
+        height: int,
+        output_path: str,
+        font_size: int = 42,
+        margin_bottom: int = 100,
+        fade_ms: int = 200
+    ) -> Optional[str]:
+        """
+        生成 ASS 字幕文件，字幕按视频时长均分（与 moviepy 方案一致）
+        
+        Returns:
+            字幕文件路径；没有有效字幕时返回 None
+        """
+        if not subtitles or duration <= 0:
+            return None
+        
+        time_per_subtitle = duration / len(subtitles)
+        events = []
+        for i, line in enumerate(subtitles):
+            if not line:
+                continue
+            # ASS 中花括号为控制符，换行用 \N
+            safe = line.replace("{", "(").replace("}", ")").replace("\r", "").replace("\n", "\\N")
+            start = self._ass_time(i * time_per_subtitle)
+            end = self._ass_time((i + 1) * time_per_subtitle)
+            events.append(
+                f"Dialogue: 0,{start},{end},Default,,0,0,0,,{{\\fad({fade_ms},{fade_ms})}}{safe}"
+            )
+        
+        if not events:
+            return None
+        
+        font_name = settings.VIDEO_SUBTITLE_FONT
+        header = [
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            f"PlayResX: {width}",
+            f"PlayResY: {height}",
+            "WrapStyle: 0",
+            "ScaledBorderAndShadow: yes",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+            "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+            "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+            f"Style: Default,{font_name},{font_size},&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,"
+            f"0,0,0,0,100,100,0,0,1,2,0,2,60,60,{margin_bottom},1",
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+        ]
+        
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(header + events) + "\n")
+        return output_path
+    
+    @staticmethod
+    def _escape_filter_path(path: str) -> str:
+        """转义 filtergraph 参数中的文件路径"""
+        return path.replace("\\", "\\\\").replace(":", "\\:").replace("'", "\\'")
+    
+    @staticmethod
+    @contextmanager
+    def _job_dir(work_dir: Optional[str], output_path: str):
+        """每次合成独立的临时目录（字幕、拼接列表等中间文件），结束后删除，避免并发任务互相覆盖"""
+        parent = work_dir or os.path.dirname(os.path.abspath(output_path))
+        path = tempfile.mkdtemp(prefix="ffmpeg_job_", dir=parent)
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+    
+    # ========== 合成 ==========
+    
+    def _check_filters(self, *names: str):
+        """检查所需滤镜是否可用，否则抛出 UnsupportedEffect"""
+        available = get_available_filters()
+        missing = [name for name in names if name not in available]
+        if missing:
+            raise UnsupportedEffect(f"ffmpeg缺少滤镜: {', '.join(missing)}")
+    
+    def compose(
+        self,
+        segment_paths: List[str],
+        output_path: str,
+        subtitles: Optional[List[str]] = None,
+        tts_path: Optional[str] = None,
+        bgm_path: Optional[str] = None,
+        transitions: Optional[List[str]] = None,
+        transition_duration: float = 0.3,
+        edge_fade: float = 0.5,
+        tts_volume: float = 1.0,
+        bgm_volume: float = 0.25,
+        bgm_volume_solo: float = 0.6,
+        font_size: int = 42,
+        margin_bottom: int = 100,
+        subtitle_fade_ms: int = 200,
+        work_dir: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        用单条 ffmpeg 命令合成视频
+        
+        Args:
+            segment_paths: 视频片段路径（单个片段即普通后期处理）
+            output_path: 输出路径
+            subtitles: 字幕列表（按总时长均分）
+            tts_path: 配音音频
+            bgm_path: 背景音乐（-stream_loop 循环至视频长度）
+            transitions: 每个片段的出场转场名称
+            transition_duration: 片段间 xfade 时长
+            edge_fade: 首尾淡入淡出时长
+            tts_volume / bgm_volume / bgm_volume_solo: 配音音量、有配音时BGM音量、无配音时BGM音量
+            font_size / margin_bottom / subtitle_fade_ms: 字幕字号、底部边距、淡入淡出毫秒
+        
+        Raises:
+            UnsupportedEffect: 需要回退到 moviepy 的情况
+        """
+        if not self.available:
+            raise UnsupportedEffect("ffmpeg不可用")
+        
+        segment_paths = [p for p in segment_paths if os.path.exists(p)]
+        if not segment_paths:
+            return {"status": "error", "message": "没有有效的视频片段"}
+        
+        # 解析转场，任一未知转场则整体回退
+        xfades = []
+        if len(segment_paths) > 1:
+            self._check_filters("xfade")
+            names = list(transitions or [])
+            for i in range(len(segment_paths) - 1):
+                name = names[i] if i < len(names) and names[i] else "cross_dissolve"
+                xfade = XFADE_TRANSITIONS.get(name)
+                if not xfade:
+                    raise UnsupportedEffect(f"不支持的转场: {name}")
+                xfades.append(xfade)
+        
+        probes = [self.probe(p) for p in segment_paths]
+        if any(p["duration"] <= 0 for p in probes):
+            raise UnsupportedEffect("无法探测片段时长")
+        
+        # 统一到第一个片段的分辨率（偶数尺寸满足 yuv420p）
+        width = (probes[0]["width"] or 1280) // 2 * 2
+        height = (probes[0]["height"] or 720) // 2 * 2
+        
+        # 片段过短时缩小转场时长，保证 offset 单调
+        shortest = min(p["duration"] for p in probes)
+        overlap = min(transition_duration, shortest / 3) if xfades else 0.0
+        total_duration = sum(p["duration"] for p in probes) - overlap * len(xfades)
+        
+        cmd = [get_ffmpeg_binary(), "-hide_banner", "-y", "-loglevel", "error"]
+        for path in segment_paths:
+            cmd += ["-i", path]
+        
+        input_index = len(segment_paths)
+        tts_index = bgm_index = None
+        if tts_path and os.path.exists(tts_path):
+            cmd += ["-i", tts_path]
+            tts_index = input_index
+            input_index += 1
+        if bgm_path and os.path.exists(bgm_path):
+            cmd += ["-stream_loop", "-1", "-i", bgm_path]
+            bgm_index = input_index
+            input_index += 1
+        
+        filters = []
+        
+        # 1. 片段归一化：尺寸、帧率、像素格式
+        for i in range(len(segment_paths)):
+            filters.append(
+                f"[{i}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+                f"fps={self.fps},format=yuv420p[v{i}]"
+            )
+        
+        # 2. xfade 转场链
+        current = "v0"
+        offset = 0.0
+        for i, xfade in enumerate(xfades):
+            offset += probes[i]["duration"] - overlap
+            label = f"x{i + 1}"
+            filters.append(
+                f"[{current}][v{i + 1}]xfade=transition={xfade}:"
+                f"duration={overlap:.3f}:offset={offset:.3f}[{label}]"
+            )
+            current = label
+        
+        # 3. 首尾淡入淡出 + 字幕烧录
+        video_chain = []
+        if edge_fade > 0 and total_duration > edge_fade * 2:
+            video_chain.append(f"fade=t=in:st=0:d={edge_fade}")
+            video_chain.append(f"fade=t=out:st={total_duration - edge_fade:.3f}:d={edge_fade}")
+        
+        with self._job_dir(work_dir, output_path) as job_dir:
+            if subtitles:
+                ass_path = self.write_ass_subtitles(
+                    subtitles, total_duration, width, height,
+                    os.path.join(job_dir, "subtitles.ass"),
+                    font_size=font_size,
+                    margin_bottom=margin_bottom,
+                    fade_ms=subtitle_fade_ms
+                )
+                if ass_path:
+                    self._check_filters("subtitles")
+                    video_chain.append(f"subtitles=filename='{self._escape_filter_path(ass_path)}'")
+            
+            video_chain.append("format=yuv420p")
+            filters.append(f"[{current}]{','.join(video_chain)}[vout]")
+            
+            # 4. 音频：配音截断到视频长度，BGM循环后截断并调整音量；
+            #    没有配音和BGM时保留片段原声（与 moviepy 方案一致）
+            if tts_index is None and bgm_index is None and any(p["has_audio"] for p in probes):
+                audio_filters, audio_map = self._source_audio_graph(
+                    [i if p["has_audio"] else None for i, p in enumerate(probes)],
+                    [p["duration"] for p in probes],
+                    overlap
+                )
+            else:
+                audio_filters, audio_map = self._audio_graph(
+                    tts_index, bgm_index, total_duration, tts_volume, bgm_volume, bgm_volume_solo
+                )
+            filters += audio_filters
+            
+            cmd += ["-filter_complex", ";".join(filters), "-map", "[vout]"]
+            if audio_map:
+                cmd += ["-map", audio_map, "-c:a", "aac", "-b:a", "128k"]
+            
+            cmd += [
+                "-c:v", "libx264",
+                "-preset", self.preset,
+                "-crf", str(self.crf),
+                "-pix_fmt", "yuv420p",
+                "-r", str(self.fps),
+                "-threads", str(self.threads),
+                "-t", f"{total_duration:.3f}",
+                "-movflags", "+faststart",
+                output_path,
+            ]
+            
+            logger.info(
+                f"[ffmpeg] 合成 {len(segment_paths)} 个片段, 时长 {total_duration:.1f}s, "
+                f"preset={self.preset}, threads={self.threads or 'auto'}"
+            )
+            error = self._run(cmd)
+            if error:
+                return {"status": "error", "message": f"ffmpeg合成失败: {error[-200:]}"}
+            
+            return {
+                "status": "success",
+                "output_path": output_path,
+                "duration": total_duration,
+                "engine": "ffmpeg",
+            }
+    
+    def _audio_graph(
+        self,
+        tts_index: Optional[int],
+        bgm_index: Optional[int],
+        duration: float,
+        tts_volume: float,
+        bgm_volume: float,
+        bgm_volume_solo: float
+    ) -> Tuple[List[str], Optional[str]]:
+        """构建配音+背景音乐的音频滤镜，返回 (滤镜列表, 输出标签)"""
+        filters = []
+        audio_labels = []
+        if tts_index is not None:
+            filters.append(
+                f"[{tts_index}:a]atrim=0:{duration:.3f},asetpts=PTS-STARTPTS,"
+                f"volume={tts_volume}[tts]"
+            )
+            audio_labels.append("[tts]")
+        if bgm_index is not None:
+            volume = bgm_volume if tts_index is not None else bgm_volume_solo
+            filters.append(
+                f"[{bgm_index}:a]atrim=0:{duration:.3f},asetpts=PTS-STARTPTS,"
+                f"volume={volume}[bgm]"
+            )
+            audio_labels.append("[bgm]")
+        
+        if len(audio_labels) == 2:
+            self._check_filters("amix")
+            # normalize=0：保持各路设定音量，不按输入数平分
+            filters.append(f"{''.join(audio_labels)}amix=inputs=2:duration=longest:normalize=0[aout]")
+            return filters, "[aout]"
+        if audio_labels:
+            return filters, audio_labels[0]
+        return filters, None
+    
+    def _source_audio_graph(
+        self,
+        input_indices: List[Optional[int]],
+        durations: List[float],
+        overlap: float = 0.0
+    ) -> Tuple[List[str], Optional[str]]:
+        """
+        构建片段原声的音频滤镜，返回 (滤镜列表, 输出标签)
+        
+        每个片段的音轨补齐/截断到片段时长（没有音轨的片段用静音代替），
+        有转场重叠时用 acrossfade 与 xfade 对齐，否则直接拼接
+        """
+        self._check_filters("anullsrc", "apad", "atrim", "concat", "acrossfade")
+        filters = []
+        labels = []
+        for n, (index, duration) in enumerate(zip(input_indices, durations)):
+            source = f"[{index}:a]" if index is not None else "anullsrc=r=44100:cl=stereo,"
+            filters.append(
+                f"{source}aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo,"
+                f"apad,atrim=0:{duration:.3f},asetpts=PTS-STARTPTS[sa{n}]"
+            )
+            labels.append(f"[sa{n}]")
+        
+        if len(labels) == 1:
+            return filters, labels[0]
+        if overlap <= 0:
+            filters.append(f"{''.join(labels)}concat=n={len(labels)}:v=0:a=1[srcaudio]")
+            return filters, "[srcaudio]"
+        
+        current = labels[0]
+        for n, label in enumerate(labels[1:], start=1):
+            output = f"[sx{n}]"
+            filters.append(f"{current}{label}acrossfade=d={overlap:.3f}{output}")
+            current = output
+        return filters, current
+    
+    def _run(self, cmd: List[str]) -> Optional[str]:
+        """
+        执行 ffmpeg 命令
+        
+        Returns:
+            成功返回 None，失败返回错误输出
+        
+        Raises:
+            UnsupportedEffect: 当前构建不支持的参数/滤镜
+        """
+        timeout = settings.VIDEO_FFMPEG_TIMEOUT or None
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # subprocess.run 超时会终止 ffmpeg 进程
+            logger.error(f"[ffmpeg] 执行超时（{timeout}s）: {cmd[-1]}")
+            return f"ffmpeg执行超时（{timeout}s）"
+        if result.returncode == 0:
+            return None
+        stderr = (result.stderr or "").strip()
+        # 参数/滤镜不被当前构建支持时交给 moviepy 处理
+        if "No such filter" in stderr or "Option not found" in stderr:
+            raise UnsupportedEffect(stderr[-300:])
+        logger.error(f"[ffmpeg] 执行失败: {stderr[-500:]}")
+        return stderr or "unknown error"
+    
+    # ========== 分段缓存流水线 ==========
+    
+    def normalize_segment(
+        self,
+        source_path: str,
+        source_key: str,
+        width: int,
+        height: int,
+        fade_in: float = 0.0,
+        fade_out: float = 0.0,
+        threads: int = 0,
+        cache: Optional[SegmentCache] = None
+    ) -> str:
+        """
+        将片段归一化为统一编码参数的中间文件（可直接流拷贝拼接），结果按内容寻址缓存
+        
+        Returns:
+            归一化后的文件路径
+        """
+        cache = cache or segment_cache
+        params = {
+            "width": width,
+            "height": height,
+            "fps": self.fps,
+            "preset": self.preset,
+            "crf": self.crf,
+            "fade_in": round(fade_in, 3),
+            "fade_out": round(fade_out, 3),
+        }
+        key = cache.transform_key(source_key, params)
+        cached = cache.get(key)
+        if cached:
+            return cached
+        
+        duration = self.probe(source_path)["duration"]
+        chain = [
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+            "setsar=1",
+            f"fps={self.fps}",
+            "format=yuv420p",
+        ]
+        if fade_in > 0:
+            chain.append(f"fade=t=in:st=0:d={fade_in}")
+        if fade_out > 0 and duration > fade_out:
+            chain.append(f"fade=t=out:st={duration - fade_out:.3f}:d={fade_out}")
+        
+        temp_path = cache.temp_path_for(key)
+        cmd = [
+            get_ffmpeg_binary(), "-hide_banner", "-y", "-loglevel", "error",
+            "-i", source_path,
+            "-vf", ",".join(chain),
+            "-an",
+            "-c:v", "libx264",
+            "-preset", self.preset,
+            "-crf", str(self.crf),
+            "-pix_fmt", "yuv420p",
+            "-r", str(self.fps),
+            # 统一时间基，保证 concat 流拷贝时间戳连续
+            "-video_track_timescale", str(self.fps * 512),
+            "-threads", str(threads),
+            temp_path,
+        ]
+        error = self._run(cmd)
+        if error:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise RuntimeError(f"片段归一化失败: {error[-200:]}")
+        return cache.commit(temp_path, key)
+    
+    def compose_segmented(
+        self,
+        segment_paths: List[str],
+        source_keys: List[str],
+        output_path: str,
+        subtitles: Optional[List[str]] = None,
+        tts_path: Optional[str] = None,
+        bgm_path: Optional[str] = None,
+        transition_duration: float = 0.3,
+        edge_fade: float = 0.5,
+        tts_volume: float = 1.0,
+        bgm_volume: float = 0.25,
+        bgm_volume_solo: float = 0.6,
+        font_size: int = 42,
+        margin_bottom: int = 100,
+        subtitle_fade_ms: int = 200,
+        max_workers: Optional[int] = None,
+        work_dir: Optional[str] = None,
+        cache: Optional[SegmentCache] = None
+    ) -> Dict[str, Any]:
+        """
+        分段缓存合成：并行归一化各片段（命中缓存则跳过）→ concat 流拷贝 → 一次性叠加字幕与音频
+        
+        转场使用片段首尾淡入淡出（与 moviepy 方案的 crossfadein/crossfadeout 一致），
+        因此只有字幕/配音变化时不需要重新编码任何片段；没有字幕时视频流全程流拷贝。
+        
+        Args:
+            segment_paths: 源片段本地路径
+            source_keys: 各源片段的缓存键（与 segment_paths 一一对应）
+            max_workers: 并行归一化的 ffmpeg 进程数，默认按CPU核数
+            其余参数同 compose
+        
+        Raises:
+            UnsupportedEffect: 需要回退的情况
+        """
+        if not self.available:
+            raise UnsupportedEffect("ffmpeg不可用")
+        
+        pairs = [(p, k) for p, k in zip(segment_paths, source_keys) if os.path.exists(p)]
+        if not pairs:
+            return {"status": "error", "message": "没有有效的视频片段"}
+        
+        first = self.probe(pairs[0][0])
+        if first["duration"] <= 0:
+            raise UnsupportedEffect("无法探测片段时长")
+        width = (first["width"] or 1280) // 2 * 2
+        height = (first["height"] or 720) // 2 * 2
+        
+        # 1. 并行归一化：每个 ffmpeg 进程分到的线程数 = CPU核数 / 并发数
+        cpu_count = os.cpu_count() or 2
+        workers = max_workers or settings.VIDEO_SEGMENT_WORKERS or max(1, cpu_count // 2)
+        workers = max(1, min(workers, len(pairs)))
+        threads_per_job = max(1, cpu_count // workers)
+        
+        last = len(pairs) - 1
+        jobs = []
+        for i, (path, key) in enumerate(pairs):
+            fade_in = edge_fade if i == 0 else transition_duration
+            fade_out = edge_fade if i == last else transition_duration
+            jobs.append((path, key, fade_in, fade_out))
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            normalized = list(pool.map(
+                lambda job: self.normalize_segment(
+                    job[0], job[1], width, height,
+                    fade_in=job[2], fade_out=job[3],
+                    threads=threads_per_job, cache=cache
+                ),
+                jobs
+            ))
+        
+        # 2. concat demuxer 流拷贝
+        with self._job_dir(work_dir, output_path) as job_dir:
+            list_path = os.path.join(job_dir, "concat_list.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for path in normalized:
+                    escaped = path.replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+            
+            durations = [self.probe(p)["duration"] for p in normalized]
+            total_duration = sum(durations)
+            
+            # 3. 字幕 + 音频合成（无字幕时视频流拷贝）
+            cmd = [
+                get_ffmpeg_binary(), "-hide_banner", "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+            ]
+            input_index = 1
+            tts_index = bgm_index = None
+            if tts_path and os.path.exists(tts_path):
+                cmd += ["-i", tts_path]
+                tts_index = input_index
+                input_index += 1
+            if bgm_path and os.path.exists(bgm_path):
+                cmd += ["-stream_loop", "-1", "-i", bgm_path]
+                bgm_index = input_index
+                input_index += 1
+            
+            # 没有配音和BGM时保留片段原声（归一化片段不含音轨，从源片段读取）
+            source_indices = []
+            if tts_index is None and bgm_index is None:
+                for path, _ in pairs:
+                    if self.probe(path)["has_audio"]:
+                        cmd += ["-i", path]
+                        source_indices.append(input_index)
+                        input_index += 1
+                    else:
+                        source_indices.append(None)
+            
+            filters = []
+            ass_path = None
+            if subtitles:
+                ass_path = self.write_ass_subtitles(
+                    subtitles, total_duration, width, height,
+                    os.path.join(job_dir, "subtitles.ass"),
+                    font_size=font_size,
+                    margin_bottom=margin_bottom,
+                    fade_ms=subtitle_fade_ms
+                )
+            if ass_path:
+                self._check_filters("subtitles")
+                filters.append(
+                    f"[0:v]subtitles=filename='{self._escape_filter_path(ass_path)}',format=yuv420p[vout]"
+                )
+            
+            if any(index is not None for index in source_indices):
+                audio_filters, audio_map = self._source_audio_graph(source_indices, durations)
+            else:
+                audio_filters, audio_map = self._audio_graph(
+                    tts_index, bgm_index, total_duration, tts_volume, bgm_volume, bgm_volume_solo
+                )
+            filters += audio_filters
+            
+            if filters:
+                cmd += ["-filter_complex", ";".join(filters)]
+            
+            if ass_path:
+                cmd += [
+                    "-map", "[vout]",
+                    "-c:v", "libx264",
+                    "-preset", self.preset,
+                    "-crf", str(self.crf),
+                    "-pix_fmt", "yuv420p",
+                    "-threads", str(self.threads),
+                ]
+            else:
+                cmd += ["-map", "0:v", "-c:v", "copy"]
+            if audio_map:
+                cmd += ["-map", audio_map, "-c:a", "aac", "-b:a", "128k"]
+            cmd += ["-t", f"{total_duration:.3f}", "-movflags", "+faststart", output_path]
+            
+            logger.info(
+                f"[ffmpeg] 分段合成 {len(normalized)} 个片段 (并发{workers}), 时长 {total_duration:.1f}s, "
+                f"视频{'重编码' if ass_path else '流拷贝'}"
+            )
+            error = self._run(cmd)
+            if error:
+                return {"status": "error", "message": f"ffmpeg合成失败: {error[-200:]}"}
+            
+            return {
+                "status": "success",
+                "output_path": output_path,
+                "duration": total_duration,
+                "engine": "ffmpeg",
+            }
+
+
+# 全局实例
+ffmpeg_composer = FFmpegComposer()
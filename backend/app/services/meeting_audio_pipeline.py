@@ -0,0 +1,585 @@
+"""
+长会议录音分段转写流水线
+负责：按静音点切分长录音、分段并发上传和转写、拼接时间戳、逐段推送分段纪要
+
+流程：
+1. ffmpeg silencedetect 找出静音区间，在目标时长附近的静音中点切分（找不到静音时按最长时长硬切）
+2. 各分段转为16k单声道mp3，有界并发上传COS并提交腾讯云ASR，由 TranscriptionTracker 统一跟踪
+3. 每段转写完成后立即生成该段纪要；按分段顺序推送，第一段纪要不必等整场会议转写完
+4. 全部完成后拼接全文（时间戳加上分段偏移），写入会议记录并生成整场会议纪要
+录音不超过单段最长时长、或 ffmpeg 不可用时，调用方仍走整段转写
+
+分段计划记录在 meeting_records.metadata.segment_plan，分段任务通过 segment_meeting_id 关联会议；
+进程重启后分段任务由 TranscriptionTracker 恢复跟踪，全部结束后由定时任务拼接并完成会议纪要
+"""
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.models.database import AsyncSessionLocal
+from app.services.ffmpeg_composer import ffmpeg_composer, get_ffmpeg_binary
+
+# 分段纪要回调：(分段序号, 分段总数, 起始秒, 结束秒, 分段纪要)
+SectionCallback = Callable[[int, int, float, float, str], Awaitable[None]]
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?\d+(?:\.\d+)?)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(\d+(?:\.\d+)?)")
+# 腾讯云识别结果时间戳：[分:秒.毫秒,分:秒.毫秒]
+_TIMESTAMP_RE = re.compile(r"\[(\d+):(\d+(?:\.\d+)?),(\d+):(\d+(?:\.\d+)?)\]")
+
+SECTION_PROMPT = """以下是一场会议录音第{index}段（{start}-{end}）的转写内容：
+
+{content}
+
+---
+请整理本段会议纪要（不超过300字）：
+1. 讨论的议题和主要观点
+2. 做出的决定
+3. 提到的待办事项（负责人、任务、截止时间）
+本段没有实质内容时只回复"本段无实质内容"。"""
+
+
+def format_clock(seconds: float) -> str:
+    """秒 → HH:MM:SS / MM:SS"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+class MeetingAudioPipeline:
+    """长录音分段并发转写"""
+    
+    def __init__(
+        self,
+        segment_seconds: Optional[int] = None,
+        max_segment_seconds: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        silence_db: Optional[int] = None,
+        silence_min: Optional[float] = None
+    ):
+        """
+        Args:
+            segment_seconds: 目标分段时长（秒）
+            max_segment_seconds: 单段最长时长（秒），录音不超过该时长时不切分
+            concurrency: 同时上传/转写的分段数
+            silence_db: 静音判定阈值（dB）
+            silence_min: 最短静音时长（秒）
+        """
+        self.segment_seconds = segment_seconds or settings.MEETING_SEGMENT_SECONDS
+        self.max_segment_seconds = max_segment_seconds or settings.MEETING_SEGMENT_MAX_SECONDS
+        self.concurrency = concurrency or settings.MEETING_SEGMENT_CONCURRENCY
+        self.silence_db = silence_db or settings.MEETING_SILENCE_DB
+        self.silence_min = silence_min or settings.MEETING_SILENCE_MIN_SECONDS
+    
+    # ========== 切分 ==========
+    
+    def detect_silences(self, path: str) -> List[Tuple[float, float]]:
+        """用 silencedetect 找出静音区间 [(开始, 结束), ...]"""
+        result = subprocess.run(
+            [
+                get_ffmpeg_binary(), "-hide_banner", "-nostats", "-i", path,
+                "-af", f"silencedetect=noise={self.silence_db}dB:d={self.silence_min}",
+                "-f", "null", "-"
+            ],
+            capture_output=True,
+            text=True
+        )
+        silences = []
+        start = None
+        for line in result.stderr.splitlines():
+            match = _SILENCE_START_RE.search(line)
+            if match:
+                start = max(0.0, float(match.group(1)))
+                continue
+            match = _SILENCE_END_RE.search(line)
+            if match and start is not None:
+                silences.append((start, float(match.group(1))))
+                start = None
+        return silences
+    
+    @staticmethod
+    def plan_segments(
+        duration: float,
+        silences: List[Tuple[float, float]],
+        target: float,
+        maximum: float
+    ) -> List[Tuple[float, float]]:
+        """
+        规划分段：在 [目标时长一半, 最长时长] 窗口内选离目标最近的静音中点切分
+        
+        Returns:
+            [(起始秒, 结束秒), ...]
+        """
+        midpoints = [(s + e) / 2 for s, e in silences]
+        segments = []
+        start = 0.0
+        while duration - start > maximum:
+            low, high = start + target / 2, start + maximum
+            candidates = [m for m in midpoints if low <= m <= high]
+            if candidates:
+                cut = min(candidates, key=lambda m: abs(m - (start + target)))
+            else:
+                cut = start + target
+            segments.append((start, cut))
+            start = cut
+        segments.append((start, duration))
+        return segments
+    
+    def plan(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        探测时长并规划分段（同步，由调用方放入线程池）
+        
+        Returns:
+            {"duration": 秒, "segments": [...]}；无需切分或 ffmpeg 不可用时返回 None
+        """
+        if not get_ffmpeg_binary():
+            return None
+        duration = ffmpeg_composer.probe(path)["duration"]
+        if duration <= self.max_segment_seconds:
+            return None
+        silences = self.detect_silences(path)
+        segments = self.plan_segments(duration, silences, self.segment_seconds, self.max_segment_seconds)
+        logger.info(
+            f"[会议录音] 时长 {duration:.0f}s, 静音 {len(silences)} 处, 切分为 {len(segments)} 段"
+        )
+        return {"duration": duration, "segments": segments}
+    
+    def split(self, path: str, segments: List[Tuple[float, float]], out_dir: str) -> List[str]:
+        """并行切出各分段（16k单声道mp3，ASR 16k模型的输入格式）"""
+        def cut(item):
+            index, (start, end) = item
+            out_path = os.path.join(out_dir, f"segment_{index:03d}.mp3")
+            result = subprocess.run(
+                [
+                    get_ffmpeg_binary(), "-hide_banner", "-y", "-loglevel", "error",
+                    "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", path,
+                    "-vn", "-ac", "1", "-ar", "16000", "-b:a", "48k", out_path
+                ],
+                capture_output=True,
+                text=True
+            )
+            if result.returncode != 0:
+                raise RuntimeError(f"切分第{index + 1}段失败: {result.stderr[-200:]}")
+            return out_path
+        
+        with ThreadPoolExecutor(max_workers=min(len(segments), os.cpu_count() or 2)) as pool:
+            return list(pool.map(cut, enumerate(segments)))
+    
+    @staticmethod
+    def shift_timestamps(transcript: str, offset: float) -> str:
+        """给分段识别结果的时间戳加上分段起始偏移"""
+        def shift(match):
+            start = int(match.group(1)) * 60 + float(match.group(2)) + offset
+            end = int(match.group(3)) * 60 + float(match.group(4)) + offset
+            return (
+                f"[{int(start // 60)}:{start % 60:.3f},"
+                f"{int(end // 60)}:{end % 60:.3f}]"
+            )
+        return _TIMESTAMP_RE.sub(shift, transcript)
+    
+    # ========== 转写 ==========
+    
+    async def _summarize_section(self, index: int, start: float, end: float, transcript: str) -> str:
+        from app.core.llm import chat_completion
+        
+        prompt = SECTION_PROMPT.format(
+            index=index + 1,
+            start=format_clock(start),
+            end=format_clock(end),
+            content=transcript[:8000]
+        )
+        try:
+            response = await chat_completion(
+                messages=[{"role": "user", "content": prompt}],
+                agent_name="Maria",
+                task_type="meeting_section_summary",
+                max_tokens=800,
+            )
+            return (response or "").strip() or "本段无实质内容"
+        except Exception as e:
+            logger.warning(f"[会议录音] 第{index + 1}段纪要生成失败: {e}")
+            return "（本段纪要生成失败）"
+    
+    async def _transcribe_segment(
+        self,
+        index: int,
+        segment_path: str,
+        start: float,
+        meeting_id: str,
+        cos_service,
+        asr_service,
+        semaphore: asyncio.Semaphore
+    ) -> Optional[str]:
+        """上传并转写单个分段，返回已平移时间戳的识别结果；失败返回 None"""
+        from app.services.transcription_tracker import transcription_tracker
+        
+        async with semaphore:
+            success, audio_url = await cos_service.upload_file(segment_path, folder="meeting_audio/segments")
+            if not success:
+                logger.warning(f"[会议录音] 第{index + 1}段上传失败: {audio_url}")
+                return None
+            # 分段任务不关联会议，避免每段都覆盖会议记录、各自生成整场纪要
+            submitted = await asr_service.transcribe_audio(audio_url=audio_url, audio_format="mp3")
+        
+        if not submitted.get("success"):
+            logger.warning(f"[会议录音] 第{index + 1}段提交失败: {submitted.get('error')}")
+            return None
+        await self._link_segment(submitted["task_id"], meeting_id, index)
+        
+        try:
+            result = await transcription_tracker.wait(submitted["task_id"], timeout=asr_service.max_wait_time)
+        except asyncio.TimeoutError:
+            logger.warning(f"[会议录音] 第{index + 1}段转写超时")
+            return None
+        if result["status"] != "completed":
+            logger.warning(f"[会议录音] 第{index + 1}段转写失败: {result.get('error')}")
+            return None
+        return self.shift_timestamps(result.get("result") or "", start)
+    
+    async def run(
+        self,
+        audio_path: str,
+        meeting_id: str,
+        plan: Dict[str, Any],
+        cos_service,
+        asr_service,
+        on_section: Optional[SectionCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        分段转写整场会议
+        
+        Args:
+            audio_path: 录音本地路径
+            meeting_id: 会议记录ID
+            plan: plan() 的返回值
+            cos_service: COS存储服务
+            asr_service: 语音识别服务
+            on_section: 分段纪要回调（按分段顺序调用）
+        
+        Returns:
+            {"success": bool, "segments": 分段数, "failed": 失败分段数, "error": str,
+             "skipped": 已由恢复任务完成时为 True}
+        """
+        segments = plan["segments"]
+        total = len(segments)
+        started = time.perf_counter()
+        work_dir = tempfile.mkdtemp(prefix="meeting_audio_")
+        await self._save_plan(meeting_id, plan)
+        
+        try:
+            loop = asyncio.get_event_loop()
+            try:
+                paths = await loop.run_in_executor(None, self.split, audio_path, segments, work_dir)
+            except Exception as e:
+                logger.error(f"[会议录音] 切分失败: {e}")
+                await self._mark_failed(meeting_id)
+                return {"success": False, "segments": total, "failed": total, "error": str(e)}
+            
+            semaphore = asyncio.Semaphore(self.concurrency)
+            
+            async def process(index: int) -> Tuple[Optional[str], str]:
+                start, end = segments[index]
+                transcript = await self._transcribe_segment(
+                    index, paths[index], start, meeting_id, cos_service, asr_service, semaphore
+                )
+                if transcript is None:
+                    return None, "（本段转写失败）"
+                if not transcript.strip():
+                    return transcript, "本段无实质内容"
+                return transcript, await self._summarize_section(index, start, end, transcript)
+            
+            tasks = [asyncio.create_task(process(i)) for i in range(total)]
+            # 原始录音同时上传，供会议记录回放
+            upload_task = asyncio.create_task(cos_service.upload_file(audio_path, folder="meeting_audio"))
+            
+            transcripts: List[Optional[str]] = []
+            summaries: List[str] = []
+            for index, task in enumerate(tasks):
+                transcript, summary = await task
+                transcripts.append(transcript)
+                summaries.append(summary)
+                if on_section:
+                    start, end = segments[index]
+                    try:
+                        await on_section(index, total, start, end, summary)
+                    except Exception as e:
+                        logger.warning(f"[会议录音] 分段纪要推送失败: {e}")
+            
+            uploaded, audio_url = await upload_task
+            if not await self._claim(meeting_id):
+                logger.info(f"[会议录音] 会议已由恢复任务完成: {meeting_id}")
+                return {"success": False, "skipped": True, "segments": total}
+            result = await self._finalize(
+                meeting_id, plan["duration"], audio_url if uploaded else None,
+                segments, transcripts, summaries, asr_service
+            )
+            
+            if result["success"]:
+                logger.info(
+                    f"[会议录音] 分段转写完成: {meeting_id}, {total} 段（失败 {result['failed']}）, "
+                    f"耗时 {time.perf_counter() - started:.0f}s"
+                )
+            return result
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    async def _finalize(
+        self,
+        meeting_id: str,
+        duration: float,
+        audio_url: Optional[str],
+        segments: List[Tuple[float, float]],
+        transcripts: List[Optional[str]],
+        summaries: List[str],
+        asr_service
+    ) -> Dict[str, Any]:
+        """拼接全文、保存分段纪要并生成整场会议纪要（调用前须先 _claim）"""
+        total = len(segments)
+        failed = sum(1 for t in transcripts if t is None)
+        if failed == total:
+            await self._mark_failed(meeting_id)
+            return {"success": False, "segments": total, "failed": failed, "error": "全部分段转写失败"}
+        
+        full_text = "\n".join(t for t in transcripts if t)
+        await self._save_sections(meeting_id, duration, audio_url, segments, summaries)
+        
+        # 全文放不进一次纪要生成时，用分段纪要作为材料
+        material = full_text
+        if len(full_text) > 8000:
+            material = "\n\n".join(
+                f"【第{i + 1}段 {format_clock(s)}-{format_clock(e)}】\n{summary}"
+                for i, ((s, e), summary) in enumerate(zip(segments, summaries))
+            )
+        await asr_service._generate_meeting_summary(meeting_id, material)
+        await asr_service._update_meeting_transcription(meeting_id, full_text)
+        return {"success": True, "segments": total, "failed": failed}
+    
+    # ========== 重启恢复 ==========
+    
+    async def resume_stalled(self, asr_service, stale_seconds: int = 600) -> List[Dict[str, Any]]:
+        """
+        完成中断的分段转写：会议仍在处理中、分段任务都已结束（或已超过最长等待时间）且超过
+        stale_seconds 无进展（处理该会议的进程已退出），从任务记录读取各段结果并生成纪要
+        
+        Returns:
+            [{"meeting_id": 会议ID, "created_by": 上传者, "result": _finalize 的返回值}, ...]
+        """
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(text("""
+                    SELECT m.id, m.created_by, m.metadata->'segment_plan'
+                    FROM meeting_records m
+                    WHERE m.transcription_status = 'processing'
+                      AND m.metadata ? 'segment_plan'
+                      AND m.created_at > NOW() - make_interval(secs => :max_age)
+                      AND NOT EXISTS (
+                          SELECT 1 FROM speech_transcription_tasks t
+                          WHERE t.segment_meeting_id = m.id AND t.status NOT IN ('completed', 'failed')
+                            AND t.started_at > NOW() - make_interval(secs => :max_wait)
+                      )
+                      AND GREATEST(
+                          m.updated_at,
+                          (SELECT MAX(t.completed_at) FROM speech_transcription_tasks t WHERE t.segment_meeting_id = m.id)
+                      ) < NOW() - make_interval(secs => :stale)
+                """), {
+                    "stale": stale_seconds,
+                    "max_wait": asr_service.max_wait_time,
+                    "max_age": asr_service.max_wait_time * 2,
+                })
+                meetings = result.fetchall()
+        except Exception as e:
+            logger.warning(f"[会议录音] 查询中断的分段转写失败: {e}")
+            return []
+        
+        finished = []
+        for meeting_id, created_by, plan in meetings:
+            meeting_id = str(meeting_id)
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            if not await self._claim(meeting_id):
+                continue
+            segments = [tuple(segment) for segment in plan["segments"]]
+            transcripts = await self._load_segment_transcripts(meeting_id, segments)
+            summaries = []
+            for index, ((start, end), transcript) in enumerate(zip(segments, transcripts)):
+                if transcript is None:
+                    summaries.append("（本段转写失败）")
+                elif not transcript.strip():
+                    summaries.append("本段无实质内容")
+                else:
+                    summaries.append(await self._summarize_section(index, start, end, transcript))
+            result = await self._finalize(
+                meeting_id, plan["duration"], None, segments, transcripts, summaries, asr_service
+            )
+            logger.info(
+                f"[会议录音] 恢复完成中断的分段转写: {meeting_id}, {len(segments)} 段（失败 {result['failed']}）"
+            )
+            finished.append({"meeting_id": meeting_id, "created_by": created_by, "result": result})
+        return finished
+    
+    async def _load_segment_transcripts(
+        self,
+        meeting_id: str,
+        segments: List[Tuple[float, float]]
+    ) -> List[Optional[str]]:
+        """读取各分段的识别结果（已平移时间戳），未提交或失败的分段为 None"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(text("""
+                SELECT segment_index, result_text FROM speech_transcription_tasks
+                WHERE segment_meeting_id = :id AND status = 'completed'
+            """), {"id": meeting_id})
+            rows = result.fetchall()
+        transcripts: List[Optional[str]] = [None] * len(segments)
+        for index, result_text in rows:
+            if index is not None and 0 <= index < len(segments):
+                transcripts[index] = self.shift_timestamps(result_text or "", segments[index][0])
+        return transcripts
+    
+    # ========== 持久化 ==========
+    
+    async def _save_plan(self, meeting_id: str, plan: Dict[str, Any]):
+        """记录分段计划，重启后据此拼接各段结果"""
+        segment_plan = {
+            "duration": plan["duration"],
+            "segments": [[round(s, 3), round(e, 3)] for s, e in plan["segments"]],
+        }
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    text("""
+                        UPDATE meeting_records
+                        SET metadata = COALESCE(metadata, '{}'::jsonb) || jsonb_build_object('segment_plan', CAST(:plan AS jsonb)),
+                            updated_at = NOW()
+                        WHERE id = :id
+                    """),
+                    {"id": meeting_id, "plan": json.dumps(segment_plan)}
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"[会议录音] 保存分段计划失败: {e}")
+    
+    async def _link_segment(self, task_id: str, meeting_id: str, index: int):
+        """分段任务关联到会议"""
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    text("""
+                        UPDATE speech_transcription_tasks
+                        SET segment_meeting_id = :meeting_id, segment_index = :index
+                        WHERE id = :id
+                    """),
+                    {"id": task_id, "meeting_id": meeting_id, "index": index}
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"[会议录音] 关联第{index + 1}段任务失败: {e}")
+    
+    async def _claim(self, meeting_id: str) -> bool:
+        """条件更新抢占会议的收尾处理，流水线和恢复任务只有一方生成纪要"""
+        try:
+            async with AsyncSessionLocal() as db:
+                row = await db.execute(
+                    text("""
+                        UPDATE meeting_records
+                        SET transcription_status = 'summarizing', updated_at = NOW()
+                        WHERE id = :id AND transcription_status = 'processing'
+                        RETURNING id
+                    """),
+                    {"id": meeting_id}
+                )
+                claimed = row.fetchone() is not None
+                await db.commit()
+                return claimed
+        except Exception as e:
+            logger.error(f"[会议录音] 更新会议状态失败: {e}")
+            return False
+    
+    async def _save_sections(
+        self,
+        meeting_id: str,
+        duration: float,
+        audio_url: Optional[str],
+        segments: List[Tuple[float, float]],
+        summaries: List[str]
+    ):
+        """记录录音时长、原始录音URL和分段纪要"""
+        sections = [
+            {"start": round(s, 3), "end": round(e, 3), "summary": summary}
+            for (s, e), summary in zip(segments, summaries)
+        ]
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    text("""
+                        UPDATE meeting_records
+                        SET audio_duration_seconds = :duration,
+                            audio_file_url = COALESCE(:audio_url, audio_file_url),
+                            metadata = COALESCE(metadata, '{}'::jsonb) || jsonb_build_object('sections', CAST(:sections AS jsonb)),
+                            updated_at = NOW()
+                        WHERE id = :id
+                    """),
+                    {
+                        "id": meeting_id,
+                        "duration": int(duration),
+                        "audio_url": audio_url,
+                        "sections": json.dumps(sections, ensure_ascii=False)
+                    }
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"[会议录音] 保存分段信息失败: {e}")
+    
+    async def _mark_failed(self, meeting_id: str):
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    text("""
+                        UPDATE meeting_records
+                        SET transcription_status = 'failed', updated_at = NOW()
+                        WHERE id = :id
+                    """),
+                    {"id": meeting_id}
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"[会议录音] 更新会议状态失败: {e}")
+
+
+# 全局实例
+meeting_audio_pipeline = MeetingAudioPipeline()
+
+
+async def resume_meeting_segments():
+    """定时任务：完成进程重启前中断的分段转写，并把会议纪要发给上传者"""
+    from app.services.speech_recognition_service import speech_recognition_service
+    if not speech_recognition_service.is_configured():
+        return
+    
+    finished = await meeting_audio_pipeline.resume_stalled(speech_recognition_service)
+    if not finished:
+        return
+    
+    from app.api.wechat_assistant import send_text_message, _send_meeting_summary
+    for item in finished:
+        if not item["created_by"]:
+            continue
+        try:
+            if item["result"]["success"]:
+                await _send_meeting_summary(item["created_by"], item["meeting_id"])
+            else:
+                await send_text_message(item["created_by"], "❌ 会议录音转写失败，请检查录音质量后重试。")
+        except Exception as e:
+            logger.warning(f"[会议录音] 发送恢复的会议纪要失败: {e}")
@@ -0,0 +1,98 @@
+"""
+企业微信回调消息去重服务
+负责：跨 worker、跨重启地判断 MsgId 是否已处理，避免企业微信超时重试导致重复调用LLM
+
+判定流程：
+1. 进程内布隆过滤器：命中说明本进程处理过（企业微信重试大多落到同一个worker），无需访问Redis
+2. Redis SET NX EX：未命中时原子抢占，抢占失败说明其他worker或重启前已处理
+3. Redis 不可用时退化为仅布隆过滤器去重
+"""
+import math
+import time
+import hashlib
+import threading
+from loguru import logger
+
+from app.core.config import settings
+from app.services.cache_service import cache_service
+
+
+class BloomFilter:
+    """定长位数组布隆过滤器（双重哈希）"""
+    
+    def __init__(self, capacity: int, error_rate: float = 1e-6):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+    
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+    
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class MessageDedupService:
+    """消息去重服务"""
+    
+    def __init__(self, ttl: int = None, bloom_capacity: int = None):
+        self.ttl = ttl or settings.WECHAT_DEDUP_TTL
+        self.bloom_capacity = bloom_capacity or settings.WECHAT_DEDUP_BLOOM_CAPACITY
+        # 两代过滤器轮换：当前代写满或超过TTL后整体丢弃旧代，控制误判率和内存
+        self._current = BloomFilter(self.bloom_capacity)
+        self._previous = BloomFilter(self.bloom_capacity)
+        self._rotated_at = time.time()
+        self._lock = threading.Lock()
+    
+    def _rotate_if_needed(self):
+        if self._current.count >= self.bloom_capacity or time.time() - self._rotated_at > self.ttl:
+            self._previous = self._current
+            self._current = BloomFilter(self.bloom_capacity)
+            self._rotated_at = time.time()
+    
+    def _seen_locally(self, item: str) -> bool:
+        return item in self._current or item in self._previous
+    
+    async def claim(self, namespace: str, msg_id: str) -> bool:
+        """
+        抢占消息处理权
+        
+        Args:
+            namespace: 应用命名空间（如 wechat、assistant、coordinator）
+            msg_id: 企业微信 MsgId
+        
+        Returns:
+            True 表示首次收到，应当处理；False 表示重复消息，应直接跳过
+        """
+        item = f"{namespace}:{msg_id}"
+        with self._lock:
+            if self._seen_locally(item):
+                return False
+            self._rotate_if_needed()
+            self._current.add(item)
+        
+        client = await cache_service.client()
+        if client is None:
+            return True
+        
+        try:
+            claimed = await client.set(cache_service.key(f"wecom_msg:{item}"), "1", nx=True, ex=self.ttl)
+            return bool(claimed)
+        except Exception as e:
+            logger.warning(f"[消息去重] Redis不可用，仅使用本地去重: {e}")
+            return True
+
+
+# 全局实例
+message_dedup = MessageDedupService()
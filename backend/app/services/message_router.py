@@ -11,6 +11,7 @@ from loguru import logger
 from sqlalchemy import text
 
 from app.models.database import async_session_maker
+from app.core.tracing import tracer, traced
 from app.agents.coordinator import coordinator
 from app.agents.sales_agent import sales_agent
 from app.agents.follow_agent import follow_agent
@@ -127,6 +128,7 @@ class MessageRouter:
         self._reply_handlers[channel] = handler
         logger.info(f"注册渠道处理器: {channel.value}")
     
+    @traced("router.process_message", kind="agent", root=True)
     async def process_message(
         self, 
         message: UnifiedMessage
@@ -146,6 +148,7 @@ class MessageRouter:
         9. 路由回复到原渠道
         """
         logger.info(f"收到消息: 渠道={message.channel.value}, 用户={message.channel_user_id[:8]}...")
+        tracer.annotate(channel=message.channel.value)
         
         # 1. 匹配/创建客户
         customer = await self._get_or_create_customer(message)
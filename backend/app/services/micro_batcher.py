@@ -0,0 +1,92 @@
+"""
+微批处理器
+负责：把并发到达的单条请求攒成批次（满N条或等待T秒即发出），一次处理后把结果分发回各调用方
+
+调用方仍按单条 await submit(item)，批次对调用方透明；
+适用于单次调用开销大（如LLM请求的系统提示词、网络往返）而单条内容很小的场景
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from loguru import logger
+
+# 批处理函数：输入一批条目，返回等长的结果列表（顺序与输入一致）
+BatchHandler = Callable[[List[Any]], Awaitable[List[Any]]]
+
+
+class MicroBatcher:
+    """按数量/时间窗口攒批"""
+    
+    def __init__(
+        self,
+        handler: BatchHandler,
+        max_items: int = 20,
+        max_wait: float = 2.0,
+        max_concurrent_batches: int = 2,
+        name: str = "batch"
+    ):
+        """
+        Args:
+            handler: 批处理函数
+            max_items: 单批最大条数，攒满立即发出
+            max_wait: 第一条到达后最长等待时间（秒）
+            max_concurrent_batches: 同时处理的批次数
+            name: 日志名称
+        """
+        self.handler = handler
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self.max_concurrent_batches = max_concurrent_batches
+        self.name = name
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: set = set()
+    
+    async def submit(self, item: Any) -> Any:
+        """提交单条，等待其所在批次处理完成后返回该条结果"""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+    
+    def _flush(self):
+        """发出当前批次（由攒满或定时器触发）"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        
+        batch, self._pending = self._pending[:self.max_items], self._pending[self.max_items:]
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        
+        if self._pending:
+            self._timer = asyncio.get_event_loop().call_later(self.max_wait, self._flush)
+    
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        
+        async with self._semaphore:
+            items = [item for item, _ in batch]
+            try:
+                results = await self.handler(items)
+                if len(results) != len(items):
+                    raise ValueError(f"批处理结果数量不符: {len(results)} != {len(items)}")
+            except Exception as e:
+                logger.error(f"[{self.name}] 批处理失败（{len(items)}条）: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
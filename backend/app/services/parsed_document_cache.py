@@ -0,0 +1,178 @@
+"""
+已解析文档缓存
+负责：按文件内容 sha256 缓存文档解析结果（全文、分页偏移），
+本地磁盘按总大小LRU淘汰，数据库记录索引和来源映射（如 邮件ID + 附件名 → 内容哈希）
+
+同一附件被"再分析一次"、或同一文件经企业微信重复发送时，直接命中缓存，跳过下载和解析
+"""
+import os
+import json
+import hashlib
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.models.database import AsyncSessionLocal
+from app.services.video_segment_cache import SegmentCache
+
+
+class ParsedDocumentCache:
+    """已解析文档缓存（磁盘存内容，数据库存索引）"""
+    
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.store = SegmentCache(
+            cache_dir=cache_dir or settings.DOCUMENT_CACHE_DIR,
+            max_bytes=max_bytes or settings.DOCUMENT_CACHE_MAX_MB * 1024 * 1024
+        )
+    
+    @staticmethod
+    def hash_file(filepath: str) -> str:
+        """分块计算文件 sha256，不整体读入内存"""
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def load(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        同步读取缓存（供解析线程使用）
+        
+        Returns:
+            {"content_hash", "file_name", "text", "pages": [[页码, 起始偏移], ...]}
+        """
+        path = self.store.get(content_hash, ext=".json")
+        if not path:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[文档缓存] 读取失败 {content_hash[:12]}: {e}")
+            return None
+    
+    def save(self, content_hash: str, file_name: str, content: str, pages: List[Tuple[int, int]]):
+        """同步写入缓存（原子替换）"""
+        record = {
+            "content_hash": content_hash,
+            "file_name": file_name,
+            "text": content,
+            "pages": pages,
+        }
+        temp_path = self.store.temp_path_for(content_hash, ext=".json")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        self.store.commit(temp_path, content_hash, ext=".json")
+    
+    async def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，命中时更新数据库访问统计"""
+        loop = asyncio.get_event_loop()
+        record = await loop.run_in_executor(None, self.load, content_hash)
+        if record:
+            await self.touch(content_hash)
+        return record
+    
+    async def register(self, content_hash: str, file_name: str, char_count: int,
+                       page_count: int, file_size: int = 0):
+        """登记数据库索引（失败不影响磁盘缓存使用）"""
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    text("""
+                        INSERT INTO parsed_documents
+                            (content_hash, file_name, file_ext, file_size, char_count, page_count)
+                        VALUES (:content_hash, :file_name, :file_ext, :file_size, :char_count, :page_count)
+                        ON CONFLICT (content_hash) DO UPDATE SET
+                            last_accessed_at = NOW()
+                    """),
+                    {
+                        "content_hash": content_hash,
+                        "file_name": file_name[:500],
+                        "file_ext": os.path.splitext(file_name)[1].lower()[:20],
+                        "file_size": file_size,
+                        "char_count": char_count,
+                        "page_count": page_count
+                    }
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"[文档缓存] 登记索引失败: {e}")
+    
+    async def touch(self, content_hash: str):
+        """更新命中次数和最近访问时间"""
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    text("""
+                        UPDATE parsed_documents
+                        SET hit_count = hit_count + 1, last_accessed_at = NOW()
+                        WHERE content_hash = :content_hash
+                    """),
+                    {"content_hash": content_hash}
+                )
+                await db.commit()
+        except Exception as e:
+            logger.debug(f"[文档缓存] 更新访问统计失败: {e}")
+    
+    async def link_source(self, source_type: str, source_id: str, file_name: str, content_hash: str):
+        """
+        记录来源映射
+        
+        Args:
+            source_type: 来源类型（email / wechat）
+            source_id: 来源ID（如邮件缓存ID）
+            file_name: 原始文件名
+            content_hash: 内容哈希
+        """
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    text("""
+                        INSERT INTO document_sources (source_type, source_id, file_name, content_hash)
+                        VALUES (:source_type, :source_id, :file_name, :content_hash)
+                        ON CONFLICT (source_type, source_id, file_name) DO UPDATE SET
+                            content_hash = EXCLUDED.content_hash
+                    """),
+                    {
+                        "source_type": source_type,
+                        "source_id": str(source_id),
+                        "file_name": file_name[:500],
+                        "content_hash": content_hash
+                    }
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"[文档缓存] 记录来源失败: {e}")
+    
+    async def lookup_source(self, source_type: str, source_id: str) -> Dict[str, str]:
+        """
+        查询来源下已缓存的文件
+        
+        Returns:
+            {文件名: 内容哈希}，仅包含磁盘缓存仍然存在的文件
+        """
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    text("""
+                        SELECT file_name, content_hash
+                        FROM document_sources
+                        WHERE source_type = :source_type AND source_id = :source_id
+                    """),
+                    {"source_type": source_type, "source_id": str(source_id)}
+                )
+                rows = result.fetchall()
+        except Exception as e:
+            logger.warning(f"[文档缓存] 查询来源失败: {e}")
+            return {}
+        
+        return {
+            row[0]: row[1] for row in rows
+            if self.store.get(row[1], ext=".json")
+        }
+
+
+# 全局实例
+parsed_document_cache = ParsedDocumentCache()
@@ -180,32 +180,36 @@ class DataMasker:
         except (ValueError, TypeError):
             return "****"
     
+    # 字符串内容合并正则：一次扫描完成邮箱/身份证/手机号脱敏
+    # 顺序即优先级：邮箱可能包含数字，身份证（18位）需先于手机号（11位）匹配
+    CONTENT_PATTERN = re.compile(
+        r'(?P<email>[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})'
+        r'|(?P<id_card>\d{17}[\dXx])'
+        r'|(?P<phone>1[3-9]\d{9})'
+    )
+    
+    @classmethod
+    def _mask_content_match(cls, match: "re.Match") -> str:
+        """合并正则的替换回调"""
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'email':
+            return cls.mask_email(value)
+        if kind == 'id_card':
+            return cls.mask_id_card(value)
+        return cls.mask_phone(value)
+    
     @classmethod
     def mask_string_content(cls, text: str) -> str:
         """
         自动检测并脱敏字符串中的敏感信息
+        
+        使用合并正则单次扫描+回调替换，避免多次 finditer + str.replace
         """
         if not text or not isinstance(text, str):
             return text
         
-        result = text
-        
-        # 脱敏手机号
-        for match in cls.PHONE_PATTERN.finditer(text):
-            phone = match.group()
-            result = result.replace(phone, cls.mask_phone(phone))
-        
-        # 脱敏身份证
-        for match in cls.ID_CARD_PATTERN.finditer(text):
-            id_card = match.group()
-            result = result.replace(id_card, cls.mask_id_card(id_card))
-        
-        # 脱敏邮箱
-        for match in cls.EMAIL_PATTERN.finditer(text):
-            email = match.group()
-            result = result.replace(email, cls.mask_email(email))
-        
-        return result
+        return cls.CONTENT_PATTERN.sub(cls._mask_content_match, text)
     
     @classmethod
     def is_sensitive_field(cls, field_name: str) -> bool:
@@ -230,6 +234,97 @@ class DataMasker:
         return field_lower in cls.AMOUNT_FIELDS or any(
             s in field_lower for s in ['amount', 'price', 'cost', 'fee', 'balance', 'total']
         )
+    
+    # ========== 字段规则编译（key → 动作） ==========
+    
+    # 字段动作常量
+    ACTION_HIDDEN = 'hidden'
+    ACTION_AMOUNT = 'amount'
+    ACTION_PHONE = 'phone'
+    ACTION_EMAIL = 'email'
+    ACTION_BANK_CARD = 'bank_card'
+    ACTION_ADDRESS = 'address'
+    ACTION_NAME = 'name'
+    ACTION_CONTENT = 'content'  # 字符串内容自动检测
+    
+    # 决策缓存：(字段名, mask_amounts, mask_contacts) → 动作
+    # ERP 字段名是有限集合，超过上限时整体清空即可
+    _FIELD_ACTION_CACHE: Dict[tuple, str] = {}
+    _FIELD_ACTION_CACHE_MAX = 4096
+    
+    @classmethod
+    def _classify_field(cls, field_name: str, mask_amounts: bool, mask_contacts: bool) -> str:
+        """计算字段的脱敏动作（规则与 is_*_field 判断保持一致）"""
+        if cls.is_hidden_field(field_name):
+            return cls.ACTION_HIDDEN
+        
+        if mask_amounts and cls.is_amount_field(field_name):
+            return cls.ACTION_AMOUNT
+        
+        if mask_contacts and cls.is_sensitive_field(field_name):
+            key_lower = field_name.lower()
+            if 'phone' in key_lower or 'mobile' in key_lower or 'tel' in key_lower:
+                return cls.ACTION_PHONE
+            if 'email' in key_lower or 'mail' in key_lower:
+                return cls.ACTION_EMAIL
+            if 'card' in key_lower or 'account' in key_lower:
+                return cls.ACTION_BANK_CARD
+            if 'address' in key_lower:
+                return cls.ACTION_ADDRESS
+            if 'name' in key_lower and 'company' not in key_lower:
+                # 联系人姓名脱敏，但公司名不脱敏
+                return cls.ACTION_NAME
+        
+        return cls.ACTION_CONTENT
+    
+    @classmethod
+    def get_field_action(cls, field_name: str, mask_amounts: bool = True, mask_contacts: bool = True) -> str:
+        """获取字段脱敏动作（带缓存，每个字段名只计算一次）"""
+        cache_key = (field_name, mask_amounts, mask_contacts)
+        action = cls._FIELD_ACTION_CACHE.get(cache_key)
+        if action is None:
+            if len(cls._FIELD_ACTION_CACHE) >= cls._FIELD_ACTION_CACHE_MAX:
+                cls._FIELD_ACTION_CACHE.clear()
+            action = cls._classify_field(field_name, mask_amounts, mask_contacts)
+            cls._FIELD_ACTION_CACHE[cache_key] = action
+        return action
+    
+    @classmethod
+    def compile_plan(cls, keys, mask_amounts: bool = True, mask_contacts: bool = True) -> tuple:
+        """
+        为一组字段名编译脱敏计划
+        
+        返回 ((key, action), ...)，同结构的记录可直接复用
+        """
+        return tuple(
+            (key, cls.get_field_action(key, mask_amounts, mask_contacts))
+            for key in keys
+        )
+    
+    @classmethod
+    def apply_action(cls, action: str, value: Any) -> Any:
+        """对标量值执行脱敏动作"""
+        if action == cls.ACTION_HIDDEN:
+            return "[已隐藏]"
+        if action == cls.ACTION_AMOUNT:
+            if isinstance(value, (int, float)):
+                return cls.mask_amount(value)
+            return value
+        if not isinstance(value, str):
+            return value
+        if action == cls.ACTION_CONTENT:
+            return cls.mask_string_content(value)
+        if action == cls.ACTION_PHONE:
+            return cls.mask_phone(value)
+        if action == cls.ACTION_EMAIL:
+            return cls.mask_email(value)
+        if action == cls.ACTION_BANK_CARD:
+            return cls.mask_bank_card(value)
+        if action == cls.ACTION_ADDRESS:
+            return cls.mask_address(value)
+        if action == cls.ACTION_NAME:
+            return cls.mask_name(value)
+        return cls.mask_string_content(value)
 
 
 class ERPDataPrivacyService:
@@ -320,7 +415,8 @@ class ERPDataPrivacyService:
         """
         脱敏ERP响应数据
         
-        递归处理所有字段，自动识别并脱敏敏感信息
+        递归处理所有字段，自动识别并脱敏敏感信息。
+        字段规则按字段名编译为脱敏计划并缓存；同结构的列表记录复用同一份计划。
         
         参数:
             data: 原始数据
@@ -334,61 +430,48 @@ class ERPDataPrivacyService:
             return data
         
         if isinstance(data, list):
-            return [cls.mask_erp_response(item, mask_amounts, mask_contacts) for item in data]
+            return cls._mask_list(data, mask_amounts, mask_contacts)
         
         if isinstance(data, dict):
-            masked_data = {}
-            for key, value in data.items():
-                # 完全隐藏的字段
-                if DataMasker.is_hidden_field(key):
-                    masked_data[key] = "[已隐藏]"
-                    continue
-                
-                # 递归处理嵌套对象
-                if isinstance(value, (dict, list)):
-                    masked_data[key] = cls.mask_erp_response(value, mask_amounts, mask_contacts)
-                    continue
-                
-                # 金额字段脱敏
-                if mask_amounts and DataMasker.is_amount_field(key):
-                    if isinstance(value, (int, float)):
-                        masked_data[key] = DataMasker.mask_amount(value)
-                    else:
-                        masked_data[key] = value
-                    continue
-                
-                # 联系方式脱敏
-                if mask_contacts and DataMasker.is_sensitive_field(key):
-                    if isinstance(value, str):
-                        key_lower = key.lower()
-                        if 'phone' in key_lower or 'mobile' in key_lower or 'tel' in key_lower:
-                            masked_data[key] = DataMasker.mask_phone(value)
-                        elif 'email' in key_lower or 'mail' in key_lower:
-                            masked_data[key] = DataMasker.mask_email(value)
-                        elif 'card' in key_lower or 'account' in key_lower:
-                            masked_data[key] = DataMasker.mask_bank_card(value)
-                        elif 'address' in key_lower:
-                            masked_data[key] = DataMasker.mask_address(value)
-                        elif 'name' in key_lower and 'company' not in key_lower:
-                            # 联系人姓名脱敏，但公司名不脱敏
-                            masked_data[key] = DataMasker.mask_name(value)
-                        else:
-                            masked_data[key] = DataMasker.mask_string_content(value)
-                    else:
-                        masked_data[key] = value
-                    continue
-                
-                # 字符串内容自动检测脱敏
-                if isinstance(value, str):
-                    masked_data[key] = DataMasker.mask_string_content(value)
-                else:
-                    masked_data[key] = value
-            
-            return masked_data
+            plan = DataMasker.compile_plan(data.keys(), mask_amounts, mask_contacts)
+            return cls._mask_dict(data, plan, mask_amounts, mask_contacts)
         
         # 其他类型直接返回
         return data
     
+    @classmethod
+    def _mask_list(cls, items: List, mask_amounts: bool, mask_contacts: bool) -> List:
+        """脱敏列表，连续的同结构记录复用上一条的脱敏计划"""
+        result = []
+        last_keys = None
+        plan = ()
+        for item in items:
+            if isinstance(item, dict):
+                keys = tuple(item.keys())
+                if keys != last_keys:
+                    plan = DataMasker.compile_plan(keys, mask_amounts, mask_contacts)
+                    last_keys = keys
+                result.append(cls._mask_dict(item, plan, mask_amounts, mask_contacts))
+            else:
+                result.append(cls.mask_erp_response(item, mask_amounts, mask_contacts))
+        return result
+    
+    @classmethod
+    def _mask_dict(cls, data: Dict, plan: tuple, mask_amounts: bool, mask_contacts: bool) -> Dict:
+        """按已编译的计划脱敏单条记录"""
+        masked_data = {}
+        for key, action in plan:
+            value = data[key]
+            # 完全隐藏的字段
+            if action == DataMasker.ACTION_HIDDEN:
+                masked_data[key] = "[已隐藏]"
+            # 递归处理嵌套对象
+            elif isinstance(value, (dict, list)):
+                masked_data[key] = cls.mask_erp_response(value, mask_amounts, mask_contacts)
+            else:
+                masked_data[key] = DataMasker.apply_action(action, value)
+        return masked_data
+    
     @classmethod
     def filter_sensitive_fields(
         cls, 
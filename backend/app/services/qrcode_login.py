@@ -6,18 +6,20 @@
 import os
 import json
 import asyncio
-from typing import Optional, Dict, Any, List
+import importlib.util
+from typing import Optional, Dict, Any, List, TYPE_CHECKING
 from datetime import datetime, timedelta
 from loguru import logger
 from uuid import uuid4
 
-try:
-    from playwright.async_api import async_playwright, Browser, BrowserContext, Page
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
+# Playwright 在首次启动浏览器时才导入
+PLAYWRIGHT_AVAILABLE = importlib.util.find_spec("playwright") is not None
+if not PLAYWRIGHT_AVAILABLE:
     logger.warning("Playwright 未安装，扫码登录功能不可用")
 
+if TYPE_CHECKING:
+    from playwright.async_api import Browser
+
 from app.models.database import AsyncSessionLocal
 from sqlalchemy import text
 
@@ -57,7 +59,7 @@ class QRCodeLoginService:
     }
     
     def __init__(self):
-        self.browser: Optional[Browser] = None
+        self.browser: Optional["Browser"] = None
         self.playwright = None
         self.active_sessions: Dict[str, Dict] = {}  # session_id -> {context, page, platform}
     
@@ -67,6 +69,7 @@ class QRCodeLoginService:
             raise RuntimeError("Playwright 未安装")
         
         if self.browser is None:
+            from playwright.async_api import async_playwright
             self.playwright = await async_playwright().start()
             self.browser = await self.playwright.chromium.launch(
                 headless=True,
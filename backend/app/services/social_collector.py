@@ -1,25 +1,193 @@
 """
 社交媒体素材采集服务
 使用 Playwright 实现小红书、抖音、B站的素材采集
+
+- 浏览器上下文池：每个平台预热若干个已加载登录状态的上下文，采集时借用、用完归还
+- 平台 × 关键词并发采集，按平台限制并发数和请求间隔
+- 采集页面拦截图片/字体/媒体请求（只解析DOM，不需要渲染资源）
+- 采集结果交给素材入库服务批量写入（URL和缩略图去重）
 """
 import os
 import json
 import asyncio
-from typing import Optional, Dict, Any, List
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, AsyncIterator, TYPE_CHECKING
 from datetime import datetime, timedelta
 from pathlib import Path
 from loguru import logger
 
-try:
-    from playwright.async_api import async_playwright, Browser, BrowserContext, Page
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
+# Playwright 在首次启动浏览器时才导入（导入本身较重，不采集的实例不需要加载）
+PLAYWRIGHT_AVAILABLE = importlib.util.find_spec("playwright") is not None
+if not PLAYWRIGHT_AVAILABLE:
     logger.warning("Playwright 未安装，社交媒体采集功能不可用")
 
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext, Page
+
 from app.models.database import AsyncSessionLocal
+from app.core.config import settings
+from app.core.rate_limiter import RateLimiter
+from app.services.asset_ingestion import asset_ingestion
 from sqlalchemy import text
 
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+class BrowserContextPool:
+    """
+    浏览器上下文池
+    每个平台最多 size 个上下文，创建时加载该平台的登录Cookie并设置资源拦截；
+    page() 借出一个上下文并新开页面，退出时关闭页面、归还上下文
+    
+    空闲队列中的 None 表示空出了一个名额（上下文被丢弃或池被重置），取到的借用方改为新建上下文
+    """
+    
+    def __init__(self, collector: "SocialMediaCollector", size: int = 2, blocked_resources: str = ""):
+        self.collector = collector
+        self.size = max(1, size)
+        self.blocked_resources = {r.strip() for r in blocked_resources.split(",") if r.strip()}
+        self._cookies: Dict[str, Optional[List[Dict]]] = {}
+        self._idle: Dict[str, asyncio.Queue] = {}
+        self._contexts: Dict[str, List["BrowserContext"]] = {}
+        self._lock = asyncio.Lock()
+    
+    async def refresh(self, platform: str) -> bool:
+        """
+        重新读取平台登录状态；Cookie 变化（重新登录/退出）时丢弃旧上下文
+        
+        Returns:
+            平台是否已登录
+        """
+        cookies = await self.collector.load_login_state(platform)
+        if platform in self._cookies and cookies != self._cookies[platform]:
+            await self.reset(platform)
+        self._cookies[platform] = cookies
+        return bool(cookies)
+    
+    async def logged_in(self, platform: str) -> bool:
+        """平台是否已登录（首次调用时读取登录状态）"""
+        if platform not in self._cookies:
+            return await self.refresh(platform)
+        return bool(self._cookies[platform])
+    
+    async def warm(self, platform: str):
+        """预热：把平台上下文补足到 size 个"""
+        if not await self.logged_in(platform):
+            return
+        async with self._lock:
+            missing = self.size - len(self._contexts.get(platform, []))
+            created = await asyncio.gather(
+                *(self._new_context(platform) for _ in range(missing)),
+                return_exceptions=True
+            )
+        for context in created:
+            if isinstance(context, Exception):
+                logger.warning(f"[小采] {platform} 预热浏览器上下文失败: {context}")
+            else:
+                self._idle_queue(platform).put_nowait(context)
+    
+    @asynccontextmanager
+    async def page(self, platform: str) -> AsyncIterator["Page"]:
+        """借出一个已登录的上下文并新开页面"""
+        context = await self._acquire(platform)
+        page = None
+        try:
+            page = await context.new_page()
+            yield page
+        except Exception:
+            if page is None:
+                # 上下文已不可用（如浏览器崩溃），丢弃
+                await self._discard(platform, context)
+                context = None
+            raise
+        finally:
+            if context is not None:
+                try:
+                    if page is not None:
+                        await page.close()
+                    self._release(platform, context)
+                except Exception:
+                    await self._discard(platform, context)
+    
+    async def reset(self, platform: Optional[str] = None):
+        """关闭平台（不传则全部）的上下文"""
+        platforms = [platform] if platform else list(self._contexts)
+        for name in platforms:
+            contexts = self._contexts.pop(name, [])
+            self._cookies.pop(name, None)
+            queue = self._idle.get(name)
+            if queue is not None:
+                while not queue.empty():
+                    queue.get_nowait()
+            for context in contexts:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            # 唤醒等待中的借用方（关闭完成后再放入，借用方新建上下文时读取的是刷新后的Cookie）
+            if queue is not None:
+                for _ in range(self.size):
+                    queue.put_nowait(None)
+    
+    # ========== 内部方法 ==========
+    
+    def _idle_queue(self, platform: str) -> asyncio.Queue:
+        if platform not in self._idle:
+            self._idle[platform] = asyncio.Queue()
+        return self._idle[platform]
+    
+    async def _acquire(self, platform: str) -> "BrowserContext":
+        queue = self._idle_queue(platform)
+        while True:
+            if queue.empty():
+                async with self._lock:
+                    if len(self._contexts.get(platform, [])) < self.size:
+                        return await self._new_context(platform)
+            context = await queue.get()
+            # None 或重置前的上下文：名额已空出，重新尝试新建
+            if context is not None and context in self._contexts.get(platform, []):
+                return context
+    
+    def _release(self, platform: str, context: "BrowserContext"):
+        """归还上下文；池已重置（上下文不再属于池）时只归还名额"""
+        if context in self._contexts.get(platform, []):
+            self._idle_queue(platform).put_nowait(context)
+        else:
+            self._idle_queue(platform).put_nowait(None)
+    
+    async def _new_context(self, platform: str) -> "BrowserContext":
+        """创建上下文（调用方持有 self._lock）"""
+        browser = await self.collector.init_browser()
+        context = await browser.new_context(
+            viewport={"width": 1280, "height": 720},
+            user_agent=USER_AGENT
+        )
+        cookies = self._cookies.get(platform)
+        if cookies:
+            await context.add_cookies(cookies)
+        if self.blocked_resources:
+            await context.route("**/*", self._route)
+        self._contexts.setdefault(platform, []).append(context)
+        return context
+    
+    async def _route(self, route):
+        if route.request.resource_type in self.blocked_resources:
+            await route.abort()
+        else:
+            await route.continue_()
+    
+    async def _discard(self, platform: str, context: "BrowserContext"):
+        contexts = self._contexts.get(platform, [])
+        if context in contexts:
+            contexts.remove(context)
+        try:
+            await context.close()
+        except Exception:
+            pass
+        # 空出的名额交给等待中的借用方
+        self._idle_queue(platform).put_nowait(None)
+
 
 class SocialMediaCollector:
     """社交媒体素材采集器"""
@@ -30,19 +198,29 @@ class SocialMediaCollector:
             "name": "小红书",
             "login_url": "https://www.xiaohongshu.com",
             "search_url": "https://www.xiaohongshu.com/search_result?keyword={keyword}&source=web_search_result_notes",
-            "cookie_domain": ".xiaohongshu.com"
+            "cookie_domain": ".xiaohongshu.com",
+            "browser": True,
+            "concurrency": 2,  # 同时采集的关键词数
+            "min_interval": 3.0  # 相邻两次搜索的最短间隔（秒）
         },
         "douyin": {
             "name": "抖音",
             "login_url": "https://www.douyin.com",
             "search_url": "https://www.douyin.com/search/{keyword}?type=video",
-            "cookie_domain": ".douyin.com"
+            "cookie_domain": ".douyin.com",
+            "browser": True,
+            "concurrency": 2,
+            "min_interval": 3.0
         },
         "bilibili": {
             "name": "B站",
             "login_url": "https://www.bilibili.com",
             "search_url": "https://search.bilibili.com/all?keyword={keyword}&order=totalrank",
-            "cookie_domain": ".bilibili.com"
+            "api_url": "https://api.bilibili.com/x/web-interface/search/type",
+            "cookie_domain": ".bilibili.com",
+            "browser": False,
+            "concurrency": 3,
+            "min_interval": 1.0
         }
     }
     
@@ -59,37 +237,51 @@ class SocialMediaCollector:
     ]
     
     def __init__(self):
-        self.browser: Optional[Browser] = None
+        self.browser: Optional["Browser"] = None
+        self._playwright = None
+        self._browser_lock = asyncio.Lock()
         self.browser_state_dir = Path("/tmp/browser_states")
         self.browser_state_dir.mkdir(parents=True, exist_ok=True)
-        
+        self.pool = BrowserContextPool(
+            self,
+            size=settings.SOCIAL_CONTEXT_POOL_SIZE,
+            blocked_resources=settings.SOCIAL_BLOCK_RESOURCES
+        )
+    
     async def init_browser(self):
         """初始化浏览器"""
         if not PLAYWRIGHT_AVAILABLE:
             raise RuntimeError("Playwright 未安装")
-            
-        if self.browser is None:
-            playwright = await async_playwright().start()
-            self.browser = await playwright.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-gpu',
-                    '--disable-software-rasterizer',
-                    '--disable-extensions',
-                    '--single-process'
-                ]
-            )
-            logger.info("[小采] Playwright 浏览器已启动")
+        
+        async with self._browser_lock:
+            if self.browser is None or not self.browser.is_connected():
+                if self._playwright is None:
+                    from playwright.async_api import async_playwright
+                    self._playwright = await async_playwright().start()
+                # 不使用 --single-process：多个上下文并发采集时单进程模式容易整体崩溃
+                self.browser = await self._playwright.chromium.launch(
+                    headless=True,
+                    args=[
+                        '--no-sandbox',
+                        '--disable-setuid-sandbox',
+                        '--disable-dev-shm-usage',
+                        '--disable-gpu',
+                        '--disable-software-rasterizer',
+                        '--disable-extensions'
+                    ]
+                )
+                logger.info("[小采] Playwright 浏览器已启动")
         return self.browser
     
     async def close_browser(self):
         """关闭浏览器"""
+        await self.pool.reset()
         if self.browser:
             await self.browser.close()
             self.browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
     
     def _get_state_path(self, platform: str) -> str:
         """获取平台状态文件路径"""
@@ -120,7 +312,7 @@ class SocialMediaCollector:
             # 创建新的浏览器上下文
             context = await browser.new_context(
                 viewport={"width": 1280, "height": 720},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+                user_agent=USER_AGENT
             )
             
             page = await context.new_page()
@@ -136,7 +328,7 @@ class SocialMediaCollector:
                 "screenshot_path": screenshot_path,
                 "message": f"请使用 {config['name']} App 扫描二维码登录"
             }
-            
+        
         except Exception as e:
             logger.error(f"启动登录会话失败: {e}")
             return {
@@ -191,7 +383,7 @@ class SocialMediaCollector:
                     "total_collected": row[5] or 0,
                     "today_collected": row[6] or 0
                 }
-                
+        
         except Exception as e:
             logger.error(f"检查登录状态失败: {e}")
             return {
@@ -239,7 +431,7 @@ class SocialMediaCollector:
                 await db.commit()
                 logger.info(f"[小采] {platform} 登录状态已保存")
                 return True
-                
+        
         except Exception as e:
             logger.error(f"保存登录状态失败: {e}")
             return False
@@ -257,7 +449,7 @@ class SocialMediaCollector:
                 if row and row[0]:
                     return json.loads(row[0])
                 return None
-                
+        
         except Exception as e:
             logger.error(f"加载登录状态失败: {e}")
             return None
@@ -267,67 +459,63 @@ class SocialMediaCollector:
         results = []
         
         try:
-            cookies = await self.load_login_state("xiaohongshu")
-            if not cookies:
+            if not await self.pool.logged_in("xiaohongshu"):
                 logger.warning("[小采] 小红书未登录，跳过采集")
                 return results
             
-            browser = await self.init_browser()
-            context = await browser.new_context(
-                viewport={"width": 1280, "height": 720},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            )
-            
-            # 加载Cookie
-            await context.add_cookies(cookies)
-            
-            page = await context.new_page()
-            search_url = self.PLATFORMS["xiaohongshu"]["search_url"].format(keyword=keyword)
-            
-            logger.info(f"[小采] 正在访问小红书: {search_url}")
-            await page.goto(search_url, wait_until="domcontentloaded", timeout=60000)
-            await asyncio.sleep(5)  # 等待动态加载
-            
-            # 解析搜索结果
-            notes = await page.query_selector_all('section.note-item')
-            
-            for i, note in enumerate(notes[:max_results]):
-                try:
-                    # 获取标题
-                    title_el = await note.query_selector('.title span')
-                    title = await title_el.inner_text() if title_el else f"小红书笔记_{i}"
-                    
-                    # 获取封面图
-                    img_el = await note.query_selector('img')
-                    cover_url = await img_el.get_attribute('src') if img_el else None
-                    
-                    # 获取链接
-                    link_el = await note.query_selector('a')
-                    link = await link_el.get_attribute('href') if link_el else None
-                    
-                    if cover_url:
-                        results.append({
-                            "name": title[:50],
-                            "platform": "xiaohongshu",
-                            "source_url": f"https://www.xiaohongshu.com{link}" if link else None,
-                            "file_url": cover_url,
-                            "thumbnail_url": cover_url,
-                            "type": "image",
-                            "tags": [keyword, "小红书"],
-                            "description": title
-                        })
-                except Exception as e:
-                    logger.debug(f"解析小红书笔记失败: {e}")
-                    continue
+            async with self.pool.page("xiaohongshu") as page:
+                search_url = self.PLATFORMS["xiaohongshu"]["search_url"].format(keyword=keyword)
+                
+                logger.info(f"[小采] 正在访问小红书: {search_url}")
+                await page.goto(search_url, wait_until="domcontentloaded", timeout=60000)
+                await self._wait_for_items(page, 'section.note-item', timeout=5000)  # 等待动态加载
+                
+                # 解析搜索结果
+                notes = await page.query_selector_all('section.note-item')
+                results = await self._parse_xiaohongshu_notes(notes[:max_results], keyword)
             
-            await context.close()
             logger.info(f"[小采] 从小红书采集到 {len(results)} 个素材")
-            
+        
         except Exception as e:
             logger.error(f"[小采] 小红书采集失败: {e}")
         
         return results
     
+    async def _parse_xiaohongshu_notes(self, notes: list, keyword: str) -> List[Dict[str, Any]]:
+        """解析小红书搜索结果中的笔记卡片"""
+        results = []
+        
+        for i, note in enumerate(notes):
+            try:
+                # 获取标题
+                title_el = await note.query_selector('.title span')
+                title = await title_el.inner_text() if title_el else f"小红书笔记_{i}"
+                
+                # 获取封面图
+                img_el = await note.query_selector('img')
+                cover_url = await img_el.get_attribute('src') if img_el else None
+                
+                # 获取链接
+                link_el = await note.query_selector('a')
+                link = await link_el.get_attribute('href') if link_el else None
+                
+                if cover_url:
+                    results.append({
+                        "name": title[:50],
+                        "platform": "xiaohongshu",
+                        "source_url": f"https://www.xiaohongshu.com{link}" if link else None,
+                        "file_url": cover_url,
+                        "thumbnail_url": cover_url,
+                        "type": "image",
+                        "tags": [keyword, "小红书"],
+                        "description": title
+                    })
+            except Exception as e:
+                logger.debug(f"解析小红书笔记失败: {e}")
+                continue
+        
+        return results
+    
     async def collect_from_bilibili(self, keyword: str, max_results: int = 10) -> List[Dict[str, Any]]:
         """从B站采集素材（B站API相对开放，可以不登录采集）"""
         results = []
@@ -338,7 +526,7 @@ class SocialMediaCollector:
             # 使用B站搜索API
             async with httpx.AsyncClient() as client:
                 response = await client.get(
-                    "https://api.bilibili.com/x/web-interface/search/type",
+                    self.PLATFORMS["bilibili"]["api_url"],
                     params={
                         "keyword": keyword,
                         "search_type": "video",
@@ -374,7 +562,7 @@ class SocialMediaCollector:
                             })
             
             logger.info(f"[小采] 从B站采集到 {len(results)} 个素材")
-            
+        
         except Exception as e:
             logger.error(f"[小采] B站采集失败: {e}")
         
@@ -385,95 +573,116 @@ class SocialMediaCollector:
         results = []
         
         try:
-            cookies = await self.load_login_state("douyin")
-            if not cookies:
+            if not await self.pool.logged_in("douyin"):
                 logger.warning("[小采] 抖音未登录，跳过采集")
                 return results
             
-            browser = await self.init_browser()
-            context = await browser.new_context(
-                viewport={"width": 1280, "height": 720},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            )
-            
-            await context.add_cookies(cookies)
-            page = await context.new_page()
-            
-            search_url = self.PLATFORMS["douyin"]["search_url"].format(keyword=keyword)
-            await page.goto(search_url, wait_until="networkidle", timeout=30000)
-            await asyncio.sleep(3)
-            
-            # 解析视频列表
-            videos = await page.query_selector_all('[class*="video-card"]')
-            
-            for i, video in enumerate(videos[:max_results]):
-                try:
-                    # 获取封面
-                    img_el = await video.query_selector('img')
-                    cover_url = await img_el.get_attribute('src') if img_el else None
-                    
-                    # 获取标题
-                    title_el = await video.query_selector('[class*="title"]')
-                    title = await title_el.inner_text() if title_el else f"抖音视频_{i}"
-                    
-                    if cover_url:
-                        results.append({
-                            "name": title[:50],
-                            "platform": "douyin",
-                            "source_url": None,
-                            "file_url": cover_url,
-                            "thumbnail_url": cover_url,
-                            "type": "video",
-                            "tags": [keyword, "抖音"],
-                            "description": title
-                        })
-                except Exception as e:
-                    logger.debug(f"解析抖音视频失败: {e}")
-                    continue
+            async with self.pool.page("douyin") as page:
+                search_url = self.PLATFORMS["douyin"]["search_url"].format(keyword=keyword)
+                # 图片/媒体请求已拦截，不必等待 networkidle
+                await page.goto(search_url, wait_until="domcontentloaded", timeout=30000)
+                await self._wait_for_items(page, '[class*="video-card"]', timeout=3000)
+                
+                # 解析视频列表
+                videos = await page.query_selector_all('[class*="video-card"]')
+                results = await self._parse_douyin_videos(videos[:max_results], keyword)
             
-            await context.close()
             logger.info(f"[小采] 从抖音采集到 {len(results)} 个素材")
-            
+        
         except Exception as e:
             logger.error(f"[小采] 抖音采集失败: {e}")
         
         return results
     
+    async def _parse_douyin_videos(self, videos: list, keyword: str) -> List[Dict[str, Any]]:
+        """解析抖音搜索结果中的视频卡片"""
+        results = []
+        
+        for i, video in enumerate(videos):
+            try:
+                # 获取封面
+                img_el = await video.query_selector('img')
+                cover_url = await img_el.get_attribute('src') if img_el else None
+                
+                # 获取标题
+                title_el = await video.query_selector('[class*="title"]')
+                title = await title_el.inner_text() if title_el else f"抖音视频_{i}"
+                
+                if cover_url:
+                    results.append({
+                        "name": title[:50],
+                        "platform": "douyin",
+                        "source_url": None,
+                        "file_url": cover_url,
+                        "thumbnail_url": cover_url,
+                        "type": "video",
+                        "tags": [keyword, "抖音"],
+                        "description": title
+                    })
+            except Exception as e:
+                logger.debug(f"解析抖音视频失败: {e}")
+                continue
+        
+        return results
+    
+    async def _wait_for_items(self, page: "Page", selector: str, timeout: int):
+        """等待搜索结果出现，超时后按已渲染的内容解析（替代固定时长的 sleep）"""
+        try:
+            await page.wait_for_selector(selector, timeout=timeout)
+        except Exception:
+            logger.debug(f"[小采] 等待 {selector} 超时，按当前页面解析")
+    
     async def run_collection(
         self, 
         platforms: List[str] = None, 
         keywords: List[str] = None,
         max_per_platform: int = 5
     ) -> Dict[str, Any]:
-        """运行采集任务"""
+        """运行采集任务（平台 × 关键词并发，按平台限流）"""
         platforms = platforms or ["bilibili"]  # 默认只采集B站（不需要登录）
         keywords = keywords or self.SEARCH_KEYWORDS[:2]
         
-        all_results = []
-        platform_stats = {}
-        
+        collectors = {
+            "xiaohongshu": self.collect_from_xiaohongshu,
+            "bilibili": self.collect_from_bilibili,
+            "douyin": self.collect_from_douyin,
+        }
+        platform_stats = {platform: 0 for platform in platforms}
+        supported = []
         for platform in platforms:
-            platform_results = []
-            
-            for keyword in keywords:
+            if platform in collectors:
+                supported.append(platform)
+            else:
+                logger.warning(f"[小采] 不支持的平台: {platform}")
+        
+        # 需要浏览器的平台：重新读取登录状态并预热上下文
+        browser_platforms = [p for p in supported if self.PLATFORMS[p].get("browser")]
+        await asyncio.gather(*(self.pool.refresh(p) for p in browser_platforms))
+        await asyncio.gather(*(self.pool.warm(p) for p in browser_platforms))
+        
+        limiters = {
+            platform: RateLimiter(
+                concurrency=self.PLATFORMS[platform].get("concurrency", 1),
+                min_interval=self.PLATFORMS[platform].get("min_interval", 0)
+            )
+            for platform in supported
+        }
+        
+        async def collect(platform: str, keyword: str) -> List[Dict[str, Any]]:
+            async with limiters[platform].slot():
                 try:
-                    if platform == "xiaohongshu":
-                        results = await self.collect_from_xiaohongshu(keyword, max_per_platform)
-                    elif platform == "bilibili":
-                        results = await self.collect_from_bilibili(keyword, max_per_platform)
-                    elif platform == "douyin":
-                        results = await self.collect_from_douyin(keyword, max_per_platform)
-                    else:
-                        logger.warning(f"[小采] 不支持的平台: {platform}")
-                        continue
-                    
-                    platform_results.extend(results)
-                    
+                    return await collectors[platform](keyword, max_per_platform)
                 except Exception as e:
                     logger.error(f"[小采] {platform} 采集 {keyword} 失败: {e}")
-            
-            all_results.extend(platform_results)
-            platform_stats[platform] = len(platform_results)
+                    return []
+        
+        jobs = [(platform, keyword) for platform in supported for keyword in keywords]
+        outcomes = await asyncio.gather(*(collect(platform, keyword) for platform, keyword in jobs))
+        
+        all_results = []
+        for (platform, _), results in zip(jobs, outcomes):
+            all_results.extend(results)
+            platform_stats[platform] += len(results)
         
         # 保存到数据库
         saved_count = 0
@@ -491,55 +700,10 @@ class SocialMediaCollector:
         }
     
     async def _save_results(self, results: List[Dict]) -> int:
-        """保存采集结果到数据库"""
-        saved = 0
-        skipped = 0
-        
-        for item in results:
-            file_url = item.get("file_url")
-            name = item.get("name", "未命名")[:100]
-            
-            # 跳过无效数据
-            if not file_url:
-                logger.debug(f"[小采] 跳过无file_url的素材: {name}")
-                skipped += 1
-                continue
-            
-            try:
-                async with AsyncSessionLocal() as db:
-                    # 检查是否已存在
-                    check = await db.execute(
-                        text("SELECT id FROM assets WHERE file_url = :url"),
-                        {"url": file_url}
-                    )
-                    if check.fetchone():
-                        skipped += 1
-                        continue
-                    
-                    # 插入新素材
-                    await db.execute(
-                        text("""
-                            INSERT INTO assets (name, type, category, file_url, thumbnail_url, description)
-                            VALUES (:name, :type, :category, :file_url, :thumbnail_url, :description)
-                        """),
-                        {
-                            "name": name,
-                            "type": item.get("type", "video"),
-                            "category": item.get("platform", "unknown"),
-                            "file_url": file_url,
-                            "thumbnail_url": item.get("thumbnail_url") or file_url,
-                            "description": (item.get("description", "") or "")[:500]
-                        }
-                    )
-                    await db.commit()
-                    saved += 1
-                    logger.info(f"[小采] 保存素材成功: {name}")
-                    
-            except Exception as e:
-                logger.error(f"[小采] 保存素材失败 ({name}): {e}")
-        
-        logger.info(f"[小采] 素材保存完成，成功 {saved} 个，跳过 {skipped} 个")
-        return saved
+        """保存采集结果到数据库（批量入库，按URL和缩略图去重）"""
+        stats = await asset_ingestion.ingest(results, collected_by="social_collector")
+        logger.info(f"[小采] 素材保存完成，成功 {stats['saved']} 个，跳过 {len(results) - stats['saved']} 个")
+        return stats["saved"]
     
     async def _update_stats(self, platform_stats: Dict[str, int]):
         """更新平台采集统计"""
@@ -6,9 +6,9 @@ import json
 import hashlib
 import hmac
 import time
-import asyncio
 from typing import Dict, Any, Optional
 from datetime import datetime
+from urllib.parse import urlparse
 from loguru import logger
 import httpx
 from sqlalchemy import text
@@ -26,11 +26,9 @@ class SpeechRecognitionService:
         self.secret_key = getattr(settings, 'TENCENT_SECRET_KEY', '') or ''
         self.region = "ap-guangzhou"
         self.service = "asr"
-        self.host = "asr.tencentcloudapi.com"
-        self.endpoint = f"https://{self.host}"
+        self.endpoint = settings.TENCENT_ASR_ENDPOINT.rstrip("/")
+        self.host = urlparse(self.endpoint).netloc
         
-        # 轮询间隔（秒）
-        self.poll_interval = 5
         self.max_wait_time = 3600  # 最长等待1小时
     
     def get_config_status(self) -> dict:
@@ -60,7 +58,7 @@ class SpeechRecognitionService:
             audio_url: 音频文件URL（需要公网可访问）
             meeting_id: 关联的会议ID
             audio_format: 音频格式（mp3/wav/m4a/amr等）
-            callback_url: 任务完成回调URL（可选）
+            callback_url: 任务完成回调URL（可选，默认使用 TENCENT_ASR_CALLBACK_URL）
         
         Returns:
             任务信息
@@ -69,12 +67,18 @@ class SpeechRecognitionService:
             logger.error("腾讯云语音识别未配置")
             return {"success": False, "error": "语音识别服务未配置，请设置TENCENT_SECRET_ID和TENCENT_SECRET_KEY"}
         
+        callback_url = callback_url or settings.TENCENT_ASR_CALLBACK_URL or None
+        if callback_url and not settings.TENCENT_ASR_CALLBACK_TOKEN:
+            # 回调接口未配置 token 时拒绝所有回调，不注册回调地址，改为轮询
+            logger.warning("已设置 TENCENT_ASR_CALLBACK_URL 但未设置 TENCENT_ASR_CALLBACK_TOKEN，改为轮询转写结果")
+            callback_url = None
+        
         # 创建转写任务记录
-        task_id = await self._create_task_record(meeting_id, audio_url, audio_format)
+        task_id = await self._create_task_record(meeting_id, audio_url, audio_format, bool(callback_url))
         
         try:
             # 调用腾讯云API创建转写任务
-            result = await self._create_recognition_task(audio_url, audio_format)
+            result = await self._create_recognition_task(audio_url, audio_format, callback_url)
             
             if not result.get("success"):
                 await self._update_task_status(task_id, "failed", error=result.get("error"))
@@ -87,10 +91,9 @@ class SpeechRecognitionService:
             
             logger.info(f"语音转写任务已提交: {tencent_task_id}")
             
-            # 如果没有回调URL，开始轮询任务状态
-            if not callback_url:
-                # 在后台轮询
-                asyncio.create_task(self._poll_task_result(task_id, tencent_task_id, meeting_id))
+            # 交给跟踪器统一轮询（有回调时只做低频兜底）
+            from app.services.transcription_tracker import transcription_tracker
+            transcription_tracker.track(task_id, tencent_task_id, meeting_id, callback=bool(callback_url))
             
             return {
                 "success": True,
@@ -107,7 +110,8 @@ class SpeechRecognitionService:
     async def _create_recognition_task(
         self,
         audio_url: str,
-        audio_format: str
+        audio_format: str,
+        callback_url: Optional[str] = None
     ) -> Dict[str, Any]:
         """调用腾讯云API创建识别任务"""
         # 请求参数
@@ -118,6 +122,8 @@ class SpeechRecognitionService:
             "SourceType": 0,  # URL方式
             "Url": audio_url,
         }
+        if callback_url:
+            params["CallbackUrl"] = callback_url
         
         # 格式映射
         format_map = {
@@ -161,60 +167,6 @@ class SpeechRecognitionService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    async def _poll_task_result(
-        self,
-        task_id: str,
-        tencent_task_id: str,
-        meeting_id: Optional[str]
-    ):
-        """轮询任务结果"""
-        start_time = time.time()
-        
-        while time.time() - start_time < self.max_wait_time:
-            try:
-                result = await self._query_task_result(tencent_task_id)
-                
-                if result.get("status") == "completed":
-                    # 任务完成
-                    transcription = result.get("result", "")
-                    await self._update_task_status(
-                        task_id, 
-                        "completed",
-                        result_text=transcription
-                    )
-                    
-                    # 更新会议记录
-                    if meeting_id:
-                        await self._update_meeting_transcription(meeting_id, transcription)
-                        # 生成会议纪要
-                        await self._generate_meeting_summary(meeting_id, transcription)
-                    
-                    logger.info(f"语音转写完成: {task_id}")
-                    return
-                    
-                elif result.get("status") == "failed":
-                    await self._update_task_status(
-                        task_id,
-                        "failed",
-                        error=result.get("error", "Unknown error")
-                    )
-                    logger.error(f"语音转写失败: {task_id} - {result.get('error')}")
-                    return
-                
-                # 更新进度
-                progress = result.get("progress", 0)
-                await self._update_task_progress(task_id, progress)
-                
-            except Exception as e:
-                logger.warning(f"查询转写任务状态失败: {e}")
-            
-            # 等待后继续轮询
-            await asyncio.sleep(self.poll_interval)
-        
-        # 超时
-        await self._update_task_status(task_id, "failed", error="任务超时")
-        logger.error(f"语音转写任务超时: {task_id}")
-    
     async def _query_task_result(self, tencent_task_id: str) -> Dict[str, Any]:
         """查询腾讯云任务结果"""
         params = {
@@ -334,21 +286,23 @@ class SpeechRecognitionService:
         self,
         meeting_id: Optional[str],
         audio_url: str,
-        audio_format: str
+        audio_format: str,
+        callback_mode: bool = False
     ) -> str:
         """创建转写任务记录"""
         async with AsyncSessionLocal() as db:
             result = await db.execute(
                 text("""
                     INSERT INTO speech_transcription_tasks 
-                    (meeting_id, audio_url, audio_format, status)
-                    VALUES (:meeting_id, :audio_url, :audio_format, 'pending')
+                    (meeting_id, audio_url, audio_format, status, callback_mode)
+                    VALUES (:meeting_id, :audio_url, :audio_format, 'pending', :callback_mode)
                     RETURNING id
                 """),
                 {
                     "meeting_id": meeting_id,
                     "audio_url": audio_url,
-                    "audio_format": audio_format
+                    "audio_format": audio_format,
+                    "callback_mode": callback_mode
                 }
             )
             row = result.fetchone()
@@ -397,15 +351,6 @@ class SpeechRecognitionService:
             )
             await db.commit()
     
-    async def _update_task_progress(self, task_id: str, progress: int):
-        """更新任务进度"""
-        async with AsyncSessionLocal() as db:
-            await db.execute(
-                text("UPDATE speech_transcription_tasks SET progress = :progress WHERE id = :id"),
-                {"id": task_id, "progress": progress}
-            )
-            await db.commit()
-    
     async def _update_meeting_transcription(self, meeting_id: str, transcription: str):
         """更新会议转写结果"""
         async with AsyncSessionLocal() as db:
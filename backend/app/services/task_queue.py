@@ -12,7 +12,7 @@ from loguru import logger
 from sqlalchemy import text
 
 from app.core.config import settings
-from app.models.database import async_session_maker
+from app.models.database import async_session_maker, db_pool
 
 # 尝试导入Redis
 try:
@@ -283,6 +283,11 @@ class TaskQueue:
         logger.info(f"📦 启动 {worker_count} 个任务工作线程")
         
         async def worker():
+            # 队列任务（AI员工长任务）使用独立的 background 连接池
+            with db_pool("background"):
+                await work_loop()
+        
+        async def work_loop():
             while self.is_running:
                 try:
                     task = await self.dequeue()
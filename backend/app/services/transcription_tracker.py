@@ -0,0 +1,408 @@
+"""
+语音转写任务跟踪器
+负责：集中跟踪所有在途的腾讯云ASR录音文件识别任务
+
+相比每个会议一个“sleep → DescribeTaskStatus → UPDATE进度”的轮询协程，跟踪器：
+1. 单个后台循环统一轮询所有到期任务（有界并发），轮询间隔随任务已运行时长增长
+2. 进度/轮询时间合并为每轮一条 UPDATE，而不是每次查询都写库
+3. 进程重启后由定时任务从 speech_transcription_tasks 重新加载无人跟踪的在途任务
+4. 配置了回调地址时，腾讯云完成后主动回调，轮询只作为低频兜底
+任务完成时用条件更新抢占，多个 worker 同时跟踪同一任务也只会生成一次会议纪要
+"""
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+from loguru import logger
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.models.database import AsyncSessionLocal
+
+
+class TranscriptionTracker:
+    """腾讯云ASR任务跟踪器"""
+    
+    def __init__(
+        self,
+        service=None,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        callback_interval: float = 300.0,
+        backoff_ratio: float = 0.1,
+        max_concurrent_queries: Optional[int] = None,
+        persist: bool = True
+    ):
+        """
+        Args:
+            service: SpeechRecognitionService 实例（默认使用全局实例）
+            min_interval: 最短轮询间隔（秒）
+            max_interval: 最长轮询间隔（秒）
+            callback_interval: 回调模式下的兜底轮询间隔（秒）
+            backoff_ratio: 状态无变化时，轮询间隔 = 已运行时长 × 该比例（限制在最短/最长间隔之间），
+                完成后被发现的延迟约为任务时长的一半比例，短任务仍按最短间隔轮询
+            max_concurrent_queries: 单轮最大并发查询数（DescribeTaskStatus 有QPS限制）
+            persist: 是否写库（测试时可关闭）
+        """
+        self._service = service
+        self.min_interval = min_interval or settings.ASR_POLL_MIN_INTERVAL
+        self.max_interval = max_interval or settings.ASR_POLL_MAX_INTERVAL
+        self.callback_interval = callback_interval
+        self.backoff_ratio = backoff_ratio
+        self.max_concurrent_queries = max_concurrent_queries or settings.ASR_QUERY_CONCURRENCY
+        self.persist = persist
+        # tencent_task_id -> 跟踪状态
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._resume_lock = asyncio.Lock()
+    
+    @property
+    def service(self):
+        if self._service is None:
+            from app.services.speech_recognition_service import speech_recognition_service
+            self._service = speech_recognition_service
+        return self._service
+    
+    def track(
+        self,
+        task_id: str,
+        tencent_task_id: str,
+        meeting_id: Optional[str] = None,
+        callback: bool = False,
+        started_at: Optional[float] = None
+    ):
+        """
+        开始跟踪一个已提交的任务
+        
+        Args:
+            task_id: speech_transcription_tasks.id
+            tencent_task_id: 腾讯云任务ID
+            meeting_id: 关联会议ID
+            callback: 是否已配置回调（回调模式只做低频兜底轮询）
+            started_at: 任务提交时间戳（恢复任务时传入）
+        """
+        if tencent_task_id in self._tasks:
+            return
+        now = time.time()
+        interval = self.callback_interval if callback else self.min_interval
+        self._tasks[tencent_task_id] = {
+            "task_id": task_id,
+            "tencent_task_id": tencent_task_id,
+            "meeting_id": meeting_id,
+            "callback": callback,
+            "started_at": started_at or now,
+            "interval": interval,
+            "next_poll": now + interval,
+            "progress": None,
+        }
+        self._ensure_loop()
+    
+    async def wait(
+        self,
+        task_id: str,
+        timeout: Optional[float] = None,
+        poll_interval: float = 30.0
+    ) -> Dict[str, Any]:
+        """
+        等待任务结束
+        
+        本进程跟踪的任务结束时立即返回；任务由其他 worker 完成时（如回调落到其他进程、
+        重启后由其他进程恢复跟踪），每 poll_interval 秒查一次任务记录
+        
+        Returns:
+            {"status": "completed"/"failed", "result": 转写文本, "error": 错误信息}
+        
+        Raises:
+            asyncio.TimeoutError: 超过 timeout 仍未结束
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._waiters.setdefault(task_id, []).append(future)
+        deadline = None if timeout is None else loop.time() + timeout
+        try:
+            while True:
+                wait_for = poll_interval if deadline is None else min(poll_interval, deadline - loop.time())
+                if wait_for <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), timeout=wait_for)
+                except asyncio.TimeoutError:
+                    pass
+                finished = await self._load_result(task_id)
+                if finished:
+                    return finished
+        finally:
+            waiters = self._waiters.get(task_id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(task_id, None)
+    
+    def _ensure_loop(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._run())
+        self._wakeup.set()
+    
+    async def _run(self):
+        """主循环：每轮查询所有到期任务，没有任务时退出"""
+        semaphore = asyncio.Semaphore(self.max_concurrent_queries)
+        
+        async def query(entry):
+            async with semaphore:
+                return await self.service._query_task_result(entry["tencent_task_id"])
+        
+        while self._tasks:
+            now = time.time()
+            due = [t for t in self._tasks.values() if t["next_poll"] <= now]
+            
+            if due:
+                states = await asyncio.gather(*[query(t) for t in due], return_exceptions=True)
+                progress_updates = []
+                for entry, state in zip(due, states):
+                    if isinstance(state, Exception):
+                        state = {"status": "error", "error": str(state)}
+                    await self._handle_state(entry, state, progress_updates)
+                await self._flush(due, progress_updates)
+            
+            if not self._tasks:
+                break
+            
+            # 睡到最近一个任务到期，新任务加入时提前唤醒
+            sleep_for = max(0.0, min(t["next_poll"] for t in self._tasks.values()) - time.time())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_for)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _handle_state(self, entry: Dict[str, Any], state: Dict[str, Any], progress_updates: list):
+        """处理单个任务的查询结果"""
+        status = state.get("status")
+        if status == "completed":
+            await self._finish(entry, "completed", result=state.get("result", ""))
+            return
+        if status == "failed":
+            await self._finish(entry, "failed", error=state.get("error", "Unknown error"))
+            return
+        
+        now = time.time()
+        if now - entry["started_at"] > self.service.max_wait_time:
+            await self._finish(entry, "failed", error="任务超时")
+            return
+        
+        progress = state.get("progress")
+        changed = status == "processing" and progress != entry["progress"]
+        if changed:
+            entry["progress"] = progress
+            progress_updates.append((entry["task_id"], progress))
+        
+        # 回调模式保持低频兜底；状态有变化（等待中→执行中）时回到最短间隔，否则按已运行时长的比例退避
+        # （按次数指数退避时，短任务几轮后就退到几十秒一次，完成后要等很久才被发现）
+        if entry["callback"]:
+            entry["interval"] = self.callback_interval
+        elif changed:
+            entry["interval"] = self.min_interval
+        else:
+            elapsed = now - entry["started_at"]
+            entry["interval"] = min(max(self.min_interval, elapsed * self.backoff_ratio), self.max_interval)
+        entry["next_poll"] = now + entry["interval"]
+    
+    async def _finish(self, entry: Dict[str, Any], status: str, result: str = "", error: Optional[str] = None):
+        """任务结束：移出跟踪列表，交给后台完成处理，不阻塞轮询循环"""
+        self._tasks.pop(entry["tencent_task_id"], None)
+        asyncio.create_task(self.complete(entry["task_id"], entry["meeting_id"], status, result, error))
+    
+    async def complete(
+        self,
+        task_id: str,
+        meeting_id: Optional[str],
+        status: str,
+        result: str = "",
+        error: Optional[str] = None
+    ):
+        """
+        写入任务结果（轮询和回调共用）
+        
+        先用条件更新抢占，只有抢到的一方继续更新会议记录、生成纪要
+        """
+        claimed = await self._claim(task_id, status, result, error)
+        if claimed:
+            if status == "completed":
+                logger.info(f"语音转写完成: {task_id}")
+                if meeting_id:
+                    try:
+                        await self.service._update_meeting_transcription(meeting_id, result)
+                        await self.service._generate_meeting_summary(meeting_id, result)
+                    except Exception as e:
+                        logger.error(f"[语音转写] 处理转写结果失败: {e}")
+            else:
+                logger.error(f"语音转写失败: {task_id} - {error}")
+        
+        for future in self._waiters.pop(task_id, []):
+            if not future.done():
+                future.set_result({"status": status, "result": result, "error": error})
+    
+    async def handle_callback(self, tencent_task_id: str, code: int, result: str, message: str = "") -> bool:
+        """
+        处理腾讯云回调
+        
+        Returns:
+            是否找到对应任务
+        """
+        entry = self._tasks.pop(tencent_task_id, None)
+        if entry:
+            task_id, meeting_id = entry["task_id"], entry["meeting_id"]
+        else:
+            # 任务可能由其他 worker 提交，从数据库查找
+            row = await self._find_task(tencent_task_id)
+            if not row:
+                logger.warning(f"[语音转写] 回调任务不存在: {tencent_task_id}")
+                return False
+            task_id, meeting_id = row
+        
+        if code == 0:
+            await self.complete(task_id, meeting_id, "completed", result=result)
+        else:
+            await self.complete(task_id, meeting_id, "failed", error=message or f"code={code}")
+        return True
+    
+    # ========== 重启恢复 ==========
+    
+    async def resume_pending(self, stale_seconds: int = 120) -> int:
+        """
+        恢复跟踪无人轮询的在途任务（进程重启后遗留的任务）
+        
+        Returns:
+            恢复的任务数
+        """
+        if not self.persist or self._resume_lock.locked():
+            return 0
+        
+        async with self._resume_lock:
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(text("""
+                        SELECT id, tencent_task_id, meeting_id, EXTRACT(EPOCH FROM started_at), callback_mode
+                        FROM speech_transcription_tasks
+                        WHERE status = 'processing'
+                          AND tencent_task_id IS NOT NULL
+                          AND COALESCE(last_polled_at, started_at) < NOW() - make_interval(secs => :stale)
+                          AND started_at > NOW() - make_interval(secs => :max_wait)
+                    """), {"stale": stale_seconds, "max_wait": self.service.max_wait_time})
+                    rows = result.fetchall()
+            except Exception as e:
+                logger.warning(f"[语音转写] 加载在途任务失败: {e}")
+                return 0
+            
+            resumed = 0
+            for row in rows:
+                if row[1] in self._tasks:
+                    continue
+                self.track(
+                    str(row[0]), row[1],
+                    meeting_id=str(row[2]) if row[2] else None,
+                    callback=bool(row[4]),
+                    started_at=float(row[3]) if row[3] else None
+                )
+                # 恢复后立即查询一次
+                self._tasks[row[1]]["next_poll"] = time.time()
+                resumed += 1
+            
+            if resumed:
+                logger.info(f"[语音转写] 恢复跟踪 {resumed} 个在途任务")
+            return resumed
+    
+    # ========== 持久化 ==========
+    
+    async def _flush(self, polled: List[Dict[str, Any]], progress_updates: List[tuple]):
+        """合并写入本轮的轮询时间和进度变化（一条语句）"""
+        task_ids = [t["task_id"] for t in polled if t["tencent_task_id"] in self._tasks]
+        if not self.persist or not task_ids:
+            return
+        progress_map = dict(progress_updates)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("""
+                    UPDATE speech_transcription_tasks AS t
+                    SET last_polled_at = NOW(),
+                        progress = COALESCE(v.progress, t.progress)
+                    FROM (
+                        SELECT unnest(CAST(:ids AS uuid[])) AS id,
+                               unnest(CAST(:progress AS integer[])) AS progress
+                    ) AS v
+                    WHERE t.id = v.id
+                """), {
+                    "ids": task_ids,
+                    "progress": [progress_map.get(task_id) for task_id in task_ids],
+                })
+                await db.commit()
+        except Exception as e:
+            logger.debug(f"[语音转写] 更新轮询状态失败: {e}")
+    
+    async def _claim(self, task_id: str, status: str, result: str, error: Optional[str]) -> bool:
+        """条件更新任务终态，返回是否由本次调用完成"""
+        if not self.persist:
+            return True
+        try:
+            async with AsyncSessionLocal() as db:
+                row = await db.execute(text("""
+                    UPDATE speech_transcription_tasks
+                    SET status = :status,
+                        result_text = :result_text,
+                        error_message = :error,
+                        progress = CASE WHEN :status = 'completed' THEN 100 ELSE progress END,
+                        completed_at = NOW()
+                    WHERE id = :id AND status NOT IN ('completed', 'failed')
+                    RETURNING id
+                """), {"id": task_id, "status": status, "result_text": result or None, "error": error})
+                claimed = row.fetchone() is not None
+                await db.commit()
+                return claimed
+        except Exception as e:
+            logger.error(f"[语音转写] 更新任务状态失败: {e}")
+            return False
+    
+    async def _load_result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """读取已结束任务的结果，未结束或读取失败返回 None"""
+        if not self.persist:
+            return None
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(text("""
+                    SELECT status, result_text, error_message FROM speech_transcription_tasks
+                    WHERE id = :id AND status IN ('completed', 'failed')
+                """), {"id": task_id})
+                row = result.fetchone()
+                if row:
+                    return {"status": row[0], "result": row[1] or "", "error": row[2]}
+        except Exception as e:
+            logger.debug(f"[语音转写] 读取任务结果失败: {e}")
+        return None
+    
+    async def _find_task(self, tencent_task_id: str) -> Optional[tuple]:
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(text("""
+                    SELECT id, meeting_id FROM speech_transcription_tasks
+                    WHERE tencent_task_id = :tencent_task_id
+                """), {"tencent_task_id": tencent_task_id})
+                row = result.fetchone()
+                if row:
+                    return str(row[0]), str(row[1]) if row[1] else None
+        except Exception as e:
+            logger.warning(f"[语音转写] 查询任务失败: {e}")
+        return None
+
+
+# 全局实例
+transcription_tracker = TranscriptionTracker()
+
+
+async def resume_transcription_tasks():
+    """定时任务：恢复跟踪重启前遗留的语音转写任务"""
+    if not transcription_tracker.service.is_configured():
+        return
+    await transcription_tracker.resume_pending()
@@ -0,0 +1,197 @@
+"""
+TTS配音合成服务
+负责：按句切分旁白、有界并发调用 edge-tts、按内容缓存音频分句、无重编码拼接
+
+缓存键为 sha256(文本 + 语音 + 语速)，公司介绍、结尾号召等固定话术在不同视频间直接复用。
+"""
+import os
+import re
+import asyncio
+import importlib.util
+import hashlib
+import subprocess
+from typing import List, Optional
+from loguru import logger
+
+from app.core.config import settings
+from app.services.ffmpeg_composer import get_ffmpeg_binary
+from app.services.video_segment_cache import SegmentCache
+
+# edge-tts 在首次合成时才导入
+EDGE_TTS_AVAILABLE = importlib.util.find_spec("edge_tts") is not None
+
+# 句末标点（保留在句子中）
+_SENTENCE_END_RE = re.compile(r'([。！？!?；;\n]+|(?<=[a-zA-Z0-9])\.\s+)')
+
+
+class TTSSynthesizer:
+    """分句并发TTS合成器"""
+    
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        max_chunk_chars: int = 200,
+        cache: Optional[SegmentCache] = None
+    ):
+        self.concurrency = concurrency or settings.VIDEO_TTS_CONCURRENCY
+        # 所有 synthesize() 调用共用，同时生成多个视频时总并发也不超过上限
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.max_chunk_chars = max_chunk_chars
+        self.cache = cache or SegmentCache(
+            cache_dir=settings.VIDEO_TTS_CACHE_DIR,
+            max_bytes=settings.VIDEO_TTS_CACHE_MAX_MB * 1024 * 1024
+        )
+    
+    def split_sentences(self, text: str) -> List[str]:
+        """
+        按句末标点切分旁白，过短的句子与后句合并，过长的句子按长度硬切
+        
+        合并后的分句保持稳定，相同文案总能命中同一批缓存
+        """
+        parts = _SENTENCE_END_RE.split(text.strip())
+        sentences = []
+        # split 结果为 [句子, 标点, 句子, 标点, ...]
+        for i in range(0, len(parts), 2):
+            sentence = parts[i]
+            if i + 1 < len(parts):
+                sentence += parts[i + 1].strip()
+            sentence = sentence.strip()
+            if sentence:
+                sentences.append(sentence)
+        
+        chunks = []
+        buffer = ""
+        for sentence in sentences:
+            while len(sentence) > self.max_chunk_chars:
+                if buffer:
+                    chunks.append(buffer)
+                    buffer = ""
+                chunks.append(sentence[:self.max_chunk_chars])
+                sentence = sentence[self.max_chunk_chars:]
+            if buffer and len(buffer) + len(sentence) > self.max_chunk_chars:
+                chunks.append(buffer)
+                buffer = ""
+            buffer += sentence
+            # 短句（如“您好。”）单独合成语气生硬，凑到一定长度再切
+            if len(buffer) >= 12:
+                chunks.append(buffer)
+                buffer = ""
+        if buffer:
+            chunks.append(buffer)
+        return chunks
+    
+    @staticmethod
+    def chunk_key(text: str, voice: str, rate: str) -> str:
+        """分句缓存键"""
+        raw = f"{voice}\x00{rate}\x00{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    async def _synthesize_chunk(
+        self,
+        text: str,
+        voice: str,
+        rate: str,
+        max_retries: int
+    ) -> Optional[str]:
+        """合成单个分句（命中缓存直接返回）"""
+        key = self.chunk_key(text, voice, rate)
+        cached = self.cache.get(key, ext=".mp3")
+        if cached:
+            return cached
+        
+        import edge_tts
+        
+        async with self._semaphore:
+            temp_path = self.cache.temp_path_for(key, ext=".mp3")
+            for attempt in range(max_retries):
+                try:
+                    communicate = edge_tts.Communicate(text, voice, rate=rate)
+                    await communicate.save(temp_path)
+                    return self.cache.commit(temp_path, key, ext=".mp3")
+                except Exception as e:
+                    logger.warning(f"TTS分句生成失败 (尝试 {attempt + 1}/{max_retries}): {e}")
+                    if attempt < max_retries - 1:
+                        # 等待后重试，使用递增延迟
+                        await asyncio.sleep(2 * (attempt + 1))
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+    
+    def _concat(self, chunk_paths: List[str], output_path: str):
+        """拼接分句音频（流拷贝，不重新编码）"""
+        if len(chunk_paths) == 1:
+            with open(chunk_paths[0], "rb") as src, open(output_path, "wb") as dst:
+                dst.write(src.read())
+            return
+        
+        binary = get_ffmpeg_binary()
+        if binary:
+            list_path = f"{output_path}.txt"
+            with open(list_path, "w", encoding="utf-8") as f:
+                for path in chunk_paths:
+                    escaped = path.replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+            result = subprocess.run(
+                [binary, "-hide_banner", "-y", "-loglevel", "error",
+                 "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path],
+                capture_output=True,
+                text=True
+            )
+            os.remove(list_path)
+            if result.returncode == 0:
+                return
+            logger.warning(f"ffmpeg拼接TTS失败，改用直接拼接: {result.stderr[-200:]}")
+        
+        # MP3 由独立帧组成，直接按字节拼接即可播放
+        with open(output_path, "wb") as dst:
+            for path in chunk_paths:
+                with open(path, "rb") as src:
+                    dst.write(src.read())
+    
+    async def synthesize(
+        self,
+        text: str,
+        voice: str,
+        output_path: str,
+        rate: str = "+0%",
+        max_retries: int = 3
+    ) -> Optional[str]:
+        """
+        合成整段旁白
+        
+        Args:
+            text: 旁白文本
+            voice: edge-tts 语音名称（如 zh-CN-XiaoxiaoNeural）
+            output_path: 输出 mp3 路径
+            rate: 语速
+            max_retries: 每个分句的最大重试次数
+        
+        Returns:
+            输出路径；任一分句最终失败则返回 None
+        """
+        if not EDGE_TTS_AVAILABLE:
+            logger.warning("edge-tts未安装，跳过TTS生成")
+            return None
+        
+        chunks = self.split_sentences(text)
+        if not chunks:
+            return None
+        
+        paths = await asyncio.gather(*[
+            self._synthesize_chunk(chunk, voice, rate, max_retries)
+            for chunk in chunks
+        ])
+        
+        if not all(paths):
+            failed = sum(1 for p in paths if not p)
+            logger.error(f"TTS生成最终失败: {failed}/{len(chunks)} 个分句失败")
+            return None
+        
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self._concat, list(paths), output_path)
+        logger.info(f"TTS生成完成: {output_path} ({len(chunks)} 个分句)")
+        return output_path
+
+
+# 全局实例
+tts_synthesizer = TTSSynthesizer()
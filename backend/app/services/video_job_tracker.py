@@ -0,0 +1,449 @@
+"""
+视频生成任务跟踪器
+负责：可灵AI文生视频任务的提交、集中轮询、状态持久化与重启恢复
+
+相比每个片段独立“提交→sleep轮询”，跟踪器：
+1. 在提供方并发上限内提交片段，任一任务完成立即补位提交下一个
+2. 单个循环统一轮询所有在途任务，按是否有进展自适应调整间隔
+3. 任务状态写入 video_generation_jobs 表，进程重启后可继续跟踪；
+   同一批次重新合成时直接复用 KELING_REUSE_MAX_AGE 内生成的片段（视频URL有有效期）
+"""
+import json
+import time
+import asyncio
+import hashlib
+from typing import Dict, Any, List, Optional, Set
+from loguru import logger
+import httpx
+import jwt
+from sqlalchemy import text
+
+from app.models.database import AsyncSessionLocal
+from app.core.config import settings
+
+
+class ProviderRateLimited(Exception):
+    """提供方限流（HTTP 429）"""
+    pass
+
+
+class KlingVideoProvider:
+    """可灵AI文生视频接口"""
+    
+    def __init__(
+        self,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        api_url: Optional[str] = None
+    ):
+        self.access_key = access_key or settings.KELING_ACCESS_KEY
+        self.secret_key = secret_key or settings.KELING_SECRET_KEY
+        self.api_url = api_url or settings.KELING_API_URL
+    
+    def is_configured(self) -> bool:
+        return bool(self.access_key and self.secret_key)
+    
+    def _headers(self) -> Dict[str, str]:
+        """生成JWT认证头（token有效期30分钟，每次请求重新生成）"""
+        payload = {
+            "iss": self.access_key,
+            "exp": int(time.time()) + 1800,
+            "nbf": int(time.time()) - 5
+        }
+        token = jwt.encode(payload, self.secret_key, algorithm="HS256", headers={"alg": "HS256", "typ": "JWT"})
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+    
+    async def submit(self, client: httpx.AsyncClient, payload: Dict[str, Any]) -> str:
+        """提交生成任务，返回 task_id"""
+        response = await client.post(
+            f"{self.api_url}/v1/videos/text2video",
+            headers=self._headers(),
+            json=payload,
+            timeout=60.0
+        )
+        if response.status_code == 429:
+            raise ProviderRateLimited("API返回: 429 (请求过于频繁)")
+        if response.status_code != 200:
+            raise RuntimeError(f"API返回: {response.status_code}")
+        
+        task_id = response.json().get("data", {}).get("task_id")
+        if not task_id:
+            raise RuntimeError("API未返回task_id")
+        return task_id
+    
+    async def query(self, client: httpx.AsyncClient, task_id: str) -> Dict[str, Any]:
+        """
+        查询任务状态
+        
+        Returns:
+            {"status": "processing|succeed|failed", "video_url": ..., "error": ...}
+        """
+        response = await client.get(
+            f"{self.api_url}/v1/videos/text2video/{task_id}",
+            headers=self._headers(),
+            timeout=30.0
+        )
+        if response.status_code != 200:
+            # 查询失败视为仍在处理，下一轮重试
+            return {"status": "processing"}
+        
+        data = response.json().get("data", {})
+        status = data.get("task_status")
+        if status == "succeed":
+            videos = data.get("task_result", {}).get("videos", [])
+            if videos:
+                return {"status": "succeed", "video_url": videos[0].get("url")}
+            return {"status": "failed", "error": "任务成功但未返回视频"}
+        if status == "failed":
+            return {"status": "failed", "error": data.get("task_status_msg") or "生成失败"}
+        return {"status": "processing"}
+
+
+class VideoJobTracker:
+    """视频生成任务跟踪器"""
+    
+    # 任务状态
+    STATUS_PENDING = "pending"
+    STATUS_SUBMITTED = "submitted"
+    STATUS_SUCCEED = "succeed"
+    STATUS_FAILED = "failed"
+    STATUS_TIMEOUT = "timeout"
+    
+    def __init__(
+        self,
+        provider: Optional[KlingVideoProvider] = None,
+        max_concurrent: Optional[int] = None,
+        min_interval: float = 3.0,
+        max_interval: float = 20.0,
+        job_timeout: Optional[float] = None,
+        max_submit_retries: int = 3,
+        rate_limit_backoff: float = 15.0,
+        reuse_max_age: Optional[float] = None,
+        persist: bool = True
+    ):
+        self.provider = provider or KlingVideoProvider()
+        self.max_concurrent = max_concurrent or settings.KELING_MAX_CONCURRENT
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.job_timeout = job_timeout or settings.KELING_JOB_TIMEOUT
+        self.max_submit_retries = max_submit_retries
+        self.rate_limit_backoff = rate_limit_backoff
+        self.reuse_max_age = reuse_max_age if reuse_max_age is not None else settings.KELING_REUSE_MAX_AGE
+        self.persist = persist
+        # 当前进程正在跟踪的 task_id，恢复任务时跳过
+        self._tracking: Set[str] = set()
+        self._resume_lock = asyncio.Lock()
+    
+    @staticmethod
+    def make_batch_id(payloads: List[Dict[str, Any]]) -> str:
+        """按提交内容生成批次ID，相同内容的批次重跑时可复用结果"""
+        raw = json.dumps(payloads, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+    
+    async def run_batch(
+        self,
+        items: List[Dict[str, Any]],
+        payloads: List[Dict[str, Any]],
+        batch_id: Optional[str] = None,
+        on_progress=None
+    ) -> List[Dict[str, Any]]:
+        """
+        生成一批视频片段
+        
+        Args:
+            items: 片段元数据（原样合并进结果）
+            payloads: 每个片段的提交参数，与 items 一一对应
+            batch_id: 批次ID，默认按 payloads 内容生成
+            on_progress: 可选回调 async fn(done, total)
+        
+        Returns:
+            与 items 顺序一致的结果列表
+        """
+        batch_id = batch_id or self.make_batch_id(payloads)
+        existing = await self._load_batch(batch_id)
+        
+        jobs = []
+        for index, (item, payload) in enumerate(zip(items, payloads)):
+            job = {
+                "batch_id": batch_id,
+                "segment_index": index,
+                "item": item,
+                "payload": payload,
+                "status": self.STATUS_PENDING,
+                "task_id": None,
+                "video_url": None,
+                "error": None,
+                "attempts": 0,
+                "submitted_at": None,
+            }
+            row = existing.get(index)
+            if (
+                row and row["status"] == self.STATUS_SUCCEED and row["video_url"]
+                and row["age"] < self.reuse_max_age
+            ):
+                job.update(status=self.STATUS_SUCCEED, task_id=row["task_id"], video_url=row["video_url"])
+            elif row and row["status"] == self.STATUS_SUBMITTED and row["task_id"]:
+                # 之前提交过但未完成（如进程重启），继续跟踪而不是重新提交
+                job.update(status=self.STATUS_SUBMITTED, task_id=row["task_id"], submitted_at=time.time())
+            jobs.append(job)
+        
+        reused = sum(1 for j in jobs if j["status"] == self.STATUS_SUCCEED)
+        if reused:
+            logger.info(f"[视频任务] 批次 {batch_id[:8]} 复用 {reused} 个已生成片段")
+        
+        await self._drive(jobs, on_progress=on_progress)
+        
+        results = []
+        for job in jobs:
+            status = job["status"]
+            if status == self.STATUS_SUCCEED:
+                result_status = "success"
+            elif status == self.STATUS_TIMEOUT:
+                # 与原轮询逻辑一致：超时未完成视为仍在处理
+                result_status = "processing"
+            else:
+                result_status = "failed"
+            result = {
+                **job["item"],
+                "status": result_status,
+                "task_id": job["task_id"],
+                "video_url": job["video_url"],
+            }
+            if job["error"]:
+                result["error"] = job["error"]
+            results.append(result)
+        return results
+    
+    async def _drive(self, jobs: List[Dict[str, Any]], on_progress=None):
+        """主循环：补位提交 + 统一轮询"""
+        pending = [j for j in jobs if j["status"] == self.STATUS_PENDING]
+        outstanding = [j for j in jobs if j["status"] == self.STATUS_SUBMITTED]
+        total = len(jobs)
+        interval = self.min_interval
+        submit_not_before = 0.0
+        
+        for job in outstanding:
+            self._tracking.add(job["task_id"])
+        
+        async with httpx.AsyncClient() as client:
+            while pending or outstanding:
+                # 1. 在并发上限内补位提交
+                while pending and len(outstanding) < self.max_concurrent and time.time() >= submit_not_before:
+                    job = pending.pop(0)
+                    submitted = await self._submit(client, job)
+                    if submitted:
+                        outstanding.append(job)
+                    elif job["status"] == self.STATUS_PENDING:
+                        # 被限流：放回队首，退避后再提交
+                        pending.insert(0, job)
+                        submit_not_before = time.time() + self.rate_limit_backoff * job["attempts"]
+                        break
+                
+                if not outstanding:
+                    if pending:
+                        await asyncio.sleep(max(0.0, submit_not_before - time.time()))
+                    continue
+                
+                # 2. 统一轮询所有在途任务
+                await asyncio.sleep(interval)
+                states = await asyncio.gather(
+                    *[self._query(client, job) for job in outstanding]
+                )
+                
+                finished = []
+                now = time.time()
+                for job, state in zip(outstanding, states):
+                    if state["status"] == "succeed":
+                        job.update(status=self.STATUS_SUCCEED, video_url=state.get("video_url"))
+                        finished.append(job)
+                    elif state["status"] == "failed":
+                        job.update(status=self.STATUS_FAILED, error=state.get("error"))
+                        finished.append(job)
+                    elif job["submitted_at"] and now - job["submitted_at"] > self.job_timeout:
+                        job.update(status=self.STATUS_TIMEOUT, error="生成超时")
+                        finished.append(job)
+                
+                for job in finished:
+                    outstanding.remove(job)
+                    self._tracking.discard(job["task_id"])
+                    await self._save_job(job)
+                
+                await self._touch([job["task_id"] for job in outstanding])
+                
+                # 3. 自适应间隔：有任务完成则加快（后面的任务往往也快完成），否则逐步放慢
+                if finished:
+                    interval = self.min_interval
+                    if on_progress:
+                        done = sum(1 for j in jobs if j["status"] not in (self.STATUS_PENDING, self.STATUS_SUBMITTED))
+                        try:
+                            await on_progress(done, total)
+                        except Exception as e:
+                            logger.warning(f"[视频任务] 进度回调失败: {e}")
+                else:
+                    interval = min(interval * 1.5, self.max_interval)
+    
+    async def _submit(self, client: httpx.AsyncClient, job: Dict[str, Any]) -> bool:
+        """提交单个任务；限流时保持 pending 状态返回 False"""
+        job["attempts"] += 1
+        try:
+            task_id = await self.provider.submit(client, job["payload"])
+        except ProviderRateLimited as e:
+            if job["attempts"] >= self.max_submit_retries:
+                job.update(status=self.STATUS_FAILED, error=str(e))
+                await self._save_job(job)
+            else:
+                logger.warning(f"[视频任务] 片段{job['segment_index']} 提交被限流，稍后重试")
+            return False
+        except Exception as e:
+            job.update(status=self.STATUS_FAILED, error=str(e))
+            await self._save_job(job)
+            return False
+        
+        job.update(status=self.STATUS_SUBMITTED, task_id=task_id, submitted_at=time.time())
+        self._tracking.add(task_id)
+        await self._save_job(job)
+        logger.info(f"[视频任务] 片段{job['segment_index']} 已提交: {task_id}")
+        return True
+    
+    async def _query(self, client: httpx.AsyncClient, job: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return await self.provider.query(client, job["task_id"])
+        except Exception as e:
+            logger.debug(f"[视频任务] 查询 {job['task_id']} 失败: {e}")
+            return {"status": "processing"}
+    
+    # ========== 重启恢复 ==========
+    
+    async def resume_pending(self, stale_seconds: int = 120) -> int:
+        """
+        恢复跟踪无人轮询的在途任务（进程重启后遗留的任务）
+        
+        Returns:
+            恢复的任务数
+        """
+        if not self.persist or self._resume_lock.locked():
+            return 0
+        
+        async with self._resume_lock:
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(text("""
+                        SELECT batch_id, segment_index, task_id, EXTRACT(EPOCH FROM submitted_at)
+                        FROM video_generation_jobs
+                        WHERE status = 'submitted'
+                          AND task_id IS NOT NULL
+                          AND COALESCE(last_polled_at, submitted_at) < NOW() - make_interval(secs => :stale)
+                          AND submitted_at > NOW() - INTERVAL '1 day'
+                    """), {"stale": stale_seconds})
+                    rows = result.fetchall()
+            except Exception as e:
+                logger.warning(f"[视频任务] 加载在途任务失败: {e}")
+                return 0
+            
+            jobs = []
+            for row in rows:
+                if row[2] in self._tracking:
+                    continue
+                jobs.append({
+                    "batch_id": row[0],
+                    "segment_index": row[1],
+                    "item": {},
+                    "payload": None,
+                    "status": self.STATUS_SUBMITTED,
+                    "task_id": row[2],
+                    "video_url": None,
+                    "error": None,
+                    "attempts": 1,
+                    "submitted_at": float(row[3]) if row[3] else time.time(),
+                })
+            
+            if jobs:
+                logger.info(f"[视频任务] 恢复跟踪 {len(jobs)} 个在途任务")
+                await self._drive(jobs)
+            return len(jobs)
+    
+    # ========== 持久化 ==========
+    
+    async def _load_batch(self, batch_id: str) -> Dict[int, Dict[str, Any]]:
+        """加载批次已有的任务状态（age 为距最近一次更新的秒数）"""
+        if not self.persist:
+            return {}
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(text("""
+                    SELECT segment_index, task_id, status, video_url,
+                           EXTRACT(EPOCH FROM NOW() - updated_at)
+                    FROM video_generation_jobs
+                    WHERE batch_id = :batch_id
+                """), {"batch_id": batch_id})
+                return {
+                    row[0]: {"task_id": row[1], "status": row[2], "video_url": row[3], "age": float(row[4] or 0)}
+                    for row in result.fetchall()
+                }
+        except Exception as e:
+            logger.warning(f"[视频任务] 加载批次状态失败: {e}")
+            return {}
+    
+    async def _save_job(self, job: Dict[str, Any]):
+        """写入/更新任务状态（失败不影响生成流程）"""
+        if not self.persist:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("""
+                    INSERT INTO video_generation_jobs
+                        (batch_id, segment_index, task_id, status, video_url, error,
+                         payload, submitted_at, updated_at)
+                    VALUES
+                        (:batch_id, :segment_index, :task_id, :status, :video_url, :error,
+                         CAST(:payload AS jsonb), NOW(), NOW())
+                    ON CONFLICT (batch_id, segment_index) DO UPDATE SET
+                        task_id = COALESCE(EXCLUDED.task_id, video_generation_jobs.task_id),
+                        status = EXCLUDED.status,
+                        video_url = EXCLUDED.video_url,
+                        error = EXCLUDED.error,
+                        submitted_at = CASE
+                            WHEN EXCLUDED.task_id IS DISTINCT FROM video_generation_jobs.task_id
+                            THEN NOW() ELSE video_generation_jobs.submitted_at END,
+                        updated_at = NOW()
+                """), {
+                    "batch_id": job["batch_id"],
+                    "segment_index": job["segment_index"],
+                    "task_id": job["task_id"],
+                    "status": job["status"],
+                    "video_url": job["video_url"],
+                    "error": job["error"],
+                    "payload": json.dumps(job["payload"], ensure_ascii=False) if job["payload"] else None,
+                })
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"[视频任务] 保存任务状态失败: {e}")
+    
+    async def _touch(self, task_ids: List[str]):
+        """记录本轮已轮询（一条语句），供恢复逻辑判断任务是否有人跟踪"""
+        if not self.persist or not task_ids:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("""
+                    UPDATE video_generation_jobs
+                    SET last_polled_at = NOW()
+                    WHERE task_id = ANY(:task_ids)
+                """), {"task_ids": task_ids})
+                await db.commit()
+        except Exception as e:
+            logger.debug(f"[视频任务] 更新轮询时间失败: {e}")
+
+
+# 全局实例
+video_job_tracker = VideoJobTracker()
+
+
+async def resume_video_generation_jobs():
+    """定时任务：恢复跟踪重启前遗留的视频生成任务"""
+    if not video_job_tracker.provider.is_configured():
+        return
+    await video_job_tracker.resume_pending()
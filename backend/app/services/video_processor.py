@@ -6,31 +6,29 @@
 import os
 import asyncio
 import tempfile
+import importlib.util
 import httpx
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, TYPE_CHECKING
 from loguru import logger
 
-# 尝试导入视频处理库
-try:
-    from moviepy.editor import (
-        VideoFileClip, AudioFileClip, CompositeVideoClip, 
-        TextClip, CompositeAudioClip, concatenate_audioclips,
-        concatenate_videoclips, vfx
-    )
-    MOVIEPY_AVAILABLE = True
-except ImportError:
-    MOVIEPY_AVAILABLE = False
+from app.core.config import settings
+from app.services.ffmpeg_composer import ffmpeg_composer, UnsupportedEffect
+from app.services.video_segment_cache import segment_cache
+from app.services.tts_synthesizer import tts_synthesizer
+
+# 只检查是否安装，moviepy 在走 moviepy 合成路径时才导入（导入较重，ffmpeg 路径不需要）
+MOVIEPY_AVAILABLE = importlib.util.find_spec("moviepy") is not None
+if not MOVIEPY_AVAILABLE:
     logger.warning("moviepy未安装，视频后期处理功能将受限")
 
-# 尝试导入edge-tts
-try:
-    import edge_tts
-    EDGE_TTS_AVAILABLE = True
-except ImportError:
-    EDGE_TTS_AVAILABLE = False
+EDGE_TTS_AVAILABLE = importlib.util.find_spec("edge_tts") is not None
+if not EDGE_TTS_AVAILABLE:
     logger.warning("edge-tts未安装，TTS配音功能将不可用")
 
+if TYPE_CHECKING:
+    from moviepy.editor import VideoFileClip, CompositeVideoClip
+
 
 class VideoProcessor:
     """视频后期处理器"""
@@ -81,10 +79,10 @@ class VideoProcessor:
         Returns:
             处理结果字典
         """
-        if not MOVIEPY_AVAILABLE:
+        if not MOVIEPY_AVAILABLE and not ffmpeg_composer.available:
             return {
                 "status": "error",
-                "message": "moviepy未安装，无法进行视频后期处理"
+                "message": "moviepy和ffmpeg均不可用，无法进行视频后期处理"
             }
         
         try:
@@ -112,7 +110,7 @@ class VideoProcessor:
             )
             
             return result
-            
+        
         except Exception as e:
             logger.error(f"视频处理失败: {e}")
             return {"status": "error", "message": str(e)}
@@ -135,31 +133,45 @@ class VideoProcessor:
             logger.error(f"视频下载异常: {e}")
             return None
     
+    async def _download_segment(self, url: str) -> Tuple[Optional[str], str]:
+        """
+        下载视频片段到内容寻址缓存
+        
+        Returns:
+            (本地路径, 源缓存键)，下载失败时路径为 None
+        """
+        key = segment_cache.source_key(url)
+        cached = segment_cache.get(key, ext=".src.mp4")
+        if cached:
+            logger.info(f"片段缓存命中: {key[:12]}")
+            return cached, key
+        
+        temp_path = segment_cache.temp_path_for(key, ext=".src.mp4")
+        try:
+            async with httpx.AsyncClient() as client:
+                async with client.stream("GET", url, timeout=120.0) as response:
+                    if response.status_code != 200:
+                        logger.error(f"片段下载失败: {response.status_code}")
+                        return None, key
+                    with open(temp_path, "wb") as f:
+                        async for chunk in response.aiter_bytes():
+                            f.write(chunk)
+            return segment_cache.commit(temp_path, key, ext=".src.mp4"), key
+        except Exception as e:
+            logger.error(f"片段下载异常: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None, key
+    
     async def _generate_tts(self, text: str, voice: str = "zh_female", max_retries: int = 3) -> Optional[str]:
-        """使用edge-tts生成配音，带重试机制"""
+        """使用edge-tts生成配音（分句并发合成，分句按内容缓存）"""
         if not EDGE_TTS_AVAILABLE:
             logger.warning("edge-tts未安装，跳过TTS生成")
             return None
         
         voice_name = self.TTS_VOICES.get(voice, self.TTS_VOICES["zh_female"])
         output_path = os.path.join(self.temp_dir, "tts.mp3")
-        
-        for attempt in range(max_retries):
-            try:
-                communicate = edge_tts.Communicate(text, voice_name)
-                await communicate.save(output_path)
-                
-                logger.info(f"TTS生成完成: {output_path}")
-                return output_path
-            except Exception as e:
-                logger.warning(f"TTS生成失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    # 等待后重试，使用递增延迟
-                    await asyncio.sleep(2 * (attempt + 1))
-                else:
-                    logger.error(f"TTS生成最终失败: {e}")
-        
-        return None
+        return await tts_synthesizer.synthesize(text, voice_name, output_path, max_retries=max_retries)
     
     async def _compose_video(
         self,
@@ -183,7 +195,55 @@ class VideoProcessor:
             logger.error(f"视频合成失败: {e}")
             return {"status": "error", "message": str(e)}
     
+    def _use_ffmpeg(self, engine: Optional[str]) -> bool:
+        """根据配置判断是否走 ffmpeg 快速路径"""
+        engine = engine or settings.VIDEO_COMPOSE_ENGINE
+        return engine != "moviepy" and ffmpeg_composer.available
+    
+    def _moviepy_threads(self) -> int:
+        """moviepy 编码线程数（0表示按CPU核数）"""
+        return settings.VIDEO_ENCODE_THREADS or os.cpu_count() or 4
+    
     def _compose_video_sync(
+        self,
+        video_path: str,
+        subtitle_texts: List[str],
+        tts_path: Optional[str],
+        music_type: str,
+        output_path: str,
+        engine: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """同步方式合成视频（在线程池中执行），优先使用 ffmpeg 快速路径"""
+        if self._use_ffmpeg(engine):
+            try:
+                result = ffmpeg_composer.compose(
+                    segment_paths=[video_path],
+                    output_path=output_path,
+                    subtitles=subtitle_texts,
+                    tts_path=tts_path,
+                    bgm_path=self._get_bgm_path(music_type),
+                    edge_fade=0,
+                    bgm_volume=0.3,
+                    bgm_volume_solo=0.7,
+                    font_size=48,
+                    margin_bottom=120,
+                    subtitle_fade_ms=300,
+                    work_dir=self.temp_dir
+                )
+                if result.get("status") == "success":
+                    result["message"] = "视频后期处理完成"
+                    logger.info(f"视频合成完成(ffmpeg): {output_path}")
+                return result
+            except UnsupportedEffect as e:
+                if not MOVIEPY_AVAILABLE:
+                    return {"status": "error", "message": f"ffmpeg不支持该效果且moviepy未安装: {e}"}
+                logger.info(f"ffmpeg快速路径不支持，回退moviepy: {e}")
+        
+        return self._compose_video_moviepy(
+            video_path, subtitle_texts, tts_path, music_type, output_path
+        )
+    
+    def _compose_video_moviepy(
         self,
         video_path: str,
         subtitle_texts: List[str],
@@ -191,7 +251,12 @@ class VideoProcessor:
         music_type: str,
         output_path: str
     ) -> Dict[str, Any]:
-        """同步方式合成视频（在线程池中执行）"""
+        """使用 moviepy 合成视频"""
+        from moviepy.editor import (
+            VideoFileClip, AudioFileClip, CompositeVideoClip,
+            TextClip, CompositeAudioClip, concatenate_audioclips
+        )
+        
         video = None
         try:
             # 加载原始视频
@@ -279,8 +344,8 @@ class VideoProcessor:
                 codec='libx264',
                 audio_codec='aac',
                 fps=24,
-                preset='medium',
-                threads=4,
+                preset=settings.VIDEO_ENCODE_PRESET,
+                threads=self._moviepy_threads(),
                 logger=None  # 禁用moviepy的进度日志
             )
             
@@ -295,9 +360,10 @@ class VideoProcessor:
                 "status": "success",
                 "output_path": output_path,
                 "duration": duration,
+                "engine": "moviepy",
                 "message": "视频后期处理完成"
             }
-            
+        
         except Exception as e:
             logger.error(f"视频合成异常: {e}")
             if video:
@@ -379,20 +445,24 @@ class VideoProcessor:
         Returns:
             合成结果
         """
-        if not MOVIEPY_AVAILABLE:
-            return {"status": "error", "message": "moviepy未安装"}
+        if not MOVIEPY_AVAILABLE and not ffmpeg_composer.available:
+            return {"status": "error", "message": "moviepy和ffmpeg均不可用"}
         
         if not segment_urls:
             return {"status": "error", "message": "没有视频片段"}
         
         try:
-            # 1. 下载所有视频片段
+            # 1. 并发下载所有视频片段（已缓存的片段直接复用）
             logger.info(f"下载{len(segment_urls)}个视频片段...")
+            downloads = await asyncio.gather(
+                *[self._download_segment(url) for url in segment_urls]
+            )
             segment_paths = []
-            for i, url in enumerate(segment_urls):
-                path = await self._download_video(url)
+            source_keys = []
+            for i, (path, key) in enumerate(downloads):
                 if path:
                     segment_paths.append(path)
+                    source_keys.append(key)
                 else:
                     logger.warning(f"片段{i}下载失败")
             
@@ -421,11 +491,12 @@ class VideoProcessor:
                 tts_path=tts_path,
                 bgm_path=bgm_path,
                 transitions=transitions,
-                output_path=output
+                output_path=output,
+                source_keys=source_keys
             )
             
             return result
-            
+        
         except Exception as e:
             logger.error(f"长视频合成失败: {e}")
             return {"status": "error", "message": str(e)}
@@ -437,17 +508,70 @@ class VideoProcessor:
         tts_path: Optional[str],
         bgm_path: Optional[str],
         transitions: Optional[List[str]],
-        output_path: str
+        output_path: str,
+        source_keys: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """同步合成长视频"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
             None,
             self._do_compose_long_video,
-            segment_paths, subtitles, tts_path, bgm_path, transitions, output_path
+            segment_paths, subtitles, tts_path, bgm_path, transitions, output_path,
+            None, source_keys
         )
     
     def _do_compose_long_video(
+        self,
+        segment_paths: List[str],
+        subtitles: List[str],
+        tts_path: Optional[str],
+        bgm_path: Optional[str],
+        transitions: Optional[List[str]],
+        output_path: str,
+        engine: Optional[str] = None,
+        source_keys: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        执行长视频合成，优先使用 ffmpeg 快速路径
+        
+        提供 source_keys 且启用片段缓存时走分段缓存流水线：
+        已归一化的片段直接复用，只有变化的片段会重新编码
+        """
+        if self._use_ffmpeg(engine):
+            try:
+                if settings.VIDEO_SEGMENT_CACHE_ENABLED and source_keys:
+                    result = ffmpeg_composer.compose_segmented(
+                        segment_paths=segment_paths,
+                        source_keys=source_keys,
+                        output_path=output_path,
+                        subtitles=subtitles,
+                        tts_path=tts_path,
+                        bgm_path=bgm_path,
+                        work_dir=self.temp_dir
+                    )
+                else:
+                    result = ffmpeg_composer.compose(
+                        segment_paths=segment_paths,
+                        output_path=output_path,
+                        subtitles=subtitles,
+                        tts_path=tts_path,
+                        bgm_path=bgm_path,
+                        transitions=transitions,
+                        work_dir=self.temp_dir
+                    )
+                if result.get("status") == "success":
+                    result["message"] = f"长视频合成完成，时长{int(result['duration'])}秒"
+                return result
+            except UnsupportedEffect as e:
+                if not MOVIEPY_AVAILABLE:
+                    return {"status": "error", "message": f"ffmpeg不支持该效果且moviepy未安装: {e}"}
+                logger.info(f"ffmpeg快速路径不支持，回退moviepy: {e}")
+        
+        return self._compose_long_video_moviepy(
+            segment_paths, subtitles, tts_path, bgm_path, transitions, output_path
+        )
+    
+    def _compose_long_video_moviepy(
         self,
         segment_paths: List[str],
         subtitles: List[str],
@@ -456,7 +580,12 @@ class VideoProcessor:
         transitions: Optional[List[str]],
         output_path: str
     ) -> Dict[str, Any]:
-        """执行长视频合成"""
+        """使用 moviepy 合成长视频"""
+        from moviepy.editor import (
+            VideoFileClip, AudioFileClip, CompositeAudioClip,
+            concatenate_audioclips, concatenate_videoclips
+        )
+        
         clips = []
         try:
             # 加载所有视频片段
@@ -531,8 +660,8 @@ class VideoProcessor:
                 codec='libx264',
                 audio_codec='aac',
                 fps=24,
-                preset='medium',
-                threads=4,
+                preset=settings.VIDEO_ENCODE_PRESET,
+                threads=self._moviepy_threads(),
                 logger=None
             )
             
@@ -545,9 +674,10 @@ class VideoProcessor:
                 "status": "success",
                 "output_path": output_path,
                 "duration": duration,
+                "engine": "moviepy",
                 "message": f"长视频合成完成，时长{int(duration)}秒"
             }
-            
+        
         except Exception as e:
             logger.error(f"长视频合成异常: {e}")
             for clip in clips:
@@ -566,6 +696,8 @@ class VideoProcessor:
         if not subtitles:
             return video
         
+        from moviepy.editor import TextClip, CompositeVideoClip
+        
         duration = video.duration
         time_per_subtitle = duration / len(subtitles)
         
@@ -602,28 +734,16 @@ class VideoProcessor:
         voice_id: str,
         max_retries: int = 3
     ) -> Optional[str]:
-        """使用指定语音ID生成TTS，带重试机制"""
+        """使用指定语音ID生成TTS（分句并发合成，分句按内容缓存）"""
         if not EDGE_TTS_AVAILABLE:
             logger.warning("edge-tts未安装，跳过TTS生成")
             return None
         
         output_path = os.path.join(self.temp_dir, "tts_long.mp3")
-        
-        for attempt in range(max_retries):
-            try:
-                communicate = edge_tts.Communicate(text, voice_id)
-                await communicate.save(output_path)
-                logger.info(f"TTS生成完成: {output_path}")
-                return output_path
-            except Exception as e:
-                logger.warning(f"TTS生成失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    # 等待后重试，使用递增延迟
-                    await asyncio.sleep(2 * (attempt + 1))
-                else:
-                    logger.error(f"TTS生成最终失败，将跳过配音: {e}")
-        
-        return None
+        result = await tts_synthesizer.synthesize(text, voice_id, output_path, max_retries=max_retries)
+        if not result:
+            logger.error("TTS生成最终失败，将跳过配音")
+        return result
     
     async def _download_audio(self, url: str) -> Optional[str]:
         """下载音频文件"""
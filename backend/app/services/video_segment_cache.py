@@ -0,0 +1,101 @@
+"""
+视频片段渲染缓存
+负责：按内容寻址缓存下载的源片段和归一化后的中间片段，按总大小做LRU淘汰
+
+缓存键：
+- 源片段：sha256(源URL)
+- 中间片段：sha256(源键 + 变换参数)，参数包括分辨率、帧率、编码预设、淡入淡出等
+"""
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+from loguru import logger
+
+from app.core.config import settings
+
+
+class SegmentCache:
+    """本地磁盘LRU片段缓存（以文件访问时间作为最近使用时间）"""
+    
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or settings.VIDEO_SEGMENT_CACHE_DIR
+        self.max_bytes = max_bytes or settings.VIDEO_SEGMENT_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def source_key(url: str) -> str:
+        """源片段缓存键"""
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def transform_key(source_key: str, params: Dict[str, Any]) -> str:
+        """中间片段缓存键：源键 + 变换参数"""
+        payload = json.dumps({"source": source_key, **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def path_for(self, key: str, ext: str = ".mp4") -> str:
+        """缓存文件路径（按键前两位分目录）"""
+        directory = os.path.join(self.cache_dir, key[:2])
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{key}{ext}")
+    
+    def get(self, key: str, ext: str = ".mp4") -> Optional[str]:
+        """命中时返回文件路径并刷新访问时间"""
+        path = self.path_for(key, ext)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            return path
+        return None
+    
+    def temp_path_for(self, key: str, ext: str = ".mp4") -> str:
+        """写入用的临时路径，完成后通过 commit 原子替换，避免并发读到半成品"""
+        return f"{self.path_for(key, ext)}.{os.getpid()}.{threading.get_ident()}.tmp{ext}"
+    
+    def commit(self, temp_path: str, key: str, ext: str = ".mp4") -> str:
+        """将临时文件提交到缓存"""
+        path = self.path_for(key, ext)
+        os.replace(temp_path, path)
+        self.evict()
+        return path
+    
+    def evict(self):
+        """总大小超过上限时按最近访问时间淘汰"""
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if ".tmp" in name:
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, path))
+                    total += stat.st_size
+            
+            if total <= self.max_bytes:
+                return
+            
+            entries.sort()
+            removed = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    continue
+            logger.info(f"[片段缓存] 淘汰 {removed} 个文件，当前 {total / 1024 / 1024:.0f}MB")
+
+
+# 全局实例
+segment_cache = SegmentCache()
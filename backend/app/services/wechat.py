@@ -11,6 +11,7 @@ from Crypto.Cipher import AES
 from loguru import logger
 
 from app.core.config import settings
+from app.services.wechat_token_manager import wechat_token_manager, TOKEN_INVALID_ERRCODES
 
 
 class WeChatCrypto:
@@ -187,26 +188,19 @@ class WeChatService:
         return result
     
     async def get_access_token(self) -> str:
-        """获取access_token"""
+        """获取access_token（统一由token管理器缓存和刷新）"""
         if not self.is_configured:
             raise ValueError("企业微信未配置")
         
-        # TODO: 实现token缓存
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/gettoken",
-                params={
-                    "corpid": self.corp_id,
-                    "corpsecret": self.secret
-                }
-            )
-            data = response.json()
-            
-            if data.get("errcode") == 0:
-                self._access_token = data.get("access_token")
-                return self._access_token
-            else:
-                raise Exception(f"获取access_token失败: {data}")
+        self._access_token = await wechat_token_manager.get_token(
+            self.corp_id, self.secret, app_name="企业微信"
+        )
+        return self._access_token
+    
+    async def invalidate_access_token(self, data: Dict[str, Any]):
+        """接口返回token失效错误码时作废缓存，下次调用自动重新获取"""
+        if data.get("errcode") in TOKEN_INVALID_ERRCODES:
+            await wechat_token_manager.invalidate(self.corp_id, self.secret, self._access_token)
     
     async def send_text_message(
         self,
@@ -241,6 +235,7 @@ class WeChatService:
                 return {"status": "sent", "data": data}
             else:
                 logger.error(f"企业微信消息发送失败: {data}")
+                await self.invalidate_access_token(data)
                 return {"status": "error", "data": data}
     
     async def send_markdown_message(
@@ -269,7 +264,9 @@ class WeChatService:
                 params={"access_token": access_token},
                 json=payload
             )
-            return response.json()
+            data = response.json()
+            await self.invalidate_access_token(data)
+            return data
     
     # 群名称缓存
     _group_name_cache: Dict[str, str] = {}
@@ -4,9 +4,13 @@
 注意：只监控不发言，最大程度降低风险
 """
 import json
+import time
+import uuid
 import asyncio
+from collections import Counter
 from typing import Dict, Any, List, Optional, Callable
 from datetime import datetime
+import httpx
 from loguru import logger
 from sqlalchemy import text
 
@@ -20,6 +24,11 @@ class WeChatMonitorService:
     
     对接WeChatFerry实现消息监控
     WeChatFerry运行在Windows虚拟机中，通过HTTP API与本服务通信
+    
+    接收链路：
+    1. 复用一个长连接客户端长轮询消息接口（服务端不支持挂起时按空轮询次数退避）
+    2. 消息先进入写入缓冲，满批或到时后一条语句批量入库，群计数按群聚合后一条语句更新
+    3. 入库后的消息放入分发队列，由固定数量的协程并发调用消息处理器，不阻塞接收
     """
     
     def __init__(self):
@@ -29,31 +38,71 @@ class WeChatMonitorService:
         self.message_handlers: List[Callable] = []
         self.monitored_groups: Dict[str, Dict] = {}
     
+        self.poll_wait = settings.WCF_POLL_WAIT
+        self.batch_size = settings.WCF_INGEST_BATCH_SIZE
+        self.flush_interval = settings.WCF_INGEST_FLUSH_INTERVAL
+        self.handler_concurrency = settings.WCF_HANDLER_CONCURRENCY
+        
+        self._client: Optional[httpx.AsyncClient] = None
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_since: Optional[float] = None
+        # 入库失败的消息，下次落库时重试（超过上限丢弃最早的）
+        self._pending: List[Dict[str, Any]] = []
+        self.max_pending = self.batch_size * 20
+        self._flush_lock = asyncio.Lock()
+        self._dispatch_queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """长连接客户端（连接复用，避免每次轮询重新建连）"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.wcf_api_url,
+                timeout=httpx.Timeout(10.0, read=self.poll_wait + 10.0),
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2)
+            )
+        return self._client
+    
+    async def close(self):
+        """停止监听并释放连接（缓冲中的消息先落库）"""
+        self.is_connected = False
+        await self._flush()
+        if self._pending:
+            logger.error(f"关闭时仍有 {len(self._pending)} 条消息未能入库")
+        if self._dispatch_queue is not None:
+            try:
+                await asyncio.wait_for(self._dispatch_queue.join(), timeout=10)
+            except asyncio.TimeoutError:
+                logger.warning(f"关闭时仍有 {self._dispatch_queue.qsize()} 条消息未处理")
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
     async def connect(self) -> bool:
         """
         连接WeChatFerry服务
         """
         try:
-            import httpx
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.wcf_api_url}/api/status", timeout=10.0)
+            response = await self._get_client().get("/api/status", timeout=10.0)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    self.is_connected = data.get("is_login", False)
-                    
-                    if self.is_connected:
-                        logger.info("✅ WeChatFerry连接成功，微信已登录")
-                        # 加载监控群列表
-                        await self._load_monitored_groups()
-                    else:
-                        logger.warning("⚠️ WeChatFerry已连接，但微信未登录，请扫码登录")
+            if response.status_code == 200:
+                data = response.json()
+                self.is_connected = data.get("is_login", False)
                     
-                    return self.is_connected
+                if self.is_connected:
+                    logger.info("✅ WeChatFerry连接成功，微信已登录")
+                    # 加载监控群列表
+                    await self._load_monitored_groups()
                 else:
-                    logger.error(f"WeChatFerry连接失败: {response.status_code}")
-                    return False
+                    logger.warning("⚠️ WeChatFerry已连接，但微信未登录，请扫码登录")
+                
+                return self.is_connected
+            else:
+                logger.error(f"WeChatFerry连接失败: {response.status_code}")
+                return False
                     
         except Exception as e:
             logger.error(f"WeChatFerry连接异常: {e}")
@@ -92,7 +141,7 @@ class WeChatMonitorService:
     async def start_listening(self):
         """
         开始监听消息
-        通过轮询WeChatFerry的消息队列
+        长轮询WeChatFerry的消息队列，消息经写入缓冲批量入库后并发分发
         """
         if not self.is_connected:
             logger.warning("未连接WeChatFerry，无法开始监听")
@@ -100,36 +149,44 @@ class WeChatMonitorService:
         
         logger.info("📱 开始监听微信群消息...")
         
-        import httpx
+        self._start_workers()
+        flusher = asyncio.create_task(self._flush_periodically())
+        client = self._get_client()
+        idle_sleep = 0.0
         
-        while self.is_connected:
-            try:
-                async with httpx.AsyncClient() as client:
-                    # 获取新消息
-                    response = await client.get(
-                        f"{self.wcf_api_url}/api/messages",
-                        timeout=30.0
-                    )
+        try:
+            while self.is_connected:
+                try:
+                    # wait：服务端有消息立即返回，否则最多挂起 poll_wait 秒
+                    response = await client.get("/api/messages", params={"wait": self.poll_wait})
                     
+                    messages = []
                     if response.status_code == 200:
                         messages = response.json().get("messages", [])
                         
-                        for msg in messages:
-                            await self._handle_message(msg)
+                    for msg in messages:
+                        await self._handle_message(msg)
                 
-                # 短暂休眠
-                await asyncio.sleep(1)
+                    # 服务端不支持挂起时会立即返回空列表，逐步退避到1秒
+                    if messages:
+                        idle_sleep = 0.0
+                    else:
+                        idle_sleep = min(1.0, idle_sleep * 2 or 0.05)
+                        await asyncio.sleep(idle_sleep)
                 
-            except asyncio.CancelledError:
-                logger.info("消息监听已停止")
-                break
-            except Exception as e:
-                logger.error(f"消息监听异常: {e}")
-                await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    logger.info("消息监听已停止")
+                    break
+                except Exception as e:
+                    logger.error(f"消息监听异常: {e}")
+                    await asyncio.sleep(5)
+        finally:
+            flusher.cancel()
+            await self._flush()
     
     async def _handle_message(self, raw_message: Dict[str, Any]):
         """
-        处理原始消息
+        处理原始消息：过滤、标准化后放入写入缓冲
         """
         try:
             msg_type = raw_message.get("type", 0)
@@ -148,8 +205,9 @@ class WeChatMonitorService:
             if group_id not in self.monitored_groups and not self._should_auto_monitor(raw_message):
                 return
             
-            # 构建标准消息格式
+            # 构建标准消息格式（ID在本地生成，批量入库时无需回读）
             message = {
+                "id": str(uuid.uuid4()),
                 "group_id": group_id,
                 "group_name": self.monitored_groups.get(group_id, {}).get("name", "未知群"),
                 "sender_id": raw_message.get("sender", ""),
@@ -159,15 +217,11 @@ class WeChatMonitorService:
                 "timestamp": raw_message.get("timestamp", datetime.now().isoformat())
             }
             
-            # 保存消息到数据库
-            await self._save_message(message)
-            
-            # 调用所有处理器
-            for handler in self.message_handlers:
-                try:
-                    await handler(message)
-                except Exception as e:
-                    logger.error(f"消息处理器异常: {e}")
+            if not self._buffer:
+                self._buffer_since = time.monotonic()
+            self._buffer.append(message)
+            if len(self._buffer) >= self.batch_size:
+                await self._flush()
                     
         except Exception as e:
             logger.error(f"处理消息异常: {e}")
@@ -191,40 +245,106 @@ class WeChatMonitorService:
         
         return False
     
-    async def _save_message(self, message: Dict[str, Any]):
-        """保存消息到数据库"""
+    # ========== 批量入库 ==========
+    
+    async def _flush_periodically(self):
+        """缓冲中最早的消息等待超过 flush_interval 时落库，入库失败的消息按同样间隔重试"""
+        while True:
+            await asyncio.sleep(self.flush_interval / 2)
+            if self._pending or (self._buffer and time.monotonic() - self._buffer_since >= self.flush_interval):
+                await self._flush()
+    
+    async def _flush(self):
+        """
+        批量写入缓冲中的消息（连同之前入库失败的消息），新消息放入分发队列
+        
+        入库失败不影响消息处理器：新消息照常分发，整批留待下次落库重试
+        """
+        async with self._flush_lock:
+            if not self._buffer and not self._pending:
+                return
+            fresh, self._buffer = self._buffer, []
+            self._buffer_since = None
+            batch = self._pending + fresh
+            
+            if await self._save_messages(batch):
+                self._pending = []
+            else:
+                self._pending = batch[-self.max_pending:]
+                dropped = len(batch) - len(self._pending)
+                if dropped:
+                    logger.error(f"入库重试队列已满，丢弃最早的 {dropped} 条消息")
+        
+        if fresh and self.message_handlers:
+            self._start_workers()
+            for message in fresh:
+                await self._dispatch_queue.put(message)
+    
+    async def _save_messages(self, messages: List[Dict[str, Any]]) -> bool:
+        """一次事务写入一批消息，并按群聚合更新计数与最后消息时间"""
+        group_counts = Counter(m["group_id"] for m in messages)
         try:
             async with async_session_maker() as db:
                 await db.execute(
                     text("""
                         INSERT INTO wechat_messages 
-                        (group_id, sender_id, sender_name, content, message_type, created_at)
-                        VALUES (:group_id, :sender_id, :sender_name, :content, :message_type, NOW())
+                        (id, group_id, sender_id, sender_name, content, message_type, created_at)
+                        SELECT *, NOW() FROM unnest(
+                            CAST(:ids AS uuid[]), CAST(:group_ids AS varchar[]), CAST(:sender_ids AS varchar[]),
+                            CAST(:sender_names AS varchar[]), CAST(:contents AS text[]), CAST(:message_types AS varchar[])
+                        )
                     """),
                     {
-                        "group_id": message["group_id"],
-                        "sender_id": message["sender_id"],
-                        "sender_name": message["sender_name"],
-                        "content": message["content"],
-                        "message_type": message["message_type"]
+                        "ids": [m["id"] for m in messages],
+                        "group_ids": [m["group_id"] for m in messages],
+                        "sender_ids": [m["sender_id"] for m in messages],
+                        "sender_names": [m["sender_name"] for m in messages],
+                        "contents": [m["content"] for m in messages],
+                        "message_types": [m["message_type"] for m in messages]
                     }
                 )
                 
-                # 更新群的最后消息时间
+                # 更新群的最后消息时间和消息计数（每个群一行）
                 await db.execute(
                     text("""
-                        UPDATE wechat_groups
+                        UPDATE wechat_groups AS g
                         SET last_message_at = NOW(),
-                            message_count = message_count + 1
-                        WHERE group_id = :group_id
+                            message_count = g.message_count + c.cnt
+                        FROM unnest(CAST(:group_ids AS varchar[]), CAST(:counts AS integer[])) AS c(group_id, cnt)
+                        WHERE g.group_id = c.group_id
                     """),
-                    {"group_id": message["group_id"]}
+                    {"group_ids": list(group_counts.keys()), "counts": list(group_counts.values())}
                 )
                 
                 await db.commit()
+            return True
                 
         except Exception as e:
-            logger.error(f"保存消息失败: {e}")
+            logger.error(f"批量保存消息失败（{len(messages)}条）: {e}")
+            return False
+    
+    # ========== 并发分发 ==========
+    
+    def _start_workers(self):
+        """启动分发协程（已启动则跳过）"""
+        if self._dispatch_queue is None:
+            # 有界队列：处理器跟不上时反压到入库环节，而不是无限堆积
+            self._dispatch_queue = asyncio.Queue(maxsize=self.batch_size * 4)
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.handler_concurrency:
+            self._workers.append(asyncio.create_task(self._dispatch_worker()))
+    
+    async def _dispatch_worker(self):
+        while True:
+            message = await self._dispatch_queue.get()
+            try:
+                for handler in self.message_handlers:
+                    try:
+                        await handler(message)
+                    except Exception as e:
+                        logger.error(f"消息处理器异常: {e}")
+            finally:
+                self._dispatch_queue.task_done()
     
     async def add_monitored_group(
         self,
@@ -306,16 +426,13 @@ class WeChatMonitorService:
             return []
         
         try:
-            import httpx
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.wcf_api_url}/api/contacts", timeout=10.0)
+            response = await self._get_client().get("/api/contacts", timeout=10.0)
                 
-                if response.status_code == 200:
-                    contacts = response.json().get("contacts", [])
-                    # 过滤出群聊
-                    groups = [c for c in contacts if c.get("type") == "chatroom"]
-                    return groups
+            if response.status_code == 200:
+                contacts = response.json().get("contacts", [])
+                # 过滤出群聊
+                groups = [c for c in contacts if c.get("type") == "chatroom"]
+                return groups
                     
         except Exception as e:
             logger.error(f"获取群列表失败: {e}")
@@ -412,14 +529,10 @@ async def setup_wechat_monitor():
                         UPDATE wechat_messages
                         SET is_valuable = true,
                             analysis_result = :analysis
-                        WHERE group_id = :group_id
-                        AND content = :content
-                        ORDER BY created_at DESC
-                        LIMIT 1
+                        WHERE id = :id
                     """),
                     {
-                        "group_id": message["group_id"],
-                        "content": message["content"],
+                        "id": message["id"],
                         "analysis": json.dumps(analysis, ensure_ascii=False)
                     }
                 )
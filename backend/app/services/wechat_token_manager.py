@@ -0,0 +1,214 @@
+"""
+企业微信 access_token 统一管理
+负责：按应用缓存token直到过期、提前刷新、合并并发刷新请求、通过Redis在多个worker间共享
+
+缓存层级：
+1. 进程内缓存：命中时不产生任何IO
+2. Redis（DB1）：多个 uvicorn worker 共用同一个token，避免各自调用 gettoken
+3. gettoken 接口：同一时刻每个应用只有一个请求在刷新（进程内用锁，跨进程用 SET NX 锁）
+"""
+import time
+import asyncio
+import hashlib
+from typing import Dict, Optional, Tuple
+import httpx
+from loguru import logger
+
+from app.services.cache_service import cache_service
+
+GETTOKEN_URL = "https://qyapi.weixin.qq.com/cgi-bin/gettoken"
+
+# token 失效相关的错误码：40014 不合法的access_token，42001 access_token已过期
+TOKEN_INVALID_ERRCODES = {40014, 42001}
+
+
+class WeChatTokenManager:
+    """企业微信 access_token 管理器"""
+    
+    def __init__(
+        self,
+        refresh_margin: int = 300,
+        lock_ttl: int = 10,
+        wait_timeout: float = 5.0
+    ):
+        """
+        Args:
+            refresh_margin: 距离过期不足该秒数时开始后台刷新
+            lock_ttl: 跨进程刷新锁的过期时间（秒）
+            wait_timeout: 未抢到刷新锁时等待其他worker刷新结果的最长时间（秒）
+        """
+        self.refresh_margin = refresh_margin
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        # cache_key -> (token, expires_at)
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._background: Dict[str, asyncio.Task] = {}
+    
+    @staticmethod
+    def _cache_key(corp_id: str, secret: str) -> str:
+        """缓存键：按 corp_id + secret 区分应用，不在Redis中暴露secret"""
+        digest = hashlib.sha1(f"{corp_id}:{secret}".encode("utf-8")).hexdigest()[:16]
+        return f"wecom_token:{digest}"
+    
+    def _get_lock(self, key: str) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+    
+    async def get_token(self, corp_id: str, secret: str, app_name: str = "") -> str:
+        """
+        获取 access_token
+        
+        Args:
+            corp_id: 企业ID
+            secret: 应用secret
+            app_name: 应用名称（仅用于日志）
+        
+        Returns:
+            access_token；获取失败抛出 ValueError
+        """
+        if not corp_id or not secret:
+            raise ValueError("企业微信配置不完整")
+        
+        key = self._cache_key(corp_id, secret)
+        now = time.time()
+        
+        cached = self._tokens.get(key)
+        if cached and now < cached[1]:
+            # 临近过期：先返回旧token，后台刷新
+            if cached[1] - now < self.refresh_margin:
+                self._schedule_refresh(key, corp_id, secret, app_name)
+            return cached[0]
+        
+        async with self._get_lock(key):
+            # 等锁期间可能已被其他协程刷新
+            cached = self._tokens.get(key)
+            if cached and time.time() < cached[1]:
+                return cached[0]
+            
+            shared = await self._load_shared(key)
+            if shared and time.time() < shared[1]:
+                self._tokens[key] = shared
+                return shared[0]
+            
+            return await self._refresh(key, corp_id, secret, app_name)
+    
+    async def invalidate(self, corp_id: str, secret: str, token: Optional[str] = None):
+        """
+        作废缓存的token（接口返回 40014/42001 时调用）
+        
+        传入 token 时仅当缓存中仍是该token才作废，避免误删其他worker刚刷新的新token
+        """
+        key = self._cache_key(corp_id, secret)
+        cached = self._tokens.get(key)
+        if token is None or (cached and cached[0] == token):
+            self._tokens.pop(key, None)
+        
+        shared = await self._load_shared(key)
+        if shared and (token is None or shared[0] == token):
+            await cache_service.delete(key)
+        logger.info(f"[企微Token] 已作废缓存token: {key}")
+    
+    def _schedule_refresh(self, key: str, corp_id: str, secret: str, app_name: str):
+        """后台提前刷新（同一应用只保留一个后台任务）"""
+        task = self._background.get(key)
+        if task and not task.done():
+            return
+        self._background[key] = asyncio.create_task(
+            self._background_refresh(key, corp_id, secret, app_name)
+        )
+    
+    async def _background_refresh(self, key: str, corp_id: str, secret: str, app_name: str):
+        lock = self._get_lock(key)
+        if lock.locked():
+            return
+        async with lock:
+            cached = self._tokens.get(key)
+            if cached and cached[1] - time.time() >= self.refresh_margin:
+                return
+            
+            # 其他worker可能已刷新过
+            shared = await self._load_shared(key)
+            if shared and shared[1] - time.time() >= self.refresh_margin:
+                self._tokens[key] = shared
+                return
+            
+            try:
+                await self._refresh(key, corp_id, secret, app_name)
+            except Exception as e:
+                # 旧token仍在有效期内，下次调用再重试
+                logger.warning(f"[企微Token] {app_name} 后台刷新失败: {e}")
+    
+    async def _load_shared(self, key: str) -> Optional[Tuple[str, float]]:
+        """从Redis读取其他worker共享的token"""
+        data = await cache_service.get(key)
+        if not data or not data.get("token"):
+            return None
+        return data["token"], float(data.get("expires_at", 0))
+    
+    async def _acquire_refresh_lock(self, key: str) -> bool:
+        """跨进程刷新锁；Redis不可用时视为获取成功（退化为仅进程内合并）"""
+        client = await cache_service.client()
+        if client is None:
+            return True
+        try:
+            return bool(await client.set(cache_service.key(f"{key}:lock"), "1", nx=True, ex=self.lock_ttl))
+        except Exception as e:
+            logger.warning(f"[企微Token] 获取刷新锁失败: {e}")
+            return True
+    
+    async def _release_refresh_lock(self, key: str):
+        client = await cache_service.client()
+        if client is None:
+            return
+        try:
+            await client.delete(cache_service.key(f"{key}:lock"))
+        except Exception:
+            pass
+    
+    async def _refresh(self, key: str, corp_id: str, secret: str, app_name: str) -> str:
+        """刷新token（调用方需持有进程内锁）"""
+        acquired = await self._acquire_refresh_lock(key)
+        if not acquired:
+            # 其他worker正在刷新，等待其写入Redis
+            deadline = time.time() + self.wait_timeout
+            while time.time() < deadline:
+                await asyncio.sleep(0.2)
+                shared = await self._load_shared(key)
+                if shared and shared[1] - time.time() >= self.refresh_margin:
+                    self._tokens[key] = shared
+                    return shared[0]
+            logger.warning(f"[企微Token] {app_name} 等待其他worker刷新超时，自行刷新")
+        
+        try:
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                response = await client.get(
+                    GETTOKEN_URL,
+                    params={"corpid": corp_id, "corpsecret": secret}
+                )
+                data = response.json()
+            
+            if data.get("errcode") != 0:
+                raise ValueError(f"获取access_token失败: {data.get('errmsg')}")
+            
+            token = data["access_token"]
+            expires_in = int(data.get("expires_in", 7200))
+            expires_at = time.time() + expires_in
+            self._tokens[key] = (token, expires_at)
+            await cache_service.set(
+                key,
+                {"token": token, "expires_at": expires_at},
+                ttl=max(expires_in - 60, 60)
+            )
+            logger.info(f"[企微Token] {app_name} access_token已刷新，有效期 {expires_in}s")
+            return token
+        finally:
+            if acquired:
+                await self._release_refresh_lock(key)
+
+
+# 全局实例
+wechat_token_manager = WeChatTokenManager()
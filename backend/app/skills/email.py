@@ -391,20 +391,33 @@ class EmailSkill(BaseSkill):
             from_name = row[2] or row[3]
             attachment_names = row[4] or []
 
-            await self.log_step("download", "下载附件", f"邮件: {subject}")
+            # 2. 下载附件（所有文档附件都已解析缓存时跳过下载）
+            from app.services.parsed_document_cache import parsed_document_cache
+
+            doc_suffixes = ('.pdf', '.doc', '.docx', '.txt')
+            cached_hashes = await parsed_document_cache.lookup_source("email", email_db_id)
+            doc_names = [n for n in attachment_names if n.lower().endswith(doc_suffixes)]
+
+            if doc_names and all(n in cached_hashes for n in doc_names):
+                await self.log_step("cache", "命中解析缓存", f"邮件: {subject}")
+                attachments = [
+                    {"filename": n, "content_hash": cached_hashes.get(n)}
+                    for n in attachment_names
+                ]
+            else:
+                await self.log_step("download", "下载附件", f"邮件: {subject}")
 
-            # 2. 下载附件
-            download_result = await multi_email_service.download_attachments(
-                email_db_id,
-                save_dir="/tmp/maria_attachments"
-            )
+                download_result = await multi_email_service.download_attachments(
+                    email_db_id,
+                    save_dir="/tmp/maria_attachments"
+                )
 
-            if not download_result.get("success"):
-                return self._err(f"附件下载失败: {download_result.get('error', '未知错误')}")
+                if not download_result.get("success"):
+                    return self._err(f"附件下载失败: {download_result.get('error', '未知错误')}")
 
-            attachments = download_result.get("attachments", [])
-            if not attachments:
-                return self._err("邮件中没有可下载的附件")
+                attachments = download_result.get("attachments", [])
+                if not attachments:
+                    return self._err("邮件中没有可下载的附件")
 
             # 3. 读取并分析每个附件
             analysis_results = []
@@ -414,14 +427,21 @@ class EmailSkill(BaseSkill):
                 filepath = att.get("path")
                 
                 # 只处理文档类型
-                if not filename.lower().endswith(('.pdf', '.doc', '.docx', '.txt')):
+                if not filename.lower().endswith(doc_suffixes):
                     analysis_results.append(f"**{filename}**: 非文档类型，跳过分析")
                     continue
 
                 await self.log_step("analyze", "分析文档", filename)
 
-                # 读取文档内容
-                doc_result = await document_service.read_document(filepath, filename)
+                # 读取文档内容（命中缓存时无需原文件）
+                if att.get("content_hash") and not filepath:
+                    doc_result = await document_service.read_cached(att["content_hash"], filename)
+                else:
+                    doc_result = await document_service.read_document(filepath, filename)
+                    if doc_result.get("content_hash"):
+                        await parsed_document_cache.link_source(
+                            "email", email_db_id, filename, doc_result["content_hash"]
+                        )
 
                 if not doc_result.get("success"):
                     analysis_results.append(f"**{filename}**: 无法读取 - {doc_result.get('error', '格式不支持')}")
@@ -541,7 +561,8 @@ class EmailSkill(BaseSkill):
                             attachment_name=filename,
                             attachment_content=content,
                             analysis_result=analysis,
-                            doc_type=doc_type
+                            doc_type=doc_type,
+                            content_hash=doc_result.get("content_hash")
                         )
                     except Exception as ctx_err:
                         logger.warning(f"[EmailSkill] 保存邮件上下文失败: {ctx_err}")
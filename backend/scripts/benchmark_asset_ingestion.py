@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+素材入库基准
+模拟一次大规模 Pexels/Pixabay 采集结果（含重复URL、带跟踪参数的同一URL、库中已有素材），对比：
+- legacy：逐条 SELECT id FROM assets WHERE file_url = ... + INSERT（原流程）
+- bulk：AssetIngestionService.ingest（URL规范化 + 批次内去重 + 一条 INSERT ... ON CONFLICT）
+统计耗时、数据库语句数和写入数，并检查 file_url 按采集到的原样保存（CDN 查询串不被重新编码）
+
+安装了 Pillow 时另外验证感知哈希：本地HTTP服务提供缩略图（每组含轻微噪声的近似图），
+检查批次内近似重复被合并，再次采集相同缩略图时按分段桶识别为库中已有
+
+默认用模拟数据库（每条语句按 --db-latency 延迟），不连接真实数据库
+
+用法:
+    python scripts/benchmark_asset_ingestion.py [--assets 2000] [--db-latency 0.002]
+"""
+import argparse
+import asyncio
+import importlib.util
+import io
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+    
+    def fetchall(self):
+        return self.rows
+
+
+class FakeDB:
+    """模拟 assets 表：按 url_key 唯一，每条语句按 latency 延迟"""
+    
+    def __init__(self, latency: float, existing: set, existing_hashes=()):
+        self.latency = latency
+        self.file_urls = set(existing)
+        self.phashes = list(existing_hashes)
+        self.statements = 0
+    
+    def session(self):
+        db = self
+        
+        class Session:
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *args):
+                return False
+            
+            async def execute(self, statement, params=None):
+                db.statements += 1
+                await asyncio.sleep(db.latency)
+                sql = str(statement)
+                if sql.strip().startswith("SELECT id FROM assets"):
+                    return FakeResult([(1,)] if params["url"] in db.file_urls else [])
+                if sql.strip().startswith("SELECT phash FROM assets"):
+                    from app.services.asset_ingestion import phash_bands
+                    bands = set(params["bands"])
+                    return FakeResult([(v,) for v in db.phashes if bands & set(phash_bands(v))])
+                if "INSERT INTO assets" in sql:
+                    urls = params.get("url_keys") or [params.get("file_url")]
+                    hashes = params.get("phashes") or [None] * len(urls)
+                    new = []
+                    for url, value in zip(urls, hashes):
+                        if url not in db.file_urls:
+                            db.file_urls.add(url)
+                            if value is not None:
+                                db.phashes.append(value)
+                            new.append((url,))
+                    return FakeResult(new)
+                return FakeResult([])
+            
+            async def commit(self):
+                await asyncio.sleep(db.latency)
+        
+        return Session()
+
+
+def make_assets(count: int, base_url: str = "https://videos.pexels.com") -> list:
+    """生成采集结果：约20%重复（同URL或仅跟踪参数不同）"""
+    assets = []
+    unique = int(count * 0.8)
+    for i in range(count):
+        n = i if i < unique else random.randrange(unique)
+        url = f"{base_url}/video-files/{n}/{n}-hd_1920_1080_25fps.mp4"
+        if i >= unique and i % 2:
+            url += "?utm_source=pexels"
+        assets.append({
+            "name": f"Pexels_{n}",
+            "platform": "pexels",
+            "file_url": url,
+            "thumbnail_url": None,
+            "type": "video",
+            "duration": 12,
+            "file_size": 1024 * 1024,
+        })
+    random.shuffle(assets)
+    return assets
+
+
+async def legacy_save(assets: list, session_factory) -> int:
+    """原 save_collected_assets：逐条查询后插入"""
+    from sqlalchemy import text
+    
+    saved = 0
+    async with session_factory() as db:
+        for asset in assets:
+            result = await db.execute(
+                text("SELECT id FROM assets WHERE file_url = :url"),
+                {"url": asset.get("file_url")}
+            )
+            if result.fetchone():
+                continue
+            await db.execute(
+                text("INSERT INTO assets (name, type, category, file_url) VALUES (:name, :type, :category, :file_url)"),
+                {"name": asset["name"], "type": asset["type"], "category": asset["platform"], "file_url": asset["file_url"]}
+            )
+            saved += 1
+        await db.commit()
+    return saved
+
+
+async def run_dedup(args) -> int:
+    import app.services.asset_ingestion as ingestion_module
+    
+    random.seed(args.seed)
+    assets = make_assets(args.assets)
+    existing = {a["file_url"] for a in random.sample(assets, args.assets // 10)}
+    
+    print(f"采集结果 {len(assets)} 条，库中已有 {len(existing)} 条，模拟数据库往返 {args.db_latency * 1000:.1f}ms")
+    results = {}
+    for mode in ("legacy", "bulk"):
+        db = FakeDB(args.db_latency, existing)
+        started = time.perf_counter()
+        if mode == "legacy":
+            saved = await legacy_save(assets, db.session)
+        else:
+            ingestion_module.AsyncSessionLocal = db.session
+            ingestion_module.asset_ingestion.phash_enabled = False
+            saved = (await ingestion_module.asset_ingestion.ingest(assets, collected_by="benchmark"))["saved"]
+        elapsed = time.perf_counter() - started
+        results[mode] = saved
+        print(f"{mode:7s} 耗时={elapsed:.2f}s 语句={db.statements} 新写入={saved}")
+    
+    # 保存的 file_url 与采集到的一致（CDN 图片处理参数、签名不被重新编码）
+    cdn_urls = [
+        "https://sns-img-qc.xhscdn.com/abc?imageView2/2/w/1080/format/jpg",
+        "https://cdn.example.com/v.mp4?sign=a/b&t=1",
+    ]
+    inserted = {}
+    
+    class RecordingDB(FakeDB):
+        def session(self):
+            session = super().session()
+            execute = session.execute
+            
+            async def record(statement, params=None):
+                if params and "file_urls" in params:
+                    inserted.update(zip(params["url_keys"], params["file_urls"]))
+                return await execute(statement, params)
+            session.execute = record
+            return session
+    
+    ingestion_module.AsyncSessionLocal = RecordingDB(0, set()).session
+    await ingestion_module.asset_ingestion.ingest(
+        [{"name": "cdn", "type": "image", "file_url": url} for url in cdn_urls], collected_by="benchmark"
+    )
+    if sorted(inserted.values()) != sorted(cdn_urls):
+        print(f"file_url 未按原样保存: {sorted(inserted.values())}")
+        return 1
+    
+    # legacy 不识别跟踪参数，会把同一素材多写一份
+    return 0 if results["bulk"] <= results["legacy"] else 1
+
+
+def make_thumbnail(group: int, noise: int) -> bytes:
+    from PIL import Image
+    
+    rng = random.Random(group)
+    image = Image.new("L", (160, 90))
+    pixels = [rng.randrange(256) for _ in range(16 * 9)]
+    # 每组一张随机色块图，组内只加轻微噪声
+    noisy = random.Random(group * 1000 + noise)
+    image.putdata([
+        max(0, min(255, pixels[(y // 10) * 16 + x // 10] + (noisy.randrange(-6, 7) if noise else 0)))
+        for y in range(90) for x in range(160)
+    ])
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+async def run_phash(args) -> int:
+    if importlib.util.find_spec("PIL") is None:
+        print("未安装 Pillow，跳过感知哈希验证")
+        return 0
+    
+    import app.services.asset_ingestion as ingestion_module
+    
+    groups, variants = 40, 3
+    images = {f"/thumb/{g}-{v}.jpg": make_thumbnail(g, v) for g in range(groups) for v in range(variants)}
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = images.get(self.path)
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Length", str(len(body or b"")))
+            self.end_headers()
+            self.wfile.write(body or b"")
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    
+    assets = [
+        {"name": f"pixabay_{g}_{v}", "platform": "pixabay", "type": "video",
+         "file_url": f"https://cdn.pixabay.com/video/{g}/{v}.mp4", "thumbnail_url": f"{base}/thumb/{g}-{v}.jpg"}
+        for g in range(groups) for v in range(variants)
+    ]
+    db = FakeDB(args.db_latency, set())
+    ingestion_module.AsyncSessionLocal = db.session
+    ingestion_module.asset_ingestion.phash_enabled = True
+    started = time.perf_counter()
+    stats = await ingestion_module.asset_ingestion.ingest(assets, collected_by="benchmark")
+    elapsed = time.perf_counter() - started
+    
+    # 换一批 URL、缩略图相同：应全部被识别为库中已有（按分段桶查候选）
+    again = [dict(asset, file_url=asset["file_url"].replace(".mp4", "-copy.mp4")) for asset in assets]
+    repeat = await ingestion_module.asset_ingestion.ingest(again, collected_by="benchmark")
+    server.shutdown()
+    
+    print(
+        f"感知哈希: {len(assets)} 条（{groups} 组近似图）耗时={elapsed:.2f}s "
+        f"新写入={stats['saved']} 近似重复={stats['similar']} 语句={db.statements}"
+    )
+    print(f"再次采集相同缩略图: 新写入={repeat['saved']} 库中已有={repeat['existing']} 批次内近似={repeat['similar']}")
+    return 0 if stats["saved"] == groups and repeat["saved"] == 0 and repeat["existing"] == groups else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="素材入库基准")
+    parser.add_argument("--assets", type=int, default=2000)
+    parser.add_argument("--db-latency", type=float, default=0.002, help="模拟数据库单次往返延迟（秒）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    
+    async def run_all():
+        return await run_dedup(args) or await run_phash(args)
+    
+    sys.exit(asyncio.run(run_all()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+仪表板接口基准
+模拟前端轮询四个仪表板接口（stats / team-status / intent-distribution / recent-activities），对比：
+- legacy：每次请求直接查数据库（原流程的9条聚合查询）
+- snapshot：dashboard_metrics 快照（Redis 计数器 + 进程内缓存 + ETag）
+模拟数据库的 COUNT/GROUP BY 耗时随表行数线性增长（--rows、--scan-us-per-1k），
+模拟 Redis 每次往返按 --redis-latency 延迟；统计每次请求的 p50/p95 和数据库语句数
+
+同时校验：写入路径增量后快照计数正确、重复请求带 If-None-Match 返回 304、对账以数据库为准、
+数据库故障时对账失败后退避（快照未命中不会每次都重跑对账）
+
+不连接数据库和Redis
+
+用法:
+    python scripts/benchmark_dashboard.py [--rows 1000000] [--polls 200]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENDPOINTS = ["/stats", "/team-status", "/intent-distribution", "/recent-activities"]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+    
+    def fetchall(self):
+        return self.rows
+    
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+
+class FakeDB:
+    """按SQL返回固定数据；聚合查询耗时 = 基础往返 + 扫描行数 × 每千行耗时"""
+    
+    def __init__(self, args):
+        self.args = args
+        self.statements = 0
+        self.fail = False
+        self.counts = {"new_customers": 12, "high_intent": 34, "conversations": 56, "videos": 7}
+        self.distribution = [("S", 10), ("A", 24), ("B", 100), ("C", 866)]
+    
+    def session(self):
+        db = self
+        
+        class Session:
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *args):
+                return False
+            
+            async def execute(self, statement, params=None):
+                db.statements += 1
+                if db.fail:
+                    raise RuntimeError("数据库不可用")
+                sql = " ".join(str(statement).split())
+                scans = sql.count("COUNT(") + sql.count("MAX(")
+                cost = db.args.db_latency + scans * db.args.rows / 1000 * db.args.scan_us_per_1k / 1e6
+                await asyncio.sleep(cost)
+                
+                if sql.startswith("SELECT (SELECT COUNT(*)"):
+                    c = db.counts
+                    return FakeResult([(c["new_customers"], c["high_intent"], c["conversations"], c["videos"])])
+                if "GROUP BY intent_level" in sql:
+                    return FakeResult(db.distribution)
+                if "FROM conversations ORDER BY" in sql:
+                    return FakeResult([("sales", "inbound", f"消息{i}", None) for i in range(params["limit"])])
+                return FakeResult([])
+        
+        return Session()
+
+
+class FakeRedis:
+    """内存版 Redis（只实现 dashboard_metrics 用到的命令），每次往返按 latency 延迟"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.data = {}
+        self.round_trips = 0
+    
+    def pipeline(self, transaction: bool = True):
+        return FakePipeline(self)
+    
+    async def set(self, key, value, ex=None):
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+        self.data[key] = value
+    
+    # ---- 命令实现（同步，供管道调用）----
+    
+    def _hincrby(self, key, field, amount):
+        h = self.data.setdefault(key, {})
+        h[field] = str(int(h.get(field, 0)) + amount)
+    
+    def _hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+    
+    def _hgetall(self, key):
+        return dict(self.data.get(key, {}))
+    
+    def _lpush(self, key, *values):
+        self.data[key] = list(reversed(values)) + self.data.get(key, [])
+    
+    def _rpush(self, key, *values):
+        self.data[key] = self.data.get(key, []) + list(values)
+    
+    def _lrange(self, key, start, end):
+        return self.data.get(key, [])[start:end + 1]
+    
+    def _ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:end + 1]
+    
+    def _get(self, key):
+        return self.data.get(key)
+    
+    def _delete(self, key):
+        self.data.pop(key, None)
+    
+    def _expire(self, key, seconds):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+    
+    def __getattr__(self, name):
+        method = getattr(self.redis, f"_{name}")
+        
+        def queue(*args, **kwargs):
+            self.ops.append((method, args, kwargs))
+            return self
+        return queue
+    
+    async def execute(self):
+        self.redis.round_trips += 1
+        await asyncio.sleep(self.redis.latency)
+        return [method(*args, **kwargs) for method, args, kwargs in self.ops]
+
+
+async def legacy_poll(db: FakeDB):
+    """原接口：每次请求执行的聚合查询"""
+    queries = [
+        "SELECT COUNT(*) FROM customers WHERE created_at >= :today",
+        "SELECT COUNT(*) FROM customers WHERE intent_score >= 60",
+        "SELECT COUNT(*) FROM conversations WHERE created_at >= :today",
+        "SELECT COUNT(*) FROM videos WHERE created_at >= :today",
+        "SELECT DISTINCT ON (agent_type) agent_type FROM ai_tasks WHERE status IN ('processing', 'pending')",
+        "SELECT agent_type, COUNT(*) FROM ai_tasks WHERE status = 'completed' GROUP BY agent_type",
+        "SELECT agent_type, MAX(COALESCE(completed_at, started_at, created_at)) FROM ai_tasks GROUP BY agent_type",
+        "SELECT intent_level, COUNT(*) FROM customers GROUP BY intent_level",
+        "SELECT agent_type, message_type, content, created_at FROM conversations ORDER BY created_at DESC LIMIT 10",
+    ]
+    # 四个接口各自一次请求
+    groups = [queries[0:4], queries[4:7], queries[7:8], queries[8:9]]
+    timings = []
+    for group in groups:
+        started = time.perf_counter()
+        async with db.session() as session:
+            for sql in group:
+                await session.execute(sql, {"limit": 10})
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def main_async(args) -> int:
+    import importlib.util
+    import httpx
+    from fastapi import FastAPI
+    import app.services.dashboard_metrics as metrics_module
+    from app.services.cache_service import cache_service
+    
+    failures = []
+    
+    # ---- legacy ----
+    db = FakeDB(args)
+    timings = []
+    for _ in range(args.polls):
+        timings.extend(await legacy_poll(db))
+    print(
+        f"legacy   p50={percentile(timings, 0.5) * 1000:.2f}ms p95={percentile(timings, 0.95) * 1000:.2f}ms "
+        f"数据库语句={db.statements}（{args.polls}轮 × 4个接口，表 {args.rows} 行）"
+    )
+    
+    # ---- snapshot ----
+    db = FakeDB(args)
+    redis = FakeRedis(args.redis_latency)
+    metrics_module.async_session_maker = db.session
+    cache_service.redis_client = redis
+    cache_service._connected = True
+    metrics = metrics_module.dashboard_metrics
+    
+    # 按文件加载，不经过 app.api 包（包初始化会导入全部路由及其依赖）
+    spec = importlib.util.spec_from_file_location(
+        "dashboard_api", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "api", "dashboard.py")
+    )
+    dashboard = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(dashboard)
+    app = FastAPI()
+    app.include_router(dashboard.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # 首次请求：Redis 为空，触发对账和团队状态查询
+        stats = (await client.get("/stats")).json()
+        if stats["today"]["conversations"] != db.counts["conversations"]:
+            failures.append(f"首次对账后对话数 {stats['today']['conversations']} != {db.counts['conversations']}")
+        
+        # 写入路径增量
+        await metrics.record_conversation("sales", "你好，海运到汉堡多少钱？")
+        await metrics.record_customer_created(65, "A")
+        await metrics.record_intent_changed(65, "A", 85, "S")
+        await metrics.record_video_created()
+        stats = (await client.get("/stats")).json()["today"]
+        expected = {
+            "conversations": db.counts["conversations"] + 1,
+            "new_customers": db.counts["new_customers"] + 1,
+            "high_intent_customers": db.counts["high_intent"] + 1,
+            "videos_generated": db.counts["videos"] + 1,
+        }
+        for field, value in expected.items():
+            if stats[field] != value:
+                failures.append(f"增量后 {field}={stats[field]}，应为 {value}")
+        distribution = (await client.get("/intent-distribution")).json()["distribution"]
+        if distribution["S"] != 11 or distribution["A"] != 24:
+            failures.append(f"增量后意向分布不正确: {distribution}")
+        activities = (await client.get("/recent-activities", params={"limit": 3})).json()["activities"]
+        if not activities or not activities[0]["content_preview"].startswith("你好"):
+            failures.append(f"最近活动未包含新消息: {activities[:1]}")
+        
+        # ETag
+        response = await client.get("/stats")
+        again = await client.get("/stats", headers={"If-None-Match": response.headers["etag"]})
+        if again.status_code != 304:
+            failures.append(f"If-None-Match 命中时状态码 {again.status_code}")
+        
+        # 对账以数据库为准
+        await metrics.reconcile()
+        stats = (await client.get("/stats")).json()["today"]
+        if stats["conversations"] != db.counts["conversations"]:
+            failures.append(f"对账后对话数 {stats['conversations']} != {db.counts['conversations']}")
+        
+        statements_before = db.statements
+        round_trips_before = redis.round_trips
+        timings = []
+        etags = {}
+        for _ in range(args.polls):
+            for path in ENDPOINTS:
+                headers = {"If-None-Match": etags[path]} if path in etags else {}
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                timings.append(time.perf_counter() - started)
+                etags[path] = response.headers.get("etag", etags.get(path))
+            await asyncio.sleep(args.poll_interval)
+        statements = db.statements - statements_before
+        round_trips = redis.round_trips - round_trips_before
+        
+        # Redis 被清空且数据库故障：对账失败后退避期内改查数据库，不再每次重跑对账
+        redis.data.clear()
+        db.fail = True
+        attempts = 0
+        reconcile = metrics.reconcile
+        
+        async def counted_reconcile():
+            nonlocal attempts
+            attempts += 1
+            return await reconcile()
+        
+        metrics.reconcile = counted_reconcile
+        for _ in range(5):
+            metrics._snapshot = None
+            await client.get("/stats")
+        del metrics.reconcile
+        db.fail = False
+        if attempts != 1:
+            failures.append(f"对账失败后 5 次快照未命中触发了 {attempts} 次对账，应为 1 次")
+    
+    print(
+        f"snapshot p50={percentile(timings, 0.5) * 1000:.2f}ms p95={percentile(timings, 0.95) * 1000:.2f}ms "
+        f"数据库语句={statements} Redis往返={round_trips} "
+        f"（平均 {statistics.mean(timings) * 1000:.2f}ms）"
+    )
+    
+    for failure in failures:
+        print(f"校验失败: {failure}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="仪表板接口基准")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="模拟表行数")
+    parser.add_argument("--scan-us-per-1k", type=float, default=20.0, help="每扫描1000行耗时（微秒）")
+    parser.add_argument("--db-latency", type=float, default=0.001, help="模拟数据库单次往返延迟（秒）")
+    parser.add_argument("--redis-latency", type=float, default=0.0003, help="模拟Redis单次往返延迟（秒）")
+    parser.add_argument("--polls", type=int, default=200, help="轮询轮数（每轮请求四个接口）")
+    parser.add_argument("--poll-interval", type=float, default=0.01, help="两轮轮询间隔（秒）")
+    args = parser.parse_args()
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
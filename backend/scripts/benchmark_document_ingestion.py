@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+长文档读取与分析性能基准
+生成一份多页测试PDF，对比：
+- legacy：整篇读取 + 截断到5万字 + 单次LLM分析（原 process_file_message 流程）
+- full：整篇读取不截断 + 单次LLM分析（120秒超时，对照完整覆盖原文的单次调用）
+- stream：流式分块读取 + 有界并发 map-reduce 分析（DocumentAnalyzer）
+各自在独立进程中运行，统计端到端耗时、峰值RSS和实际送入LLM的原文字数
+
+默认使用模拟LLM（延迟 = 基础延迟 + 按输入token线性增长），加 --real-llm 调用真实模型
+
+用法:
+    python scripts/benchmark_document_ingestion.py [--pages 200] [--real-llm]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import zlib
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LINES_PER_PAGE = 45
+
+
+def make_pdf(path: str, pages: int):
+    """手写最小PDF（Helvetica 文本页），不依赖额外库"""
+    objects = []
+    
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+    
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # 占位，最后回填
+    page_ids = []
+    for p in range(pages):
+        lines = [
+            f"Clause {p + 1}.{i + 1}: The Carrier shall deliver container MSKU{p:04d}{i:03d} "
+            f"to Hamburg within {10 + i % 20} days; freight EUR {1000 + p * 7 + i}."
+            for i in range(LINES_PER_PAGE)
+        ]
+        text = "BT /F1 9 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = zlib.compress(text.encode("latin-1"))
+        content_id = add(
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)
+        ))
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids).encode()
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for i, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objects) + 1, catalog_id, xref
+        ))
+
+
+def install_fake_llm(base_latency: float, per_1k_tokens: float, stats: dict):
+    """替换 chat_completion 为按输入长度模拟延迟的假实现"""
+    import app.core.llm as llm
+    from app.services.document_service import estimate_tokens
+    
+    async def fake_chat_completion(messages, system_prompt=None, **kwargs):
+        prompt = messages[-1]["content"]
+        stats["calls"] += 1
+        stats["input_chars"] += len(prompt)
+        await asyncio.sleep(base_latency + estimate_tokens(prompt) / 1000 * per_1k_tokens)
+        return f"要点摘要（{len(prompt)}字输入）"
+    
+    llm.chat_completion = fake_chat_completion
+
+
+def run_mode(mode: str, pdf_path: str, real_llm: bool, base_latency: float, per_1k: float, queue):
+    """在独立进程中执行一种流程"""
+    stats = {"calls": 0, "input_chars": 0}
+    if not real_llm:
+        install_fake_llm(base_latency, per_1k, stats)
+    
+    from app.services.document_service import document_service
+    from app.services.document_analyzer import document_analyzer
+    
+    build_prompt = lambda name, content: f"请分析文档「{name}」：\n{content}"
+    
+    async def legacy():
+        from app.core.llm import chat_completion
+        doc = await document_service.read_document(pdf_path, "bench.pdf")
+        await chat_completion(messages=[{"role": "user", "content": build_prompt("bench.pdf", doc["content"])}])
+        return {"chunks": 1, "chars": doc["length"]}
+    
+    async def full():
+        from app.core.llm import chat_completion
+        loop = asyncio.get_event_loop()
+        content = await loop.run_in_executor(None, document_service._read_pdf, pdf_path)
+        try:
+            await asyncio.wait_for(
+                chat_completion(messages=[{"role": "user", "content": build_prompt("bench.pdf", content)}]),
+                timeout=120
+            )
+        except asyncio.TimeoutError:
+            return {"chunks": "超时", "chars": len(content)}
+        return {"chunks": 1, "chars": len(content)}
+    
+    async def stream():
+        return await document_analyzer.analyze(pdf_path, "bench.pdf", build_prompt, "")
+    
+    start = time.perf_counter()
+    runners = {"legacy": legacy, "full": full, "stream": stream}
+    result = asyncio.run(runners[mode]())
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((mode, elapsed, peak_kb, result.get("chunks"), result.get("chars"), stats["calls"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长文档读取与分析性能基准")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--modes", default="legacy,full,stream")
+    parser.add_argument("--real-llm", action="store_true", help="调用真实LLM（会产生费用）")
+    parser.add_argument("--base-latency", type=float, default=2.0, help="模拟LLM基础延迟（秒）")
+    parser.add_argument("--per-1k-tokens", type=float, default=0.5, help="模拟LLM每千输入token延迟（秒）")
+    args = parser.parse_args()
+    
+    work_dir = tempfile.mkdtemp(prefix="doc_bench_")
+    pdf_path = os.path.join(work_dir, "bench.pdf")
+    make_pdf(pdf_path, args.pages)
+    print(f"测试PDF: {args.pages} 页, {os.path.getsize(pdf_path) / 1024:.0f}KB")
+    
+    ctx = multiprocessing.get_context("spawn")
+    for mode in args.modes.split(","):
+        queue = ctx.Queue()
+        proc = ctx.Process(
+            target=run_mode,
+            args=(mode, pdf_path, args.real_llm, args.base_latency, args.per_1k_tokens, queue)
+        )
+        proc.start()
+        proc.join()
+        if queue.empty():
+            print(f"{mode:8s} 运行失败 (exit={proc.exitcode})")
+            continue
+        name, elapsed, peak_kb, chunks, chars, calls = queue.get()
+        print(
+            f"{name:8s} 耗时={elapsed:.1f}s 峰值RSS={peak_kb / 1024:.0f}MB "
+            f"分析原文={chars}字 分块={chunks} LLM调用={calls}"
+        )
+
+
+if __name__ == "__main__":
+    main()
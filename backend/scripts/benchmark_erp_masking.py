@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+ERP响应脱敏性能基准
+构造 10k 行订单/发票数据，测量 ERPDataPrivacyService.mask_erp_response 耗时
+
+用法:
+    python scripts/benchmark_erp_masking.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import random
+import sys
+import os
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.privacy_protection import ERPDataPrivacyService
+
+
+def build_payload(rows: int) -> dict:
+    """构造模拟的ERP订单列表响应"""
+    random.seed(42)
+    items = []
+    for i in range(rows):
+        items.append({
+            "id": i,
+            "orderNo": f"SO2024{i:08d}",
+            "customerName": "深圳市某某贸易有限公司",
+            "contactName": "张三丰",
+            "contactPhone": f"13{random.randint(100000000, 999999999)}",
+            "email": f"user{i}@example.com",
+            "address": "广东省深圳市南山区科技园南区某某大厦1001室",
+            "totalAmount": random.uniform(100, 2000000),
+            "fee": random.randint(10, 5000),
+            "currency": "CNY",
+            "status": "shipped",
+            "remark": f"请联系 13812345678 或 ops{i}@example.com，身份证 110101199001011234",
+            "apiToken": "abcdef",
+            "goods": [
+                {"name": "电子配件", "price": 12.5, "quantity": 100},
+                {"name": "包装材料", "price": 3.2, "quantity": 20},
+            ],
+        })
+    return {"code": 200, "data": {"list": items, "total": rows}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ERP响应脱敏性能基准")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    payload = build_payload(args.rows)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        ERPDataPrivacyService.mask_erp_response(payload)
+        timings.append(time.perf_counter() - start)
+    
+    timings.sort()
+    print(f"行数: {args.rows}  重复: {args.repeat}")
+    print(f"最快: {timings[0] * 1000:.1f} ms  中位数: {timings[len(timings) // 2] * 1000:.1f} ms")
+    print(f"每行: {timings[len(timings) // 2] / args.rows * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+小欧间谍完整监控基准
+用桩替换 Serper 搜索（按 --search-latency 延迟，每次返回10条，部分URL跨关键词重复）、
+LLM（按 --llm-latency 延迟，单条返回JSON对象、批量返回JSON数组）和数据库，对比：
+- serial：搜索并发1 + 每条新闻单独调用LLM + 不做规则预筛（等同原流程）
+- batched：并发搜索（限流）+ 规则预筛 + 小批量并发评估
+统计总耗时、LLM调用次数、数据库语句数，并检查入库的重要新闻都经过AI分析（超出 --max-results 的留待下次）
+
+不连接数据库，不调用真实LLM和搜索API
+
+用法:
+    python scripts/benchmark_eu_monitor.py [--search-latency 1.0] [--llm-latency 8.0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TITLES = [
+    "欧盟对华铝型材启动反倾销调查",
+    "德国海关查获走私电子烟",
+    "EU adopts new anti-dumping duties on steel",
+    "欧洲港口本周天气晴好",
+    "某品牌发布新款手机",
+    "荷兰鹿特丹港集装箱吞吐量统计",
+    "欧盟VAT新规明年实施",
+    "European Commission tariff quota review",
+]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def fetchall(self):
+        return self.rows
+
+
+def install_stubs(agent, args, stats):
+    import app.models.database as database_module
+    
+    async def search(query, client=None):
+        stats["searches"] += 1
+        await asyncio.sleep(args.search_latency)
+        rng = random.Random(query)
+        # URL 取自较小的编号空间，模拟不同关键词搜到同一篇新闻
+        return [
+            {
+                "title": rng.choice(TITLES),
+                "content": "该措施将于下月生效，具体以官方公告为准。" if rng.random() < 0.5 else "详情见原文。",
+                "url": f"https://news.example.com/{rng.randrange(120)}",
+                "date": "1小时前",
+                "source": "example",
+            }
+            for _ in range(10)
+        ]
+    
+    async def think(messages, temperature=0.7, context=None):
+        stats["llm_calls"] += 1
+        await asyncio.sleep(args.llm_latency)
+        prompt = messages[-1]["content"]
+        ids = [int(i) for i in re.findall(r"【(\d+)】", prompt)]
+        verdict = {
+            "is_important": True, "importance_score": 75, "urgency": "重要", "news_type": "反倾销",
+            "title_cn": "标题", "summary_cn": "摘要", "affected_countries": ["德国"],
+            "affected_products": ["铝型材"], "impact_analysis": "影响", "business_suggestion": "建议",
+        }
+        if ids:
+            return json.dumps([{**verdict, "id": i} for i in ids], ensure_ascii=False)
+        return json.dumps(verdict, ensure_ascii=False)
+    
+    class Session:
+        async def __aenter__(self):
+            return self
+        
+        async def __aexit__(self, *args):
+            return False
+        
+        async def execute(self, statement, params=None):
+            stats["statements"] += 1
+            await asyncio.sleep(args.db_latency)
+            if "INSERT INTO eu_customs_news" in str(statement):
+                stats["stored"].extend(params)
+            return FakeResult([])
+        
+        async def commit(self):
+            pass
+    
+    async def noop(*args, **kwargs):
+        return {"success": True}
+    
+    agent._search_with_serper = search
+    agent.think = think
+    agent._send_wechat_notification = noop
+    agent.log_live_step = noop
+    agent.log_think = noop
+    agent.log_result = noop
+    agent.log_error = noop
+    database_module.async_session_maker = Session
+
+
+async def run(mode: str, args) -> dict:
+    from app.core.config import settings
+    from app.agents.eu_customs_monitor import EUCustomsMonitorAgent
+    
+    settings.SERPER_API_KEY = "fake"
+    if mode == "serial":
+        settings.EU_MONITOR_SEARCH_CONCURRENCY = 1
+        settings.EU_MONITOR_BATCH_SIZE = 1
+        settings.EU_MONITOR_LLM_CONCURRENCY = 1
+        settings.EU_MONITOR_PREFILTER_SCORE = 0
+    else:
+        settings.EU_MONITOR_SEARCH_CONCURRENCY = args.search_concurrency
+        settings.EU_MONITOR_BATCH_SIZE = args.batch_size
+        settings.EU_MONITOR_LLM_CONCURRENCY = args.llm_concurrency
+        settings.EU_MONITOR_PREFILTER_SCORE = 40
+    
+    agent = EUCustomsMonitorAgent()
+    agent.enable_live_broadcast = False
+    stats = {"searches": 0, "llm_calls": 0, "statements": 0, "stored": []}
+    install_stubs(agent, args, stats)
+    
+    started = time.perf_counter()
+    result = await agent._full_monitor({"max_results": args.max_results})
+    elapsed = time.perf_counter() - started
+    return {"mode": mode, "elapsed": elapsed, **stats, "result": result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="小欧间谍完整监控基准")
+    parser.add_argument("--modes", default="serial,batched")
+    parser.add_argument("--search-latency", type=float, default=1.0, help="单次搜索延迟（秒）")
+    parser.add_argument("--llm-latency", type=float, default=8.0, help="单次LLM调用延迟（秒）")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="模拟数据库单次往返延迟（秒）")
+    parser.add_argument("--search-concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=6)
+    parser.add_argument("--llm-concurrency", type=int, default=3)
+    parser.add_argument("--max-results", type=int, default=30)
+    args = parser.parse_args()
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    
+    failures = []
+    for mode in args.modes.split(","):
+        r = asyncio.run(run(mode, args))
+        result = r["result"]
+        print(
+            f"{r['mode']:8s} 耗时={r['elapsed']:.1f}s 搜索={r['searches']} LLM调用={r['llm_calls']} "
+            f"语句={r['statements']} 入库={result.get('total_news')} 重要={result.get('important_count')} "
+            f"AI分析={result.get('llm_analyzed')} 留待下次={result.get('deferred')}"
+            f"{' 错误=' + result['error'] if result.get('error') else ''}"
+        )
+        # 入库和通知的重要新闻都必须经过AI分析（桩LLM返回的译文标题为"标题"），超出 max_results 的不入库
+        unanalyzed = [row["title"] for row in r["stored"] if row["is_important"] and row["title_cn"] != "标题"]
+        if unanalyzed:
+            failures.append(f"{mode}: {len(unanalyzed)} 条未经AI分析的新闻被标记为重要，如 {unanalyzed[0]}")
+        if result.get("llm_analyzed", 0) > args.max_results:
+            failures.append(f"{mode}: AI分析 {result['llm_analyzed']} 条，超过 max_results={args.max_results}")
+    
+    for failure in failures:
+        print(f"校验失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
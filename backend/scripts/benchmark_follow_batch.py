@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+每日跟进检查基准
+用桩替换小跟（按 --llm-latency 延迟返回跟进内容）、对话历史、跟进提醒通知和数据库，
+对 --customers 位高意向客户执行 daily_follow_check，对比：
+- serial：FOLLOW_CONTENT_CONCURRENCY=1（等同原来逐个生成）
+- concurrent：FOLLOW_CONTENT_CONCURRENCY=--concurrency
+其中1位客户生成时抛异常、1位一直不返回（验证单条超时和失败汇总不影响其他客户）
+
+不连接数据库，不调用真实LLM
+
+用法:
+    python scripts/benchmark_follow_batch.py [--customers 200] [--llm-latency 2.0] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def install_stubs(follow_tasks, args, stats):
+    customers = [
+        {"id": f"c{i}", "name": f"客户{i}", "company": f"公司{i}", "intent_level": "S" if i % 2 else "A",
+         "intent_score": 80, "last_contact_at": None}
+        for i in range(args.customers)
+    ]
+    
+    async def get_customers_need_follow(limit=50):
+        return customers[:limit]
+    
+    async def get_chat_history(customer_id, limit=5):
+        return [{"message_type": "inbound", "content": "海运到汉堡多少钱？"}]
+    
+    async def notify_follow_reminder(customers_to_follow):
+        return {"success": True}
+    
+    async def process(input_data):
+        name = input_data["customer_info"]["name"]
+        stats["llm_calls"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            if name == "客户1":
+                raise RuntimeError("模拟LLM错误")
+            await asyncio.sleep(3600 if name == "客户3" else args.llm_latency)
+            return {"follow_message": f"{name}您好，最近有新的欧洲航线报价"}
+        finally:
+            stats["in_flight"] -= 1
+    
+    class Session:
+        async def __aenter__(self):
+            return self
+        
+        async def __aexit__(self, *args):
+            return False
+        
+        async def execute(self, statement, params=None):
+            stats["inserts"] += 1
+        
+        async def commit(self):
+            pass
+    
+    follow_tasks.conversation_service.get_customers_need_follow = get_customers_need_follow
+    follow_tasks.conversation_service.get_chat_history = get_chat_history
+    follow_tasks.notification_service.notify_follow_reminder = notify_follow_reminder
+    follow_tasks.follow_agent.process = process
+    follow_tasks.async_session_maker = Session
+
+
+async def run(mode: str, args) -> dict:
+    from app.core.config import settings
+    import app.scheduler.follow_tasks as follow_tasks
+    
+    settings.FOLLOW_CHECK_LIMIT = args.customers
+    settings.FOLLOW_CONTENT_MAX_CUSTOMERS = args.customers
+    settings.FOLLOW_CONTENT_CONCURRENCY = 1 if mode == "serial" else args.concurrency
+    settings.FOLLOW_CONTENT_TIMEOUT = args.timeout
+    
+    stats = {"llm_calls": 0, "inserts": 0, "in_flight": 0, "max_in_flight": 0}
+    install_stubs(follow_tasks, args, stats)
+    
+    started = time.perf_counter()
+    await follow_tasks.daily_follow_check()
+    return {"mode": mode, "elapsed": time.perf_counter() - started, **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="每日跟进检查基准")
+    parser.add_argument("--modes", default="serial,concurrent")
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="单次生成跟进内容的延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=10.0, help="单个客户超时（秒）")
+    args = parser.parse_args()
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING", format="{message}")
+    
+    for mode in args.modes.split(","):
+        r = asyncio.run(run(mode, args))
+        print(
+            f"{r['mode']:10s} 耗时={r['elapsed']:.1f}s 生成={r['inserts']} LLM调用={r['llm_calls']} "
+            f"最大并发={r['max_in_flight']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
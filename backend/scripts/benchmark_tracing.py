@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+请求追踪校验与开销基准
+
+校验（TRACING_SAMPLE_RATE=1）：通过 app.main 的应用发起一次模拟的 Maria 工具调用请求，
+请求内依次经过 chat_completion（桩LLM，经 httpx MockTransport 发出请求）、MariaToolExecutor.execute
+（桩Skill，内部查询 SQLite）、一条出错的SQL，检查：
+- 追踪包含 HTTP 入口、llm、http.client、tool、db span，父子关系正确，外部请求不记录查询参数
+- /api/monitoring/traces 返回该追踪和分位数统计，/api/monitoring/traces/{trace_id} 返回全部 span
+- OTLP/JSON 文件写入一行且可解析
+- 采样率为0时不记录任何追踪
+
+开销：每个模拟请求嵌套 --spans 个 span（每个 span 内 await 一次），对比 关闭 / 开启但未采样 / 开启且采样
+三种情况下每个请求的额外耗时
+
+需要 aiosqlite（仅本脚本使用，验证异步引擎事件中的 contextvars 传递）；不连接 PostgreSQL、Redis 和真实LLM
+
+用法:
+    python scripts/benchmark_tracing.py [--requests 2000] [--spans 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def check(failures: list):
+    import httpx
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.core.config import settings
+    from app.core import llm as llm_module
+    from app.core.tracing import tracer, instrument_sqlalchemy
+    from app.agents.maria_tools import MariaToolExecutor
+    from app.main import app
+    
+    export_path = os.path.join(tempfile.mkdtemp(prefix="tracing_"), "traces.jsonl")
+    settings.TRACING_SAMPLE_RATE = 1.0
+    settings.TRACING_EXPORT_FILE = export_path
+    tracer.reset()
+    
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_sqlalchemy(engine)
+    
+    def provider(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"choices": [{"message": {"content": "好的"}}]})
+    
+    class FakeLLM:
+        provider = "fake"
+        
+        async def chat(self, messages, **kwargs):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(provider)) as client:
+                response = await client.post("https://llm.example.com/v1/chat/completions?key=secret", json={})
+                return response.json()["choices"][0]["message"]["content"]
+    
+    class FakeSkill:
+        async def handle(self, tool_name, args, message="", user_id=""):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return {"status": "success", "message": "ok"}
+    
+    llm_module.LLMFactory.get_primary = classmethod(lambda cls: FakeLLM())
+    executor = MariaToolExecutor(agent=None)
+    executor._skill_map = {"search_leads": FakeSkill()}
+    
+    async def maria_turn():
+        await llm_module.chat_completion([{"role": "user", "content": "找几个德国客户"}], agent_name="Maria")
+        await executor.execute("search_leads", {"country": "DE"}, user_id="u1")
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT * FROM no_such_table"))
+        except Exception:
+            pass
+        return {"ok": True}
+    
+    app.add_api_route("/bench/maria-turn", maria_turn, methods=["POST"])
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/bench/maria-turn")
+        data = (await client.get("/api/monitoring/traces")).json()
+        
+        if data["buffered"] != 1 or not data["slowest"]:
+            failures.append(f"缓冲区应有1条追踪: buffered={data['buffered']}")
+            return
+        summary = data["slowest"][0]
+        if summary["name"] != "HTTP POST /bench/maria-turn":
+            failures.append(f"入口 span 名称不正确: {summary['name']}")
+        detail = (await client.get(f"/api/monitoring/traces/{summary['trace_id']}")).json()
+    
+    spans = {span["name"]: span for span in detail["spans"]}
+    expected = [
+        "HTTP POST /bench/maria-turn", "llm.chat_completion", "http.client POST llm.example.com",
+        "tool.search_leads", "db.SELECT",
+    ]
+    for name in expected:
+        if name not in spans:
+            failures.append(f"缺少 span: {name}（实际: {sorted(spans)}）")
+    if failures:
+        return
+    
+    by_id = {span["span_id"]: span for span in detail["spans"]}
+    parents = {
+        "llm.chat_completion": "HTTP POST /bench/maria-turn",
+        "http.client POST llm.example.com": "llm.chat_completion",
+        "tool.search_leads": "HTTP POST /bench/maria-turn",
+    }
+    for child, parent in parents.items():
+        actual = by_id.get(spans[child]["parent_id"], {}).get("name")
+        if actual != parent:
+            failures.append(f"{child} 的父 span 应为 {parent}，实际 {actual}")
+    db_spans = [span for span in detail["spans"] if span["kind"] == "db"]
+    if not any(by_id.get(s["parent_id"], {}).get("name") == "tool.search_leads" for s in db_spans):
+        failures.append("工具内的SQL未挂在 tool span 下")
+    if not any(s["error"] for s in db_spans):
+        failures.append("出错的SQL未标记错误")
+    if "secret" in json.dumps(detail, ensure_ascii=False):
+        failures.append("外部请求的查询参数被记录")
+    for kind in ("llm", "client", "tool", "db"):
+        if kind not in summary["breakdown_ms"]:
+            failures.append(f"耗时汇总缺少 {kind}: {summary['breakdown_ms']}")
+    if "llm.chat_completion" not in data["spans"] or data["spans"]["llm.chat_completion"]["count"] != 1:
+        failures.append(f"span 统计不正确: {data['spans'].get('llm.chat_completion')}")
+    
+    with open(export_path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    if len(lines) != 1:
+        failures.append(f"OTLP 文件应有1行，实际 {len(lines)}")
+    else:
+        otlp_spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        if len(otlp_spans) != len(detail["spans"]):
+            failures.append(f"OTLP span 数 {len(otlp_spans)} != {len(detail['spans'])}")
+    
+    # 采样率为0：不记录
+    settings.TRACING_SAMPLE_RATE = 0.0
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/bench/maria-turn")
+    if tracer.buffered != 1:
+        failures.append(f"采样率为0时仍记录了追踪（buffered={tracer.buffered}）")
+    
+    print(f"校验追踪 {summary['trace_id']}: {len(detail['spans'])} 个span，耗时汇总 {summary['breakdown_ms']}")
+    await engine.dispose()
+
+
+async def overhead(args) -> dict:
+    from app.core.config import settings
+    from app.core.tracing import tracer
+    
+    async def request():
+        with tracer.span("bench.request", kind="server", root=True):
+            for i in range(args.spans):
+                with tracer.span("bench.step", kind="internal", step=i):
+                    await asyncio.sleep(0)
+    
+    settings.TRACING_EXPORT_FILE = None
+    results = {}
+    for mode, enabled, rate in [("关闭", False, 0.0), ("开启未采样", True, 0.0), ("开启并采样", True, 1.0)]:
+        settings.TRACING_ENABLED = enabled
+        settings.TRACING_SAMPLE_RATE = rate
+        tracer.reset()
+        for _ in range(100):
+            await request()
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            await request()
+        results[mode] = (time.perf_counter() - started) / args.requests * 1e6
+    settings.TRACING_ENABLED = True
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="请求追踪校验与开销基准")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--spans", type=int, default=20, help="每个请求内的span数")
+    args = parser.parse_args()
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    
+    failures = []
+    asyncio.run(check(failures))
+    
+    results = asyncio.run(overhead(args))
+    baseline = results["关闭"]
+    print(f"\n每个请求 {args.spans} 个span，{args.requests} 次请求：")
+    for mode, us in results.items():
+        extra = us - baseline
+        print(f"  {mode:8s} {us:8.1f}µs/请求  额外 {extra:7.1f}µs（每个span {extra / (args.spans + 1):.2f}µs）")
+    
+    for failure in failures:
+        print(f"校验失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
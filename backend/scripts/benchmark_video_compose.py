@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+视频合成引擎性能基准
+用 ffmpeg 生成测试片段，配合 assets/bgm 下自带的背景音乐，
+分别用 ffmpeg 快速路径和 moviepy 合成长视频，对比耗时与峰值内存
+
+用法:
+    python scripts/benchmark_video_compose.py [--segments 6] [--seconds 10] [--engines ffmpeg,moviepy]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ffmpeg_composer import get_ffmpeg_binary
+
+BGM_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "bgm")
+
+
+def make_segments(work_dir: str, count: int, seconds: int, size: str) -> list:
+    """生成带音轨的测试视频片段"""
+    paths = []
+    for i in range(count):
+        path = os.path.join(work_dir, f"segment_{i}.mp4")
+        subprocess.run(
+            [
+                get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y",
+                "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=24",
+                "-f", "lavfi", "-i", f"sine=frequency={300 + i * 50}",
+                "-t", str(seconds), "-c:v", "libx264", "-preset", "ultrafast",
+                "-c:a", "aac", path,
+            ],
+            check=True
+        )
+        paths.append(path)
+    return paths
+
+
+def run_engine(engine: str, segments: list, bgm_path: str, tts_path: str, work_dir: str, queue):
+    """在独立进程中执行合成，统计自身及 ffmpeg 子进程的峰值内存"""
+    from app.services.video_processor import VideoProcessor
+    
+    processor = VideoProcessor()
+    output = os.path.join(work_dir, f"output_{engine}.mp4")
+    subtitles = [f"第{i + 1}段 专业物流 全程可控" for i in range(len(segments))]
+    
+    start = time.perf_counter()
+    result = processor._do_compose_long_video(
+        segments, subtitles, tts_path, bgm_path,
+        ["cross_dissolve"] * len(segments), output, engine=engine
+    )
+    elapsed = time.perf_counter() - start
+    
+    peak_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    processor.cleanup()
+    queue.put((engine, result.get("status"), result.get("engine", engine), elapsed, peak_kb))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视频合成引擎性能基准")
+    parser.add_argument("--segments", type=int, default=6)
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--engines", default="ffmpeg,moviepy")
+    args = parser.parse_args()
+    
+    if not get_ffmpeg_binary():
+        print("未找到 ffmpeg，无法运行基准")
+        return
+    
+    bgm_files = sorted(f for f in os.listdir(BGM_DIR) if f.endswith(".mp3"))
+    bgm_path = os.path.join(BGM_DIR, bgm_files[0]) if bgm_files else None
+    tts_path = os.path.join(BGM_DIR, bgm_files[-1]) if len(bgm_files) > 1 else None
+    
+    work_dir = tempfile.mkdtemp(prefix="video_bench_")
+    segments = make_segments(work_dir, args.segments, args.seconds, args.size)
+    print(f"片段: {args.segments} x {args.seconds}s @ {args.size}  BGM: {bgm_path}")
+    
+    ctx = multiprocessing.get_context("spawn")
+    for engine in args.engines.split(","):
+        queue = ctx.Queue()
+        proc = ctx.Process(
+            target=run_engine,
+            args=(engine, segments, bgm_path, tts_path, work_dir, queue)
+        )
+        proc.start()
+        proc.join()
+        if queue.empty():
+            print(f"{engine:8s} 运行失败 (exit={proc.exitcode})")
+            continue
+        name, status, used, elapsed, peak_kb = queue.get()
+        print(f"{name:8s} 状态={status} 实际引擎={used} 耗时={elapsed:.1f}s 峰值RSS={peak_kb / 1024:.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+微信群消息接收吞吐基准
+本地启动模拟WeChatFerry（/api/status、/api/messages，支持 wait 长轮询），
+按突发批次灌入群消息，对比：
+- legacy：每次轮询新建客户端 + 固定1秒间隔 + 每条消息 INSERT/UPDATE/COMMIT + 串行调用处理器（原流程）
+- bulk：WeChatMonitorService 长连接长轮询 + 批量入库 + 并发分发
+统计全部消息入库并处理完成的耗时和吞吐
+
+默认用模拟数据库（每条语句/提交按 --db-latency 延迟），加 --real-db 写入真实数据库
+
+用法:
+    python scripts/benchmark_wechat_ingest.py [--bursts 5] [--burst-size 2000] [--real-db]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GROUPS = [f"{i}@chatroom" for i in range(20)]
+
+
+class FakeWeChatFerry:
+    """模拟消息队列：按突发批次生成群消息，每次请求最多返回 page 条"""
+
+    def __init__(self, page: int):
+        self.page = page
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.requests = 0
+
+    def burst(self, count: int, start: int):
+        with self.cond:
+            for i in range(start, start + count):
+                self.queue.append({
+                    "type": 1,
+                    "is_group": True,
+                    "roomid": GROUPS[i % len(GROUPS)],
+                    "room_name": "欧洲物流交流群",
+                    "sender": f"wxid_{i % 300}",
+                    "sender_name": f"群友{i % 300}",
+                    "content": f"第{i}条：找货代发德国FBA，多少钱？",
+                })
+            self.cond.notify_all()
+
+    def take(self, wait: float) -> list:
+        with self.cond:
+            if not self.queue and wait > 0:
+                self.cond.wait(timeout=wait)
+            count = min(self.page, len(self.queue))
+            return [self.queue.popleft() for _ in range(count)]
+
+
+def make_handler(wcf: FakeWeChatFerry):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/api/status":
+                payload = {"is_login": True}
+            elif url.path == "/api/messages":
+                wcf.requests += 1
+                wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+                payload = {"messages": wcf.take(min(wait, 2.0))}
+            else:
+                payload = {}
+            raw = json.dumps(payload, ensure_ascii=False).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def install_fake_db(latency: float, stats: dict):
+    """替换 async_session_maker：每条语句和每次提交按固定延迟模拟一次数据库往返"""
+    import app.services.wechat_monitor as monitor_module
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return False
+
+        async def execute(self, *args, **kwargs):
+            stats["statements"] += 1
+            await asyncio.sleep(latency)
+
+        async def commit(self):
+            stats["commits"] += 1
+            await asyncio.sleep(latency)
+
+    monitor_module.async_session_maker = FakeSession
+
+
+async def run_legacy(service, total: int, handled: list):
+    """原流程：逐条入库、串行处理"""
+    import httpx
+    import app.services.wechat_monitor as monitor_module
+    from sqlalchemy import text
+
+    while len(handled) < total:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{service.wcf_api_url}/api/messages", timeout=30.0)
+            for raw in response.json().get("messages", []):
+                message = {
+                    "group_id": raw["roomid"], "sender_id": raw["sender"],
+                    "sender_name": raw["sender_name"], "content": raw["content"], "message_type": "text",
+                }
+                async with monitor_module.async_session_maker() as db:
+                    await db.execute(text("INSERT INTO wechat_messages ..."), message)
+                    await db.execute(text("UPDATE wechat_groups ..."), message)
+                    await db.commit()
+                for handler in service.message_handlers:
+                    await handler(message)
+        await asyncio.sleep(1)
+
+
+async def run_bulk(service, total: int, handled: list):
+    listener = asyncio.create_task(service.start_listening())
+    while len(handled) < total:
+        await asyncio.sleep(0.05)
+    service.is_connected = False
+    listener.cancel()
+    await service.close()
+
+
+async def run(mode: str, args) -> dict:
+    from app.services.wechat_monitor import WeChatMonitorService
+
+    wcf = FakeWeChatFerry(page=args.page)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(wcf))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stats = {"statements": 0, "commits": 0}
+    if not args.real_db:
+        install_fake_db(args.db_latency, stats)
+
+    service = WeChatMonitorService()
+    service.wcf_api_url = f"http://127.0.0.1:{server.server_address[1]}"
+    service.is_connected = True
+    service.monitored_groups = {g: {"name": g, "type": "logistics", "keywords": []} for g in GROUPS}
+
+    handled = []
+
+    async def handler(message):
+        # 模拟小析2快速过滤/提交批量分类的开销
+        await asyncio.sleep(args.handler_latency)
+        handled.append(message)
+
+    service.add_message_handler(handler)
+    total = args.bursts * args.burst_size
+
+    async def feeder():
+        for b in range(args.bursts):
+            wcf.burst(args.burst_size, b * args.burst_size)
+            await asyncio.sleep(args.burst_gap)
+
+    start = time.perf_counter()
+    feed = asyncio.create_task(feeder())
+    runner = run_legacy if mode == "legacy" else run_bulk
+    try:
+        await asyncio.wait_for(runner(service, total, handled), timeout=args.timeout)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - start
+    feed.cancel()
+    server.shutdown()
+    return {
+        "mode": mode, "handled": len(handled), "total": total, "elapsed": elapsed,
+        "requests": wcf.requests, **stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="微信群消息接收吞吐基准")
+    parser.add_argument("--modes", default="legacy,bulk")
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--burst-size", type=int, default=2000)
+    parser.add_argument("--burst-gap", type=float, default=2.0, help="突发批次间隔（秒）")
+    parser.add_argument("--page", type=int, default=500, help="每次请求最多返回条数")
+    parser.add_argument("--db-latency", type=float, default=0.001, help="模拟数据库单次往返延迟（秒）")
+    parser.add_argument("--handler-latency", type=float, default=0.002, help="模拟处理器耗时（秒）")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--real-db", action="store_true", help="写入真实数据库")
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        result = asyncio.run(run(mode, args))
+        print(
+            f"{result['mode']:7s} 处理={result['handled']}/{result['total']} "
+            f"耗时={result['elapsed']:.1f}s 吞吐={result['handled'] / result['elapsed']:.0f}条/s "
+            f"轮询请求={result['requests']} 语句={result['statements']} 提交={result['commits']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
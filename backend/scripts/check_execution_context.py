@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+执行上下文并发隔离检查
+AI员工是单例，同一事件循环里并发处理多条消息时，请求级状态不能互相覆盖。
+本脚本用桩替换 LLM / 记忆 / RAG / 数据库，交错并发发起请求，逐条核对：
+- Maria：每次 LLM 调用看到的系统提示词（记忆、RAG）、对话历史都属于本请求的用户
+- Maria：用量记录的 agent_name / user_id / session_id 属于本请求
+- 普通 AI员工：think() 的用量归属到本请求自己的任务会话
+- 所有请求结束后，外层上下文中没有残留状态
+
+不连接数据库，不调用真实LLM
+
+用法:
+    python scripts/check_execution_context.py [--requests 100]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from typing import Any, Dict, List
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def jitter():
+    """随机让出事件循环，制造交错"""
+    await asyncio.sleep(random.uniform(0, 0.01))
+
+
+def user_of(text: str, prefix: str) -> str:
+    """从 'PREFIX:user-n' 标记中取出用户，没有标记时返回空字符串"""
+    marker = prefix + ":"
+    if marker not in text:
+        return ""
+    return text[text.index(marker) + len(marker):].split()[0]
+
+
+class StubLLM:
+    """桩LLM：记录每次调用看到的提示词，按请求内容回复，并走真实的用量记录流程"""
+    
+    def __init__(self, provider: str, calls: List[Dict[str, Any]]):
+        from app.core.llm import BaseLLM
+        
+        self.provider = provider
+        self.model = f"{provider}-model"
+        self.calls = calls
+        # 借用 BaseLLM._record_usage（读取执行上下文）
+        self._record_usage = BaseLLM._record_usage.__get__(self)
+    
+    async def chat_with_tools(self, messages, system_prompt=None, **kwargs):
+        return {"content": await self.chat(messages, system_prompt=system_prompt), "tool_calls": None}
+    
+    async def chat(self, messages, system_prompt=None, **kwargs):
+        from app.core.execution_context import current_context
+        
+        await jitter()
+        prompt = str(system_prompt or "")
+        ctx = current_context()
+        self.calls.append({
+            "provider": self.provider,
+            "prompt": prompt,
+            "messages": [m["content"] for m in messages],
+            "session_id": ctx.session_id,
+            "user_id": ctx.user_id,
+        })
+        await jitter()
+        await self._record_usage(model_name=self.model, input_tokens=100, output_tokens=10, response_time_ms=1)
+        last = messages[-1]["content"]
+        # 回复足够长，避免被"口头承诺"拦截重试
+        return f"REPLY:{user_of(last, 'MSG')} 老板，这是针对你这条消息整理好的答复内容，没有其他需要补充的事项了。"
+
+
+def install_stubs(llm_calls: list, usage_records: list, saved: list):
+    import app.core.llm as llm_module
+    import app.services.ai_usage_service as usage_module
+    import app.services.memory_service as memory_module
+    import app.services.vector_store as vector_module
+    import app.services.email_context_service as email_context_module
+    from app.core.execution_context import current_context
+    
+    primary = StubLLM("stub", llm_calls)
+    reasoning = StubLLM("stub-reasoning", llm_calls)
+    llm_module.LLMFactory.get_primary = classmethod(lambda cls: primary)
+    llm_module.LLMFactory.get_advanced = classmethod(lambda cls: primary)
+    llm_module.LLMFactory.get_for_task = classmethod(lambda cls, task_type: reasoning)
+    
+    async def record_ai_usage(**kwargs):
+        usage_records.append(kwargs)
+    
+    usage_module.record_ai_usage = record_ai_usage
+    
+    class StubMemory:
+        async def get_context_for_llm(self, user_id):
+            await jitter()
+            return f"MEM:{user_id} 偏好"
+        
+        async def recall(self, user_id, key):
+            await jitter()
+            return f"Bot-{user_id}" if key == "bot_name" else None
+        
+        async def detect_correction(self, message):
+            return False
+        
+        async def auto_learn(self, *args, **kwargs):
+            pass
+    
+    class StubVectorStore:
+        async def get_relevant_context(self, user_id, message, top_k=3):
+            await jitter()
+            return f"RAG:{user_id} 历史片段"
+        
+        async def ingest_conversation(self, *args, **kwargs):
+            pass
+    
+    class StubEmailContext:
+        async def build_context_prompt(self, user_id, message):
+            return None
+    
+    memory_module.memory_service = StubMemory()
+    vector_module.vector_store = StubVectorStore()
+    email_context_module.email_context_service = StubEmailContext()
+    
+    from app.agents.assistant_agent import clauwdbot_agent
+    
+    async def load_recent_history(user_id, limit=6):
+        await jitter()
+        return [{"role": "user", "content": f"HIST:{user_id} 之前的消息"}]
+    
+    async def save_interaction(user_id, message, message_type, intent, response):
+        ctx = current_context()
+        saved.append({"user_id": user_id, "response": response, "session_id": ctx.session_id, "trace_id": ctx.trace_id})
+    
+    async def self_verify(user_message, response, conversation):
+        return response
+    
+    clauwdbot_agent.enable_live_broadcast = False
+    clauwdbot_agent._load_recent_history = load_recent_history
+    clauwdbot_agent._save_interaction = save_interaction
+    clauwdbot_agent._self_verify_response = self_verify
+    return clauwdbot_agent
+
+
+def make_worker_agent():
+    """普通AI员工：开始任务会话后多次 think()"""
+    from app.agents.base import BaseAgent
+    
+    class WorkerAgent(BaseAgent):
+        name = "小测"
+        enable_live_broadcast = False
+        
+        def _build_system_prompt(self) -> str:
+            return "你是测试员工"
+        
+        async def process(self, input_data):
+            user = input_data["user"]
+            session_id = await self.start_task_session("check", user)
+            replies = []
+            for _ in range(2):
+                replies.append(await self.think([{"role": "user", "content": f"MSG:{user}"}]))
+                await jitter()
+            await self.end_task_session("完成")
+            return {"user": user, "session_id": session_id, "replies": replies}
+    
+    return WorkerAgent()
+
+
+async def run(args) -> int:
+    from app.core.execution_context import current_context
+    
+    llm_calls, usage_records, saved = [], [], []
+    maria = install_stubs(llm_calls, usage_records, saved)
+    worker = make_worker_agent()
+    
+    async def ask_maria(i: int):
+        user = f"user-{i}"
+        # 偶数请求带"分析"关键词，走复杂任务路由
+        text = f"MSG:{user} {'帮我分析一下' if i % 2 == 0 else '你好'}"
+        return user, await maria.process({"message": text, "user_id": user})
+    
+    jobs = []
+    for i in range(args.requests):
+        jobs.append(ask_maria(i))
+        jobs.append(worker.process({"user": f"worker-{i}"}))
+    random.shuffle(jobs)
+    results = await asyncio.gather(*jobs)
+    
+    errors = []
+    
+    # 1. Maria 回复与交互记录
+    maria_results = [r for r in results if isinstance(r, tuple)]
+    for user, result in maria_results:
+        if not result.get("response", "").startswith(f"REPLY:{user} "):
+            errors.append(f"{user} 回复错乱: {result.get('response', '')[:40]}")
+    
+    sessions_by_user = {}
+    for item in saved:
+        if not item["response"].startswith(f"REPLY:{item['user_id']} "):
+            errors.append(f"{item['user_id']} 保存的回复属于别人")
+        sessions_by_user[item["user_id"]] = item["session_id"]
+    if len({s["trace_id"] for s in saved}) != len(saved):
+        errors.append("不同请求共用了 trace_id")
+    
+    # 2. Maria 每次LLM调用看到的提示词与历史
+    for call in llm_calls:
+        if call["provider"] not in ("stub", "stub-reasoning") or not call["user_id"]:
+            continue
+        if call["user_id"].startswith("worker-"):
+            continue
+        user = call["user_id"]
+        if user_of(call["prompt"], "MEM") != user or user_of(call["prompt"], "RAG") != user:
+            errors.append(f"{user} 的系统提示词混入了其他请求的记忆/RAG")
+        if user_of(call["messages"][0], "HIST") != user or user_of(call["messages"][-1], "MSG") != user:
+            errors.append(f"{user} 的对话历史/消息错乱")
+        if "Bot-" + user not in call["prompt"]:
+            errors.append(f"{user} 的助理名称错乱")
+        expected_provider = "stub-reasoning" if int(user.split("-")[1]) % 2 == 0 else "stub"
+        if call["provider"] != expected_provider:
+            errors.append(f"{user} 的复杂任务判断错乱")
+        if call["session_id"] != sessions_by_user.get(user):
+            errors.append(f"{user} 的LLM调用不在自己的任务会话中")
+    
+    # 3. 用量归属
+    worker_sessions = {r["user"]: str(r["session_id"]) for r in results if isinstance(r, dict)}
+    maria_usage = worker_usage = 0
+    for record in usage_records:
+        extra = record.get("extra_data") or {}
+        user = extra.get("user_id")
+        if record.get("agent_name") == "Maria":
+            maria_usage += 1
+            if record.get("task_type") != "react_turn" or not user:
+                errors.append(f"Maria 用量归属不完整: {record}")
+            elif extra.get("session_id") != str(sessions_by_user.get(user)):
+                errors.append(f"{user} 的用量记到了别的任务会话")
+        elif record.get("agent_name") == "小测":
+            worker_usage += 1
+            if record.get("task_type") != "check":
+                errors.append(f"小测 用量任务类型错误: {record.get('task_type')}")
+            if extra.get("session_id") not in worker_sessions.values():
+                errors.append("小测 用量没有归属到任务会话")
+        else:
+            errors.append(f"用量记录缺少AI员工归属: {record.get('agent_name')}")
+    
+    # 普通员工：每次 think 的会话都必须是发起请求的那个会话
+    for call in llm_calls:
+        user = call["messages"][-1].split(":", 1)[1] if call["messages"][-1].startswith("MSG:worker-") else None
+        if user and str(call["session_id"]) != worker_sessions.get(user):
+            errors.append(f"{user} 的 think() 落在了别的任务会话")
+    
+    # 4. 外层上下文无残留
+    ctx = current_context()
+    if ctx.session_id or ctx.user_id or ctx.agent_name or maria._rag_context or maria._recent_history:
+        errors.append(f"外层上下文有残留: {ctx}")
+    
+    print(
+        f"Maria请求={len(maria_results)} 普通员工请求={len(worker_sessions)} "
+        f"LLM调用={len(llm_calls)} 用量记录={len(usage_records)}（Maria {maria_usage} / 小测 {worker_usage}）"
+    )
+    if errors:
+        print(f"发现 {len(errors)} 处上下文串扰，例如：")
+        for e in errors[:10]:
+            print(f"  - {e}")
+        return 1
+    print("无上下文串扰")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行上下文并发隔离检查")
+    parser.add_argument("--requests", type=int, default=100, help="每类AI员工的并发请求数")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    
+    if args.seed is not None:
+        random.seed(args.seed)
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+腾讯云ASR录音文件识别模拟服务 + 转写任务跟踪器压测
+本地模拟 CreateRecTask / DescribeTaskStatus（任务在随机时长后完成），
+同时提交两批任务，由 TranscriptionTracker 统一跟踪：
+- 轮询模式：统计 DescribeTaskStatus 调用次数（对比旧实现每任务每5秒一次）和完成后被发现的延迟，
+  每个任务的延迟不应超过它完成时的轮询间隔（短任务即最短轮询间隔）
+- 回调模式：任务带 CallbackUrl 提交，完成后模拟服务以表单回调 /api/assistant/meetings/asr-callback
+  （走真实路由和 token 校验），结果应在回调后立即送达，且只有低频兜底轮询
+不写数据库，不调用LLM；检查不通过时退出码非0
+
+用法:
+    python scripts/fake_asr_server.py [--tasks 50] [--min-duration 20] [--max-duration 90] [--callback-delay 0.5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeASRState:
+    """模拟任务表：task_id -> (开始执行时间, 完成时间)"""
+    
+    def __init__(self, min_duration: float, max_duration: float, callback_delay: float):
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.callback_delay = callback_delay
+        self.tasks = {}
+        self.calls = {"CreateRecTask": 0, "DescribeTaskStatus": 0}
+        # task_id -> DescribeTaskStatus 次数
+        self.describes = Counter()
+        # task_id -> 回调地址（未回调的）
+        self.callbacks = {}
+        # 回调投递函数 (url, form) -> HTTP状态码，由压测逻辑设置
+        self.deliver = None
+        self.lock = threading.Lock()
+    
+    def create(self, callback_url: str = None) -> int:
+        with self.lock:
+            task_id = len(self.tasks) + 1
+            now = time.time()
+            self.tasks[task_id] = (now + 2, now + random.uniform(self.min_duration, self.max_duration))
+            if callback_url:
+                self.callbacks[task_id] = callback_url
+            return task_id
+    
+    def result(self, task_id: int) -> str:
+        return f"[0:0.000,0:1.000] 任务{task_id}的转写结果"
+    
+    def describe(self, task_id: int) -> dict:
+        self.describes[task_id] += 1
+        started, finished = self.tasks[task_id]
+        now = time.time()
+        if now >= finished:
+            return {"StatusCode": 2, "Result": self.result(task_id)}
+        return {"StatusCode": 1 if now >= started else 0}
+    
+    def deliver_callbacks(self):
+        """后台线程：任务完成 callback_delay 秒后按腾讯云格式回调"""
+        while True:
+            now = time.time()
+            with self.lock:
+                due = [
+                    (task_id, url) for task_id, url in self.callbacks.items()
+                    if now >= self.tasks[task_id][1] + self.callback_delay
+                ]
+                for task_id, _ in due:
+                    self.callbacks.pop(task_id)
+            for task_id, url in due:
+                form = {"code": "0", "message": "", "requestId": str(task_id), "text": self.result(task_id)}
+                try:
+                    status = self.deliver(url, form)
+                    if status != 200:
+                        print(f"回调返回 {status}: 任务{task_id}")
+                except Exception as e:
+                    print(f"回调失败: 任务{task_id} - {e}")
+            time.sleep(0.05)
+
+
+def make_handler(state: FakeASRState):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            action = self.headers.get("X-TC-Action", "")
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with state.lock:
+                state.calls[action] = state.calls.get(action, 0) + 1
+            if action == "CreateRecTask":
+                data = {"TaskId": state.create(body.get("CallbackUrl"))}
+            elif action == "DescribeTaskStatus":
+                data = state.describe(int(body["TaskId"]))
+            else:
+                data = None
+            payload = {"Response": {"Data": data, "RequestId": "fake"}} if data is not None else {
+                "Response": {"Error": {"Code": "InvalidAction", "Message": action}}
+            }
+            raw = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+        
+        def log_message(self, *args):
+            pass
+    
+    return Handler
+
+
+async def run(args, state: FakeASRState, endpoint: str) -> list:
+    from app.core.config import settings
+    settings.TENCENT_ASR_ENDPOINT = endpoint
+    settings.TENCENT_ASR_CALLBACK_TOKEN = "fake-asr-callback-token"
+    
+    import httpx
+    from fastapi import FastAPI
+    from app.api.assistant_work import router
+    from app.services.speech_recognition_service import SpeechRecognitionService
+    from app.services.transcription_tracker import transcription_tracker as tracker
+    
+    service = SpeechRecognitionService()
+    # 回调路由使用全局跟踪器，指向模拟服务且不写库
+    tracker._service = service
+    tracker.persist = False
+    
+    async def fake_complete(task_id, meeting_id, status, result="", error=None):
+        detected[task_id] = time.time()
+        for future in tracker._waiters.pop(task_id, []):
+            if not future.done():
+                future.set_result({"status": status, "result": result, "error": error})
+    
+    detected = {}
+    tracker.complete = fake_complete
+    
+    # 回调通过 ASGI 直接投递到真实路由（不经过鉴权中间件），在主事件循环中执行
+    app = FastAPI()
+    app.include_router(router, prefix="/api/assistant")
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://asr-callback")
+    loop = asyncio.get_running_loop()
+    
+    def deliver(url, form):
+        response = asyncio.run_coroutine_threadsafe(client.post(url, data=form), loop).result(timeout=10)
+        return response.status_code
+    
+    state.deliver = deliver
+    threading.Thread(target=state.deliver_callbacks, daemon=True).start()
+    
+    failures = []
+    callback_url = f"/api/assistant/meetings/asr-callback?token={settings.TENCENT_ASR_CALLBACK_TOKEN}"
+    
+    # 错误 token 必须被拒绝
+    rejected = await client.post(
+        "/api/assistant/meetings/asr-callback?token=wrong",
+        data={"code": "0", "requestId": "1", "text": "伪造结果"}
+    )
+    if rejected.status_code != 403:
+        failures.append(f"错误token回调应返回403，实际 {rejected.status_code}")
+    
+    start = time.time()
+    modes = {}
+    waits = []
+    for i in range(args.tasks * 2):
+        callback = i % 2 == 1
+        created = await service._create_recognition_task(
+            f"https://example.com/audio/{i}.mp3", "mp3",
+            callback_url=callback_url if callback else None
+        )
+        task_id = f"local-{created['task_id']}"
+        modes[int(created["task_id"])] = "callback" if callback else "polling"
+        tracker.track(task_id, str(created["task_id"]), callback=callback)
+        waits.append(tracker.wait(task_id, timeout=args.max_duration * 3))
+    results = await asyncio.gather(*waits, return_exceptions=True)
+    elapsed = time.time() - start
+    await client.aclose()
+    
+    print(f"任务数={args.tasks}×2（轮询/回调） 总耗时={elapsed:.1f}s")
+    for mode in ("polling", "callback"):
+        task_ids = [tid for tid, m in modes.items() if m == mode]
+        completed = sum(
+            1 for tid, r in zip(modes, results)
+            if modes[tid] == mode and isinstance(r, dict) and r["status"] == "completed"
+        )
+        lags = [
+            detected[f"local-{tid}"] - state.tasks[tid][1]
+            for tid in task_ids if f"local-{tid}" in detected
+        ]
+        calls = sum(state.describes[tid] for tid in task_ids)
+        avg_lag = sum(lags) / len(lags) if lags else float("inf")
+        print(f"[{mode}] 完成={completed}/{len(task_ids)} DescribeTaskStatus 调用={calls}")
+        if lags:
+            print(f"[{mode}] 完成后被发现延迟: 平均={avg_lag:.1f}s 最大={max(lags):.1f}s")
+        if completed != len(task_ids):
+            failures.append(f"[{mode}] 有 {len(task_ids) - completed} 个任务未完成")
+        
+        # 任务时长（从提交算起）
+        durations = {tid: state.tasks[tid][1] - (state.tasks[tid][0] - 2) for tid in task_ids}
+        if mode == "polling":
+            legacy_calls = sum(int(d // 5) + 1 for d in durations.values())
+            print(f"[{mode}] 旧实现每5秒轮询约 {legacy_calls} 次")
+            # 完成时的轮询间隔 = 已运行时长 × backoff_ratio，限制在最短/最长间隔之间
+            late = [
+                tid for tid in task_ids
+                if detected.get(f"local-{tid}", float("inf")) - state.tasks[tid][1] > min(
+                    max(tracker.min_interval, durations[tid] * tracker.backoff_ratio), tracker.max_interval
+                ) + 1
+            ]
+            if late:
+                failures.append(f"[{mode}] {len(late)} 个任务完成后超过一个轮询间隔才被发现")
+        else:
+            if avg_lag > args.callback_delay + 1:
+                failures.append(f"[{mode}] 平均发现延迟 {avg_lag:.1f}s，回调未及时送达")
+            fallback_calls = sum(int(d // tracker.callback_interval) for d in durations.values())
+            if calls > fallback_calls:
+                failures.append(f"[{mode}] 回调模式产生了 {calls} 次轮询查询（兜底轮询应不超过 {fallback_calls} 次）")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="腾讯云ASR模拟服务与转写跟踪器压测")
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--min-duration", type=float, default=20, help="任务最短处理时长（秒）")
+    parser.add_argument("--max-duration", type=float, default=90, help="任务最长处理时长（秒）")
+    parser.add_argument("--callback-delay", type=float, default=0.5, help="任务完成到回调的延迟（秒）")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+    
+    state = FakeASRState(args.min_duration, args.max_duration, args.callback_delay)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"模拟ASR服务: {endpoint}")
+    
+    try:
+        failures = asyncio.run(run(args, state, endpoint))
+    finally:
+        server.shutdown()
+    
+    if failures:
+        print("\n检查未通过:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+可灵AI文生视频模拟服务 + 视频生成任务跟踪器校验
+本地模拟 /v1/videos/text2video 提交和查询接口（校验JWT；同时在途任务超过上限返回429；
+任务在随机时长后完成，提示词含 FAIL 的任务失败、含 SLOW 的任务不会完成），
+通过真实的 KlingVideoProvider 由 VideoJobTracker 跟踪，校验：
+- 批次结果与片段顺序一致，失败片段带错误信息，超时片段为 processing
+- 在途任务数不超过并发上限；提供方上限更低时被限流的片段退避后重新提交
+- 中途中断（模拟进程重启）后同一批次继续跟踪已提交的任务，不重复提交
+- 同一批次重跑时直接复用已生成的片段，只重新提交失败的片段；超过复用期限的片段重新生成
+并输出各批次的提交、查询和限流次数
+
+任务状态保存在内存（替代 video_generation_jobs 表），不连接 PostgreSQL
+
+用法:
+    python scripts/fake_kling_server.py [--segments 8] [--concurrent 3] [--min-duration 1] [--max-duration 3]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ACCESS_KEY = "fake-access-key"
+SECRET_KEY = "fake-secret-key-for-local-testing-only"
+
+
+class FakeKlingState:
+    """模拟任务表：task_id -> (提示词, 提交时间, 完成时间)"""
+    
+    def __init__(self, min_duration: float, max_duration: float, limit: int):
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.limit = limit
+        self.tasks = {}
+        self.calls = {"submit": 0, "query": 0, "rate_limited": 0, "unauthorized": 0}
+        self.max_running = 0
+        self.lock = threading.Lock()
+    
+    def running(self, now: float) -> int:
+        return sum(
+            1 for prompt, _, finished in self.tasks.values()
+            if "FAIL" not in prompt and now < finished
+        )
+    
+    def submit(self, prompt: str):
+        """返回 task_id；在途任务已满时返回 None"""
+        with self.lock:
+            self.calls["submit"] += 1
+            now = time.time()
+            if self.running(now) >= self.limit:
+                self.calls["rate_limited"] += 1
+                return None
+            task_id = f"task-{len(self.tasks) + 1}"
+            finished = float("inf") if "SLOW" in prompt else now + random.uniform(self.min_duration, self.max_duration)
+            self.tasks[task_id] = (prompt, now, finished)
+            self.max_running = max(self.max_running, self.running(now))
+            return task_id
+    
+    def query(self, task_id: str) -> dict:
+        with self.lock:
+            self.calls["query"] += 1
+        prompt, _, finished = self.tasks[task_id]
+        if "FAIL" in prompt:
+            return {"task_status": "failed", "task_status_msg": "内容审核未通过"}
+        if time.time() >= finished:
+            return {
+                "task_status": "succeed",
+                "task_result": {"videos": [{"url": f"https://cdn.example.com/{task_id}.mp4"}]},
+            }
+        return {"task_status": "processing"}
+
+
+def make_handler(state: FakeKlingState):
+    import jwt
+    
+    class Handler(BaseHTTPRequestHandler):
+        def _authorized(self) -> bool:
+            token = self.headers.get("Authorization", "").replace("Bearer ", "", 1)
+            try:
+                claims = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            except jwt.PyJWTError:
+                claims = {}
+            if claims.get("iss") == ACCESS_KEY:
+                return True
+            with state.lock:
+                state.calls["unauthorized"] += 1
+            self._reply(401, {"code": 1000, "message": "unauthorized"})
+            return False
+        
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self._authorized():
+                return
+            task_id = state.submit(body.get("prompt", ""))
+            if task_id is None:
+                self._reply(429, {"code": 1302, "message": "rate limited"})
+            else:
+                self._reply(200, {"code": 0, "data": {"task_id": task_id}})
+        
+        def do_GET(self):
+            if not self._authorized():
+                return
+            task_id = self.path.rsplit("/", 1)[-1]
+            if task_id not in state.tasks:
+                self._reply(404, {"code": 1203, "message": "task not found"})
+            else:
+                self._reply(200, {"code": 0, "data": state.query(task_id)})
+        
+        def _reply(self, status: int, payload: dict):
+            raw = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+        
+        def log_message(self, *args):
+            pass
+    
+    return Handler
+
+
+def make_tracker(endpoint: str, store: dict, **kwargs):
+    """任务状态写入内存 store 的跟踪器（其余逻辑与线上一致）"""
+    from app.services.video_job_tracker import KlingVideoProvider, VideoJobTracker
+    
+    class MemoryJobTracker(VideoJobTracker):
+        async def _load_batch(self, batch_id):
+            now = time.time()
+            return {
+                index: {**row, "age": now - row["updated_at"]}
+                for (b, index), row in store.items() if b == batch_id
+            }
+        
+        async def _save_job(self, job):
+            key = (job["batch_id"], job["segment_index"])
+            previous = store.get(key, {})
+            store[key] = {
+                "task_id": job["task_id"] or previous.get("task_id"),
+                "status": job["status"],
+                "video_url": job["video_url"],
+                "updated_at": time.time(),
+            }
+        
+        async def _touch(self, task_ids):
+            pass
+    
+    provider = KlingVideoProvider(access_key=ACCESS_KEY, secret_key=SECRET_KEY, api_url=endpoint)
+    options = {"min_interval": 0.2, "max_interval": 1.0, "rate_limit_backoff": 0.3, "max_submit_retries": 20}
+    options.update(kwargs)
+    return MemoryJobTracker(provider=provider, **options)
+
+
+def make_batch(name: str, count: int, special: dict = None):
+    items = [{"segment_id": i + 1, "name": name} for i in range(count)]
+    payloads = [
+        {"model": "kling-v1-5", "prompt": f"{name} 片段{i + 1} {(special or {}).get(i, '')}".strip(), "duration": "5"}
+        for i in range(count)
+    ]
+    return items, payloads
+
+
+async def run(args, state: FakeKlingState, endpoint: str, failures: list):
+    store = {}
+    
+    # 1. 正常批次：含一个失败片段
+    state.limit = args.concurrent
+    items, payloads = make_batch("批次A", args.segments, {1: "FAIL"})
+    tracker = make_tracker(endpoint, store, max_concurrent=args.concurrent)
+    progress = []
+    
+    async def on_progress(done, total):
+        progress.append((done, total))
+    
+    start = time.time()
+    results = await tracker.run_batch(items, payloads, on_progress=on_progress)
+    elapsed = time.time() - start
+    
+    if [r["segment_id"] for r in results] != [i["segment_id"] for i in items]:
+        failures.append("结果顺序与片段顺序不一致")
+    statuses = [r["status"] for r in results]
+    if statuses[1] != "failed" or not results[1].get("error"):
+        failures.append(f"FAIL 片段应失败并带错误信息: {results[1]}")
+    if statuses.count("success") != args.segments - 1:
+        failures.append(f"应有 {args.segments - 1} 个片段成功: {statuses}")
+    if any(r["status"] == "success" and not r["video_url"] for r in results):
+        failures.append("成功片段缺少 video_url")
+    if state.max_running > args.concurrent:
+        failures.append(f"在途任务数 {state.max_running} 超过并发上限 {args.concurrent}")
+    if state.calls["rate_limited"] or state.calls["unauthorized"]:
+        failures.append(f"并发上限内不应被限流或鉴权失败: {state.calls}")
+    if not progress or progress[-1] != (args.segments, args.segments):
+        failures.append(f"进度回调不完整: {progress}")
+    
+    print(
+        f"批次A: 片段={args.segments} 并发={args.concurrent} 耗时={elapsed:.1f}s "
+        f"提交={state.calls['submit']} 查询={state.calls['query']}"
+    )
+    
+    # 2. 同一批次重跑：成功片段直接复用，只重新提交失败片段
+    submits = state.calls["submit"]
+    rerun = await tracker.run_batch(items, payloads)
+    if state.calls["submit"] != submits + 1:
+        failures.append(f"重跑应只重新提交失败片段，实际提交 {state.calls['submit'] - submits} 次")
+    reused = [r["video_url"] for r in rerun if r["status"] == "success"]
+    if reused != [r["video_url"] for r in results if r["status"] == "success"]:
+        failures.append("重跑未复用已生成片段的 video_url")
+    
+    # 超过复用期限（视频URL可能已失效）：全部重新提交
+    expired_tracker = make_tracker(endpoint, store, max_concurrent=args.concurrent, reuse_max_age=0.5)
+    await asyncio.sleep(0.5)
+    submits = state.calls["submit"]
+    expired = await expired_tracker.run_batch(items, payloads)
+    if state.calls["submit"] - submits != args.segments:
+        failures.append(f"超过复用期限后应重新提交全部 {args.segments} 个片段，实际 {state.calls['submit'] - submits} 个")
+    if {r["video_url"] for r in expired if r["video_url"]} & set(reused):
+        failures.append("超过复用期限后仍返回了旧的 video_url")
+    
+    # 3. 提供方上限低于跟踪器并发：被限流的片段退避后重新提交
+    state.limit = max(1, args.concurrent - 1)
+    items, payloads = make_batch("批次B", args.segments)
+    limited = state.calls["rate_limited"]
+    results = await make_tracker(endpoint, store, max_concurrent=args.concurrent).run_batch(items, payloads)
+    state.limit = args.concurrent
+    if any(r["status"] != "success" for r in results):
+        failures.append(f"限流后重试的批次应全部成功: {[r.get('error') for r in results]}")
+    print(f"批次B: 提供方上限={max(1, args.concurrent - 1)} 限流={state.calls['rate_limited'] - limited} 次，全部成功")
+    
+    # 4. 中途中断（模拟进程重启），新的跟踪器继续跟踪已提交的任务
+    items, payloads = make_batch("批次C", args.segments)
+    first = make_tracker(endpoint, store, max_concurrent=args.concurrent)
+    task = asyncio.create_task(first.run_batch(items, payloads))
+    batch_id = first.make_batch_id(payloads)
+    while not any(b == batch_id and row["status"] == "submitted" for (b, _), row in store.items()):
+        await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    submitted_before = {row["task_id"] for (b, _), row in store.items() if b == batch_id}
+    
+    submits = state.calls["submit"]
+    results = await make_tracker(endpoint, store, max_concurrent=args.concurrent).run_batch(items, payloads)
+    resubmitted = state.calls["submit"] - submits
+    task_ids = {r["task_id"] for r in results}
+    if not submitted_before <= task_ids:
+        failures.append("重启后未继续跟踪中断前已提交的任务")
+    if resubmitted != args.segments - len(submitted_before):
+        failures.append(f"重启后应只提交剩余 {args.segments - len(submitted_before)} 个片段，实际 {resubmitted}")
+    if any(r["status"] != "success" for r in results):
+        failures.append("重启后继续跟踪的批次应全部成功")
+    print(f"批次C: 中断前已提交 {len(submitted_before)} 个，重启后补交 {resubmitted} 个，全部成功")
+    
+    # 5. 超时：未完成的片段返回 processing
+    items, payloads = make_batch("批次D", 2, {0: "SLOW"})
+    results = await make_tracker(
+        endpoint, store, max_concurrent=args.concurrent, job_timeout=args.max_duration + 1
+    ).run_batch(items, payloads)
+    if [r["status"] for r in results] != ["processing", "success"]:
+        failures.append(f"超时片段应为 processing: {[r['status'] for r in results]}")
+    print(f"批次D: 超时片段状态={results[0]['status']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="可灵AI模拟服务与视频任务跟踪器校验")
+    parser.add_argument("--segments", type=int, default=8)
+    parser.add_argument("--concurrent", type=int, default=3, help="跟踪器并发上限（也是模拟服务的在途上限）")
+    parser.add_argument("--min-duration", type=float, default=1, help="任务最短生成时长（秒）")
+    parser.add_argument("--max-duration", type=float, default=3, help="任务最长生成时长（秒）")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    
+    state = FakeKlingState(args.min_duration, args.max_duration, args.concurrent)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"模拟可灵AI服务: {endpoint}")
+    
+    failures = []
+    try:
+        asyncio.run(run(args, state, endpoint, failures))
+    finally:
+        server.shutdown()
+    
+    for failure in failures:
+        print(f"校验失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
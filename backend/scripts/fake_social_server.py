@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+社交媒体采集模拟站点 + SocialMediaCollector 压测
+本地 HTTP 服务提供小红书/抖音搜索结果页（HTML 夹具，带图片和字体资源）与B站搜索API，
+页面和接口按 --latency 模拟网络延迟；分别以"串行"（单上下文、不拦截资源，等同旧实现）
+和"并发"（上下文池 + 按平台限流 + 资源拦截）两种方式跑 run_collection，统计：
+- 总耗时
+- 图片/字体请求数（拦截后应为0）
+- 素材写入的SQL语句数（批量写入每次采集1条）
+- 未携带登录Cookie的搜索请求数（上下文应预先加载登录状态）
+
+需要 playwright 及 chromium（playwright install chromium）；只测B站时不需要
+不连接数据库，不调用LLM
+
+用法:
+    python scripts/fake_social_server.py [--keywords 8] [--latency 0.5] [--platforms xiaohongshu,douyin,bilibili]
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOGIN_COOKIE = "fake_session"
+ITEMS_PER_PAGE = 6
+
+
+class FakeSite:
+    """模拟站点状态：请求计数"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.counts = {"search": 0, "api": 0, "image": 0, "font": 0, "no_cookie": 0}
+        self.lock = threading.Lock()
+    
+    def hit(self, kind: str):
+        with self.lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+
+def xiaohongshu_page(keyword: str) -> str:
+    notes = "".join(
+        f'<section class="note-item"><a href="/explore/{keyword}-{i}">'
+        f'<img src="/img/xhs/{keyword}-{i}.jpg"></a>'
+        f'<div class="title"><span>{keyword} 笔记 {i}</span></div></section>'
+        for i in range(ITEMS_PER_PAGE)
+    )
+    # 结果由脚本延迟插入，模拟动态加载
+    return f"""<html><head><style>
+@font-face {{ font-family: F; src: url(/font/xhs.woff2); }} body {{ font-family: F; }}
+</style></head><body><div id="feeds"></div>
+<script>setTimeout(function () {{ document.getElementById('feeds').innerHTML = {json.dumps(notes)}; }}, 200);</script>
+</body></html>"""
+
+
+def douyin_page(keyword: str) -> str:
+    # 每个关键词的第0条与小红书夹具共用封面，验证跨平台去重
+    cards = "".join(
+        f'<div class="search-video-card"><img src="/img/{"xhs" if i == 0 else "dy"}/{keyword}-{i}.jpg">'
+        f'<p class="video-title">{keyword} 视频 {i}</p></div>'
+        for i in range(ITEMS_PER_PAGE)
+    )
+    return f"""<html><head><link rel="preload" href="/font/dy.woff2" as="font" crossorigin></head>
+<body>{cards}</body></html>"""
+
+
+def make_handler(site: FakeSite):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [unquote(p) for p in url.path.strip("/").split("/")]
+            
+            if parts[0] == "img":
+                site.hit("image")
+                return self._send(b"\xff\xd8\xff\xd9", "image/jpeg")
+            if parts[0] == "font":
+                site.hit("font")
+                return self._send(b"wOF2", "font/woff2")
+            
+            time.sleep(site.latency)
+            if parts[0] == "api":
+                site.hit("api")
+                keyword = parse_qs(url.query).get("keyword", [""])[0]
+                result = [
+                    {"title": f'<em class="keyword">{keyword}</em> 视频 {i}', "bvid": f"BV{keyword}{i}",
+                     "pic": f"//127.0.0.1:{self.server.server_port}/img/bili/{keyword}-{i}.jpg",
+                     "duration": "1:00", "author": "up", "play": 100, "description": "测试"}
+                    for i in range(ITEMS_PER_PAGE)
+                ]
+                return self._send(json.dumps({"code": 0, "data": {"result": result}}).encode(), "application/json")
+            
+            site.hit("search")
+            if LOGIN_COOKIE not in (self.headers.get("Cookie") or ""):
+                site.hit("no_cookie")
+                return self._send(b"<html><body>login required</body></html>", "text/html")
+            keyword = parse_qs(url.query).get("keyword", [""])[0]
+            if parts[0] == "xhs":
+                return self._send(xiaohongshu_page(keyword).encode(), "text/html; charset=utf-8")
+            return self._send(douyin_page(parts[-1]).encode(), "text/html; charset=utf-8")
+        
+        def _send(self, body: bytes, content_type: str):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    return Handler
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def fetchall(self):
+        return self.rows
+
+
+class FakeDB:
+    """模拟 assets 表：按 file_url 唯一，记录执行的语句"""
+    
+    def __init__(self):
+        self.file_urls = set()
+        self.statements = []
+    
+    def session(self):
+        db = self
+        
+        class Session:
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *args):
+                return False
+            
+            async def execute(self, statement, params=None):
+                sql = str(statement)
+                db.statements.append(sql)
+                if "INSERT INTO assets" in sql:
+                    urls = params["file_urls"]
+                    new = [u for u in urls if u not in db.file_urls]
+                    db.file_urls.update(new)
+                    return FakeResult([(u,) for u in new])
+                return FakeResult([])
+            
+            async def commit(self):
+                pass
+        
+        return Session()
+
+
+async def run(mode: str, args, base_url: str) -> dict:
+    import app.services.asset_ingestion as ingestion_module
+    import app.services.social_collector as collector_module
+    from app.services.social_collector import SocialMediaCollector
+    
+    db = FakeDB()
+    ingestion_module.AsyncSessionLocal = db.session
+    collector_module.AsyncSessionLocal = db.session
+    # 缩略图哈希会下载图片，这里只统计浏览器发出的资源请求
+    ingestion_module.asset_ingestion.phash_enabled = False
+    
+    collector = SocialMediaCollector()
+    platforms = copy.deepcopy(SocialMediaCollector.PLATFORMS)
+    platforms["xiaohongshu"]["search_url"] = base_url + "/xhs/search?keyword={keyword}"
+    platforms["douyin"]["search_url"] = base_url + "/dy/search/{keyword}"
+    platforms["bilibili"]["api_url"] = base_url + "/api/search"
+    if mode == "serial":
+        # 旧实现：逐个平台、逐个关键词，单上下文，不拦截资源
+        for config in platforms.values():
+            config["concurrency"] = 1
+            config["min_interval"] = 0
+        collector.pool.size = 1
+        collector.pool.blocked_resources = set()
+    else:
+        for config in platforms.values():
+            config["min_interval"] = args.min_interval
+    collector.PLATFORMS = platforms
+    
+    async def load_login_state(platform):
+        return [{"name": LOGIN_COOKIE, "value": platform, "domain": "127.0.0.1", "path": "/"}]
+    
+    collector.load_login_state = load_login_state
+    
+    keywords = [f"kw{i}" for i in range(args.keywords)]
+    selected = [p.strip() for p in args.platforms.split(",") if p.strip()]
+    
+    started = time.perf_counter()
+    if mode == "serial":
+        # 平台之间也串行
+        result = {"total_found": 0, "saved": 0}
+        for platform in selected:
+            part = await collector.run_collection(platforms=[platform], keywords=keywords, max_per_platform=ITEMS_PER_PAGE)
+            result["total_found"] += part["total_found"]
+            result["saved"] += part["saved"]
+    else:
+        result = await collector.run_collection(platforms=selected, keywords=keywords, max_per_platform=ITEMS_PER_PAGE)
+    elapsed = time.perf_counter() - started
+    
+    if any(platforms[p].get("browser") for p in selected):
+        await collector.close_browser()
+    
+    return {
+        "elapsed": elapsed,
+        "found": result["total_found"],
+        "saved": result["saved"],
+        "insert_statements": sum(1 for s in db.statements if "INSERT INTO assets" in s),
+    }
+
+
+async def main_async(args) -> int:
+    exit_code = 0
+    for mode in ("serial", "parallel"):
+        site = FakeSite(args.latency)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(site))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            stats = await run(mode, args, f"http://127.0.0.1:{server.server_port}")
+        finally:
+            server.shutdown()
+        
+        print(
+            f"[{mode}] 耗时 {stats['elapsed']:.2f}s，找到 {stats['found']} 个，新写入 {stats['saved']} 个，"
+            f"INSERT 语句 {stats['insert_statements']} 条；"
+            f"搜索页 {site.counts['search']} 次（未带登录Cookie {site.counts['no_cookie']} 次），"
+            f"B站API {site.counts['api']} 次，图片 {site.counts['image']} 次，字体 {site.counts['font']} 次"
+        )
+        if site.counts["no_cookie"]:
+            print("  ✗ 有搜索请求没有携带登录状态")
+            exit_code = 1
+        if mode == "parallel" and (site.counts["image"] or site.counts["font"]):
+            print("  ✗ 图片/字体请求未被拦截")
+            exit_code = 1
+    return exit_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="社交媒体采集模拟站点压测")
+    parser.add_argument("--keywords", type=int, default=8, help="关键词个数")
+    parser.add_argument("--latency", type=float, default=0.5, help="搜索页/API 模拟延迟（秒）")
+    parser.add_argument("--min-interval", type=float, default=0.1, help="并发模式下同一平台请求的最短间隔（秒）")
+    parser.add_argument("--platforms", default="xiaohongshu,douyin,bilibili")
+    args = parser.parse_args()
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
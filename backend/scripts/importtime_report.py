@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+启动导入耗时报告
+在子进程中用 python -X importtime 导入 worker 启动时加载的模块（默认 app.main、app.scheduler、
+app.services.task_queue），重复 --repeat 次取中位数，输出：
+- 总导入耗时、导入模块数、进程峰值内存（ru_maxrss）
+- 耗时最高的顶层依赖包和 app.* 模块（累计耗时）
+- 重型可选依赖（moviepy、playwright、edge-tts、腾讯云SDK、文档库等）及AI员工是否在启动时被加载
+
+加 --compare REV 时用 git worktree 检出该版本，在相同环境下测量并对比（如 --compare HEAD~1）
+
+用法:
+    python scripts/importtime_report.py [--repeat 5] [--top 15] [--compare HEAD~1]
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["app.main", "app.scheduler", "app.services.task_queue"]
+
+# 只在具体功能中使用的重型依赖
+HEAVY_PACKAGES = [
+    "moviepy", "numpy", "imageio", "edge_tts", "playwright", "qcloud_cos", "tencentcloud",
+    "docx", "pptx", "pypdf", "PIL", "caldav", "icalendar", "notion_client", "bs4",
+]
+
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+# -X importtime 只记录经过 __import__ 的导入，importlib.import_module（路由注册、AgentRegistry 延迟加载）
+# 不会出现在输出中；子进程里把绝对导入转给 __import__，保证这些模块也计入报告
+CHILD_CODE = """
+import importlib, resource, sys
+_import_module = importlib.import_module
+def import_module(name, package=None):
+    if name.startswith("."):
+        return _import_module(name, package)
+    __import__(name)
+    return sys.modules[name]
+importlib.import_module = import_module
+for name in {modules!r}:
+    __import__(name)
+print("RSS_KB=%d" % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, file=sys.stderr)
+print("MODULES=" + ",".join(sys.modules), file=sys.stderr)
+"""
+
+
+def measure_once(backend_dir: str, modules) -> dict:
+    """子进程导入一次，解析 -X importtime 输出"""
+    env = dict(os.environ, PYTHONPATH=backend_dir)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_CODE.format(modules=modules)],
+        cwd=backend_dir, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入失败（{backend_dir}）:\n{proc.stderr[-2000:]}")
+    
+    cumulative = {}
+    loaded = set()
+    total_us = 0
+    rss_kb = 0
+    for line in proc.stderr.splitlines():
+        if line.startswith("RSS_KB="):
+            rss_kb = int(line.split("=", 1)[1])
+            continue
+        if line.startswith("MODULES="):
+            loaded = set(line.split("=", 1)[1].split(","))
+            continue
+        match = LINE_RE.match(line)
+        if not match:
+            continue
+        cum_us, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        cumulative[name] = max(cumulative.get(name, 0), cum_us)
+        # 缩进为1的是本次直接导入的模块，累计耗时之和即总耗时
+        if len(indent) == 1:
+            total_us += cum_us
+    return {"total_us": total_us, "rss_kb": rss_kb, "cumulative": cumulative, "loaded": loaded}
+
+
+def measure(backend_dir: str, modules, repeat: int) -> dict:
+    """预热一次（生成 .pyc），再测 repeat 次取中位数"""
+    measure_once(backend_dir, modules)
+    runs = [measure_once(backend_dir, modules) for _ in range(repeat)]
+    names = set().union(*(run["cumulative"] for run in runs))
+    return {
+        "total_us": statistics.median(run["total_us"] for run in runs),
+        "rss_kb": statistics.median(run["rss_kb"] for run in runs),
+        "cumulative": {
+            name: statistics.median(run["cumulative"].get(name, 0) for run in runs) for name in names
+        },
+        "loaded": runs[-1]["loaded"],
+    }
+
+
+def top_modules(result: dict, predicate, limit: int):
+    items = [(name, us) for name, us in result["cumulative"].items() if predicate(name)]
+    return sorted(items, key=lambda item: item[1], reverse=True)[:limit]
+
+
+def print_report(label: str, result: dict, top: int):
+    print(f"\n=== {label} ===")
+    print(
+        f"总导入耗时 {result['total_us'] / 1000:.0f}ms  模块数 {len(result['loaded'])}  "
+        f"峰值内存 {result['rss_kb'] / 1024:.1f}MB"
+    )
+    
+    print("\n耗时最高的顶层依赖包（累计）:")
+    for name, us in top_modules(result, lambda n: "." not in n and not n.startswith(("app", "_")), top):
+        print(f"  {us / 1000:8.1f}ms  {name}")
+    
+    print("\n耗时最高的 app 模块（累计）:")
+    for name, us in top_modules(result, lambda n: n.startswith("app."), top):
+        print(f"  {us / 1000:8.1f}ms  {name}")
+    
+    heavy = [name for name in HEAVY_PACKAGES if name in result["loaded"]]
+    agents = sorted(
+        name for name in result["loaded"]
+        if name.startswith("app.agents.") and name not in ("app.agents.base",)
+    )
+    print(f"\n启动时加载的重型可选依赖: {', '.join(heavy) or '无'}")
+    print(f"启动时加载的AI员工模块: {', '.join(a.rsplit('.', 1)[1] for a in agents) or '无'}")
+
+
+def checkout(rev: str) -> str:
+    """检出 rev 到临时 worktree，返回其 backend 目录"""
+    repo_root = subprocess.run(
+        ["git", "rev-parse", "--show-toplevel"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    worktree = tempfile.mkdtemp(prefix="importtime_")
+    os.rmdir(worktree)
+    subprocess.run(["git", "worktree", "add", "--detach", "-q", worktree, rev], cwd=repo_root, check=True)
+    return os.path.join(worktree, os.path.relpath(BACKEND_DIR, repo_root))
+
+
+def remove_worktree(backend_dir: str):
+    worktree = subprocess.run(
+        ["git", "rev-parse", "--show-toplevel"], cwd=backend_dir, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=BACKEND_DIR, check=False)
+    shutil.rmtree(worktree, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动导入耗时报告")
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULES), help="逗号分隔的启动模块")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--compare", metavar="REV", help="与指定 git 版本对比")
+    args = parser.parse_args()
+    
+    modules = args.modules.split(",")
+    current = measure(BACKEND_DIR, modules, args.repeat)
+    
+    if args.compare:
+        base_dir = checkout(args.compare)
+        try:
+            baseline = measure(base_dir, modules, args.repeat)
+        finally:
+            remove_worktree(base_dir)
+        print_report(f"{args.compare}", baseline, args.top)
+    
+    print_report("当前工作区", current, args.top)
+    
+    if args.compare:
+        print(f"\n=== 对比（{args.compare} -> 当前，中位数 / {args.repeat} 次）===")
+        print(f"总导入耗时 {baseline['total_us'] / 1000:.0f}ms -> {current['total_us'] / 1000:.0f}ms")
+        print(f"模块数     {len(baseline['loaded'])} -> {len(current['loaded'])}")
+        print(f"峰值内存   {baseline['rss_kb'] / 1024:.1f}MB -> {current['rss_kb'] / 1024:.1f}MB")
+        no_longer = sorted(
+            name for name in baseline["loaded"] - current["loaded"]
+            if "." not in name or name.startswith("app.")
+        )
+        print(f"不再在启动时加载: {', '.join(no_longer) or '无'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+数据库连接池隔离压测
+用 SQLite 文件库（aiosqlite）代替 PostgreSQL 主库和只读副本，通过 app.main 的应用发请求：
+- 校验路由：普通 API 请求走 api 池，/api/dashboard/* 的 GET 走 analytics 池并读到副本，
+  analytics 会话中的写操作和加锁读（FOR UPDATE、WITH 中含修改语句）仍走主库，写过之后的读也走主库
+- 压测：--clients 个客户端持续请求一个查询数据库的接口 --duration 秒，分三轮对比 API 延迟
+  - idle：无后台任务
+  - shared：后台任务在 api 池中运行（等同原来所有地方共用一个引擎）
+  - isolated：后台任务在 background 池中运行（定时任务和任务队列的实际配置）
+  后台任务并发 --job-tasks 个会话，每个持有连接 --hold 秒，占满所在连接池
+- 压测期间从 /api/monitoring/db-pools 读取各池的借出数、溢出数和等待时间
+
+isolated 轮的 API p95 超过 idle 轮的3倍+20ms、或校验失败时退出码非0
+需要 aiosqlite；不连接 PostgreSQL 和 Redis
+
+用法:
+    python scripts/loadtest_db_pools.py [--duration 5] [--clients 4] [--job-tasks 30] [--hold 0.5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def configure(args):
+    """在导入 app 之前用环境变量指定数据库和连接池大小"""
+    workdir = tempfile.mkdtemp(prefix="db_pools_")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/primary.db"
+    os.environ["DATABASE_REPLICA_URL"] = f"sqlite+aiosqlite:///{workdir}/replica.db"
+    os.environ["DB_POOL_API_SIZE"] = "5"
+    os.environ["DB_POOL_API_OVERFLOW"] = "10"
+    os.environ["DB_POOL_BACKGROUND_SIZE"] = "3"
+    os.environ["DB_POOL_BACKGROUND_OVERFLOW"] = "5"
+    os.environ["DB_POOL_TIMEOUT"] = str(args.timeout)
+
+
+async def prepare(failures: list):
+    from fastapi import Depends
+    from sqlalchemy import text
+    from app.models.database import engines, current_pool, get_db, db_pool, async_session_maker
+    from app.main import app
+    
+    for name, source in (("api", "primary"), ("analytics", "replica")):
+        async with engines[name].begin() as conn:
+            await conn.execute(text("CREATE TABLE marker (source TEXT)"))
+            await conn.execute(text("INSERT INTO marker VALUES (:source)"), {"source": source})
+    
+    async def ping(db=Depends(get_db)):
+        row = (await db.execute(text("SELECT source FROM marker LIMIT 1"))).first()
+        return {"pool": current_pool(), "source": row[0]}
+    
+    app.add_api_route("/bench/ping", ping, methods=["GET"])
+    app.add_api_route("/api/dashboard/_bench", ping, methods=["GET"])
+    
+    # analytics 会话中的写操作应写主库，写过之后会话固定走主库
+    with db_pool("analytics"):
+        async with async_session_maker() as db:
+            source = (await db.execute(text("SELECT source FROM marker"))).scalar()
+            await db.execute(text("INSERT INTO marker VALUES ('written')"))
+            after_write = (await db.execute(text("SELECT source FROM marker LIMIT 1"))).scalar()
+            await db.commit()
+        # SQLite 不支持加锁读和 WITH 中的修改语句，只检查路由结果
+        for sql in (
+            "SELECT source FROM marker LIMIT 1 FOR UPDATE",
+            "WITH moved AS (DELETE FROM marker RETURNING source) SELECT source FROM moved",
+        ):
+            async with async_session_maker() as db:
+                bind = db.sync_session.get_bind(clause=text(sql))
+            if bind is not engines["api"].sync_engine:
+                failures.append(f"analytics 会话中的语句应走主库: {sql}")
+    if source != "replica":
+        failures.append(f"analytics 会话的查询应读副本，实际读到 {source}")
+    if after_write != "primary":
+        failures.append(f"analytics 会话写过之后的查询应读主库，实际读到 {after_write}")
+    for name, expected in (("api", 1), ("analytics", 0)):
+        async with engines[name].connect() as conn:
+            count = (await conn.execute(text("SELECT COUNT(*) FROM marker WHERE source = 'written'"))).scalar()
+        if count != expected:
+            failures.append(f"analytics 会话的写操作应只写主库（{name} 中有 {count} 条）")
+    return app
+
+
+async def saturate(stop: asyncio.Event, args):
+    """后台任务：--job-tasks 个会话轮流持有连接，占满所在连接池"""
+    from sqlalchemy import text
+    from app.models.database import async_session_maker
+    
+    async def hold_connection():
+        while not stop.is_set():
+            async with async_session_maker() as db:
+                await db.execute(text("SELECT 1"))
+                await asyncio.sleep(args.hold)
+    
+    await asyncio.gather(*(hold_connection() for _ in range(args.job_tasks)), return_exceptions=True)
+
+
+async def run_round(client, mode: str, args) -> dict:
+    from app.models.database import with_db_pool
+    
+    stop = asyncio.Event()
+    job = None
+    if mode != "idle":
+        job_pool = "api" if mode == "shared" else "background"
+        job = asyncio.create_task(with_db_pool(job_pool)(saturate)(stop, args))
+        await asyncio.sleep(args.hold)  # 等后台任务占满连接池
+    
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+    
+    async def api_client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get("/bench/ping")
+            if response.status_code == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors += 1
+    
+    await asyncio.gather(*(api_client() for _ in range(args.clients)))
+    pools = (await client.get("/api/monitoring/db-pools")).json()["pools"]
+    
+    stop.set()
+    if job:
+        await job
+    
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50": statistics.median(latencies) if latencies else float("inf"),
+        "p95": latencies[int(len(latencies) * 0.95)] if latencies else float("inf"),
+        "max": latencies[-1] if latencies else float("inf"),
+        "pools": pools,
+    }
+
+
+async def run(args, failures: list) -> list:
+    import httpx
+    
+    app = await prepare(failures)
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        plain = (await client.get("/bench/ping")).json()
+        dashboard = (await client.get("/api/dashboard/_bench")).json()
+        if plain != {"pool": "api", "source": "primary"}:
+            failures.append(f"普通请求应走 api 池读主库，实际 {plain}")
+        if dashboard != {"pool": "analytics", "source": "replica"}:
+            failures.append(f"仪表板请求应走 analytics 池读副本，实际 {dashboard}")
+        
+        for mode in ("idle", "shared", "isolated"):
+            results.append(await run_round(client, mode, args))
+    
+    from app.models.database import dispose_engines
+    await dispose_engines()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库连接池隔离压测")
+    parser.add_argument("--duration", type=float, default=5.0, help="每轮压测时长（秒）")
+    parser.add_argument("--clients", type=int, default=4, help="并发API客户端数")
+    parser.add_argument("--job-tasks", type=int, default=30, help="后台任务并发会话数")
+    parser.add_argument("--hold", type=float, default=0.5, help="后台任务每次持有连接的时间（秒）")
+    parser.add_argument("--timeout", type=int, default=10, help="获取连接超时（秒）")
+    args = parser.parse_args()
+    
+    configure(args)
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    
+    failures = []
+    results = asyncio.run(run(args, failures))
+    
+    print(f"{args.clients} 个API客户端 × {args.duration:.0f}s，后台任务 {args.job_tasks} 个会话各持有连接 {args.hold}s")
+    for r in results:
+        print(
+            f"\n{r['mode']:9s} 请求={r['requests']:5d} 失败={r['errors']} "
+            f"p50={r['p50']:.1f}ms p95={r['p95']:.1f}ms max={r['max']:.1f}ms"
+        )
+        for name, pool in r["pools"].items():
+            print(
+                f"  {name:10s} 借出={pool['checked_out']:2d} 溢出={pool['overflow']:2d} "
+                f"等待avg={pool['wait_ms']['avg']:.1f}ms p95={pool['wait_ms']['p95']:.1f}ms "
+                f"max={pool['wait_ms']['max']:.1f}ms 超时={pool['timeouts']}"
+            )
+    
+    idle = results[0]
+    isolated = results[2]
+    if isolated["errors"] or isolated["p95"] > idle["p95"] * 3 + 20:
+        failures.append(
+            f"后台任务占满 background 池时 API 延迟上升: p95 {idle['p95']:.1f}ms -> {isolated['p95']:.1f}ms，"
+            f"失败 {isolated['errors']}"
+        )
+    
+    for failure in failures:
+        print(f"校验失败: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+-- 043_add_video_generation_jobs.sql
+-- 视频生成任务跟踪表（可灵AI片段任务状态持久化，支持重启恢复与批次复用）
+
+CREATE TABLE IF NOT EXISTS video_generation_jobs (
+    id SERIAL PRIMARY KEY,
+    batch_id VARCHAR(64) NOT NULL,             -- 批次ID（按提交内容哈希）
+    segment_index INTEGER NOT NULL,            -- 片段序号
+    task_id VARCHAR(100),                      -- 提供方任务ID
+    status VARCHAR(20) NOT NULL DEFAULT 'pending', -- pending/submitted/succeed/failed/timeout
+    video_url TEXT,                            -- 生成结果URL
+    error TEXT,                                -- 错误信息
+    payload JSONB,                             -- 提交参数
+    submitted_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_polled_at TIMESTAMP WITH TIME ZONE,   -- 最近一次被轮询的时间
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (batch_id, segment_index)
+);
+
+-- 恢复在途任务时按状态查询
+CREATE INDEX IF NOT EXISTS idx_video_generation_jobs_status
+ON video_generation_jobs(status, last_polled_at)
+WHERE status = 'submitted';
+
+CREATE INDEX IF NOT EXISTS idx_video_generation_jobs_task_id
+ON video_generation_jobs(task_id);
+
+COMMENT ON TABLE video_generation_jobs IS '视频生成任务跟踪（可灵AI）';
+
+SELECT '视频生成任务跟踪表创建完成' AS message;
@@ -0,0 +1,32 @@
+-- 044_add_parsed_document_cache.sql
+-- 已解析文档缓存索引（内容存本地磁盘，按文件 sha256 寻址）
+
+CREATE TABLE IF NOT EXISTS parsed_documents (
+    content_hash CHAR(64) PRIMARY KEY,         -- 文件内容 sha256
+    file_name VARCHAR(500),                    -- 首次解析时的文件名
+    file_ext VARCHAR(20),                      -- 扩展名
+    file_size BIGINT DEFAULT 0,                -- 原文件大小（字节）
+    char_count INTEGER DEFAULT 0,              -- 提取文本字数
+    page_count INTEGER DEFAULT 0,              -- 页数（非PDF为段落分组数）
+    hit_count INTEGER DEFAULT 0,               -- 缓存命中次数
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_accessed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 来源映射：邮件附件、企业微信文件等 → 内容哈希（再次分析时免下载）
+CREATE TABLE IF NOT EXISTS document_sources (
+    source_type VARCHAR(20) NOT NULL,          -- email / wechat
+    source_id VARCHAR(200) NOT NULL,           -- 来源ID（如 email_cache.id）
+    file_name VARCHAR(500) NOT NULL,           -- 原始文件名
+    content_hash CHAR(64) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source_type, source_id, file_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_document_sources_hash
+ON document_sources(content_hash);
+
+COMMENT ON TABLE parsed_documents IS '已解析文档缓存索引';
+COMMENT ON TABLE document_sources IS '文档来源到内容哈希的映射';
+
+SELECT '已解析文档缓存表创建完成' AS message;
@@ -0,0 +1,22 @@
+-- 045_add_transcription_tracking.sql
+-- 语音转写任务跟踪字段（集中轮询、回调模式与重启恢复）
+
+ALTER TABLE speech_transcription_tasks
+ADD COLUMN IF NOT EXISTS last_polled_at TIMESTAMP WITH TIME ZONE;   -- 最近一次被轮询的时间
+
+ALTER TABLE speech_transcription_tasks
+ADD COLUMN IF NOT EXISTS callback_mode BOOLEAN DEFAULT FALSE;       -- 是否配置了腾讯云回调
+
+-- 恢复在途任务时按状态查询
+CREATE INDEX IF NOT EXISTS idx_speech_transcription_tasks_processing
+ON speech_transcription_tasks(last_polled_at)
+WHERE status = 'processing';
+
+-- 回调按腾讯云任务ID查找
+CREATE INDEX IF NOT EXISTS idx_speech_transcription_tasks_tencent_task_id
+ON speech_transcription_tasks(tencent_task_id);
+
+COMMENT ON COLUMN speech_transcription_tasks.last_polled_at IS '最近一次被跟踪器轮询的时间';
+COMMENT ON COLUMN speech_transcription_tasks.callback_mode IS '是否由腾讯云回调通知结果';
+
+SELECT '语音转写任务跟踪字段添加完成' AS message;
@@ -0,0 +1,7 @@
+-- 046_add_ai_usage_cached_tokens.sql
+-- AI用量日志记录提示词缓存命中的输入tokens（已包含在 input_tokens 中）
+-- 写入缓存的tokens（Anthropic cache_creation）记录在 extra_data.cache_write_tokens
+
+ALTER TABLE ai_usage_logs ADD COLUMN IF NOT EXISTS cached_tokens INTEGER NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN ai_usage_logs.cached_tokens IS '命中提示词前缀缓存的输入token数';
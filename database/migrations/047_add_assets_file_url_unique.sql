@@ -0,0 +1,47 @@
+-- 047_add_assets_file_url_unique.sql
+-- 素材按 file_url 去重（采集结果批量 INSERT ... ON CONFLICT (file_url) DO NOTHING）
+
+-- 历史重复素材合并到最早的一条：使用次数累加，保留行缺失的字段用重复行补齐，再删除重复行
+CREATE TEMP TABLE asset_duplicates AS
+SELECT id, keep_id
+FROM (
+    SELECT id,
+           FIRST_VALUE(id) OVER (PARTITION BY file_url ORDER BY created_at NULLS LAST, id::text) AS keep_id
+    FROM assets
+    WHERE file_url IS NOT NULL
+) ranked
+WHERE id <> keep_id;
+
+UPDATE assets a
+SET usage_count = COALESCE(a.usage_count, 0) + m.usage_count,
+    thumbnail_url = COALESCE(a.thumbnail_url, m.thumbnail_url),
+    duration = COALESCE(a.duration, m.duration),
+    file_size = CASE WHEN COALESCE(a.file_size, 0) = 0 THEN m.file_size ELSE a.file_size END,
+    source_platform = COALESCE(a.source_platform, m.source_platform),
+    source_url = COALESCE(a.source_url, m.source_url),
+    updated_at = GREATEST(a.updated_at, m.updated_at)
+FROM (
+    SELECT d.keep_id,
+           SUM(COALESCE(b.usage_count, 0)) AS usage_count,
+           MAX(b.thumbnail_url) AS thumbnail_url,
+           MAX(b.duration) AS duration,
+           MAX(b.file_size) AS file_size,
+           MAX(b.source_platform) AS source_platform,
+           MAX(b.source_url) AS source_url,
+           MAX(b.updated_at) AS updated_at
+    FROM asset_duplicates d
+    JOIN assets b ON b.id = d.id
+    GROUP BY d.keep_id
+) m
+WHERE a.id = m.keep_id;
+
+DELETE FROM assets a
+USING asset_duplicates d
+WHERE a.id = d.id;
+
+DROP TABLE asset_duplicates;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_assets_file_url_unique
+ON assets(file_url);
+
+SELECT '素材 file_url 唯一索引添加完成' AS message;
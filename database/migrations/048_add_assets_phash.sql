@@ -0,0 +1,37 @@
+-- 048_add_assets_phash.sql
+-- 素材入库服务：URL 去重键、缩略图感知哈希（近似重复去重）
+
+-- 社交媒体采集写入的描述（此前迁移中缺少该字段）
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS description TEXT;
+
+-- 规范化后的 URL（去掉跟踪参数等），只用于去重；file_url 保存采集到的原始URL
+-- 历史素材为 NULL（唯一索引允许多个 NULL），仍由 file_url 唯一索引去重
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS url_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_assets_url_key_unique
+ON assets(url_key);
+
+-- 缩略图 64 位 dHash（有符号 BIGINT 存储），无缩略图或下载失败时为 NULL
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS phash BIGINT;
+
+-- 哈希按8位一段分成8段：第 i 段为 i * 256 + 该段值
+-- 汉明距离不超过7的两个哈希至少有一段相同，入库时按段查候选（GIN 索引），不逐行计算距离
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS phash_bands INTEGER[];
+
+UPDATE assets
+SET phash_bands = ARRAY(
+    SELECT i * 256 + CAST((phash >> (i * 8)) & 255 AS integer)
+    FROM generate_series(0, 7) AS i
+)
+WHERE phash IS NOT NULL AND phash_bands IS NULL;
+
+DROP INDEX IF EXISTS idx_assets_phash;
+
+CREATE INDEX IF NOT EXISTS idx_assets_phash_bands
+ON assets USING GIN (phash_bands);
+
+COMMENT ON COLUMN assets.url_key IS '规范化URL（去重键），file_url 为原始URL';
+COMMENT ON COLUMN assets.phash IS '缩略图感知哈希（dHash），汉明距离小于阈值视为同一素材';
+COMMENT ON COLUMN assets.phash_bands IS '感知哈希的8个分段桶，用于查找近似素材候选';
+
+SELECT '素材去重键和感知哈希字段添加完成' AS message;
@@ -0,0 +1,38 @@
+-- 049_add_list_keyset_indexes.sql
+-- 线索/客户列表：游标分页复合索引 + 多列 trigram 搜索索引
+-- 搜索表达式必须与 app/core/pagination.py 的 search_expression 拼接结果完全一致，否则规划器不会使用索引
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ========================================
+-- 1. leads 表
+-- ========================================
+-- 游标分页：ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_leads_created_id
+ON leads(created_at DESC, id DESC);
+
+-- 名称/公司/电话/邮箱模糊搜索
+CREATE INDEX IF NOT EXISTS idx_leads_search_trgm
+ON leads USING gin (
+    (coalesce(name, '') || ' ' || coalesce(company, '') || ' ' || coalesce(phone, '') || ' ' || coalesce(email, ''))
+    gin_trgm_ops
+);
+
+-- ========================================
+-- 2. customers 表
+-- ========================================
+-- 游标分页：ORDER BY intent_score DESC, created_at DESC, id DESC（仅有效客户）
+CREATE INDEX IF NOT EXISTS idx_customers_active_score_created_id
+ON customers(intent_score DESC, created_at DESC, id DESC)
+WHERE is_active = true;
+
+-- 名称/电话/公司模糊搜索
+CREATE INDEX IF NOT EXISTS idx_customers_search_trgm
+ON customers USING gin (
+    (coalesce(name, '') || ' ' || coalesce(phone, '') || ' ' || coalesce(company, ''))
+    gin_trgm_ops
+);
+
+-- 更新统计信息（count=estimated 依赖查询计划的估算行数）
+ANALYZE leads;
+ANALYZE customers;
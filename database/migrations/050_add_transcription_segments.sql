@@ -0,0 +1,19 @@
+-- 050_add_transcription_segments.sql
+-- 长会议录音分段转写：分段任务关联到会议，进程重启后由定时任务拼接完成
+
+ALTER TABLE speech_transcription_tasks
+ADD COLUMN IF NOT EXISTS segment_meeting_id UUID REFERENCES meeting_records(id) ON DELETE CASCADE;   -- 所属会议（分段任务）
+
+ALTER TABLE speech_transcription_tasks
+ADD COLUMN IF NOT EXISTS segment_index INTEGER;                     -- 分段序号（从0开始）
+
+-- 按会议查找分段任务
+CREATE INDEX IF NOT EXISTS idx_speech_transcription_tasks_segment_meeting
+ON speech_transcription_tasks(segment_meeting_id)
+WHERE segment_meeting_id IS NOT NULL;
+
+COMMENT ON COLUMN speech_transcription_tasks.segment_meeting_id IS '分段转写所属会议（meeting_id 为空，避免每段单独更新会议记录）';
+COMMENT ON COLUMN speech_transcription_tasks.segment_index IS '分段序号，分段起止时间记录在 meeting_records.metadata.segment_plan';
+COMMENT ON COLUMN meeting_records.transcription_status IS 'pending/processing/summarizing（分段转写收尾中）/completed/failed';
+
+SELECT '语音转写分段字段添加完成' AS message;